@@ -878,9 +878,11 @@ public function generateExpiredPredictions(Request $request)
                 
                 $startTime = microtime(true);
                 try {
-                    $response = Http::timeout(900)->post($this->getExpiredPredictionServiceUrl() . '/predict-expiration-batch', [
-                        'bahan_list' => $bahanDataList
-                    ]);
+                    $response = Http::timeout(900)
+                        ->withHeaders(['X-Request-Timeout' => 900])
+                        ->post($this->getExpiredPredictionServiceUrl() . '/predict-expiration-batch', [
+                            'bahan_list' => $bahanDataList
+                        ]);
                     
                     $elapsedTime = round(microtime(true) - $startTime, 2);
                     Log::info('Python service response received', [
@@ -1447,9 +1449,11 @@ public function smartUpdateExpiredPrediction($idBahan)
             // Call Python service for single prediction
             // Use shorter timeout to prevent PHP execution timeout (60s limit)
             try {
-                $response = Http::timeout(15)->post($this->getExpiredPredictionServiceUrl() . '/predict-expiration', [
-                    'bahan' => $bahanData
-                ]);
+                $response = Http::timeout(15)
+                    ->withHeaders(['X-Request-Timeout' => 15])
+                    ->post($this->getExpiredPredictionServiceUrl() . '/predict-expiration', [
+                        'bahan' => $bahanData
+                    ]);
 
                 if (!$response->successful()) {
                     Log::warning('Python service returned error for smart update', [
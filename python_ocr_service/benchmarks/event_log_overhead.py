@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+"""Request-thread cost of diagnostics at batch scale: the old print() trail
+of one expiry prediction versus the structured event log.
+
+Each "item" emits what predict_expiration used to print (banners, prompt
+length, response preview, parse steps, final summary) or the events that
+replaced them. Output goes to a real file so buffering and writes are part
+of the measurement.
+
+    python benchmarks/event_log_overhead.py --items 500 --threads 4
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from event_log import EventLogger  # noqa: E402
+
+RESPONSE = json.dumps({
+    'estimasi_hari': 180,
+    'reason': 'Minyak Goreng adalah bahan pokok yang tahan lama. Minyak Goreng dapat bertahan sekitar '
+              '180 hari jika disimpan di tempat yang sejuk dan kering.',
+    'confidence': 90,
+})
+
+
+def legacy_item(idx: int):
+    """The print trail of one item before the event log (abridged)."""
+    print(f"\n[{idx}] Memproses: Minyak Goreng (Bahan Pokok)")
+    print(f"[DATA] Stok: 20 liter, ID: {idx}")
+    print(f"[DATA] Data lengkap: ['id_bahan', 'nama_bahan', 'kategori', 'stok_bahan', 'satuan']")
+    print(f"\n{'#'*80}")
+    print(f"# PREDIKSI EXPIRED: Minyak Goreng (Bahan Pokok)")
+    print(f"{'#'*80}")
+    print(f"Waktu mulai: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"\n[PROCESS] Prompt dibuat (attempt 1/3)")
+    print(f"[PROCESS] Panjang prompt: 2841 karakter")
+    print(f"\n{'='*80}")
+    print(f"[OLLAMA API] Memanggil Ollama API (Attempt 1/2)...")
+    print(f"[OLLAMA API] Model: gemma3:1b")
+    print(f"[OLLAMA API] Timeout: 240s")
+    print(f"{'='*80}")
+    print(f"[OLLAMA API] Response diterima dalam 1.23 detik")
+    print(f"[OLLAMA API] Response length: {len(RESPONSE)} karakter")
+    print(f"[OLLAMA API] Response preview: {RESPONSE[:100]}...")
+    print(f"\n[PARSING] Memproses hasil untuk kategori: Bahan Pokok")
+    print(f"[PARSING] Response AI: {RESPONSE[:200]}...")
+    print(f"[PARSING] JSON ditemukan dengan pattern matching (Method 1)")
+    print(f"[PARSING] JSON yang ditemukan: {RESPONSE}")
+    print(f"[PARSING] JSON berhasil di-parse")
+    print(f"[PARSING] Menggunakan estimasi_hari dari AI: 180 hari")
+    print(f"[PARSING] expired_date dihitung: 2026-04-17 = 2025-10-19 + 180 hari")
+    print(f"[PARSING] Konsistensi OK: reason 180 hari, estimasi_hari 180 hari (selisih 0 hari)")
+    print(f"[PARSING] Tanggal valid: 2026-04-17 (180 hari dari terakhir update, 180 hari dari sekarang)")
+    print(f"[PARSING] Confidence: 90.0%")
+    print(f"[PARSING] Reason: {json.loads(RESPONSE)['reason']}")
+    print(f"\n[PARSING] HASIL AKHIR:")
+    print(f"  - Tanggal Expired: 2026-04-17")
+    print(f"  - Total Hari: 180 hari")
+    print(f"  - Confidence: 90.0%")
+    print(f"  - Reason: {json.loads(RESPONSE)['reason']}")
+    print(f"{'='*80}\n")
+    print(f"[PROCESS] [OK] Prediksi selesai untuk Bahan Pokok (attempt 1)")
+    print(f"[PROCESS] Waktu selesai: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"[{idx}] [OK] Berhasil: 2026-04-17 (180 hari) - 1.3s")
+
+
+def make_event_item(events: EventLogger) -> Callable[[int], None]:
+    """The events the same item emits now (INFO and DEBUG ones)."""
+
+    def item(idx: int):
+        events.debug("expiry.predict.start", nama_bahan='Minyak Goreng', kategori='Bahan Pokok')
+        events.debug("ollama.request", model='gemma3:1b', attempt=1, attempts=2, timeout=240.0,
+                     prompt_chars=2841, context=False)
+        events.info("ollama.response", model='gemma3:1b', attempt=1, elapsed=1.23,
+                    response_chars=len(RESPONSE), prompt_eval_count=712, eval_count=64)
+        events.debug("ollama.response_preview", preview=lambda: RESPONSE[:100])
+        events.debug("expiry.parse.start", kategori='Bahan Pokok', response=lambda: RESPONSE[:200])
+        events.debug("expiry.parse.json_found", method=1)
+        events.debug("expiry.parse.result", kategori='Bahan Pokok', expired_date='2026-04-17', days=180,
+                     reason=json.loads(RESPONSE)['reason'], confidence=90.0, days_from_today=180)
+        events.info("expiry.predict.done", nama_bahan='Minyak Goreng', attempts=1, days=180, elapsed=1.3)
+        events.debug("expiry.batch.item", index=idx, items=0, nama_bahan='Minyak Goreng', success=True, elapsed=1.3)
+
+    return item
+
+
+def run(label: str, item: Callable[[int], None], items: int, threads: int, flush: Callable[[], None]) -> Dict:
+    per_thread = max(1, items // threads)
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(offset: int):
+        local = []
+        for idx in range(offset, offset + per_thread):
+            start = time.perf_counter()
+            item(idx)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+
+    wall_start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    request_wall = time.perf_counter() - wall_start
+    flush()
+    drain_wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        'mode': label,
+        'items': len(latencies),
+        'per_item_us_p50': round(latencies[len(latencies) // 2] * 1e6, 1),
+        'per_item_us_p99': round(latencies[int(len(latencies) * 0.99) - 1] * 1e6, 1),
+        'request_threads_wall_s': round(request_wall, 4),
+        'until_written_wall_s': round(drain_wall, 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='print() vs event log overhead')
+    parser.add_argument('--items', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--output', '-o', default='', help='Write JSON results here')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        def sink(name):
+            return open(os.path.join(tmp, name), 'w', encoding='utf-8')
+
+        with sink('print.log') as stream, contextlib.redirect_stdout(stream):
+            results.append(run('print', legacy_item, args.items, args.threads, stream.flush))
+
+        for level in ('INFO', 'DEBUG'):
+            for async_mode in (False, True):
+                with sink(f'events_{level}_{async_mode}.log') as stream:
+                    events = EventLogger(f'bench_{level}_{async_mode}', level=level, async_mode=async_mode,
+                                         stream=stream)
+                    label = f"events {level.lower()} {'async' if async_mode else 'sync'}"
+                    results.append(run(label, make_event_item(events), args.items, args.threads, events.flush))
+                    events.close()
+
+        sampled = EventLogger('bench_sampled', level='DEBUG', sampling={'expiry.parse': 0.01, 'ollama': 0.1},
+                              stream=sink('events_sampled.log'))
+        results.append(run('events debug async sampled', make_event_item(sampled), args.items, args.threads,
+                           sampled.flush))
+        sampled.close()
+
+    header = f"{'mode':<30}{'p50 us':>10}{'p99 us':>10}{'threads s':>12}{'written s':>12}"
+    print(header)
+    print('-' * len(header))
+    for row in results:
+        print(f"{row['mode']:<30}{row['per_item_us_p50']:>10}{row['per_item_us_p99']:>10}"
+              f"{row['request_threads_wall_s']:>12}{row['until_written_wall_s']:>12}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
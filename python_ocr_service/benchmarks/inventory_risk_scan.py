@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""Wall time of one /inventory-risk scan over a synthetic inventory.
+
+Reports the in-process scan_inventory time for the column payload and the
+row payload (bahan_list, converted with rows_to_columns) so the cost of the
+conversion is visible next to the vectorized math.
+
+    python benchmarks/inventory_risk_scan.py --items 100000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+from typing import Dict
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from inventory_risk import rows_to_columns, scan_inventory  # noqa: E402
+
+KATEGORI = ['Bahan Pokok', 'Protein', 'Sayuran', 'Bumbu', 'Minuman']
+
+
+def synthetic_columns(items: int, seed: int = 7) -> Dict[str, list]:
+    rng = random.Random(seed)
+    start = date(2026, 1, 1)
+    return {
+        'id_bahan': list(range(1, items + 1)),
+        'nama_bahan': [f'Bahan {idx % 5000}' for idx in range(items)],
+        'kategori': [rng.choice(KATEGORI) for _ in range(items)],
+        'stok_bahan': [rng.randint(0, 200) for _ in range(items)],
+        'min_stok': [rng.randint(0, 20) for _ in range(items)],
+        'harga_beli': [rng.randint(1000, 100000) for _ in range(items)],
+        'estimasi_hari': [rng.choice([None, 3, 7, 14, 30, 180, 365]) for _ in range(items)],
+        'pemakaian_harian': [rng.choice([None, 0, 0.5, 2, 5]) for _ in range(items)],
+        'terakhir_update': [(start + timedelta(days=rng.randint(0, 280))).isoformat() for _ in range(items)],
+    }
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--items', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    columns = synthetic_columns(args.items)
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+    today = date(2026, 10, 1)
+
+    result = scan_inventory(columns, today=today)
+    report = {
+        'items': args.items,
+        'columns_ms': round(best_of(args.repeat, lambda: scan_inventory(columns, today=today)), 2),
+        'rows_ms': round(best_of(args.repeat, lambda: scan_inventory(rows_to_columns(rows), today=today)), 2),
+        'summary': {key: result['summary'][key] for key in ('expired', 'expiring', 'low_stock', 'value_at_risk')},
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Row reconstruction time and accuracy: legacy group_text_by_rows against
+the NumPy layout engine, on synthetic readtext results.
+
+Each receipt row has four boxes (name, qty, unit price, total); --slant
+tilts the photo (dy/dx) so the fixed pixel tolerance starts mixing rows.
+
+    python benchmarks/layout_rows.py --rows 50 200 500 --slant 0 0.05
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+
+from receipt_layout import analyze_layout  # noqa: E402
+
+COLUMNS = ((20, 260, 'Gula Pasir'), (300, 320, '2'), (380, 470, '14.000'), (520, 610, '28.000'))
+
+
+def synthetic_results(rows: int, slant: float, spacing: int = 34, height: int = 24) -> list:
+    results = []
+    for row in range(rows):
+        base = 40 + row * spacing
+        for x0, x1, text in COLUMNS:
+            top, bottom = base + slant * x0, base + slant * x1 + height
+            results.append(([[x0, top], [x1, top], [x1, bottom], [x0, bottom]], text, 0.9))
+    return results
+
+
+def best_of(repeat: int, fn) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+def legacy_lines(results, tolerance):
+    from ocr_service_hybrid import clean_ocr_text, group_text_by_rows
+    lines = []
+    for row in group_text_by_rows([item for item in results if item[2] > 0.2], tolerance=tolerance):
+        text = " ".join(clean_ocr_text(item[1]) for item in sorted(row, key=lambda x: x[0][0][0])).strip()
+        if len(text) > 1:
+            lines.append(text)
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[50, 200, 500])
+    parser.add_argument('--slant', type=float, nargs='+', default=[0.0, 0.05])
+    parser.add_argument('--tolerance', type=int, default=18, help='legacy row tolerance (px)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    expected_line = " ".join(text for _, _, text in COLUMNS)
+    report = []
+    for rows in args.rows:
+        for slant in args.slant:
+            results = synthetic_results(rows, slant)
+            legacy = legacy_lines(results, args.tolerance)
+            layout = analyze_layout(results)
+            report.append({
+                'rows': rows,
+                'boxes': len(results),
+                'slant': slant,
+                'legacy_ms': round(best_of(args.repeat, lambda: legacy_lines(results, args.tolerance)), 2),
+                'layout_ms': round(best_of(args.repeat, lambda: analyze_layout(results)), 2),
+                'legacy_correct_rows': sum(1 for line in legacy if line == expected_line),
+                'layout_correct_rows': sum(1 for line in layout if line == expected_line),
+            })
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""Closed-loop load generator for the OCR and expiry prediction services.
+
+Run it against a service whose OLLAMA_URL points at benchmarks/mock_ollama.py
+to measure throughput, latency, timeout behaviour and retry amplification
+(Ollama generations per client request) under a controlled LLM latency.
+
+    python benchmarks/mock_ollama.py --port 11435 --latency normal:2,0.5 &
+    OLLAMA_URL=http://127.0.0.1:11435/api/generate python expired_prediction_service.py &
+    python benchmarks/load_test.py --target http://127.0.0.1:5001 --scenario predict \
+        --concurrency 8 --requests 200 --mock http://127.0.0.1:11435 --output load.json
+
+Sync (Flask) vs asyncio expiry service under the same load:
+
+    python expired_prediction_service.py --port 5001 &
+    python expired_prediction_service_async.py --port 5002 &
+    python benchmarks/load_test.py --target http://127.0.0.1:5001 -c 256 -n 2000 --label flask -o flask.json
+    python benchmarks/load_test.py --target http://127.0.0.1:5002 -c 256 -n 2000 --label async -o async.json
+    python benchmarks/load_test.py --compare flask.json async.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from run_benchmark import percentile  # noqa: E402
+
+SAMPLE_BAHAN = [
+    {'nama_bahan': 'Ayam Potong', 'kategori': 'Daging', 'stok_bahan': 10, 'satuan': 'kg', 'harga_beli': 35000, 'min_stok': 2},
+    {'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 20, 'satuan': 'liter', 'harga_beli': 17000, 'min_stok': 5},
+    {'nama_bahan': 'Beras', 'kategori': 'Bahan Pokok', 'stok_bahan': 50, 'satuan': 'kg', 'harga_beli': 12000, 'min_stok': 10},
+    {'nama_bahan': 'Cabai Rawit', 'kategori': 'Sayur', 'stok_bahan': 3, 'satuan': 'kg', 'harga_beli': 60000, 'min_stok': 1},
+    {'nama_bahan': 'Gula Pasir', 'kategori': 'Bahan Pokok', 'stok_bahan': 15, 'satuan': 'kg', 'harga_beli': 16000, 'min_stok': 3},
+    {'nama_bahan': 'Telur', 'kategori': 'Protein', 'stok_bahan': 8, 'satuan': 'kg', 'harga_beli': 28000, 'min_stok': 2},
+]
+
+SCENARIOS = ('predict', 'predict-batch', 'process-photo', 'health')
+
+
+class ScenarioRunner:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+        self.session.mount('http://', adapter)
+        self.receipts: List[bytes] = []
+        if args.scenario == 'process-photo':
+            from receipt_corpus import encode_image, generate_corpus
+            self.receipts = [encode_image(s['image']) for s in generate_corpus(size=10, seed=args.seed)]
+
+    def _bahan(self, idx: int) -> Dict:
+        bahan = dict(SAMPLE_BAHAN[idx % len(SAMPLE_BAHAN)])
+        bahan['id_bahan'] = idx + 1
+        bahan['terakhir_update'] = datetime.now().strftime('%Y-%m-%d')
+        return bahan
+
+    def send(self, idx: int) -> Dict:
+        target = self.args.target.rstrip('/')
+        headers = {}
+        if self.args.deadline:
+            headers['X-Request-Timeout'] = str(self.args.deadline)
+        start = time.perf_counter()
+        try:
+            if self.args.scenario == 'predict':
+                resp = self.session.post(f"{target}/predict-expiration", json={'bahan': self._bahan(idx)},
+                                         headers=headers, timeout=self.args.timeout)
+            elif self.args.scenario == 'predict-batch':
+                bahan_list = [self._bahan(idx * self.args.batch_size + j) for j in range(self.args.batch_size)]
+                resp = self.session.post(f"{target}/predict-expiration-batch", json={'bahan_list': bahan_list},
+                                         headers=headers, timeout=self.args.timeout)
+            elif self.args.scenario == 'process-photo':
+                image = self.receipts[idx % len(self.receipts)]
+                resp = self.session.post(f"{target}/process-photo", files={'image': (f'r{idx}.jpg', image, 'image/jpeg')},
+                                         headers=headers, timeout=self.args.timeout)
+            else:
+                resp = self.session.get(f"{target}/health", timeout=self.args.timeout)
+            elapsed = time.perf_counter() - start
+            ok = resp.status_code == 200
+            if ok:
+                try:
+                    ok = bool(resp.json().get('success', True))
+                except ValueError:
+                    ok = False
+            return {'latency': elapsed, 'status': resp.status_code, 'ok': ok}
+        except requests.exceptions.Timeout:
+            return {'latency': time.perf_counter() - start, 'status': 'timeout', 'ok': False}
+        except requests.exceptions.RequestException as exc:
+            return {'latency': time.perf_counter() - start, 'status': type(exc).__name__, 'ok': False}
+
+
+def mock_stats(mock_url: Optional[str]) -> Optional[Dict]:
+    if not mock_url:
+        return None
+    try:
+        return requests.get(mock_url.rstrip('/') + '/mock/stats', timeout=5).json()
+    except requests.exceptions.RequestException:
+        return None
+
+
+def run_load(args) -> Dict:
+    runner = ScenarioRunner(args)
+    if args.mock:
+        try:
+            requests.post(args.mock.rstrip('/') + '/mock/reset', timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+
+    results: List[Dict] = []
+    counter = {'next': 0}
+    stop_at = time.time() + args.duration if args.duration else None
+
+    def worker():
+        while True:
+            with runner.lock:
+                idx = counter['next']
+                if args.requests and idx >= args.requests:
+                    return
+                if stop_at and time.time() >= stop_at:
+                    return
+                counter['next'] += 1
+            outcome = runner.send(idx)
+            with runner.lock:
+                results.append(outcome)
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - wall_start
+
+    latencies = [r['latency'] for r in results if r['ok']]
+    statuses: Dict[str, int] = {}
+    for r in results:
+        statuses[str(r['status'])] = statuses.get(str(r['status']), 0) + 1
+    llm = mock_stats(args.mock)
+    logical_items = len(results) * (args.batch_size if args.scenario == 'predict-batch' else 1)
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'target': args.target,
+            'scenario': args.scenario,
+            'concurrency': args.concurrency,
+            'batch_size': args.batch_size,
+            'client_timeout': args.timeout,
+            'deadline': args.deadline,
+            'label': args.label,
+        },
+        'requests': len(results),
+        'succeeded': sum(1 for r in results if r['ok']),
+        'timeouts': statuses.get('timeout', 0),
+        'statuses': statuses,
+        'wall_seconds': round(wall, 3),
+        'throughput_per_s': round(len(latencies) / wall, 3) if wall else 0.0,
+        'latency_p50_s': round(percentile(latencies, 50), 3),
+        'latency_p95_s': round(percentile(latencies, 95), 3),
+        'latency_p99_s': round(percentile(latencies, 99), 3),
+        'latency_max_s': round(max(latencies), 3) if latencies else 0.0,
+    }
+    if llm is not None:
+        report['ollama'] = llm
+        report['retry_amplification'] = round(llm.get('requests', 0) / logical_items, 3) if logical_items else 0.0
+    return report
+
+
+COMPARE_FIELDS = ('succeeded', 'timeouts', 'throughput_per_s', 'latency_p50_s', 'latency_p95_s', 'latency_p99_s',
+                  'retry_amplification')
+
+
+def compare_reports(before: Dict, after: Dict):
+    print(f"{'':<22}{before['meta'].get('label') or before['meta']['target']:>16}"
+          f"{after['meta'].get('label') or after['meta']['target']:>16}{'change':>10}")
+    for field in COMPARE_FIELDS:
+        if field not in before and field not in after:
+            continue
+        a, b = before.get(field, 0), after.get(field, 0)
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{field:<22}{a:>16}{b:>16}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load generator for the OCR / expiry services')
+    parser.add_argument('--target', help='Service base URL, e.g. http://127.0.0.1:5001')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Diff two load reports and exit')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='predict')
+    parser.add_argument('--concurrency', '-c', type=int, default=4)
+    parser.add_argument('--requests', '-n', type=int, default=100, help='Total requests (0 = use --duration)')
+    parser.add_argument('--duration', type=float, default=0.0, help='Seconds to run when --requests is 0')
+    parser.add_argument('--batch-size', type=int, default=5, help='Items per request for predict-batch')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Client side timeout per request')
+    parser.add_argument('--deadline', type=float, default=0.0, help='Send X-Request-Timeout with this many seconds')
+    parser.add_argument('--mock', default='', help='Mock Ollama base URL, to report LLM calls and retry amplification')
+    parser.add_argument('--label', default='', help='Free text label stored in the report')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', '-o', default='', help='Write JSON report here')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            after = json.load(f)
+        compare_reports(before, after)
+        return
+    if not args.target:
+        parser.error('--target is required')
+
+    report = run_load(args)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
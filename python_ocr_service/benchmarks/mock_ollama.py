@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""Local stand-in for the Ollama HTTP API, for deterministic load tests.
+
+Speaks /api/generate (streaming and non-streaming) and /api/tags, with
+scriptable responses, configurable latency distributions, a concurrency
+limit with queueing, and error injection.
+
+    python benchmarks/mock_ollama.py --port 11435 --latency lognormal:0.0,0.5 \
+        --tokens-per-second 40 --max-concurrency 2 --error-rate 0.05
+
+Point a service at it with OLLAMA_URL=http://localhost:11435/api/generate.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from flask import Flask, Response, jsonify, request
+
+DEFAULT_MODELS = ['gemma3:1b']
+
+SHELF_LIFE_RULES = [
+    (('garam', 'salt'), 730),
+    (('beras', 'rice', 'gula', 'sugar'), 365),
+    (('minyak', 'oil'), 180),
+    (('ayam', 'chicken', 'ikan', 'fish', 'udang'), 3),
+    (('cabai', 'cabe', 'sayur', 'tomat'), 5),
+]
+
+
+class LatencyModel:
+    """Parses 'fixed:S', 'uniform:A,B', 'normal:MEAN,STD' or
+    'lognormal:MU,SIGMA' (seconds) and samples from it."""
+
+    def __init__(self, spec: str, rng: random.Random):
+        self.spec = spec or 'fixed:0'
+        self.rng = rng
+        kind, _, params = self.spec.partition(':')
+        self.kind = kind.strip().lower()
+        self.params = [float(p) for p in params.split(',') if p.strip()]
+        if self.kind not in ('fixed', 'uniform', 'normal', 'lognormal'):
+            raise ValueError(f"Unknown latency distribution: {spec}")
+
+    def sample(self) -> float:
+        p = self.params
+        if self.kind == 'fixed':
+            value = p[0] if p else 0.0
+        elif self.kind == 'uniform':
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == 'normal':
+            value = self.rng.gauss(p[0], p[1])
+        else:
+            value = self.rng.lognormvariate(p[0], p[1])
+        return max(0.0, value)
+
+
+def default_shelf_life(nama: str) -> int:
+    lower = nama.lower()
+    for keywords, days in SHELF_LIFE_RULES:
+        if any(k in lower for k in keywords):
+            return days
+    return 14
+
+
+def expiry_answer(nama: str, confidence: int = 85) -> Dict:
+    days = default_shelf_life(nama)
+    return {
+        'estimasi_hari': days,
+        'reason': f"{nama} dapat bertahan sekitar {days} hari jika disimpan dengan benar.",
+        'confidence': confidence,
+    }
+
+
+def default_response(prompt: str) -> str:
+    """Plausible answers for the prompts our services send."""
+    if 'estimasi_hari' in prompt and 'DAFTAR BAHAN:' in prompt:
+        block = prompt.split('DAFTAR BAHAN:', 1)[1]
+        answers = []
+        for key, nama in re.findall(r'^\[id_bahan=([^\]]+)\]\s*\n-\s*Nama:\s*(.+)$', block, re.MULTILINE):
+            answer = {'id_bahan': int(key) if key.isdigit() else key}
+            answer.update(expiry_answer(nama.strip()))
+            answers.append(answer)
+        return json.dumps(answers)
+    if 'estimasi_hari' in prompt:
+        match = re.search(r'^-\s*Nama:\s*(.+)$', prompt, re.MULTILINE)
+        nama = match.group(1).strip() if match else 'Bahan'
+        return json.dumps(expiry_answer(nama))
+    if 'Kandidat:' in prompt:
+        return '1'
+    if 'DATA OCR:' in prompt:
+        block = prompt.split('DATA OCR:', 1)[1].split('Output text', 1)[0]
+        return "\n".join(line.split('. ', 1)[-1] for line in block.strip().splitlines() if line.strip())
+    if 'TEXT YANG SUDAH RAPIH:' in prompt:
+        block = prompt.split('TEXT YANG SUDAH RAPIH:', 1)[1].split('JSON array:', 1)[0]
+        items = []
+        for line in block.strip().splitlines():
+            match = re.match(r'^\s*(\d+)?\s*(.*?)\s+(?:Rp\s*)?([\d\.]{3,})\s*$', line)
+            if not match or line.lower().startswith('total'):
+                continue
+            harga = int(match.group(3).replace('.', ''))
+            if harga >= 100:
+                items.append({'nama_barang': match.group(2), 'jumlah': int(match.group(1) or 1),
+                              'satuan': '1 pcs', 'harga': harga})
+        return json.dumps(items)
+    return 'Ya, saya berfungsi dengan baik.'
+
+
+class ScriptedResponses:
+    """Rules loaded from a JSON file:
+
+        [{"match": "Minyak", "response": "{...}"},
+         {"match": "Kandidat", "responses": ["1", "2"]},
+         {"match": ".*", "model": "gemma3:4b", "response": "..."}]
+
+    The first rule whose regex matches the prompt (and model, when given)
+    wins; "responses" are cycled through. Unmatched prompts get
+    default_response().
+    """
+
+    def __init__(self, rules: Optional[List[Dict]] = None):
+        self.rules = []
+        self._lock = threading.Lock()
+        for rule in rules or []:
+            self.rules.append({
+                'pattern': re.compile(rule.get('match', '.*'), re.DOTALL),
+                'model': rule.get('model'),
+                'responses': rule.get('responses') or [rule.get('response', '')],
+                'next': 0,
+            })
+
+    @classmethod
+    def from_file(cls, path: Optional[str]) -> 'ScriptedResponses':
+        if not path:
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def respond(self, prompt: str, model: str) -> str:
+        for rule in self.rules:
+            if rule['model'] and rule['model'] != model:
+                continue
+            if rule['pattern'].search(prompt):
+                with self._lock:
+                    text = rule['responses'][rule['next'] % len(rule['responses'])]
+                    rule['next'] += 1
+                return text
+        return default_response(prompt)
+
+
+class MockOllama:
+    def __init__(self, args):
+        self.rng = random.Random(args.seed)
+        self.latency = LatencyModel(args.latency, self.rng)
+        self.tokens_per_second = args.tokens_per_second
+        self.prompt_tokens_per_second = args.prompt_tokens_per_second
+        self.models = [m.strip() for m in args.models.split(',') if m.strip()]
+        self.error_rate = args.error_rate
+        self.timeout_rate = args.timeout_rate
+        self.malformed_rate = args.malformed_rate
+        self.hang_seconds = args.hang_seconds
+        self.max_queue = args.max_queue
+        self.script = ScriptedResponses.from_file(args.script)
+        # Ollama keeps the KV cache of the last prompt per loaded model and
+        # only evaluates tokens after the common prefix; `context` handles
+        # returned by earlier calls are replayed without prompt eval.
+        self.prompt_cache = not args.no_prompt_cache
+        self._last_prompt: Dict[str, str] = {}
+        self._contexts: Dict[int, str] = {}
+        self._next_context = 0
+        self._slots = threading.BoundedSemaphore(max(1, args.max_concurrency))
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {
+                'requests': 0, 'completed': 0, 'streamed': 0, 'errors_injected': 0,
+                'timeouts_injected': 0, 'malformed_injected': 0, 'rejected_queue_full': 0,
+                'unknown_model': 0, 'in_flight': 0, 'peak_in_flight': 0, 'queued': 0,
+                'peak_queued': 0, 'prompt_chars': 0, 'prompt_chars_cached': 0,
+            }
+
+    def _bump(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+            if key == 'in_flight':
+                self.stats['peak_in_flight'] = max(self.stats['peak_in_flight'], self.stats['in_flight'])
+            if key == 'queued':
+                self.stats['peak_queued'] = max(self.stats['peak_queued'], self.stats['queued'])
+
+    def _roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self.rng.random() < rate
+
+    def resolve_prompt(self, model: str, prompt: str, context) -> tuple:
+        """Return (full prompt text, number of chars served from cache)."""
+        with self._lock:
+            prefix = ''
+            if context and isinstance(context, list) and context[0] in self._contexts:
+                prefix = self._contexts[context[0]]
+            full = prefix + prompt
+            cached = len(prefix)
+            if self.prompt_cache:
+                last = self._last_prompt.get(model, '')
+                cached = max(cached, len(os.path.commonprefix([last, full])))
+                self._last_prompt[model] = full
+            return full, cached
+
+    def remember_context(self, full_prompt: str, text: str) -> List[int]:
+        with self._lock:
+            self._next_context += 1
+            self._contexts[self._next_context] = full_prompt + text
+            if len(self._contexts) > 256:
+                self._contexts.pop(next(iter(self._contexts)))
+            return [self._next_context]
+
+    def timings(self, prompt: str, text: str, elapsed: float, cached_chars: int = 0) -> Dict:
+        prompt_tokens = max(1, (len(prompt) - cached_chars) // 4)
+        eval_tokens = max(1, len(text) // 4)
+        prompt_ns = int(prompt_tokens / self.prompt_tokens_per_second * 1e9) if self.prompt_tokens_per_second else 0
+        eval_ns = int(eval_tokens / self.tokens_per_second * 1e9) if self.tokens_per_second else 0
+        return {
+            'total_duration': int(elapsed * 1e9),
+            'load_duration': 0,
+            'prompt_eval_count': prompt_tokens,
+            'prompt_eval_duration': prompt_ns,
+            'eval_count': eval_tokens,
+            'eval_duration': eval_ns,
+        }
+
+    def generation_seconds(self, prompt: str, text: str, cached_chars: int = 0) -> float:
+        seconds = self.latency.sample()
+        if self.prompt_tokens_per_second:
+            seconds += ((len(prompt) - cached_chars) // 4) / self.prompt_tokens_per_second
+        if self.tokens_per_second:
+            seconds += (len(text) // 4) / self.tokens_per_second
+        return seconds
+
+
+def create_app(mock: MockOllama) -> Flask:
+    app = Flask(__name__)
+
+    @app.route('/api/tags', methods=['GET'])
+    def tags():
+        return jsonify({'models': [
+            {'name': name, 'model': name, 'size': 0, 'details': {'family': 'mock'}}
+            for name in mock.models
+        ]})
+
+    @app.route('/api/generate', methods=['POST'])
+    def generate():
+        body = request.get_json(silent=True) or {}
+        prompt = body.get('prompt', '')
+        model = body.get('model', '')
+        stream = body.get('stream', True)
+        mock._bump('requests')
+        mock._bump('prompt_chars', len(prompt))
+
+        if model not in mock.models:
+            mock._bump('unknown_model')
+            return jsonify({'error': f"model '{model}' not found, try pulling it first"}), 404
+
+        with mock._lock:
+            queue_full = mock.max_queue >= 0 and mock.stats['queued'] >= mock.max_queue
+        if queue_full:
+            mock._bump('rejected_queue_full')
+            return jsonify({'error': 'server busy, please try again. maximum pending requests exceeded'}), 503
+
+        mock._bump('queued')
+        mock._slots.acquire()
+        mock._bump('queued', -1)
+        mock._bump('in_flight')
+        started = time.time()
+        release_in_generator = False
+        try:
+            if mock._roll(mock.error_rate):
+                mock._bump('errors_injected')
+                return jsonify({'error': 'injected failure: CUDA error: out of memory (requires more GiB)'}), 500
+            if mock._roll(mock.timeout_rate):
+                mock._bump('timeouts_injected')
+                time.sleep(mock.hang_seconds)
+                return jsonify({'error': 'injected hang'}), 500
+
+            full_prompt, cached = mock.resolve_prompt(model, prompt, body.get('context'))
+            mock._bump('prompt_chars_cached', cached)
+            text = mock.script.respond(full_prompt, model)
+            if mock._roll(mock.malformed_rate):
+                mock._bump('malformed_injected')
+                text = text[: max(1, len(text) // 3)] + ' ... maaf, saya tidak yakin'
+            seconds = mock.generation_seconds(full_prompt, text, cached)
+            context = mock.remember_context(full_prompt, text)
+            created_at = datetime.now(timezone.utc).isoformat()
+
+            if not stream:
+                time.sleep(seconds)
+                payload = {'model': model, 'created_at': created_at, 'response': text,
+                           'done': True, 'done_reason': 'stop', 'context': context}
+                payload.update(mock.timings(full_prompt, text, time.time() - started, cached))
+                mock._bump('completed')
+                return jsonify(payload)
+
+            chunks = [c for c in re.split(r'(\s+)', text) if c] or ['']
+            per_chunk = seconds / len(chunks)
+            release_in_generator = True
+
+            def emit():
+                try:
+                    for chunk in chunks:
+                        time.sleep(per_chunk)
+                        yield json.dumps({'model': model, 'created_at': created_at,
+                                          'response': chunk, 'done': False}) + '\n'
+                    final = {'model': model, 'created_at': created_at, 'response': '',
+                             'done': True, 'done_reason': 'stop', 'context': context}
+                    final.update(mock.timings(full_prompt, text, time.time() - started, cached))
+                    mock._bump('completed')
+                    mock._bump('streamed')
+                    yield json.dumps(final) + '\n'
+                finally:
+                    mock._bump('in_flight', -1)
+                    mock._slots.release()
+
+            return Response(emit(), mimetype='application/x-ndjson')
+        finally:
+            if not release_in_generator:
+                mock._bump('in_flight', -1)
+                mock._slots.release()
+
+    @app.route('/mock/stats', methods=['GET'])
+    def stats():
+        with mock._lock:
+            return jsonify(dict(mock.stats))
+
+    @app.route('/mock/reset', methods=['POST'])
+    def reset():
+        mock.reset_stats()
+        return jsonify({'success': True})
+
+    @app.route('/mock/config', methods=['POST'])
+    def configure():
+        body = request.get_json(silent=True) or {}
+        if 'latency' in body:
+            mock.latency = LatencyModel(body['latency'], mock.rng)
+        for key in ('error_rate', 'timeout_rate', 'malformed_rate', 'hang_seconds',
+                    'tokens_per_second', 'prompt_tokens_per_second', 'max_queue'):
+            if key in body:
+                setattr(mock, key, type(getattr(mock, key))(body[key]))
+        if 'script' in body:
+            mock.script = ScriptedResponses(body['script'])
+        return jsonify({'success': True})
+
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='Mock Ollama server for load testing')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--models', default=','.join(DEFAULT_MODELS), help='Comma separated models served by /api/tags')
+    parser.add_argument('--script', default='', help='JSON file with scripted response rules')
+    parser.add_argument('--latency', default='fixed:0', help="fixed:S | uniform:A,B | normal:MEAN,STD | lognormal:MU,SIGMA")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0, help='Simulated generation speed (0 = instant)')
+    parser.add_argument('--prompt-tokens-per-second', type=float, default=0.0, help='Simulated prompt eval speed (0 = instant)')
+    parser.add_argument('--max-concurrency', type=int, default=1, help='Parallel generations (OLLAMA_NUM_PARALLEL)')
+    parser.add_argument('--max-queue', type=int, default=512, help='Pending requests before 503 (-1 = unbounded)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with HTTP 500')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Fraction of requests that hang for --hang-seconds')
+    parser.add_argument('--hang-seconds', type=float, default=300.0)
+    parser.add_argument('--malformed-rate', type=float, default=0.0, help='Fraction of responses truncated into invalid output')
+    parser.add_argument('--no-prompt-cache', action='store_true', help='Disable simulated prompt prefix caching')
+    parser.add_argument('--seed', type=int, default=42)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    app = create_app(MockOllama(args))
+    print(f"Mock Ollama listening on http://{args.host}:{args.port} (latency {args.latency}, "
+          f"concurrency {args.max_concurrency}, error rate {args.error_rate})")
+    app.run(host=args.host, port=args.port, threaded=True, debug=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Synthetic Indonesian receipt images with golden item lists.
+
+Receipts are rendered with OpenCV so the corpus needs no fonts or files on
+disk and is fully reproducible from its seed.
+"""
+import json
+import os
+import random
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+PRODUCTS = [
+    ("Semangka", "Kg"), ("Melon", "Kg"), ("Nangka", "Kg"), ("Jambu", "Kg"),
+    ("Mangga", "Kg"), ("Apel", "Kg"), ("Salak", "Kg"), ("Pisang", "Kg"),
+    ("Masako", "Bks"), ("Ketumbar", "Bks"), ("Kecap", "Btl"), ("Saos", "Btl"),
+    ("Cuka", "Btl"), ("Kerupuk", "Bks"), ("Mie Instan", "Bks"),
+    ("Minyak Goreng", "Ltr"), ("Tepung Kanji", "Kg"),
+]
+
+STORES = ["TOKO BUAH SEGAR", "TOKO SUMBER REJEKI", "UD MAKMUR JAYA", "TOKO BAROKAH"]
+DEGRADATIONS = ("clean", "noisy", "blurred", "rotated", "mixed")
+
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.8
+FONT_THICKNESS = 2
+LINE_HEIGHT = 38
+WIDTH = 640
+
+
+def format_price(amount: int, style: str) -> str:
+    dotted = f"{amount:,}".replace(',', '.')
+    if style == "rp":
+        return f"Rp {dotted}"
+    if style == "plain":
+        return str(amount)
+    return dotted
+
+
+def build_receipt_lines(rng: random.Random, n_items: int) -> Dict:
+    """Pick items and return the printed rows plus the golden items."""
+    products = rng.sample(PRODUCTS, k=min(n_items, len(PRODUCTS)))
+    while len(products) < n_items:
+        products.append(rng.choice(PRODUCTS))
+    price_style = rng.choice(["dotted", "rp", "plain"])
+
+    rows = []
+    expected = []
+    for name, unit in products:
+        qty = rng.randint(1, 5)
+        harga = rng.randint(2, 60) * 500 * qty
+        rows.append((f"{qty} {unit} {name}", format_price(harga, price_style)))
+        expected.append({'nama_barang': name, 'jumlah': qty, 'harga': harga})
+    total = sum(item['harga'] for item in expected)
+
+    header = [
+        (rng.choice(STORES), ""),
+        (f"Tgl {rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2025", ""),
+        ("-" * 28, ""),
+    ]
+    footer = [("-" * 28, ""), ("TOTAL", format_price(total, price_style))]
+    return {'rows': header + rows + footer, 'expected': expected, 'total': total}
+
+
+def render_receipt(rows, width: int = WIDTH) -> np.ndarray:
+    height = LINE_HEIGHT * (len(rows) + 2)
+    img = np.full((height, width, 3), 255, np.uint8)
+    for idx, (left, right) in enumerate(rows):
+        y = LINE_HEIGHT * (idx + 1) + 10
+        cv2.putText(img, left, (20, y), FONT, FONT_SCALE, (0, 0, 0), FONT_THICKNESS, cv2.LINE_AA)
+        if right:
+            (text_w, _), _ = cv2.getTextSize(right, FONT, FONT_SCALE, FONT_THICKNESS)
+            cv2.putText(img, right, (width - 20 - text_w, y), FONT, FONT_SCALE, (0, 0, 0), FONT_THICKNESS, cv2.LINE_AA)
+    return img
+
+
+def degrade(img: np.ndarray, kind: str, rng: random.Random) -> np.ndarray:
+    out = img
+    if kind in ("blurred", "mixed"):
+        ksize = rng.choice([3, 5])
+        out = cv2.GaussianBlur(out, (ksize, ksize), 0)
+    if kind in ("rotated", "mixed"):
+        angle = rng.uniform(-4.0, 4.0)
+        h, w = out.shape[:2]
+        matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+        out = cv2.warpAffine(out, matrix, (w, h), borderValue=(255, 255, 255))
+    if kind in ("noisy", "mixed"):
+        np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+        noise = np_rng.normal(0, 18, out.shape)
+        out = np.clip(out.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+    return out
+
+
+def generate_corpus(size: int = 20,
+                    seed: int = 1234,
+                    min_items: int = 3,
+                    max_items: int = 8,
+                    degradations=DEGRADATIONS) -> List[Dict]:
+    """Return `size` samples: {'name', 'degradation', 'image', 'lines',
+    'expected', 'total'}. `lines` are the printed rows joined the way
+    build_lines_from_results joins OCR boxes, i.e. perfect-OCR input."""
+    rng = random.Random(seed)
+    samples = []
+    for idx in range(size):
+        kind = degradations[idx % len(degradations)]
+        receipt = build_receipt_lines(rng, rng.randint(min_items, max_items))
+        image = degrade(render_receipt(receipt['rows']), kind, rng)
+        lines = [" ".join(part for part in row if part) for row in receipt['rows']]
+        samples.append({
+            'name': f"receipt_{idx:03d}_{kind}",
+            'degradation': kind,
+            'image': image,
+            'lines': lines,
+            'expected': receipt['expected'],
+            'total': receipt['total'],
+        })
+    return samples
+
+
+def encode_image(image: np.ndarray, ext: str = '.jpg') -> bytes:
+    ok, encoded = cv2.imencode(ext, image)
+    if not ok:
+        raise ValueError("Failed to encode synthetic receipt")
+    return encoded.tobytes()
+
+
+def write_corpus(samples: List[Dict], directory: str) -> str:
+    """Write images plus a golden.json manifest, for inspection or for
+    benchmarking other OCR engines against the same receipts."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = []
+    for sample in samples:
+        filename = f"{sample['name']}.jpg"
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(encode_image(sample['image']))
+        manifest.append({
+            'file': filename,
+            'degradation': sample['degradation'],
+            'lines': sample['lines'],
+            'expected': sample['expected'],
+            'total': sample['total'],
+        })
+    path = os.path.join(directory, 'golden.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def _normalize_name(name: str) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def score_items(predicted: List[Dict], expected: List[Dict], name_threshold: float = 80.0,
+                scorer: Optional[callable] = None) -> Dict[str, int]:
+    """Greedy one-to-one match of predicted to golden items. An item matches
+    when its price is equal and its name is similar enough."""
+    if scorer is None:
+        try:
+            from rapidfuzz import fuzz
+            scorer = fuzz.WRatio
+        except ImportError:
+            import difflib
+            scorer = lambda a, b: difflib.SequenceMatcher(None, a, b).ratio() * 100
+    unmatched = list(expected)
+    true_positive = 0
+    for item in predicted:
+        name = _normalize_name(item.get('nama_barang', ''))
+        for golden in unmatched:
+            if item.get('harga') == golden['harga'] and scorer(name, _normalize_name(golden['nama_barang'])) >= name_threshold:
+                unmatched.remove(golden)
+                true_positive += 1
+                break
+    return {
+        'true_positive': true_positive,
+        'predicted': len(predicted),
+        'expected': len(expected),
+    }
@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+"""Receipt processing benchmark on the synthetic golden corpus.
+
+Runs OCR (extract_text_with_easyocr), each classifier and the end-to-end
+pipeline with a stubbed Ollama, and reports throughput, p50/p95 latency,
+peak RSS and item precision/recall. Results are written as JSON so two
+commits can be compared with --compare.
+
+    python benchmarks/run_benchmark.py --size 20 --output bench.json
+    python benchmarks/run_benchmark.py --compare before.json bench.json
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from unittest.mock import patch
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SERVICE_DIR not in sys.path:
+    sys.path.insert(0, SERVICE_DIR)
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+if BENCH_DIR not in sys.path:
+    sys.path.insert(0, BENCH_DIR)
+
+from receipt_corpus import encode_image, generate_corpus, score_items, write_corpus  # noqa: E402
+
+STAGES = ('ocr', 'classify', 'classify_fulltext', 'classify_per_line', 'fallback', 'e2e')
+
+
+class NamedBytesIO(io.BytesIO):
+    def __init__(self, data: bytes, filename: str):
+        super().__init__(data)
+        self.filename = filename
+
+
+def make_stub_ollama(latency: float) -> Callable:
+    """Deterministic stand-in for call_ollama_api, so the benchmark measures
+    our pipeline, not a model. The cleanup prompt is answered from its own
+    text; the item extraction prompt with the golden items of `stub.sample`
+    (set per sample by run_stage), i.e. a perfect model answer, so the
+    classify rows measure the classifier's post-processing of it."""
+
+    def stub(prompt: str, timeout: int = 30, options=None, **kwargs):
+        if latency:
+            time.sleep(latency)
+        if 'DATA OCR:' in prompt:
+            block = prompt.split('DATA OCR:', 1)[1].split('Output text', 1)[0]
+            lines = [line.split('. ', 1)[-1] for line in block.strip().splitlines() if line.strip()]
+            return "\n".join(lines)
+        if 'TEXT YANG SUDAH RAPIH:' in prompt:
+            return json.dumps([
+                {'nama_barang': item['nama_barang'], 'jumlah': item['jumlah'],
+                 'satuan': '1 pcs', 'harga': item['harga']}
+                for item in (stub.sample or {}).get('expected', [])
+            ])
+        if 'Kandidat:' in prompt:
+            return '1'
+        return ''
+
+    stub.sample = None
+    return stub
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    if sys.platform == 'darwin':
+        return round(peak / (1024 * 1024), 1)
+    return round(peak / 1024, 1)
+
+
+def summarize(stage: str, latencies: List[float], scores: List[Dict], wall: float, errors: int = 0) -> Dict:
+    tp = sum(s['true_positive'] for s in scores)
+    predicted = sum(s['predicted'] for s in scores)
+    expected = sum(s['expected'] for s in scores)
+    return {
+        'stage': stage,
+        'samples': len(latencies),
+        'errors': errors,
+        'wall_seconds': round(wall, 3),
+        'throughput_per_s': round(len(latencies) / wall, 3) if wall else 0.0,
+        'latency_p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'latency_p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'precision': round(tp / predicted, 4) if predicted else 0.0,
+        'recall': round(tp / expected, 4) if expected else 0.0,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_stage(stage: str, fn: Callable[[Dict], List], samples: List[Dict], score: bool = True,
+              stub: Optional[Callable] = None) -> Dict:
+    """A sample whose fn raises (e.g. ImageRejected or PipelineBusy from the
+    e2e pipeline) is counted as an error and scored as an empty output."""
+    latencies = []
+    scores = []
+    errors = 0
+    wall_start = time.perf_counter()
+    for sample in samples:
+        if stub is not None:
+            stub.sample = sample
+        start = time.perf_counter()
+        try:
+            output = fn(sample)
+        except Exception as exc:
+            errors += 1
+            output = []
+            print(f"{stage}: {sample.get('name', '?')} failed: {type(exc).__name__}: {exc}", file=sys.stderr)
+        latencies.append(time.perf_counter() - start)
+        if score:
+            scores.append(score_items(output, sample['expected']))
+    return summarize(stage, latencies, scores, time.perf_counter() - wall_start, errors)
+
+
+def run_benchmark(args) -> Dict:
+    os.environ.setdefault('UPLOAD_ARCHIVE_MODE', 'off')
+    os.environ.setdefault('LOG_OCR_OUTPUT', 'false')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    import_start = time.perf_counter()
+    import ocr_service_hybrid as service
+    import_seconds = time.perf_counter() - import_start
+    startup_rss_mb = peak_rss_mb()
+
+    samples = generate_corpus(size=args.size, seed=args.seed,
+                              min_items=args.min_items, max_items=args.max_items)
+    for sample in samples:
+        sample['bytes'] = encode_image(sample['image'])
+    if args.write_corpus:
+        write_corpus(samples, args.write_corpus)
+
+    stages = [s for s in args.stages.split(',') if s] if args.stages else list(STAGES)
+    results = []
+    stub = make_stub_ollama(args.llm_latency)
+    with patch.object(service, 'call_ollama_api', side_effect=stub), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        for stage in stages:
+            if stage in ('ocr', 'e2e') and not service.easyocr_available:
+                results.append({'stage': stage, 'skipped': 'EasyOCR not available'})
+                continue
+            if stage == 'ocr':
+                # One row per OCR profile (ocr:fast, ...) to show the latency/accuracy trade-off.
+                profiles = [p for p in args.ocr_profiles.split(',') if p] or [None]
+                for profile in profiles:
+                    def ocr_fn(sample, profile=profile):
+                        sample['ocr_lines'] = service.extract_text_with_easyocr(sample['bytes'], profile=profile)
+                        return service.parse_receipt_text_fallback(sample['ocr_lines'])
+                    results.append(run_stage(f'ocr:{profile}' if profile else stage, ocr_fn, samples))
+            elif stage == 'classify':
+                # What the service runs: the LLM bypass first, then the LLM classifiers.
+                results.append(run_stage(stage, lambda s: service.classify_text_lines(s['lines']), samples, stub=stub))
+            elif stage == 'classify_fulltext':
+                results.append(run_stage(stage, lambda s: service.classify_fulltext_with_ollama(s['lines']), samples,
+                                         stub=stub))
+            elif stage == 'classify_per_line':
+                results.append(run_stage(stage, lambda s: service.classify_per_line(s['lines']), samples, stub=stub))
+            elif stage == 'fallback':
+                results.append(run_stage(stage, lambda s: service.parse_receipt_text_fallback(s['lines']), samples))
+            elif stage == 'e2e':
+                results.append(run_stage(
+                    stage,
+                    lambda s: service.process_image_hybrid(NamedBytesIO(s['bytes'], s['name'] + '.jpg')),
+                    samples, stub=stub
+                ))
+            else:
+                results.append({'stage': stage, 'skipped': 'unknown stage'})
+
+    return {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'corpus': {'size': args.size, 'seed': args.seed,
+                       'min_items': args.min_items, 'max_items': args.max_items},
+            'llm_latency': args.llm_latency,
+            'easyocr_available': service.easyocr_available,
+            'ocr_runtime': service.ocr_profile,
+            # Service import (torch/onnxruntime, model load) and the RSS right after it.
+            'startup_seconds': round(import_seconds, 3),
+            'ocr_init_seconds': service.ocr_startup_seconds,
+            'startup_rss_mb': startup_rss_mb,
+            'llm_bypass': service.llm_bypass.stats() if service.llm_bypass is not None else None,
+        },
+        'results': results,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=SERVICE_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return 'unknown'
+
+
+def print_table(report: Dict):
+    header = f"{'stage':<20}{'n':>5}{'err':>5}{'thr/s':>10}{'p50 ms':>11}{'p95 ms':>11}{'prec':>8}{'recall':>8}{'rss MB':>9}"
+    print(header)
+    print('-' * len(header))
+    for row in report['results']:
+        if 'skipped' in row:
+            print(f"{row['stage']:<20} skipped: {row['skipped']}")
+            continue
+        print(f"{row['stage']:<20}{row['samples']:>5}{row.get('errors', 0):>5}{row['throughput_per_s']:>10.2f}"
+              f"{row['latency_p50_ms']:>11.1f}{row['latency_p95_ms']:>11.1f}"
+              f"{row['precision']:>8.3f}{row['recall']:>8.3f}{row['peak_rss_mb']:>9.1f}")
+
+
+def compare_reports(before: Dict, after: Dict):
+    metrics = ('throughput_per_s', 'latency_p50_ms', 'latency_p95_ms', 'precision', 'recall', 'peak_rss_mb')
+    old_rows = {row['stage']: row for row in before['results'] if 'skipped' not in row}
+    print(f"{before['meta'].get('git_commit')} -> {after['meta'].get('git_commit')}")
+    runtimes = [report['meta'].get('ocr_runtime') for report in (before, after)]
+    if runtimes[0] != runtimes[1]:
+        print(f"ocr_runtime: {runtimes[0]} -> {runtimes[1]}")
+    for key in ('startup_seconds', 'startup_rss_mb', 'llm_bypass'):
+        if key in before['meta'] and key in after['meta']:
+            print(f"{key}: {before['meta'][key]} -> {after['meta'][key]}")
+    for row in after['results']:
+        old = old_rows.get(row['stage'])
+        if 'skipped' in row or old is None:
+            continue
+        deltas = []
+        for metric in metrics:
+            a, b = old[metric], row[metric]
+            change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+            deltas.append(f"{metric}={b} ({change})")
+        print(f"{row['stage']:<20}" + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Receipt processing benchmark')
+    parser.add_argument('--size', type=int, default=20, help='Number of synthetic receipts')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--min-items', type=int, default=3)
+    parser.add_argument('--max-items', type=int, default=8)
+    parser.add_argument('--stages', type=str, default='', help=f"Comma separated subset of {','.join(STAGES)}")
+    parser.add_argument('--ocr-profiles', type=str, default='',
+                        help='Comma separated OCR profiles for the ocr stage, e.g. fast,balanced,accurate')
+    parser.add_argument('--llm-latency', type=float, default=0.0, help='Seconds added to every stubbed Ollama call')
+    parser.add_argument('--write-corpus', type=str, default='', help='Also write the images + golden.json here')
+    parser.add_argument('--output', '-o', type=str, default='', help='Write JSON results to this file')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Diff two result files and exit')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            before = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            after = json.load(f)
+        compare_reports(before, after)
+        return
+
+    report = run_benchmark(args)
+    print_table(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
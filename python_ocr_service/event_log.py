@@ -0,0 +1,165 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+
+LEVELS = {'DEBUG': logging.DEBUG, 'INFO': logging.INFO, 'WARNING': logging.WARNING, 'ERROR': logging.ERROR}
+
+
+def parse_sampling(spec: str) -> Dict[str, float]:
+    """"ollama.response=0.1,expiry.parse=0.01" -> {event prefix: keep rate}."""
+    rates = {}
+    for part in (spec or '').split(','):
+        if '=' not in part:
+            continue
+        name, rate = part.split('=', 1)
+        try:
+            rates[name.strip()] = max(0.0, min(1.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'service': getattr(record, 'service', record.name),
+            'event': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the request thread: when the queue is full the event is
+    counted and dropped. Records are queued unformatted; JSON encoding and the
+    stdout write happen on the listener thread."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class EventLogger:
+    """Levelled JSON-lines event log.
+
+    events.info("ollama.response", elapsed=1.2, preview=lambda: text[:100])
+
+    Callable field values are only evaluated when the event is actually
+    emitted, i.e. it passes the level check and its sampling rate. Sampling
+    is per event name (longest matching dotted prefix wins).
+    """
+
+    def __init__(self, service: str, level: str = 'INFO', sampling: Optional[Dict[str, float]] = None,
+                 async_mode: bool = True, queue_size: int = 10000, stream=None):
+        self.service = service
+        self.sampling = sampling or {}
+        self._rng = random.Random()
+        self._logger = logging.getLogger(f"events.{service}")
+        self._logger.setLevel(LEVELS.get(level.upper(), logging.INFO))
+        self._logger.propagate = False
+        for handler in list(self._logger.handlers):
+            self._logger.removeHandler(handler)
+
+        stream_handler = logging.StreamHandler(stream or sys.stdout)
+        stream_handler.setFormatter(JsonLineFormatter())
+        self._listener = None
+        self._queue_handler = None
+        if async_mode:
+            self._queue_handler = DroppingQueueHandler(queue.Queue(maxsize=max(1, queue_size)))
+            self._listener = logging.handlers.QueueListener(self._queue_handler.queue, stream_handler)
+            self._listener.start()
+            self._logger.addHandler(self._queue_handler)
+            atexit.register(self.close)
+        else:
+            self._logger.addHandler(stream_handler)
+        self._lock = threading.Lock()
+        self.sampled_out = 0
+
+    def enabled(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def _rate(self, event: str) -> float:
+        name = event
+        while name:
+            if name in self.sampling:
+                return self.sampling[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+    def log(self, level: int, event: str, exc_info=None, **fields: Any):
+        if not self._logger.isEnabledFor(level):
+            return
+        rate = self._rate(event)
+        if rate < 1.0 and self._rng.random() >= rate:
+            with self._lock:
+                self.sampled_out += 1
+            return
+        resolved = {key: value() if callable(value) else value for key, value in fields.items()}
+        if rate < 1.0:
+            resolved['sample_rate'] = rate
+        self._logger.log(level, event, exc_info=exc_info,
+                         extra={'service': self.service, 'fields': resolved})
+
+    def debug(self, event: str, **fields: Any):
+        self.log(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields: Any):
+        self.log(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields: Any):
+        self.log(logging.WARNING, event, **fields)
+
+    def error(self, event: str, exc_info=None, **fields: Any):
+        self.log(logging.ERROR, event, exc_info=exc_info, **fields)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'dropped': self._queue_handler.dropped if self._queue_handler else 0,
+            'sampled_out': self.sampled_out,
+            'queued': self._queue_handler.queue.qsize() if self._queue_handler else 0,
+        }
+
+    def flush(self, timeout: float = 5.0):
+        """Wait until the listener has written everything queued so far."""
+        if not self._queue_handler:
+            return
+        deadline = time.time() + timeout
+        while self._queue_handler.queue.qsize() and time.time() < deadline:
+            time.sleep(0.005)
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+
+
+def create_event_logger_from_env(service: str) -> EventLogger:
+    return EventLogger(
+        service,
+        level=os.getenv('EVENT_LOG_LEVEL', os.getenv('LOG_LEVEL', 'INFO')),
+        sampling=parse_sampling(os.getenv('EVENT_LOG_SAMPLING', '')),
+        async_mode=os.getenv('EVENT_LOG_ASYNC', 'true').lower() == 'true',
+        queue_size=int(os.getenv('EVENT_LOG_QUEUE_SIZE', '10000')),
+    )
@@ -5,12 +5,22 @@ import sys
 import logging
 import requests
 import re
-from typing import Dict, Optional, List
+import time
+from typing import Dict, Optional, List, Tuple
 from flask import Flask, request, jsonify
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import pathlib
 
+from event_log import create_event_logger_from_env
+from inventory_risk import rows_to_columns, scan_inventory
+from metrics import MetricsRegistry, OllamaMetrics, install_flask_metrics
+from model_router import create_router_from_env
+from ollama_pool import create_pool_from_env
+from request_budget import Deadline, RetryBudget
+from shelf_life_kb import create_kb_from_env
+from singleflight import SingleFlight, request_key
+
 if sys.platform == 'win32':
     import io
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
@@ -28,21 +38,61 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger("expired_prediction_service")
+events = create_event_logger_from_env("expired_prediction_service")
 
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434/api/generate')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'gemma3:1b')
+EXPIRY_PACKED_MODE = os.getenv('EXPIRY_PACKED_MODE', 'false').lower() == 'true'
+EXPIRY_PACK_SIZE = int(os.getenv('EXPIRY_PACK_SIZE', '8'))
+EXPIRY_PACK_MAX_PROMPT_CHARS = int(os.getenv('EXPIRY_PACK_MAX_PROMPT_CHARS', '12000'))
+EXPIRY_PACK_TOKENS_PER_ITEM = int(os.getenv('EXPIRY_PACK_TOKENS_PER_ITEM', '250'))
+# Keep the model (and its prompt KV cache) loaded between batch items.
+OLLAMA_KEEP_ALIVE = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+# Evaluate the static prompt prefix once and send only the suffix plus the
+# returned context handle afterwards.
+OLLAMA_REUSE_CONTEXT = os.getenv('OLLAMA_REUSE_CONTEXT', 'false').lower() == 'true'
+# Deadline used when the caller sends none (0 = unbounded) and the time kept
+# back to serialize the response before the caller gives up.
+EXPIRY_DEFAULT_TIMEOUT = float(os.getenv('EXPIRY_DEFAULT_TIMEOUT', '0'))
+DEADLINE_SAFETY_MARGIN = float(os.getenv('DEADLINE_SAFETY_MARGIN', '1.0'))
+RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', '0.2'))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv('RETRY_BUDGET_MIN_PER_SECOND', '0.01'))
+# /inventory-risk defaults: alert window in days and max alerts returned.
+RISK_HORIZON_DAYS = float(os.getenv('RISK_HORIZON_DAYS', '7'))
+RISK_MAX_ALERTS = int(os.getenv('RISK_MAX_ALERTS', '100'))
+
+retry_budget = RetryBudget(ratio=RETRY_BUDGET_RATIO, min_per_second=RETRY_BUDGET_MIN_PER_SECOND)
+# Learned estimasi_hari per normalized nama_bahan + kategori (None = disabled).
+shelf_life_kb = create_kb_from_env()
+# OLLAMA_URLS spreads calls over several Ollama boxes; defaults to OLLAMA_URL alone.
+ollama_pool = create_pool_from_env(OLLAMA_URL)
 
 app = Flask(__name__)
 
+metrics = MetricsRegistry()
+install_flask_metrics(app, metrics)
+ollama_metrics = OllamaMetrics(metrics)
+OLLAMA_RETRIES = metrics.counter('expiry_ollama_retries_total', 'Repeated Ollama calls inside call_ollama_api')
+PREDICTIONS = metrics.counter('expiry_predictions_total', 'predict_expiration results by outcome')
+PREDICT_SECONDS = metrics.histogram('expiry_predict_duration_seconds', 'predict_expiration wall time by outcome')
+PREDICT_RETRIES = metrics.counter('expiry_predict_retries_total', 'predict_expiration re-prompts by reason')
+RETRY_DECISIONS = metrics.counter('expiry_retry_decisions_total', 'may_retry results by stage')
+KB_LOOKUPS = metrics.counter('expiry_kb_lookups_total', 'Shelf-life knowledge base lookups by outcome')
+PACKED_ITEMS = metrics.counter('expiry_packed_items_total', 'Items of packed batches by how they were answered')
+_retry_budget_tokens = metrics.gauge('expiry_retry_budget_tokens', 'Retry tokens currently available')
+# Per-task model cascade (MODEL_ROUTES); without routes every task uses OLLAMA_MODEL.
+model_router = create_router_from_env(OLLAMA_MODEL, metrics=metrics)
+ollama_pool.instrument(metrics)
+ollama_flight = SingleFlight('expiry_ollama', metrics)
+predict_flight = SingleFlight('expiry_predict', metrics)
+_retry_budget_tokens.set_function(lambda: retry_budget.stats()['tokens'])
+
 # Global error handler untuk menangkap semua unhandled exceptions
 @app.errorhandler(Exception)
 def handle_exception(e):
     """Handle all unhandled exceptions and return proper JSON response"""
     error_msg = f"Unhandled exception: {str(e)}"
-    logger.error(error_msg, exc_info=True)
-    print(f"[GLOBAL ERROR HANDLER] {error_msg}")
-    import traceback
-    traceback.print_exc()
+    events.error("http.unhandled_exception", exc_info=e, error=str(e))
     return jsonify({
         'success': False,
         'message': 'Terjadi kesalahan pada server',
@@ -56,187 +106,241 @@ def get_ollama_config():
         'model': OLLAMA_MODEL
     }
 
-def is_ollama_available():
+def is_ollama_available(force: bool = False):
     try:
-        config = get_ollama_config()
-        base_url = config['url'].rsplit('/', 1)[0]
-        tags_url = base_url + '/tags'
-        resp = requests.get(tags_url, timeout=3)
-        return resp.status_code == 200
+        return ollama_pool.available(force=force)
     except Exception as e:
         logger.warning("Ollama check failed: %s", e)
         return False
 
-def call_ollama_api(prompt: str, timeout: int = 240, retry: int = 2) -> Optional[str]:
+def new_ollama_usage() -> Dict:
+    return {'calls': 0, 'prompt_eval_count': 0, 'prompt_eval_ms': 0.0, 'eval_count': 0, 'eval_ms': 0.0}
+
+
+def merge_ollama_usage(total: Dict, usage: Optional[Dict]) -> Dict:
+    for key, value in (usage or {}).items():
+        if key in total:
+            total[key] = round(total[key] + value, 2) if isinstance(value, float) else total[key] + value
+    return total
+
+
+def _record_ollama_usage(usage: Optional[Dict], result: Dict):
+    """Accumulate the prompt/eval counters Ollama returns with every response."""
+    if usage is None:
+        return
+    usage['calls'] += 1
+    usage['prompt_eval_count'] += int(result.get('prompt_eval_count') or 0)
+    usage['prompt_eval_ms'] = round(usage['prompt_eval_ms'] + (result.get('prompt_eval_duration') or 0) / 1e6, 2)
+    usage['eval_count'] += int(result.get('eval_count') or 0)
+    usage['eval_ms'] = round(usage['eval_ms'] + (result.get('eval_duration') or 0) / 1e6, 2)
+
+
+def may_retry(deadline: Optional[Deadline], label: str) -> bool:
+    """A retry needs both time left before the caller's deadline and a token
+    from the service wide retry budget."""
+    if deadline is not None and deadline.expired():
+        RETRY_DECISIONS.inc(stage=label, outcome='deadline_exceeded')
+        events.warning("retry.deadline_exceeded", stage=label)
+        return False
+    if not retry_budget.try_retry():
+        RETRY_DECISIONS.inc(stage=label, outcome='budget_exhausted')
+        events.warning("retry.budget_exhausted", stage=label)
+        return False
+    RETRY_DECISIONS.inc(stage=label, outcome='allowed')
+    return True
+
+
+def _out_of_time(deadline: Optional[Deadline]) -> bool:
+    return deadline is not None and deadline.expired()
+
+
+def call_ollama_api(prompt: str, timeout: int = 240, retry: int = 2, options: Optional[Dict] = None,
+                    usage: Optional[Dict] = None, context: Optional[List[int]] = None,
+                    raw_result: Optional[Dict] = None, deadline: Optional[Deadline] = None,
+                    purpose: str = 'predict', model: Optional[str] = None) -> Optional[str]:
+    base_options = {
+        'num_predict': 3000,  # Increased untuk prompt yang lebih panjang
+        'temperature': 0.3,  # Lower temperature untuk lebih konsisten dan akurat
+        'top_p': 0.85,  # Slightly lower untuk lebih fokus
+        'top_k': 40,  # Lower untuk lebih deterministik
+        'repeat_penalty': 1.2  # Slightly lower untuk menghindari pengulangan berlebihan
+    }
+    if options:
+        base_options.update(options)
+    model_name = model or get_ollama_config()['model']
+
+    # Identical concurrent generations (same model, prompt, options and
+    # context) share one Ollama call; only the caller that ran it is billed
+    # the token usage. A failed call (the leader's deadline or the retry
+    # budget ran out) is not shared with a waiter that still has time.
+    key = request_key(model_name, prompt, base_options, context)
+    (response_text, result), shared = ollama_flight.do(
+        key, _call_ollama_api, prompt, timeout, retry, base_options, context, deadline, purpose, model_name,
+        wait_timeout=deadline.remaining() if deadline is not None else None,
+        share_if=lambda value: value[0] is not None or _out_of_time(deadline)
+    )
+    if result:
+        if not shared:
+            _record_ollama_usage(usage, result)
+        if raw_result is not None:
+            raw_result.update(result)
+    return response_text
+
+
+def _call_ollama_api(prompt: str, timeout: float, retry: int, base_options: Dict, context: Optional[List[int]],
+                     deadline: Optional[Deadline], purpose: str, model_name: str) -> Tuple[Optional[str], Dict]:
+    requested_timeout = timeout
     for attempt in range(retry + 1):
+        if attempt > 0:
+            if not may_retry(deadline, 'ollama'):
+                return None, {}
+            OLLAMA_RETRIES.inc(purpose=purpose)
+        if deadline is not None:
+            timeout = deadline.clamp(requested_timeout)
+            if timeout <= 0:
+                events.warning("ollama.deadline_exceeded", attempt=attempt + 1)
+                return None, {}
         try:
-            config = get_ollama_config()
-            print(f"\n{'='*80}")
-            print(f"[OLLAMA API] Memanggil Ollama API (Attempt {attempt + 1}/{retry + 1})...")
-            print(f"[OLLAMA API] Model: {config['model']}")
-            print(f"[OLLAMA API] Timeout: {timeout}s")
-            print(f"{'='*80}")
-            
-            start_time = datetime.now()
-
-            response = requests.post(
-                config['url'],
-                json={
-                    'model': config['model'],
-                    'prompt': prompt,
-                    'stream': False,
-                    'options': {
-                        'num_predict': 3000,  # Increased untuk prompt yang lebih panjang
-                        'temperature': 0.3,  # Lower temperature untuk lebih konsisten dan akurat
-                        'top_p': 0.85,  # Slightly lower untuk lebih fokus
-                        'top_k': 40,  # Lower untuk lebih deterministik
-                        'repeat_penalty': 1.2  # Slightly lower untuk menghindari pengulangan berlebihan
-                    }
-                },
-                timeout=timeout
-            )
+            events.debug("ollama.request", model=model_name, attempt=attempt + 1, attempts=retry + 1,
+                         timeout=round(timeout, 1), prompt_chars=len(prompt), context=bool(context))
+            start_time = time.perf_counter()
 
-            elapsed = (datetime.now() - start_time).total_seconds()
-            print(f"[OLLAMA API] Response diterima dalam {elapsed:.2f} detik")
+            payload = {
+                'model': model_name,
+                'prompt': prompt,
+                'stream': False,
+                'keep_alive': OLLAMA_KEEP_ALIVE,
+                'options': base_options
+            }
+            if context:
+                payload['context'] = context
+            response = ollama_pool.post(payload, timeout)
+            elapsed = time.perf_counter() - start_time
 
             if response.status_code == 200:
                 result = response.json()
                 response_text = result.get('response', '').strip()
-                print(f"[OLLAMA API] Response length: {len(response_text)} karakter")
-                if len(response_text) > 50:
-                    print(f"[OLLAMA API] Response preview: {response_text[:100]}...")
-                return response_text
-            else:
-                error_text = response.text
-                print(f"[OLLAMA API] ERROR: Status {response.status_code}")
-                print(f"[OLLAMA API] Error text: {error_text[:200]}...")
-                logger.error("Ollama API error %s: %s", response.status_code, error_text)
-                if attempt < retry:
-                    print(f"[OLLAMA API] Retrying...")
-                    continue
-                return None
+                ollama_metrics.observe(purpose, 'ok', elapsed, result)
+                events.info("ollama.response", model=model_name, attempt=attempt + 1,
+                            elapsed=round(elapsed, 3), response_chars=len(response_text),
+                            prompt_eval_count=result.get('prompt_eval_count'),
+                            eval_count=result.get('eval_count'))
+                events.debug("ollama.response_preview", preview=lambda: response_text[:100])
+                return response_text, result
+            ollama_metrics.observe(purpose, 'http_error', elapsed)
+            events.error("ollama.http_error", status=response.status_code, attempt=attempt + 1,
+                         elapsed=round(elapsed, 3), error=lambda: response.text[:200])
         except requests.exceptions.Timeout:
-            print(f"[OLLAMA API] TIMEOUT setelah {timeout}s")
-            if attempt < retry:
-                print(f"[OLLAMA API] Retrying...")
-                continue
-            logger.warning("Ollama API timeout after %ss", timeout)
-            return None
+            ollama_metrics.observe(purpose, 'timeout', time.perf_counter() - start_time)
+            events.warning("ollama.timeout", timeout=round(timeout, 1), attempt=attempt + 1)
         except requests.exceptions.ConnectionError:
-            print(f"[OLLAMA API] CONNECTION ERROR")
-            if attempt < retry:
-                print(f"[OLLAMA API] Retrying...")
-                continue
-            logger.error("Ollama connection error")
-            return None
+            ollama_metrics.observe(purpose, 'connection_error')
+            events.error("ollama.connection_error", attempt=attempt + 1)
         except Exception as e:
-            print(f"[OLLAMA API] EXCEPTION: {str(e)}")
-            if attempt < retry:
-                print(f"[OLLAMA API] Retrying...")
-                continue
-            logger.error("Ollama API call error: %s", e)
-            return None
+            ollama_metrics.observe(purpose, 'error')
+            events.error("ollama.exception", error=str(e), attempt=attempt + 1)
     
-    return None
+    return None, {}
 
 
-def build_expiration_prompt(bahan_data: Dict, is_retry: bool = False, previous_error: str = '') -> str:
-    try:
-        nama_bahan = bahan_data.get('nama_bahan', '')
-        kategori = bahan_data.get('kategori', '')
-        stok = bahan_data.get('stok_bahan', '')
-        satuan = bahan_data.get('satuan', '')
-        harga_beli = bahan_data.get('harga_beli', 0)
-        min_stok = bahan_data.get('min_stok', '')
-        
-        # Tanggal dibuat dan terakhir update
-        tanggal_dibuat_str = bahan_data.get('tanggal_dibuat', '')
-        terakhir_update_str = bahan_data.get('terakhir_update', '')
-        
-        if not terakhir_update_str:
-            terakhir_update = datetime.now()
-            terakhir_update_str = terakhir_update.strftime('%Y-%m-%d')
-        
-        # Hitung umur stok dan hari sejak update
-        umur_stok_hari = bahan_data.get('umur_stok_hari')
-        hari_sejak_update = bahan_data.get('hari_sejak_update')
-        
-        today = datetime.now()
-        today_str = today.strftime('%Y-%m-%d')
-        
-        retry_note = ""
-        if is_retry:
-            if 'JSON' in previous_error.upper() or 'parse' in previous_error.lower():
-                retry_note = f"\n⚠️ KESALAHAN SEBELUMNYA: {previous_error}\n⚠️ PENTING: Kembalikan HANYA JSON tanpa teks penjelasan!\n"
-            else:
-                retry_note = f"\n⚠️ KESALAHAN SEBELUMNYA: {previous_error}\n"
-        
-        return f"""Anda adalah ahli prediksi masa simpan bahan makanan. Analisis dan prediksi kapan {nama_bahan} akan expired.
-
-DATA BAHAN:
-- Nama: {nama_bahan}
-- Kategori: {kategori}
-- Stok: {stok} {satuan}
-- Tanggal dibuat: {tanggal_dibuat_str if tanggal_dibuat_str else 'Tidak diketahui'}
-- Terakhir update: {terakhir_update_str}
-- Umur stok: {umur_stok_hari if umur_stok_hari is not None else 'Tidak diketahui'} hari
-- Hari sejak update: {hari_sejak_update if hari_sejak_update is not None else 'Tidak diketahui'} hari
+# Static part of the expiry prompt. It must stay byte-identical between
+# calls: Ollama keeps the KV cache of the previous prompt and only evaluates
+# the tokens after the longest common prefix, so all per-bahan values go in
+# the suffix built by build_expiration_suffix().
+EXPIRATION_PROMPT_PREFIX = """Anda adalah ahli prediksi masa simpan bahan makanan. Analisis dan prediksi kapan bahan pada bagian DATA BAHAN (di akhir prompt) akan expired.
 
 PENTING - BACA INI DENGAN HATI-HATI:
 
-1. ANALISIS KARAKTERISTIK {nama_bahan.upper()}:
+1. ANALISIS KARAKTERISTIK BAHAN:
    - Identifikasi jenis bahan: bahan segar (sayur/daging/buah) atau bahan pokok (minyak/beras/gula/garam)?
    - Bahan SEGAR (Ayam, Cabai, Sayur, Ikan, Buah): mudah busuk, kandungan air tinggi, perlu kulkas → 1-7 hari
    - Bahan POKOK (Minyak, Beras, Gula, Garam): tahan lama, tidak mudah rusak, disimpan kering → 180-365+ hari
    - Daging SEGAR (Ayam, Ikan): sangat mudah busuk, perlu kulkas → 1-3 hari maksimal
 
 2. PREDIKSI MASA SIMPAN:
-   - Hitung dari tanggal terakhir update ({terakhir_update_str})
-   - Jika {nama_bahan} adalah bahan POKOK (minyak/beras/gula/garam): estimasi MINIMAL 180 hari
-   - Jika {nama_bahan} adalah bahan SEGAR (ayam/cabai/sayur): estimasi 1-7 hari
-   - Jika {nama_bahan} adalah daging SEGAR (ayam/ikan): estimasi 1-3 hari maksimal
+   - Hitung dari tanggal terakhir update bahan
+   - Jika bahan adalah bahan POKOK (minyak/beras/gula/garam): estimasi MINIMAL 180 hari
+   - Jika bahan adalah bahan SEGAR (ayam/cabai/sayur): estimasi 1-7 hari
+   - Jika bahan adalah daging SEGAR (ayam/ikan): estimasi 1-3 hari maksimal
 
 3. KONSISTENSI WAJIB:
    - Jika reason mengatakan "dapat bertahan X hari", maka estimasi_hari HARUS = X
    - JANGAN mengatakan "dapat bertahan 24 hari" tapi estimasi_hari = 0 atau 1
    - JANGAN mengatakan "tahan lama" tapi estimasi_hari < 180 untuk bahan pokok
+   - Reason WAJIB menyebut nama bahan yang diprediksi
 
 OUTPUT (HANYA JSON):
-{{
+{
   "estimasi_hari": <angka_hari>,
-  "reason": "<Deskripsi {nama_bahan} dan alasan. WAJIB sebutkan jumlah hari yang SAMA dengan estimasi_hari. Contoh: '{nama_bahan} adalah bahan pokok yang tahan lama. {nama_bahan} dapat bertahan sekitar 180 hari jika disimpan dengan benar.'>",
+  "reason": "<Deskripsi bahan dan alasan. WAJIB sebutkan nama bahan dan jumlah hari yang SAMA dengan estimasi_hari.>",
   "confidence": <angka_1_100>
-}}
+}
 
 CONTOH BENAR untuk MINYAK:
-{{"estimasi_hari": 180, "reason": "Minyak adalah bahan pokok yang tahan lama karena tidak mengandung air dan memiliki sifat pengawet alami. Minyak dapat bertahan sekitar 180 hari jika disimpan di tempat yang sejuk, kering, dan terhindar dari cahaya langsung.", "confidence": 90}}
+{"estimasi_hari": 180, "reason": "Minyak adalah bahan pokok yang tahan lama karena tidak mengandung air dan memiliki sifat pengawet alami. Minyak dapat bertahan sekitar 180 hari jika disimpan di tempat yang sejuk, kering, dan terhindar dari cahaya langsung.", "confidence": 90}
 
 CONTOH BENAR untuk AYAM:
-{{"estimasi_hari": 3, "reason": "Ayam adalah daging segar yang sangat mudah busuk karena kandungan protein dan air yang tinggi. Ayam dapat bertahan sekitar 3 hari jika disimpan di kulkas dengan suhu dingin.", "confidence": 90}}
+{"estimasi_hari": 3, "reason": "Ayam adalah daging segar yang sangat mudah busuk karena kandungan protein dan air yang tinggi. Ayam dapat bertahan sekitar 3 hari jika disimpan di kulkas dengan suhu dingin.", "confidence": 90}
 
 CONTOH SALAH (JANGAN LAKUKAN):
-{{"estimasi_hari": 0, "reason": "Ayam dapat bertahan sekitar 24 hari..."}} ❌ INKONSISTEN!
-{{"estimasi_hari": 23, "reason": "Minyak tahan lama..."}} ❌ Terlalu kecil untuk minyak!
+{"estimasi_hari": 0, "reason": "Ayam dapat bertahan sekitar 24 hari..."} ❌ INKONSISTEN!
+{"estimasi_hari": 23, "reason": "Minyak tahan lama..."} ❌ Terlalu kecil untuk minyak!
+
+"""
 
-{retry_note}
 
-KEMBALIKAN HANYA JSON, TANPA TEKS LAIN!
+def build_expiration_suffix(bahan_data: Dict, is_retry: bool = False, previous_error: str = '') -> str:
+    nama_bahan = bahan_data.get('nama_bahan', '')
+    kategori = bahan_data.get('kategori', '')
+    stok = bahan_data.get('stok_bahan', '')
+    satuan = bahan_data.get('satuan', '')
+    
+    # Tanggal dibuat dan terakhir update
+    tanggal_dibuat_str = bahan_data.get('tanggal_dibuat', '')
+    terakhir_update_str = bahan_data.get('terakhir_update', '')
+    if not terakhir_update_str:
+        terakhir_update_str = datetime.now().strftime('%Y-%m-%d')
+    
+    # Hitung umur stok dan hari sejak update
+    umur_stok_hari = bahan_data.get('umur_stok_hari')
+    hari_sejak_update = bahan_data.get('hari_sejak_update')
+    
+    retry_note = ""
+    if is_retry:
+        if 'JSON' in previous_error.upper() or 'parse' in previous_error.lower():
+            retry_note = f"\n⚠️ KESALAHAN SEBELUMNYA: {previous_error}\n⚠️ PENTING: Kembalikan HANYA JSON tanpa teks penjelasan!\n"
+        else:
+            retry_note = f"\n⚠️ KESALAHAN SEBELUMNYA: {previous_error}\n"
+    
+    return f"""DATA BAHAN:
+- Nama: {nama_bahan}
+- Kategori: {kategori}
+- Stok: {stok} {satuan}
+- Tanggal dibuat: {tanggal_dibuat_str if tanggal_dibuat_str else 'Tidak diketahui'}
+- Terakhir update: {terakhir_update_str}
+- Umur stok: {umur_stok_hari if umur_stok_hari is not None else 'Tidak diketahui'} hari
+- Hari sejak update: {hari_sejak_update if hari_sejak_update is not None else 'Tidak diketahui'} hari
+{retry_note}
+Prediksi kapan {nama_bahan} akan expired. KEMBALIKAN HANYA JSON, TANPA TEKS LAIN!
 """
+
+
+def build_expiration_prompt(bahan_data: Dict, is_retry: bool = False, previous_error: str = '',
+                            include_prefix: bool = True) -> str:
+    try:
+        suffix = build_expiration_suffix(bahan_data, is_retry=is_retry, previous_error=previous_error)
+        return EXPIRATION_PROMPT_PREFIX + suffix if include_prefix else suffix
     except Exception as e:
-        print(f"[PROMPT] ERROR: Gagal build prompt: {e}")
-        logger.error(f"Error building prompt: {e}", exc_info=True)
+        events.error("expiry.prompt_error", exc_info=e, error=str(e))
         raise
 
 def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
     kategori = bahan_data.get('kategori', '')
     
-    print(f"\n[PARSING] Memproses hasil untuk kategori: {kategori}")
-    
     if not ai_response:
-        print(f"[PARSING] ERROR: Tidak ada response dari AI")
         raise ValueError("Tidak ada response dari Ollama AI")
 
-    print(f"[PARSING] Response AI: {ai_response[:200]}...")
+    events.debug("expiry.parse.start", kategori=kategori, response=lambda: ai_response[:200])
     
     # Clean response - remove markdown code blocks
     cleaned_response = re.sub(r'```json|```', '', ai_response, flags=re.IGNORECASE).strip()
@@ -251,7 +355,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
     
     if matches:
         json_match = matches[0]
-        print(f"[PARSING] JSON ditemukan dengan pattern matching (Method 1)")
+        events.debug("expiry.parse.json_found", method=1)
     else:
         # Method 2: Cari semua kemungkinan JSON object dengan bracket matching
         # Cari semua { dan coba temukan } yang seimbang
@@ -280,7 +384,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                     test_parse = json.loads(potential_json)
                     if ('estimasi_hari' in test_parse or 'expired_date' in test_parse) and 'reason' in test_parse and 'confidence' in test_parse:
                         json_match = potential_json
-                        print(f"[PARSING] JSON ditemukan dengan bracket matching (Method 2)")
+                        events.debug("expiry.parse.json_found", method=2)
                         break
                 except json.JSONDecodeError:
                     continue
@@ -316,7 +420,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                                 test_parse = json.loads(potential_json)
                                 if ('estimasi_hari' in test_parse or 'expired_date' in test_parse) and 'reason' in test_parse and 'confidence' in test_parse:
                                     json_match = potential_json
-                                    print(f"[PARSING] JSON ditemukan setelah keyword '{keyword}' (Method 3)")
+                                    events.debug("expiry.parse.json_found", method=3, keyword=keyword)
                                     break
                             except:
                                 pass
@@ -335,34 +439,28 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                         test_parse = json.loads(normalized)
                         if ('estimasi_hari' in test_parse or 'expired_date' in test_parse) and 'reason' in test_parse and 'confidence' in test_parse:
                             json_match = normalized
-                            print(f"[PARSING] JSON ditemukan dengan flexible pattern (Method 4)")
+                            events.debug("expiry.parse.json_found", method=4)
                             break
                     except:
                         continue
     
     if not json_match:
-        print(f"[PARSING] ERROR: Tidak ada JSON ditemukan dalam response")
-        print(f"[PARSING] Response lengkap: {cleaned_response[:1000]}...")
+        events.warning("expiry.parse.no_json", response=lambda: cleaned_response[:1000])
         raise ValueError("Tidak dapat menemukan JSON dalam response AI")
 
-    print(f"[PARSING] JSON yang ditemukan: {json_match}")
-    
     try:
         parsed = json.loads(json_match)
-        print(f"[PARSING] JSON berhasil di-parse")
         
         # Validasi field wajib - cek apakah ada estimasi_hari atau expired_date
         has_estimasi_hari = 'estimasi_hari' in parsed
         has_expired_date = 'expired_date' in parsed
         
         if not has_estimasi_hari and not has_expired_date:
-            print(f"[PARSING] ERROR: Field 'estimasi_hari' atau 'expired_date' tidak ditemukan")
             raise ValueError("Field 'estimasi_hari' atau 'expired_date' tidak ditemukan dalam response")
         
         required_fields = ['reason', 'confidence']
         for field in required_fields:
             if field not in parsed:
-                print(f"[PARSING] ERROR: Field '{field}' tidak ditemukan")
                 raise ValueError(f"Field '{field}' tidak ditemukan dalam response")
         
         ai_date = None
@@ -375,13 +473,10 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             # Prioritas: gunakan estimasi_hari jika ada
             try:
                 ai_days = int(parsed['estimasi_hari'])
-                print(f"[PARSING] Menggunakan estimasi_hari dari AI: {ai_days} hari")
             except (ValueError, TypeError):
-                print(f"[PARSING] ERROR: estimasi_hari tidak valid: {parsed.get('estimasi_hari', 'N/A')}")
                 raise ValueError(f"estimasi_hari harus berupa angka, mendapat: {parsed.get('estimasi_hari', 'N/A')}")
         elif has_expired_date:
             # Fallback: parse expired_date jika estimasi_hari tidak ada
-            print(f"[PARSING] INFO: estimasi_hari tidak ditemukan, mencoba parse expired_date")
             expired_date_str = parsed['expired_date']
             
             # Coba parse format yang salah seperti "2025-12-15 + 16 hari"
@@ -390,7 +485,6 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                 hari_match = re.search(r'\+?\s*(\d+)\s*hari', expired_date_str, re.IGNORECASE)
                 if hari_match:
                     ai_days = int(hari_match.group(1))
-                    print(f"[PARSING] Mengekstrak estimasi_hari dari format salah: {ai_days} hari")
                 else:
                     raise ValueError(f"Tidak dapat mengekstrak estimasi_hari dari format: {expired_date_str}")
             else:
@@ -412,9 +506,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                     ai_days = (date - terakhir_update).days
                     if ai_days <= 0:
                         raise ValueError(f"expired_date harus lebih besar dari terakhir_update")
-                    print(f"[PARSING] Menghitung estimasi_hari dari expired_date: {ai_days} hari")
                 except ValueError as e:
-                    print(f"[PARSING] ERROR: Tidak dapat parse expired_date: {expired_date_str}")
                     raise ValueError(f"Format expired_date tidak valid: {str(e)}")
         
         if ai_days is None or ai_days <= 0:
@@ -438,44 +530,31 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
         # Validasi khusus untuk bahan yang seharusnya tahan lama
         if 'minyak' in nama_bahan_lower or 'oil' in nama_bahan_lower:
             if ai_days < 180:
-                print(f"[PARSING] ERROR: Estimasi_hari untuk Minyak terlalu kecil ({ai_days} hari)")
-                print(f"[PARSING] Minyak adalah bahan pokok yang tahan lama, HARUS minimal 180 hari")
-                print(f"[PARSING] Memperbaiki menjadi 180 hari minimum")
                 ai_days = 180
                 reason_updated = True
         elif 'beras' in nama_bahan_lower or 'rice' in nama_bahan_lower:
             if ai_days < 365:
-                print(f"[PARSING] ERROR: Estimasi_hari untuk Beras terlalu kecil ({ai_days} hari)")
-                print(f"[PARSING] Beras adalah bahan pokok yang sangat tahan lama, HARUS minimal 365 hari")
-                print(f"[PARSING] Memperbaiki menjadi 365 hari minimum")
                 ai_days = 365
                 reason_updated = True
         elif 'gula' in nama_bahan_lower or 'sugar' in nama_bahan_lower:
             if ai_days < 365:
-                print(f"[PARSING] ERROR: Estimasi_hari untuk Gula terlalu kecil ({ai_days} hari)")
-                print(f"[PARSING] Gula adalah bahan pokok yang sangat tahan lama, HARUS minimal 365 hari")
-                print(f"[PARSING] Memperbaiki menjadi 365 hari minimum")
                 ai_days = 365
                 reason_updated = True
         elif 'garam' in nama_bahan_lower or 'salt' in nama_bahan_lower:
             if ai_days < 730:
-                print(f"[PARSING] ERROR: Estimasi_hari untuk Garam terlalu kecil ({ai_days} hari)")
-                print(f"[PARSING] Garam adalah bahan pokok yang hampir tidak pernah expired, HARUS minimal 730 hari")
-                print(f"[PARSING] Memperbaiki menjadi 730 hari minimum")
                 ai_days = 730
                 reason_updated = True
         
         # Validasi untuk bahan segar - tidak boleh terlalu lama
         if any(x in nama_bahan_lower for x in ['ayam', 'chicken', 'ikan', 'fish', 'udang', 'shrimp']):
             if ai_days > 7:
-                print(f"[PARSING] ERROR: Estimasi_hari untuk daging segar terlalu besar ({ai_days} hari)")
-                print(f"[PARSING] Daging segar maksimal 3-7 hari, memperbaiki menjadi 3 hari")
                 ai_days = 3
                 reason_updated = True
         
         # Jika estimasi_hari diubah, perlu update reason dan expired_date juga
         if ai_days != original_ai_days:
-            print(f"[PARSING] Estimasi_hari diubah dari {original_ai_days} menjadi {ai_days} hari")
+            events.info("expiry.parse.days_clamped", nama_bahan=bahan_data.get('nama_bahan', ''),
+                        from_days=original_ai_days, to_days=ai_days)
             
             # Recalculate expired_date
             expired_date = terakhir_update + timedelta(days=ai_days)
@@ -493,15 +572,11 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             else:
                 # Update reason dengan jumlah hari yang benar
                 ai_reason = re.sub(r'\d+\s*hari', f'{ai_days} hari', ai_reason, flags=re.IGNORECASE)
-            
-            print(f"[PARSING] Reason diperbaiki untuk konsistensi: {ai_reason}")
         
         # Hitung expired_date = terakhir_update + estimasi_hari
         expired_date = terakhir_update + timedelta(days=ai_days)
         ai_date = expired_date.strftime('%Y-%m-%d')
         
-        print(f"[PARSING] expired_date dihitung: {ai_date} = {terakhir_update_str} + {ai_days} hari")
-        
         # Validasi konsistensi: ekstrak jumlah hari dari reason dan bandingkan dengan estimasi_hari
         if ai_reason:
             # Cari angka hari dalam reason (contoh: "16 hari", "30 hari", "365 hari")
@@ -534,19 +609,13 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                 # Bandingkan dengan ai_days
                 diff = abs(ai_days - reason_days)
                 if diff > 2:  # Toleransi 2 hari untuk perbedaan kecil
-                    print(f"[PARSING] ERROR: INKONSISTENSI DETECTED!")
-                    print(f"[PARSING] Reason menyebutkan: {reason_days} hari")
-                    print(f"[PARSING] estimasi_hari menunjukkan: {ai_days} hari")
-                    print(f"[PARSING] Selisih: {diff} hari - INI SANGAT TIDAK KONSISTEN!")
-                    print(f"[PARSING] Memperbaiki estimasi_hari sesuai dengan reason...")
+                    events.info("expiry.parse.reason_inconsistent", nama_bahan=bahan_data.get('nama_bahan', ''),
+                                reason_days=reason_days, estimasi_hari=ai_days)
 
                     # Perbaiki estimasi_hari sesuai dengan reason (reason lebih akurat karena AI sudah berpikir)
                     ai_days = reason_days
                     expired_date = terakhir_update + timedelta(days=ai_days)
                     ai_date = expired_date.strftime('%Y-%m-%d')
-
-                    print(f"[PARSING] estimasi_hari diperbaiki menjadi: {ai_days} hari")
-                    print(f"[PARSING] expired_date diperbaiki menjadi: {ai_date}")
                     
                     # Update reason untuk memastikan konsistensi
                     nama_bahan_display = bahan_data.get('nama_bahan', 'Bahan ini')
@@ -563,19 +632,11 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                         # Update reason dengan jumlah hari yang benar
                         # Ganti angka hari yang salah dengan yang benar
                         ai_reason = re.sub(r'\d+\s*hari', f'{ai_days} hari', ai_reason, flags=re.IGNORECASE)
-                    
-                    print(f"[PARSING] Reason diperbaiki untuk konsistensi: {ai_reason}")
-                else:
-                    print(f"[PARSING] Konsistensi OK: reason {reason_days} hari, estimasi_hari {ai_days} hari (selisih {diff} hari)")
-            else:
-                print(f"[PARSING] INFO: Tidak ditemukan jumlah hari eksplisit dalam reason, menggunakan estimasi_hari yang diberikan")
         
         # Hitung hari dari sekarang (real-time calculation)
         today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
         days_from_today = (datetime.strptime(ai_date, '%Y-%m-%d') - today).days
         
-        print(f"[PARSING] Tanggal valid: {ai_date} ({ai_days} hari dari terakhir update, {days_from_today} hari dari sekarang)")
-        
         # Validasi confidence
         try:
             conf_value = parsed['confidence']
@@ -584,23 +645,17 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             ai_confidence = float(conf_value)
             # Jika model mengembalikan 0-1, konversi ke 0-100
             if 0 < ai_confidence <= 1:
-                print(f"[PARSING] Info: confidence {ai_confidence} diasumsikan skala 0-1, dikonversi ke persen")
                 ai_confidence = ai_confidence * 100.0
             
             if ai_confidence < 0 or ai_confidence > 100:
-                print(f"[PARSING] WARNING: Confidence {ai_confidence} di luar range 0-100%")
                 raise ValueError(f"Confidence harus antara 0-100%, mendapat: {ai_confidence}")
             
-            print(f"[PARSING] Confidence: {ai_confidence:.1f}%")
-            
         except (ValueError, TypeError) as e:
-            print(f"[PARSING] ERROR: Confidence tidak valid: {parsed.get('confidence', 'N/A')}")
             raise ValueError(f"Confidence tidak valid: {str(e)}")
         
         # Validasi reason
         try:
             if not ai_reason or len(ai_reason) < 10:
-                print(f"[PARSING] ERROR: Reason terlalu pendek atau kosong")
                 raise ValueError("Reason terlalu pendek atau kosong")
             
             # PENTING: Validasi bahwa reason menyebutkan nama bahan yang benar
@@ -644,10 +699,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             reason_mentions_wrong_bahan = any(wrong in ai_reason_lower for wrong in wrong_bahan_mentions)
             
             if reason_mentions_wrong_bahan:
-                print(f"[PARSING] WARNING: Reason menyebutkan bahan yang salah!")
-                print(f"[PARSING] Bahan yang diprediksi: {nama_bahan}")
-                print(f"[PARSING] Reason asli dari AI: {ai_reason}")
-                print(f"[PARSING] Reason menyebutkan bahan yang salah, akan diperbaiki...")
+                events.info("expiry.parse.reason_wrong_bahan", nama_bahan=nama_bahan, reason=ai_reason)
                 
                 # Perbaiki reason dengan mengganti bahan yang salah dengan bahan yang benar
                 nama_bahan_display = bahan_data.get('nama_bahan', 'Bahan ini')
@@ -658,8 +710,6 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                     # PENTING: Minyak HARUS memiliki estimasi_hari yang besar (180-365 hari)
                     # Jika estimasi_hari terlalu kecil (< 180), berarti AI salah menganalisis
                     if ai_days < 180:
-                        print(f"[PARSING] WARNING: Estimasi_hari untuk Minyak terlalu kecil ({ai_days} hari)")
-                        print(f"[PARSING] Minyak adalah bahan pokok yang tahan lama, memperbaiki menjadi 180 hari minimum")
                         ai_days = 180
                         # Recalculate expired_date
                         terakhir_update_str = bahan_data.get('terakhir_update', '')
@@ -683,20 +733,14 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                 else:
                     # Untuk bahan lain, gunakan template umum
                     ai_reason = f"{nama_bahan_display} adalah bahan makanan yang dapat bertahan sekitar {ai_days} hari jika disimpan dengan baik."
-                
-                print(f"[PARSING] Reason diperbaiki menjadi: {ai_reason}")
             
             if not reason_mentions_correct_bahan:
-                print(f"[PARSING] WARNING: Reason tidak menyebutkan nama bahan yang benar!")
-                print(f"[PARSING] Bahan yang diprediksi: {nama_bahan}")
-                print(f"[PARSING] Reason: {ai_reason}")
-                print(f"[PARSING] Menambahkan nama bahan ke reason...")
+                events.debug("expiry.parse.reason_missing_bahan", nama_bahan=nama_bahan)
                 
                 # Tambahkan nama bahan di awal reason jika belum ada
                 nama_bahan_display = bahan_data.get('nama_bahan', 'Bahan ini')
                 if not any(mention in ai_reason_lower for mention in bahan_mentions):
                     ai_reason = f"{nama_bahan_display} adalah {ai_reason.lower()}"
-                    print(f"[PARSING] Reason diperbaiki menjadi: {ai_reason}")
             
             # Validasi: reason harus menyebutkan jumlah hari
             hari_patterns = [
@@ -706,8 +750,7 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             has_hari_mention = any(re.search(pattern, ai_reason, re.IGNORECASE) for pattern in hari_patterns)
             
             if not has_hari_mention:
-                print(f"[PARSING] WARNING: Reason tidak menyebutkan jumlah hari eksplisit")
-                print(f"[PARSING] Reason: {ai_reason}")
+                events.debug("expiry.parse.reason_without_days", nama_bahan=nama_bahan)
                 # Tidak error, hanya warning karena sudah ada validasi konsistensi sebelumnya
             
             # Potong reason jika terlalu panjang
@@ -716,20 +759,11 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
                 ai_reason = '. '.join(sentences[:2]).strip()
                 if ai_reason and not ai_reason.endswith('.'):
                     ai_reason += '.'
-                print(f"[PARSING] Alasan dipotong menjadi: {ai_reason}")
-            
-            print(f"[PARSING] Reason: {ai_reason}")
         except (KeyError, AttributeError) as e:
-            print(f"[PARSING] ERROR: Reason tidak ditemukan atau tidak valid")
             raise ValueError(f"Reason tidak valid: {str(e)}")
         
         # Final validation
         if not ai_date or ai_days is None or ai_confidence is None or not ai_reason:
-            print(f"[PARSING] ERROR: Data tidak lengkap")
-            print(f"  - Date: {ai_date}")
-            print(f"  - Days: {ai_days}")
-            print(f"  - Confidence: {ai_confidence}")
-            print(f"  - Reason: {bool(ai_reason)}")
             raise ValueError("Data prediksi tidak lengkap dari AI")
         
         result = {
@@ -739,177 +773,542 @@ def parse_expiration_prediction(ai_response: str, bahan_data: Dict) -> Dict:
             'confidence': round(ai_confidence, 2)
         }
         
-        print(f"\n[PARSING] HASIL AKHIR:")
-        print(f"  - Tanggal Expired: {result['expired_date']}")
-        print(f"  - Total Hari: {result['days']} hari")
-        print(f"  - Confidence: {result['confidence']:.1f}%")
-        print(f"  - Reason: {result['reason']}")
-        print(f"{'='*80}\n")
+        events.debug("expiry.parse.result", kategori=kategori, days_from_today=days_from_today, **result)
         
         return result
         
     except json.JSONDecodeError as e:
-        print(f"[PARSING] ERROR: JSON decode error: {e}")
-        print(f"[PARSING] JSON yang gagal di-parse: {json_match}")
         raise ValueError(f"Gagal parse JSON: {str(e)}")
+
+_prefix_context: Dict[str, List[int]] = {}
+
+
+def get_prefix_context(usage: Optional[Dict] = None, deadline: Optional[Deadline] = None,
+                       model: Optional[str] = None) -> Optional[List[int]]:
+    """Context handle for EXPIRATION_PROMPT_PREFIX, evaluated once per model.
+    Only used when OLLAMA_REUSE_CONTEXT is enabled."""
+    model = model or get_ollama_config()['model']
+    if model not in _prefix_context:
+        result: Dict = {}
+        call_ollama_api(EXPIRATION_PROMPT_PREFIX + "Jawab OK jika sudah paham.", timeout=120, retry=0,
+                        options={'num_predict': 1}, usage=usage, raw_result=result, deadline=deadline,
+                        purpose='prefix', model=model)
+        if not result.get('context'):
+            return None
+        _prefix_context[model] = result['context']
+    return _prefix_context[model]
+
+
+def terakhir_update_date(bahan_data: Dict) -> datetime:
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    terakhir_update_str = bahan_data.get('terakhir_update', '')
+    if not terakhir_update_str:
+        return today
+    try:
+        return datetime.strptime(terakhir_update_str, '%Y-%m-%d')
+    except ValueError:
+        return today
+
+
+def lookup_shelf_life(bahan_data: Dict) -> Optional[Dict]:
+    """Prediction result built from the knowledge base, or None on a miss.
+    expired_date is plain arithmetic on terakhir_update, no LLM involved."""
+    if shelf_life_kb is None:
+        return None
+    entry = shelf_life_kb.lookup(bahan_data.get('nama_bahan', ''), bahan_data.get('kategori', ''))
+    KB_LOOKUPS.inc(outcome='hit' if entry else 'miss')
+    if entry is None:
+        return None
+    days = entry['estimasi_hari']
+    expired_date = terakhir_update_date(bahan_data) + timedelta(days=days)
+    events.debug("expiry.kb.hit", nama_bahan=bahan_data.get('nama_bahan', ''), days=days, source=entry['source'])
+    return {
+        'success': True,
+        'bahan': bahan_data,
+        'prediction': {
+            'expired_date': expired_date.strftime('%Y-%m-%d'),
+            'days': days,
+            'reason': entry['reason'],
+            'confidence': entry['confidence']
+        },
+        'source': 'knowledge_base'
+    }
+
+
+def remember_shelf_life(bahan_data: Dict, prediction: Dict, model: Optional[str] = None):
+    if shelf_life_kb is None:
+        return
+    try:
+        shelf_life_kb.store(bahan_data.get('nama_bahan', ''), bahan_data.get('kategori', ''),
+                            prediction['days'], prediction['reason'], prediction['confidence'],
+                            model=model or get_ollama_config()['model'])
     except Exception as e:
-        print(f"[PARSING] ERROR: {str(e)}")
-        raise
+        events.warning("expiry.kb.store_failed", nama_bahan=bahan_data.get('nama_bahan', ''), error=str(e))
+
+
+def predict_expiration(bahan_data: Dict, deadline: Optional[Deadline] = None, use_kb: bool = True,
+                       start_tier: int = 0) -> Dict:
+    """Predict expiration date for a bahan. Known ingredients are answered
+    from the shelf-life knowledge base; otherwise every attempt uses only
+    what is left of `deadline`, and attempts after the first draw on
+    retry_budget. The 'expiry' model cascade is entered at `start_tier` and
+    climbed one tier per rejected answer. Concurrent requests for the same
+    bahan wait for the prediction already running and share it when it
+    succeeded; after a failed one a waiter with time left predicts itself."""
+    if use_kb:
+        cached = lookup_shelf_life(bahan_data)
+        if cached is not None:
+            PREDICTIONS.inc(outcome='knowledge_base')
+            return cached
+    key = request_key(normalize_bahan_request(bahan_data), start_tier)
+    result, shared = predict_flight.do(key, _predict_and_remember, bahan_data, deadline, start_tier,
+                                       wait_timeout=deadline.remaining() if deadline is not None else None,
+                                       share_if=lambda value: value.get('success') or _out_of_time(deadline))
+    if shared:
+        result = dict(result, bahan=bahan_data, ollama_usage=new_ollama_usage())
+    return result
+
+
+def is_validation_error(error_str: str) -> bool:
+    """parse_expiration_prediction errors worth re-prompting for (as opposed
+    to output that is not a prediction at all)."""
+    return any(keyword in error_str.lower()
+               for keyword in ['tanggal', 'masa depan', 'expired', 'format', 'confidence', 'reason'])
+
+
+def normalize_bahan_request(bahan_data: Dict) -> Dict:
+    """Case and surrounding whitespace do not change the prediction."""
+    return {key: value.strip().lower() if isinstance(value, str) else value for key, value in bahan_data.items()}
+
+
+def _predict_and_remember(bahan_data: Dict, deadline: Optional[Deadline], start_tier: int) -> Dict:
+    started = time.perf_counter()
+    result = _predict_expiration(bahan_data, deadline, start_tier)
+    if result.get('success'):
+        remember_shelf_life(bahan_data, result['prediction'], result.get('model'))
+        outcome = 'success'
+    elif result.get('deadline_exceeded'):
+        outcome = 'deadline_exceeded'
+    else:
+        outcome = 'failed'
+    PREDICTIONS.inc(outcome=outcome)
+    PREDICT_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+    return result
 
-def predict_expiration(bahan_data: Dict) -> Dict:
-    """Predict expiration date for a bahan"""
+
+def _predict_expiration(bahan_data: Dict, deadline: Optional[Deadline], start_tier: int = 0) -> Dict:
     try:
         kategori = bahan_data.get('kategori', '')
         nama_bahan = bahan_data.get('nama_bahan', 'Unknown')
         max_retries = 3
+        usage = new_ollama_usage()
+        started = time.perf_counter()
+        tier = min(max(start_tier, 0), len(model_router.cascade('expiry')) - 1)
         
-        print(f"\n{'#'*80}")
-        print(f"# PREDIKSI EXPIRED: {nama_bahan} ({kategori})")
-        print(f"{'#'*80}")
-        print(f"Waktu mulai: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        events.debug("expiry.predict.start", nama_bahan=nama_bahan, kategori=kategori)
         
         # Check if Ollama is available before starting
         if not is_ollama_available():
             config = get_ollama_config()
             error_msg = f"Ollama tidak tersedia di {config['url']} dengan model {config['model']}"
-            print(f"[PROCESS] ERROR: {error_msg}")
+            events.error("expiry.predict.ollama_unavailable", url=config['url'], model=config['model'])
             return {
                 'success': False,
                 'error': error_msg,
                 'bahan': bahan_data
             }
         
+        retry_budget.record_request()
         for attempt in range(max_retries):
+            if (attempt == 0 and deadline is not None and deadline.expired()) or \
+                    (attempt > 0 and not may_retry(deadline, 'predict')):
+                deadline_exceeded = deadline is not None and deadline.expired()
+                error_msg = (f"Deadline terlewati saat memprediksi {kategori}" if deadline_exceeded
+                             else f"Retry budget habis saat memprediksi {kategori}")
+                events.warning("expiry.predict.abandoned", nama_bahan=nama_bahan, attempt=attempt + 1,
+                               deadline_exceeded=deadline_exceeded)
+                return {
+                    'success': False,
+                    'error': error_msg,
+                    'deadline_exceeded': deadline_exceeded,
+                    'bahan': bahan_data,
+                    'ollama_usage': usage
+                }
             try:
                 is_retry = attempt > 0
                 previous_error = ""
                 
                 if is_retry:
-                    print(f"\n[PROCESS] RETRY #{attempt} untuk {kategori}")
+                    events.info("expiry.predict.retry", nama_bahan=nama_bahan, attempt=attempt + 1)
                     previous_error = "Perbaikan diperlukan untuk memenuhi semua aturan"
                 
-                prompt = build_expiration_prompt(bahan_data, is_retry=is_retry, previous_error=previous_error)
-                
-                print(f"\n[PROCESS] Prompt dibuat (attempt {attempt + 1}/{max_retries})")
-                print(f"[PROCESS] Panjang prompt: {len(prompt)} karakter")
+                model = model_router.model_for('expiry', tier)
+                context = get_prefix_context(usage, deadline, model) if OLLAMA_REUSE_CONTEXT else None
+                prompt = build_expiration_prompt(bahan_data, is_retry=is_retry, previous_error=previous_error,
+                                                 include_prefix=context is None)
                 
-                ai_response = call_ollama_api(prompt, timeout=240, retry=1)
+                call_started = time.perf_counter()
+                ai_response = call_ollama_api(prompt, timeout=240, retry=1, usage=usage, context=context,
+                                              deadline=deadline, model=model)
+                call_elapsed = time.perf_counter() - call_started
                 
                 if not ai_response:
+                    model_router.record('expiry', tier, model, 'no_response', call_elapsed)
                     if attempt < max_retries - 1:
-                        print(f"[PROCESS] Tidak ada response, akan retry...")
+                        PREDICT_RETRIES.inc(reason='no_response')
                         continue
                     error_msg = f"Gagal mendapatkan response dari Ollama untuk {kategori} setelah {max_retries} kali attempt"
-                    print(f"[PROCESS] ERROR: {error_msg}")
+                    events.error("expiry.predict.failed", nama_bahan=nama_bahan, error=error_msg)
                     return {
                         'success': False,
                         'error': error_msg,
-                        'bahan': bahan_data
+                        'bahan': bahan_data,
+                        'ollama_usage': usage
                     }
                 
                 try:
                     prediction = parse_expiration_prediction(ai_response, bahan_data)
-                    
-                    print(f"[PROCESS] [OK] Prediksi selesai untuk {kategori} (attempt {attempt + 1})")
-                    print(f"[PROCESS] Waktu selesai: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+                    model_router.record('expiry', tier, model, 'accepted', call_elapsed)
+                    events.info("expiry.predict.done", nama_bahan=nama_bahan, attempts=attempt + 1,
+                                days=prediction['days'], model=model, tier=tier,
+                                elapsed=round(time.perf_counter() - started, 3))
                     
                     return {
                         'success': True,
                         'bahan': bahan_data,
-                        'prediction': prediction
+                        'prediction': prediction,
+                        'model': model,
+                        'ollama_usage': usage
                     }
                     
                 except ValueError as e:
                     error_str = str(e)
-                    if any(keyword in error_str.lower() for keyword in ['tanggal', 'masa depan', 'expired', 'format', 'confidence', 'reason']):
+                    model_router.record('expiry', tier, model, 'rejected', call_elapsed)
+                    next_tier = model_router.next_tier('expiry', tier)
+                    if next_tier is not None and attempt < max_retries - 1:
+                        # The small model's answer failed validation: ask the next model up.
+                        events.info("expiry.predict.escalate", nama_bahan=nama_bahan, attempt=attempt + 1,
+                                    model=model, next_model=model_router.model_for('expiry', next_tier),
+                                    error=error_str)
+                        PREDICT_RETRIES.inc(reason='escalation')
+                        tier = next_tier
+                        continue
+                    if is_validation_error(error_str):
+                        events.info("expiry.predict.validation_failed", nama_bahan=nama_bahan,
+                                    attempt=attempt + 1, error=error_str)
                         if attempt < max_retries - 1:
-                            print(f"[PROCESS] Validasi gagal: {error_str}, akan retry...")
+                            PREDICT_RETRIES.inc(reason='validation')
                             continue
                         else:
                             error_msg = f"Validasi gagal setelah {max_retries} kali attempt: {error_str}"
-                            print(f"[PROCESS] ERROR: {error_msg}")
                             return {
                                 'success': False,
                                 'error': error_msg,
-                                'bahan': bahan_data
+                                'bahan': bahan_data,
+                                'ollama_usage': usage
                             }
                     else:
                         error_msg = f"Error parsing untuk {kategori}: {error_str}"
-                        print(f"[PROCESS] ERROR: {error_msg}")
+                        events.warning("expiry.predict.failed", nama_bahan=nama_bahan, error=error_msg)
                         return {
                             'success': False,
                             'error': error_msg,
-                            'bahan': bahan_data
+                            'bahan': bahan_data,
+                            'ollama_usage': usage
                         }
                         
             except Exception as e:
+                events.warning("expiry.predict.exception", nama_bahan=nama_bahan, attempt=attempt + 1, error=str(e))
                 if attempt < max_retries - 1:
-                    print(f"[PROCESS] Exception: {str(e)}, akan retry...")
+                    PREDICT_RETRIES.inc(reason='exception')
                     continue
                 error_msg = f"Unexpected error untuk {kategori}: {str(e)}"
-                print(f"[PROCESS] ERROR: {error_msg}")
                 return {
                     'success': False,
                     'error': error_msg,
-                    'bahan': bahan_data
+                    'bahan': bahan_data,
+                    'ollama_usage': usage
                 }
         
         # If we get here, all retries failed
         error_msg = f"Gagal memprediksi {kategori} setelah {max_retries} kali attempt"
-        print(f"[PROCESS] ERROR: {error_msg}")
+        events.error("expiry.predict.failed", nama_bahan=nama_bahan, error=error_msg)
         return {
             'success': False,
             'error': error_msg,
-            'bahan': bahan_data
+            'bahan': bahan_data,
+            'ollama_usage': usage
         }
     except Exception as e:
         error_msg = f"Unexpected error in predict_expiration: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(f"[PROCESS] FATAL ERROR: {error_msg}")
+        events.error("expiry.predict.fatal", exc_info=e, error=str(e))
         return {
             'success': False,
             'error': error_msg,
             'bahan': bahan_data
         }
 
+PACKED_PROMPT_HEADER = """Anda adalah ahli prediksi masa simpan bahan makanan. Prediksi masa simpan SETIAP bahan pada daftar di bawah.
+
+ATURAN (berlaku untuk setiap bahan):
+
+1. ANALISIS KARAKTERISTIK BAHAN:
+   - Identifikasi jenis bahan: bahan segar (sayur/daging/buah) atau bahan pokok (minyak/beras/gula/garam)?
+   - Bahan SEGAR (Ayam, Cabai, Sayur, Ikan, Buah): mudah busuk, kandungan air tinggi, perlu kulkas → 1-7 hari
+   - Bahan POKOK (Minyak, Beras, Gula, Garam): tahan lama, tidak mudah rusak, disimpan kering → 180-365+ hari
+   - Daging SEGAR (Ayam, Ikan): sangat mudah busuk, perlu kulkas → 1-3 hari maksimal
+
+2. PREDIKSI MASA SIMPAN dihitung dari tanggal terakhir update masing-masing bahan.
+
+3. KONSISTENSI WAJIB:
+   - Jika reason mengatakan "dapat bertahan X hari", maka estimasi_hari HARUS = X
+   - Reason WAJIB menyebut nama bahan itu sendiri, bukan bahan lain
+   - JANGAN mengatakan "tahan lama" tapi estimasi_hari < 180 untuk bahan pokok
+
+OUTPUT (HANYA JSON ARRAY, satu objek per bahan, gunakan id_bahan yang sama persis):
+[
+  {"id_bahan": <id_bahan>, "estimasi_hari": <angka_hari>, "reason": "<Nama bahan dan alasan, sebutkan jumlah hari yang SAMA dengan estimasi_hari>", "confidence": <angka_1_100>},
+  ...
+]
+
+CONTOH BENAR:
+[{"id_bahan": 7, "estimasi_hari": 180, "reason": "Minyak adalah bahan pokok yang tahan lama. Minyak dapat bertahan sekitar 180 hari jika disimpan di tempat sejuk dan kering.", "confidence": 90},
+ {"id_bahan": 9, "estimasi_hari": 3, "reason": "Ayam adalah daging segar yang sangat mudah busuk. Ayam dapat bertahan sekitar 3 hari jika disimpan di kulkas.", "confidence": 90}]
+
+DAFTAR BAHAN:
+"""
+
+
+def _packed_key(bahan_data: Dict, position: int) -> str:
+    id_bahan = bahan_data.get('id_bahan')
+    return str(id_bahan) if id_bahan is not None else f"item-{position}"
+
+
+def _format_packed_item(key: str, bahan_data: Dict) -> str:
+    terakhir_update = bahan_data.get('terakhir_update') or datetime.now().strftime('%Y-%m-%d')
+    return (
+        f"[id_bahan={key}]\n"
+        f"- Nama: {bahan_data.get('nama_bahan', '')}\n"
+        f"- Kategori: {bahan_data.get('kategori', '')}\n"
+        f"- Stok: {bahan_data.get('stok_bahan', '')} {bahan_data.get('satuan', '')}\n"
+        f"- Terakhir update: {terakhir_update}\n"
+    )
+
+
+def build_packed_expiration_prompt(chunk: List[tuple]) -> str:
+    """chunk is a list of (key, bahan_data); one prompt asks for all of them."""
+    items = "\n".join(_format_packed_item(key, bahan_data) for key, bahan_data in chunk)
+    return f"{PACKED_PROMPT_HEADER}{items}\nKEMBALIKAN HANYA JSON ARRAY dengan {len(chunk)} objek, TANPA TEKS LAIN!\n"
+
+
+def chunk_bahan_for_packing(bahan_list: List[Dict], pack_size: int, max_prompt_chars: int) -> List[List[tuple]]:
+    """Greedy chunks limited by item count and by estimated prompt size, so a
+    packed prompt plus its answer stays inside the model context."""
+    chunks: List[List[tuple]] = []
+    current: List[tuple] = []
+    current_chars = len(PACKED_PROMPT_HEADER)
+    seen_keys = set()
+    for position, bahan_data in enumerate(bahan_list):
+        key = _packed_key(bahan_data, position)
+        if key in seen_keys:
+            key = f"item-{position}"
+        seen_keys.add(key)
+        item_chars = len(_format_packed_item(key, bahan_data))
+        if current and (len(current) >= pack_size or current_chars + item_chars > max_prompt_chars):
+            chunks.append(current)
+            current = []
+            current_chars = len(PACKED_PROMPT_HEADER)
+        current.append((key, bahan_data))
+        current_chars += item_chars
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def extract_json_array(text: str) -> Optional[list]:
+    if not text:
+        return None
+    cleaned = re.sub(r'```json|```', '', text, flags=re.IGNORECASE).strip()
+    start = cleaned.find('[')
+    while start != -1:
+        depth = 0
+        for i in range(start, len(cleaned)):
+            if cleaned[i] == '[':
+                depth += 1
+            elif cleaned[i] == ']':
+                depth -= 1
+                if depth == 0:
+                    try:
+                        parsed = json.loads(cleaned[start:i + 1])
+                        if isinstance(parsed, list):
+                            return parsed
+                    except json.JSONDecodeError:
+                        pass
+                    break
+        start = cleaned.find('[', start + 1)
+    return None
+
+
+def parse_packed_expiration_response(ai_response: str, chunk: List[tuple]) -> Dict[str, Dict]:
+    """Map each key of the chunk to {'prediction': ...} or {'error': ...}.
+    Every element goes through parse_expiration_prediction, so packed answers
+    are held to exactly the same validation rules as single ones."""
+    outcomes: Dict[str, Dict] = {key: {'error': 'Tidak ada hasil untuk bahan ini di response AI'} for key, _ in chunk}
+    by_key = dict(chunk)
+    parsed = extract_json_array(ai_response)
+    if parsed is None:
+        for key in outcomes:
+            outcomes[key] = {'error': 'Tidak dapat menemukan JSON array dalam response AI'}
+        return outcomes
+
+    for element in parsed:
+        if not isinstance(element, dict):
+            continue
+        key = str(element.get('id_bahan', ''))
+        if key not in by_key or 'prediction' in outcomes[key]:
+            continue
+        single = {field: element[field] for field in ('estimasi_hari', 'expired_date', 'reason', 'confidence') if field in element}
+        try:
+            outcomes[key] = {'prediction': parse_expiration_prediction(json.dumps(single, ensure_ascii=False), by_key[key])}
+        except ValueError as e:
+            outcomes[key] = {'error': str(e)}
+    return outcomes
+
+
+def predict_expiration_packed(bahan_list: List[Dict], pack_size: int = EXPIRY_PACK_SIZE,
+                              max_prompt_chars: int = EXPIRY_PACK_MAX_PROMPT_CHARS,
+                              usage: Optional[Dict] = None, deadline: Optional[Deadline] = None,
+                              use_kb: bool = True) -> tuple:
+    """Predict many bahan with one LLM call per chunk. Items found in the
+    shelf-life knowledge base are not sent to the LLM; items whose packed
+    answer is missing or invalid are retried individually via
+    predict_expiration. Returns (results in input order, stats); the Ollama
+    counters of the packed calls are added to `usage` when given."""
+    known = {}
+    if use_kb:
+        for idx, bahan_data in enumerate(bahan_list):
+            cached = lookup_shelf_life(bahan_data)
+            if cached is not None:
+                known[idx] = cached
+    if known:
+        unknown = [bahan_data for idx, bahan_data in enumerate(bahan_list) if idx not in known]
+        predicted, stats = _predict_expiration_packed(unknown, pack_size, max_prompt_chars, usage, deadline) \
+            if unknown else ([], {'chunks': 0, 'packed_ok': 0, 'individual_retries': 0, 'llm_calls': 0})
+        remaining = iter(predicted)
+        return [known[idx] if idx in known else next(remaining) for idx in range(len(bahan_list))], stats
+    return _predict_expiration_packed(bahan_list, pack_size, max_prompt_chars, usage, deadline)
+
+
+def _predict_expiration_packed(bahan_list: List[Dict], pack_size: int, max_prompt_chars: int,
+                               usage: Optional[Dict], deadline: Optional[Deadline]) -> tuple:
+    chunks = chunk_bahan_for_packing(bahan_list, max(1, pack_size), max_prompt_chars)
+    stats = {'chunks': len(chunks), 'packed_ok': 0, 'individual_retries': 0, 'llm_calls': 0}
+    results: List[Dict] = []
+
+    if not is_ollama_available():
+        config = get_ollama_config()
+        error_msg = f"Ollama tidak tersedia di {config['url']} dengan model {config['model']}"
+        return [{'success': False, 'error': error_msg, 'bahan': bahan_data} for bahan_data in bahan_list], stats
+
+    for chunk_idx, chunk in enumerate(chunks, 1):
+        if deadline is not None and deadline.expired():
+            events.warning("expiry.packed.deadline_exceeded", chunk=chunk_idx, items=len(chunk))
+            results.extend({'success': False, 'error': 'Deadline terlewati sebelum bahan diproses',
+                            'deadline_exceeded': True, 'bahan': bahan_data} for _, bahan_data in chunk)
+            continue
+        retry_budget.record_request()
+        prompt = build_packed_expiration_prompt(chunk)
+        events.debug("expiry.packed.chunk", chunk=chunk_idx, chunks=len(chunks), items=len(chunk), prompt_chars=len(prompt))
+        model = model_router.model_for('expiry_packed', 0)
+        call_started = time.perf_counter()
+        ai_response = call_ollama_api(
+            prompt,
+            timeout=240,
+            retry=1,
+            options={'num_predict': min(8192, EXPIRY_PACK_TOKENS_PER_ITEM * len(chunk) + 200)},
+            usage=usage,
+            deadline=deadline,
+            purpose='packed',
+            model=model
+        )
+        call_elapsed = time.perf_counter() - call_started
+        stats['llm_calls'] += 1
+        if ai_response:
+            outcomes = parse_packed_expiration_response(ai_response, chunk)
+            accepted = sum(1 for outcome in outcomes.values() if 'prediction' in outcome)
+            model_router.record('expiry_packed', 0, model, 'accepted' if accepted == len(chunk) else 'rejected',
+                                call_elapsed)
+        else:
+            outcomes = {key: {'error': 'Tidak ada response dari Ollama'} for key, _ in chunk}
+            model_router.record('expiry_packed', 0, model, 'no_response', call_elapsed)
+
+        for key, bahan_data in chunk:
+            outcome = outcomes[key]
+            if 'prediction' in outcome:
+                stats['packed_ok'] += 1
+                PACKED_ITEMS.inc(outcome='packed_ok')
+                remember_shelf_life(bahan_data, outcome['prediction'], model)
+                results.append({'success': True, 'bahan': bahan_data, 'prediction': outcome['prediction']})
+                continue
+            events.info("expiry.packed.item_fallback", nama_bahan=bahan_data.get('nama_bahan', key), error=outcome['error'])
+            stats['individual_retries'] += 1
+            PACKED_ITEMS.inc(outcome='individual_retry')
+            # An answer that came back but failed validation already cost the
+            # cheapest tier; start the individual retry one tier higher.
+            start_tier = 1 if ai_response and model_router.next_tier('expiry', 0) is not None else 0
+            results.append(predict_expiration(bahan_data, deadline=deadline, start_tier=start_tier))
+
+    events.info("expiry.packed.done", items=len(bahan_list), **stats)
+    return results, stats
+
+
+def summarize_ollama_usage(item_usages: List[Dict], extra: Optional[Dict] = None) -> Dict:
+    """Batch level prompt-eval report. With a static prompt prefix the first
+    item pays for the whole prompt and later items only for their suffix, so
+    the first item is reported separately from the average of the rest."""
+    total = merge_ollama_usage(new_ollama_usage(), extra)
+    for item_usage in item_usages:
+        merge_ollama_usage(total, item_usage)
+    summary = {'total': total}
+    if item_usages:
+        rest = item_usages[1:]
+        summary['first_item_prompt_eval_count'] = item_usages[0]['prompt_eval_count']
+        summary['first_item_prompt_eval_ms'] = item_usages[0]['prompt_eval_ms']
+        if rest:
+            summary['avg_prompt_eval_count_after_first'] = round(sum(u['prompt_eval_count'] for u in rest) / len(rest), 1)
+            summary['avg_prompt_eval_ms_after_first'] = round(sum(u['prompt_eval_ms'] for u in rest) / len(rest), 2)
+    return summary
+
 @app.route('/predict-expiration', methods=['POST'])
 def predict_expiration_endpoint():
     try:
         data = request.get_json()
-        print(f"[ENDPOINT] /predict-expiration called")
         
         if not data or 'bahan' not in data:
-            print(f"[ENDPOINT] ERROR: Data bahan tidak ditemukan")
             return jsonify({
                 'success': False,
                 'message': 'Data bahan tidak ditemukan'
             }), 400
         
         bahan_data = data['bahan']
-        print(f"[ENDPOINT] Processing bahan: {bahan_data.get('nama_bahan', 'Unknown')}")
         
-        result = predict_expiration(bahan_data)
+        deadline = Deadline.from_request(request.headers, data, EXPIRY_DEFAULT_TIMEOUT, DEADLINE_SAFETY_MARGIN)
+        result = predict_expiration(bahan_data, deadline=deadline, use_kb=data.get('use_kb', True))
         
         if result['success']:
-            print(f"[ENDPOINT] Success: {result['prediction'].get('expired_date', 'N/A')}")
             return jsonify({
                 'success': True,
                 'data': result
             }), 200
         else:
-            print(f"[ENDPOINT] Failed: {result.get('error', 'Unknown error')}")
             return jsonify({
                 'success': False,
                 'message': result.get('error', 'Gagal memprediksi'),
                 'data': result
-            }), 500
+            }), 504 if result.get('deadline_exceeded') else 500
             
     except Exception as e:
-        error_msg = f"Error in predict-expiration endpoint: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(f"[ENDPOINT] EXCEPTION: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        events.error("http.predict_expiration.exception", exc_info=e, error=str(e))
         return jsonify({
             'success': False,
             'message': 'Terjadi kesalahan saat memprediksi expired',
@@ -922,7 +1321,6 @@ def predict_expiration_batch_endpoint():
         data = request.get_json()
         
         if not data or 'bahan_list' not in data:
-            print(f"[BATCH] ERROR: Data bahan_list tidak ditemukan")
             return jsonify({
                 'success': False,
                 'message': 'Data bahan_list tidak ditemukan'
@@ -930,77 +1328,97 @@ def predict_expiration_batch_endpoint():
         
         bahan_list = data['bahan_list']
         if not isinstance(bahan_list, list):
-            print(f"[BATCH] ERROR: bahan_list bukan array")
             return jsonify({
                 'success': False,
                 'message': 'bahan_list harus berupa array'
             }), 400
         
         if len(bahan_list) == 0:
-            print(f"[BATCH] ERROR: bahan_list kosong")
             return jsonify({
                 'success': False,
                 'message': 'bahan_list tidak boleh kosong'
             }), 400
         
-        batch_start_time = datetime.now()
-        print(f"\n{'#'*80}")
-        print(f"# BATCH PREDICTION: {len(bahan_list)} bahan")
-        print(f"{'#'*80}")
-        print(f"Waktu mulai batch: {batch_start_time.strftime('%Y-%m-%d %H:%M:%S')}\n")
+        batch_start_time = time.perf_counter()
         
         results = []
         errors = []
+        deadline = Deadline.from_request(request.headers, data, EXPIRY_DEFAULT_TIMEOUT, DEADLINE_SAFETY_MARGIN)
+        skipped = 0
+        packed = data.get('packed', EXPIRY_PACKED_MODE)
+        use_kb = data.get('use_kb', True)
+        pack_stats = None
+        packed_usage = new_ollama_usage()
+        item_usages = []
+        
+        if packed:
+            pack_size = int(data.get('pack_size') or EXPIRY_PACK_SIZE)
+            packed_results, pack_stats = predict_expiration_packed(bahan_list, pack_size=pack_size,
+                                                                   usage=packed_usage, deadline=deadline,
+                                                                   use_kb=use_kb)
+            for idx, (bahan_data, result) in enumerate(zip(bahan_list, packed_results), 1):
+                if 'ollama_usage' in result:
+                    item_usages.append(result['ollama_usage'])
+                if result.get('deadline_exceeded'):
+                    skipped += 1
+                if result['success']:
+                    results.append(result)
+                else:
+                    errors.append({
+                        'bahan': bahan_data.get('nama_bahan', f'Bahan-{idx}'),
+                        'kategori': bahan_data.get('kategori', ''),
+                        'error': result.get('error', 'Unknown error')
+                    })
         
-        for idx, bahan_data in enumerate(bahan_list, 1):
-            item_start_time = datetime.now()
+        events.info("expiry.batch.start", items=len(bahan_list), packed=bool(packed),
+                    deadline_seconds=lambda: deadline.remaining())
+        for idx, bahan_data in enumerate([] if packed else bahan_list, 1):
+            if deadline.expired():
+                # The caller stops waiting at its deadline; return what is
+                # done instead of spending LLM time on the rest.
+                skipped = len(bahan_list) - idx + 1
+                events.warning("expiry.batch.deadline_exceeded", skipped=skipped)
+                for rest in bahan_list[idx - 1:]:
+                    errors.append({
+                        'bahan': rest.get('nama_bahan', ''),
+                        'kategori': rest.get('kategori', ''),
+                        'error': 'Deadline terlewati sebelum bahan diproses'
+                    })
+                break
+            item_start_time = time.perf_counter()
             try:
                 nama = bahan_data.get('nama_bahan', f'Bahan-{idx}')
                 kategori = bahan_data.get('kategori', '')
-                stok = bahan_data.get('stok_bahan', '')
-                satuan = bahan_data.get('satuan', '')
                 
-                print(f"\n[{idx}/{len(bahan_list)}] Memproses: {nama} ({kategori})")
-                print(f"[DATA] Stok: {stok} {satuan}, ID: {bahan_data.get('id_bahan', 'N/A')}")
-                print(f"[DATA] Data lengkap: {list(bahan_data.keys())}")
-                
-                result = predict_expiration(bahan_data)
-                item_elapsed = (datetime.now() - item_start_time).total_seconds()
+                result = predict_expiration(bahan_data, deadline=deadline, use_kb=use_kb)
+                item_elapsed = time.perf_counter() - item_start_time
+                if 'ollama_usage' in result:
+                    item_usages.append(result['ollama_usage'])
                 if result['success']:
                     results.append(result)
-                    pred = result['prediction']
-                    print(f"[{idx}/{len(bahan_list)}] [OK] Berhasil: {pred['expired_date']} ({pred.get('days', 'N/A')} hari) - {item_elapsed:.1f}s")
+                    events.debug("expiry.batch.item", index=idx, items=len(bahan_list), nama_bahan=nama,
+                                 success=True, elapsed=round(item_elapsed, 3))
                 else:
                     errors.append({
                         'bahan': nama,
                         'kategori': kategori,
                         'error': result.get('error', 'Unknown error')
                     })
-                    print(f"[{idx}/{len(bahan_list)}] [FAIL] Gagal: {result.get('error', 'Unknown error')} - {item_elapsed:.1f}s")
+                    events.warning("expiry.batch.item", index=idx, items=len(bahan_list), nama_bahan=nama,
+                                   success=False, elapsed=round(item_elapsed, 3), error=result.get('error'))
             except Exception as e:
                 nama = bahan_data.get('nama_bahan', f'Bahan-{idx}')
                 kategori = bahan_data.get('kategori', '')
                 error_msg = f"Exception saat memproses {nama}: {str(e)}"
-                print(f"[{idx}/{len(bahan_list)}] [FAIL] Exception: {error_msg}")
-                logger.error(error_msg, exc_info=True)
+                events.error("expiry.batch.item_exception", exc_info=e, index=idx, nama_bahan=nama, error=str(e))
                 errors.append({
                     'bahan': nama,
                     'kategori': kategori,
                     'error': error_msg
                 })
         
-        batch_end_time = datetime.now()
-        batch_elapsed = (batch_end_time - batch_start_time).total_seconds()
-        print(f"\n{'#'*80}")
-        print(f"# BATCH PREDICTION SELESAI")
-        print(f"{'#'*80}")
-        print(f"Total: {len(bahan_list)}")
-        print(f"Berhasil: {len(results)}")
-        print(f"Gagal: {len(errors)}")
-        print(f"Waktu mulai: {batch_start_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Waktu selesai: {batch_end_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"Total waktu: {batch_elapsed:.1f} detik ({batch_elapsed/60:.1f} menit)")
-        print(f"{'#'*80}\n")
+        events.info("expiry.batch.done", items=len(bahan_list), berhasil=len(results), gagal=len(errors),
+                    skipped=skipped, elapsed=round(time.perf_counter() - batch_start_time, 3))
         
         return jsonify({
             'success': True,
@@ -1009,25 +1427,66 @@ def predict_expiration_batch_endpoint():
                 'berhasil': len(results),
                 'gagal': len(errors),
                 'predictions': results,
-                'errors': errors
+                'errors': errors,
+                'mode': 'packed' if packed else 'individual',
+                'dilewati_deadline': skipped,
+                'dari_knowledge_base': sum(1 for r in results if r.get('source') == 'knowledge_base'),
+                'ollama_usage': summarize_ollama_usage(item_usages, packed_usage),
+                **({'packing': pack_stats} if pack_stats is not None else {})
             }
         }), 200
         
     except Exception as e:
-        error_msg = f"Error in predict-expiration-batch endpoint: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        print(f"\n[ERROR] Batch prediction error: {error_msg}\n")
-        import traceback
-        traceback.print_exc()
+        events.error("http.predict_expiration_batch.exception", exc_info=e, error=str(e))
         return jsonify({
             'success': False,
             'message': 'Terjadi kesalahan saat memprediksi expired',
             'error': str(e)
         }), 500
 
+def kb_shelf_life(pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], float]:
+    return {pair: entry['estimasi_hari'] for pair, entry in shelf_life_kb.lookup_many(pairs).items()}
+
+@app.route('/inventory-risk', methods=['POST'])
+def inventory_risk_endpoint():
+    """Rank expiry and stock-out risk for the whole inventory without the LLM.
+
+    Accepts `columns` (column name -> list of values, the cheapest shape for
+    large inventories) or `bahan_list` (the batch payload shape). Items without
+    estimasi_hari take it from the shelf life knowledge base when use_kb.
+    """
+    data = request.get_json(silent=True) or {}
+    columns = data.get('columns')
+    if columns is None and isinstance(data.get('bahan_list'), list):
+        columns = rows_to_columns(data['bahan_list'])
+    if not isinstance(columns, dict):
+        return jsonify({
+            'success': False,
+            'message': 'Data columns atau bahan_list tidak ditemukan'
+        }), 400
+
+    try:
+        horizon_days = float(data.get('horizon_days', RISK_HORIZON_DAYS))
+        limit = int(data.get('limit', RISK_MAX_ALERTS))
+        today = datetime.strptime(data['today'], '%Y-%m-%d').date() if data.get('today') else None
+        lookup = kb_shelf_life if data.get('use_kb', True) and shelf_life_kb is not None else None
+        result = scan_inventory(columns, horizon_days=horizon_days, limit=limit, today=today,
+                                shelf_life_lookup=lookup)
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'message': 'Data inventory tidak valid',
+            'error': str(e)
+        }), 400
+
+    summary = result['summary']
+    events.info("inventory_risk.scan", items=summary['items'], alerts=len(result['alerts']),
+                value_at_risk=summary['value_at_risk'], elapsed_ms=summary['elapsed_ms'])
+    return jsonify({'success': True, 'data': result}), 200
+
 @app.route('/health', methods=['GET'])
 def health_check():
-    ollama_available = is_ollama_available()
+    ollama_available = is_ollama_available(force=True)
     config = get_ollama_config()
     
     return jsonify({
@@ -1035,7 +1494,77 @@ def health_check():
         'message': 'Expired Prediction Service is running',
         'ollama': 'ready' if ollama_available else 'not_available',
         'ollama_url': config['url'],
-        'ollama_model': config['model']
+        'ollama_model': config['model'],
+        'ollama_backends': ollama_pool.stats(),
+        'coalescing': {'predict': predict_flight.stats(), 'ollama': ollama_flight.stats()},
+        'retry_budget': retry_budget.stats(),
+        'shelf_life_kb': shelf_life_kb.summary() if shelf_life_kb is not None else None
+    }), 200
+
+@app.route('/model-routes', methods=['GET'])
+def model_routes():
+    return jsonify({'success': True, 'data': model_router.stats()}), 200
+
+@app.route('/shelf-life', methods=['GET', 'PUT', 'DELETE'])
+def shelf_life_endpoint():
+    """List, override (PUT) or remove (DELETE) knowledge base entries."""
+    if shelf_life_kb is None:
+        return jsonify({
+            'success': False,
+            'message': 'Knowledge base masa simpan tidak aktif'
+        }), 503
+
+    if request.method == 'GET':
+        try:
+            limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+            offset = max(int(request.args.get('offset', 0)), 0)
+        except ValueError:
+            return jsonify({
+                'success': False,
+                'message': 'limit dan offset harus berupa angka'
+            }), 400
+        return jsonify({
+            'success': True,
+            'data': {
+                'summary': shelf_life_kb.summary(),
+                'entries': shelf_life_kb.list(request.args.get('q', ''), limit=limit, offset=offset)
+            }
+        }), 200
+
+    data = request.get_json(silent=True) or {}
+    nama_bahan = data.get('nama_bahan', '')
+    kategori = data.get('kategori', '')
+    if not nama_bahan:
+        return jsonify({
+            'success': False,
+            'message': 'nama_bahan wajib diisi'
+        }), 400
+
+    if request.method == 'DELETE':
+        deleted = shelf_life_kb.delete(nama_bahan, kategori)
+        return jsonify({
+            'success': deleted,
+            'message': 'Entry dihapus' if deleted else 'Entry tidak ditemukan'
+        }), 200 if deleted else 404
+
+    try:
+        estimasi_hari = int(data.get('estimasi_hari'))
+        confidence = float(data.get('confidence', 100))
+    except (TypeError, ValueError):
+        return jsonify({
+            'success': False,
+            'message': 'estimasi_hari dan confidence harus berupa angka'
+        }), 400
+    reason = data.get('reason') or f"{nama_bahan} dapat bertahan sekitar {estimasi_hari} hari."
+    if not shelf_life_kb.store(nama_bahan, kategori, estimasi_hari, reason, confidence, source='manual'):
+        return jsonify({
+            'success': False,
+            'message': 'estimasi_hari harus lebih besar dari 0'
+        }), 400
+    return jsonify({
+        'success': True,
+        'message': 'Override disimpan',
+        'data': shelf_life_kb.get(nama_bahan, kategori)
     }), 200
 
 @app.route('/test-ollama', methods=['GET'])
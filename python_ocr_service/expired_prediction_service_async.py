@@ -0,0 +1,642 @@
+#!/usr/bin/env python3
+"""
+Expired Prediction Service, asyncio serving mode (aiohttp).
+
+Same routes and request/response contract as expired_prediction_service.py
+(/predict-expiration, /predict-expiration-batch, /health, /metrics). The
+prompts, validation, shelf-life knowledge base, model cascade, Ollama pool
+(failover and hedging), prefix context, retry budget and metrics are shared
+with the Flask service; only the waiting on Ollama is different. A pending
+prediction is a coroutine instead of a blocked thread, knowledge-base reads
+and writes run in worker threads, and `ASYNC_LLM_CONCURRENCY` caps how many
+generations are sent to Ollama at once. A hedge that loses the race is
+cancelled rather than left to finish.
+
+    pip install aiohttp
+    python expired_prediction_service_async.py --port 5001
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+import expired_prediction_service as svc
+from request_budget import Deadline
+from singleflight import request_key
+
+# Generations in flight towards Ollama, for the whole process.
+ASYNC_LLM_CONCURRENCY = int(os.getenv('ASYNC_LLM_CONCURRENCY', '4'))
+# Batch items predicted concurrently within one request (0 = all at once,
+# still bounded by ASYNC_LLM_CONCURRENCY).
+ASYNC_BATCH_CONCURRENCY = int(os.getenv('ASYNC_BATCH_CONCURRENCY', '0'))
+
+events = svc.events
+logger = svc.logger
+
+LLM_SLOTS = svc.metrics.gauge('expiry_async_llm_slots_in_use', 'Ollama generations holding an async LLM slot')
+LLM_WAITING = svc.metrics.gauge('expiry_async_llm_waiting', 'Coroutines waiting for an async LLM slot')
+
+
+class AsyncOllamaClient:
+    """aiohttp counterpart of svc.call_ollama_api: same options, retries,
+    retry budget, deadline clamping, prefix context, backend selection,
+    failover and hedging."""
+
+    def __init__(self, session: aiohttp.ClientSession, concurrency: int, pool=None):
+        self.session = session
+        self.pool = pool or svc.ollama_pool
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.concurrency = max(1, concurrency)
+        self.waiting = 0
+        self.active = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        LLM_SLOTS.set_function(lambda: self.active)
+        LLM_WAITING.set_function(lambda: self.waiting)
+
+    async def generate(self, prompt: str, timeout: float = 240, retry: int = 2, options: Optional[Dict] = None,
+                       usage: Optional[Dict] = None, context: Optional[List[int]] = None,
+                       raw_result: Optional[Dict] = None, deadline: Optional[Deadline] = None,
+                       purpose: str = 'predict', model: Optional[str] = None) -> Optional[str]:
+        base_options = {
+            'num_predict': 3000,
+            'temperature': 0.3,
+            'top_p': 0.85,
+            'top_k': 40,
+            'repeat_penalty': 1.2
+        }
+        if options:
+            base_options.update(options)
+        model_name = model or svc.get_ollama_config()['model']
+
+        # Identical concurrent generations share one call, as in the sync
+        # service; a failed one is rerun by a waiter that still has time.
+        key = request_key(model_name, prompt, base_options, context)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            response_text, result = await asyncio.shield(shared)
+            if response_text is not None or svc._out_of_time(deadline):
+                svc.ollama_flight.count('coalesced')
+                if raw_result is not None:
+                    raw_result.update(result)
+                return response_text
+            svc.ollama_flight.count('reruns')
+            response_text, result = await self._generate(prompt, timeout, retry, base_options, context, deadline,
+                                                         purpose, model_name)
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            svc.ollama_flight.count('leaders')
+            try:
+                response_text, result = await self._generate(prompt, timeout, retry, base_options, context,
+                                                             deadline, purpose, model_name)
+                future.set_result((response_text, result))
+            except asyncio.CancelledError:
+                future.cancel()
+                raise
+            except Exception as exc:
+                future.set_exception(exc)
+                future.exception()  # retrieved: waiters re-raise it, the leader raises below
+                raise
+            finally:
+                del self._inflight[key]
+        if result:
+            svc._record_ollama_usage(usage, result)
+            if raw_result is not None:
+                raw_result.update(result)
+        return response_text
+
+    async def prefix_context(self, usage: Optional[Dict] = None, deadline: Optional[Deadline] = None,
+                             model: Optional[str] = None) -> Optional[List[int]]:
+        """svc.get_prefix_context over aiohttp; the handles are shared with
+        the sync service's cache."""
+        model = model or svc.get_ollama_config()['model']
+        if model not in svc._prefix_context:
+            result: Dict = {}
+            await self.generate(svc.EXPIRATION_PROMPT_PREFIX + "Jawab OK jika sudah paham.", timeout=120, retry=0,
+                                options={'num_predict': 1}, usage=usage, raw_result=result, deadline=deadline,
+                                purpose='prefix', model=model)
+            if not result.get('context'):
+                return None
+            svc._prefix_context[model] = result['context']
+        return svc._prefix_context[model]
+
+    async def _generate(self, prompt: str, timeout: float, retry: int, base_options: Dict,
+                        context: Optional[List[int]], deadline: Optional[Deadline], purpose: str,
+                        model_name: str) -> Tuple[Optional[str], Dict]:
+        requested_timeout = timeout
+        payload = {
+            'model': model_name,
+            'prompt': prompt,
+            'stream': False,
+            'keep_alive': svc.OLLAMA_KEEP_ALIVE,
+            'options': base_options
+        }
+        if context:
+            payload['context'] = context
+        for attempt in range(retry + 1):
+            if attempt > 0:
+                if not svc.may_retry(deadline, 'ollama'):
+                    return None, {}
+                svc.OLLAMA_RETRIES.inc(purpose=purpose)
+            self.waiting += 1
+            try:
+                await self.semaphore.acquire()
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            try:
+                if deadline is not None:
+                    # Time spent waiting for a slot counts against the deadline.
+                    timeout = deadline.clamp(requested_timeout)
+                    if timeout <= 0:
+                        events.warning("ollama.deadline_exceeded", attempt=attempt + 1)
+                        return None, {}
+                result = await self._post(payload, timeout, purpose, attempt)
+            finally:
+                self.active -= 1
+                self.semaphore.release()
+            if result is not None:
+                return result.get('response', '').strip(), result
+        return None, {}
+
+    async def _post(self, payload: Dict, timeout: float, purpose: str, attempt: int) -> Optional[Dict]:
+        """OllamaPool.post over aiohttp: the least loaded backend serving the
+        model, the next one when the connection is refused (no retry budget
+        spent), and a hedged duplicate after the p95 latency."""
+        model_name = payload['model']
+        if len(self.pool.backends) > 1:
+            await asyncio.to_thread(self.pool.refresh)
+        tried = []
+        while True:
+            backend = self.pool.choose(model_name, exclude=tried)
+            if backend is None:
+                return None
+            tried.append(backend)
+            try:
+                delay = self.pool.hedge_delay(model_name) if self.pool.hedge else None
+                if delay is not None and delay < timeout:
+                    return await self._send_hedged(backend, payload, timeout, delay, tried, purpose, attempt)
+                return await self._send(backend, payload, timeout, purpose, attempt)
+            except aiohttp.ClientConnectionError:
+                if len(tried) >= len(self.pool.backends):
+                    return None
+                logger.warning("Ollama backend %s unreachable, failing over", backend.base_url)
+
+    async def _send_hedged(self, backend, payload: Dict, timeout: float, delay: float, tried: List,
+                           purpose: str, attempt: int) -> Optional[Dict]:
+        """Unlike the sync pool, the losing call is cancelled: closing the
+        connection stops the generation instead of leaving it to finish."""
+        started = time.perf_counter()
+        primary = asyncio.ensure_future(self._send(backend, payload, timeout, purpose, attempt))
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done:
+            return primary.result()
+        second = self.pool.choose(payload['model'], exclude=tried)
+        if second is None:
+            return await primary
+        tried.append(second)
+        self.pool.record_hedge('fired')
+        remaining = max(0.1, timeout - (time.perf_counter() - started))
+        hedge = asyncio.ensure_future(self._send(second, payload, remaining, purpose, attempt))
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif task.result() is not None:
+                        if task is hedge:
+                            self.pool.record_hedge('won')
+                        return task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        if error is not None:
+            raise error
+        return None
+
+    async def _send(self, backend, payload: Dict, timeout: float, purpose: str, attempt: int) -> Optional[Dict]:
+        """One POST on a backend from pool.choose(); the reply on HTTP 200,
+        None on other failures. Connection errors are raised for failover."""
+        model_name = payload['model']
+        events.debug("ollama.request", model=model_name, attempt=attempt + 1, timeout=round(timeout, 1),
+                     prompt_chars=len(payload['prompt']), context=bool(payload.get('context')),
+                     backend=backend.base_url)
+        start_time = time.perf_counter()
+        try:
+            async with self.session.post(backend.generate_url, json=payload,
+                                         timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+                elapsed = time.perf_counter() - start_time
+                if response.status == 200:
+                    result = await response.json(content_type=None)
+                    elapsed = time.perf_counter() - start_time
+                    self.pool.release(backend, 'ok', model_name, elapsed)
+                    svc.ollama_metrics.observe(purpose, 'ok', elapsed, result)
+                    events.info("ollama.response", model=model_name, attempt=attempt + 1,
+                                elapsed=round(elapsed, 3), prompt_eval_count=result.get('prompt_eval_count'),
+                                eval_count=result.get('eval_count'))
+                    return result
+                error_text = await response.text()
+                self.pool.release(backend, 'http_error')
+                svc.ollama_metrics.observe(purpose, 'http_error', elapsed)
+                events.error("ollama.http_error", status=response.status, attempt=attempt + 1,
+                             elapsed=round(elapsed, 3), error=error_text[:200])
+        except asyncio.CancelledError:
+            self.pool.release(backend, 'cancelled')
+            raise
+        except asyncio.TimeoutError:
+            self.pool.release(backend, 'error')
+            svc.ollama_metrics.observe(purpose, 'timeout', time.perf_counter() - start_time)
+            events.warning("ollama.timeout", timeout=round(timeout, 1), attempt=attempt + 1)
+        except aiohttp.ClientConnectionError:
+            self.pool.release(backend, 'connection_error')
+            svc.ollama_metrics.observe(purpose, 'connection_error')
+            events.error("ollama.connection_error", attempt=attempt + 1, backend=backend.base_url)
+            raise
+        except Exception as e:
+            self.pool.release(backend, 'error')
+            svc.ollama_metrics.observe(purpose, 'error')
+            events.error("ollama.exception", error=str(e), attempt=attempt + 1)
+        return None
+
+    async def available(self, force: bool = False) -> bool:
+        """svc.is_ollama_available for this client's pool; cached unless `force`."""
+        try:
+            return await asyncio.to_thread(self.pool.available, force=force)
+        except Exception as e:
+            logger.warning("Ollama check failed: %s", e)
+            return False
+
+
+class AsyncExpiryPredictor:
+    def __init__(self, client: AsyncOllamaClient):
+        self.client = client
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def predict(self, bahan_data: Dict, deadline: Optional[Deadline] = None, use_kb: bool = True,
+                      start_tier: int = 0) -> Dict:
+        """svc.predict_expiration without a thread per waiting prediction."""
+        if use_kb:
+            # SQLite is blocking; keep it off the event loop.
+            cached = await asyncio.to_thread(svc.lookup_shelf_life, bahan_data)
+            if cached is not None:
+                svc.PREDICTIONS.inc(outcome='knowledge_base')
+                return cached
+        key = request_key(svc.normalize_bahan_request(bahan_data), start_tier)
+        shared = self._inflight.get(key)
+        if shared is not None:
+            result = await asyncio.shield(shared)
+            if result.get('success') or svc._out_of_time(deadline):
+                svc.predict_flight.count('coalesced')
+                return dict(result, bahan=bahan_data, ollama_usage=svc.new_ollama_usage())
+            svc.predict_flight.count('reruns')
+            return await self._predict_and_remember(bahan_data, deadline, start_tier)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        svc.predict_flight.count('leaders')
+        try:
+            result = await self._predict_and_remember(bahan_data, deadline, start_tier)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as exc:
+            future.set_exception(exc)
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _predict_and_remember(self, bahan_data: Dict, deadline: Optional[Deadline], start_tier: int) -> Dict:
+        started = time.perf_counter()
+        try:
+            result = await self._predict(bahan_data, deadline, start_tier)
+        except Exception as e:
+            events.warning("expiry.predict.exception", nama_bahan=bahan_data.get('nama_bahan', ''), error=str(e))
+            result = {'success': False, 'error': f"Error: {str(e)}", 'bahan': bahan_data}
+        if result.get('success'):
+            await asyncio.to_thread(svc.remember_shelf_life, bahan_data, result['prediction'], result.get('model'))
+            outcome = 'success'
+        elif result.get('deadline_exceeded'):
+            outcome = 'deadline_exceeded'
+        else:
+            outcome = 'failed'
+        svc.PREDICTIONS.inc(outcome=outcome)
+        svc.PREDICT_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+        return result
+
+    async def _predict(self, bahan_data: Dict, deadline: Optional[Deadline], start_tier: int) -> Dict:
+        kategori = bahan_data.get('kategori', '')
+        nama_bahan = bahan_data.get('nama_bahan', 'Unknown')
+        max_retries = 3
+        usage = svc.new_ollama_usage()
+        started = time.perf_counter()
+        router = svc.model_router
+        tier = min(max(start_tier, 0), len(router.cascade('expiry')) - 1)
+
+        def failure(error_msg: str, **extra) -> Dict:
+            return {'success': False, 'error': error_msg, **extra, 'bahan': bahan_data, 'ollama_usage': usage}
+
+        if not await self.client.available():
+            config = svc.get_ollama_config()
+            events.error("expiry.predict.ollama_unavailable", url=config['url'], model=config['model'])
+            return failure(f"Ollama tidak tersedia di {config['url']} dengan model {config['model']}")
+
+        svc.retry_budget.record_request()
+        for attempt in range(max_retries):
+            if (attempt == 0 and deadline is not None and deadline.expired()) or \
+                    (attempt > 0 and not svc.may_retry(deadline, 'predict')):
+                deadline_exceeded = deadline is not None and deadline.expired()
+                events.warning("expiry.predict.abandoned", nama_bahan=nama_bahan, attempt=attempt + 1,
+                               deadline_exceeded=deadline_exceeded)
+                return failure(f"Deadline terlewati saat memprediksi {kategori}" if deadline_exceeded
+                               else f"Retry budget habis saat memprediksi {kategori}",
+                               deadline_exceeded=deadline_exceeded)
+            is_retry = attempt > 0
+            model = router.model_for('expiry', tier)
+            context = await self.client.prefix_context(usage, deadline, model) if svc.OLLAMA_REUSE_CONTEXT else None
+            prompt = svc.build_expiration_prompt(
+                bahan_data, is_retry=is_retry,
+                previous_error="Perbaikan diperlukan untuk memenuhi semua aturan" if is_retry else "",
+                include_prefix=context is None
+            )
+            call_started = time.perf_counter()
+            ai_response = await self.client.generate(prompt, timeout=240, retry=1, usage=usage, context=context,
+                                                     deadline=deadline, model=model)
+            call_elapsed = time.perf_counter() - call_started
+            if not ai_response:
+                router.record('expiry', tier, model, 'no_response', call_elapsed)
+                if attempt < max_retries - 1:
+                    svc.PREDICT_RETRIES.inc(reason='no_response')
+                    continue
+                return failure(f"Gagal mendapatkan response dari Ollama untuk {kategori} "
+                               f"setelah {max_retries} kali attempt")
+            try:
+                prediction = svc.parse_expiration_prediction(ai_response, bahan_data)
+            except ValueError as e:
+                error_str = str(e)
+                router.record('expiry', tier, model, 'rejected', call_elapsed)
+                next_tier = router.next_tier('expiry', tier)
+                if next_tier is not None and attempt < max_retries - 1:
+                    svc.PREDICT_RETRIES.inc(reason='escalation')
+                    tier = next_tier
+                    continue
+                if not svc.is_validation_error(error_str):
+                    return failure(f"Error parsing untuk {kategori}: {error_str}")
+                if attempt < max_retries - 1:
+                    svc.PREDICT_RETRIES.inc(reason='validation')
+                    continue
+                return failure(f"Validasi gagal setelah {max_retries} kali attempt: {error_str}")
+            router.record('expiry', tier, model, 'accepted', call_elapsed)
+            events.info("expiry.predict.done", nama_bahan=nama_bahan, attempts=attempt + 1, days=prediction['days'],
+                        model=model, tier=tier, elapsed=round(time.perf_counter() - started, 3))
+            return {'success': True, 'bahan': bahan_data, 'prediction': prediction, 'model': model,
+                    'ollama_usage': usage}
+        return failure(f"Gagal memprediksi {kategori} setelah {max_retries} kali attempt")
+
+    async def predict_packed(self, bahan_list: List[Dict], pack_size: int, usage: Dict,
+                             deadline: Optional[Deadline], use_kb: bool) -> Tuple[List[Dict], Dict]:
+        """svc.predict_expiration_packed with the chunks sent concurrently."""
+        results: List[Optional[Dict]] = [None] * len(bahan_list)
+        unknown = []
+        cached_list = [None] * len(bahan_list)
+        if use_kb:
+            cached_list = await asyncio.to_thread(lambda: [svc.lookup_shelf_life(b) for b in bahan_list])
+        for idx, cached in enumerate(cached_list):
+            if cached is not None:
+                results[idx] = cached
+            else:
+                unknown.append(idx)
+        chunks = svc.chunk_bahan_for_packing([bahan_list[idx] for idx in unknown], max(1, pack_size),
+                                             svc.EXPIRY_PACK_MAX_PROMPT_CHARS)
+        stats = {'chunks': len(chunks), 'packed_ok': 0, 'individual_retries': 0, 'llm_calls': 0}
+        positions = iter(unknown)
+        chunk_positions = [[next(positions) for _ in chunk] for chunk in chunks]
+
+        if unknown and not await self.client.available():
+            config = svc.get_ollama_config()
+            error_msg = f"Ollama tidak tersedia di {config['url']} dengan model {config['model']}"
+            for idx in unknown:
+                results[idx] = {'success': False, 'error': error_msg, 'bahan': bahan_list[idx]}
+            return results, stats
+
+        async def run_chunk(chunk, chunk_idx_list):
+            if deadline is not None and deadline.expired():
+                for idx in chunk_idx_list:
+                    results[idx] = {'success': False, 'error': 'Deadline terlewati sebelum bahan diproses',
+                                    'deadline_exceeded': True, 'bahan': bahan_list[idx]}
+                return
+            svc.retry_budget.record_request()
+            model = svc.model_router.model_for('expiry_packed', 0)
+            stats['llm_calls'] += 1
+            call_started = time.perf_counter()
+            ai_response = await self.client.generate(
+                svc.build_packed_expiration_prompt(chunk), timeout=240, retry=1,
+                options={'num_predict': min(8192, svc.EXPIRY_PACK_TOKENS_PER_ITEM * len(chunk) + 200)},
+                usage=usage, deadline=deadline, purpose='packed', model=model
+            )
+            call_elapsed = time.perf_counter() - call_started
+            if ai_response:
+                outcomes = svc.parse_packed_expiration_response(ai_response, chunk)
+                accepted = sum(1 for outcome in outcomes.values() if 'prediction' in outcome)
+                svc.model_router.record('expiry_packed', 0, model,
+                                        'accepted' if accepted == len(chunk) else 'rejected', call_elapsed)
+            else:
+                outcomes = {key: {'error': 'Tidak ada response dari Ollama'} for key, _ in chunk}
+                svc.model_router.record('expiry_packed', 0, model, 'no_response', call_elapsed)
+            retries = []
+            for (key, bahan_data), idx in zip(chunk, chunk_idx_list):
+                outcome = outcomes[key]
+                if 'prediction' in outcome:
+                    stats['packed_ok'] += 1
+                    svc.PACKED_ITEMS.inc(outcome='packed_ok')
+                    await asyncio.to_thread(svc.remember_shelf_life, bahan_data, outcome['prediction'], model)
+                    results[idx] = {'success': True, 'bahan': bahan_data, 'prediction': outcome['prediction']}
+                    continue
+                stats['individual_retries'] += 1
+                svc.PACKED_ITEMS.inc(outcome='individual_retry')
+                start_tier = 1 if ai_response and svc.model_router.next_tier('expiry', 0) is not None else 0
+                retries.append((idx, self.predict(bahan_data, deadline=deadline, start_tier=start_tier)))
+            for idx, result in zip([idx for idx, _ in retries], await asyncio.gather(*(c for _, c in retries))):
+                results[idx] = result
+
+        await asyncio.gather(*(run_chunk(chunk, idx_list) for chunk, idx_list in zip(chunks, chunk_positions)))
+        events.info("expiry.packed.done", items=len(bahan_list), **stats)
+        return results, stats
+
+
+def _json_error(message: str, status: int, error: Optional[str] = None) -> web.Response:
+    body = {'success': False, 'message': message}
+    if error is not None:
+        body['error'] = error
+    return web.json_response(body, status=status)
+
+
+async def _read_json(request: web.Request) -> Optional[Dict]:
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def predict_expiration_endpoint(request: web.Request) -> web.Response:
+    predictor: AsyncExpiryPredictor = request.app['predictor']
+    try:
+        data = await _read_json(request)
+        if not data or 'bahan' not in data:
+            return _json_error('Data bahan tidak ditemukan', 400)
+        deadline = Deadline.from_request(request.headers, data, svc.EXPIRY_DEFAULT_TIMEOUT, svc.DEADLINE_SAFETY_MARGIN)
+        result = await predictor.predict(data['bahan'], deadline=deadline, use_kb=data.get('use_kb', True))
+        if result['success']:
+            return web.json_response({'success': True, 'data': result}, status=200)
+        return web.json_response({
+            'success': False,
+            'message': result.get('error', 'Gagal memprediksi'),
+            'data': result
+        }, status=504 if result.get('deadline_exceeded') else 500)
+    except Exception as e:
+        events.error("http.predict_expiration.exception", exc_info=e, error=str(e))
+        return _json_error('Terjadi kesalahan saat memprediksi expired', 500, str(e))
+
+
+async def predict_expiration_batch_endpoint(request: web.Request) -> web.Response:
+    predictor: AsyncExpiryPredictor = request.app['predictor']
+    try:
+        data = await _read_json(request)
+        if not data or 'bahan_list' not in data:
+            return _json_error('Data bahan_list tidak ditemukan', 400)
+        bahan_list = data['bahan_list']
+        if not isinstance(bahan_list, list):
+            return _json_error('bahan_list harus berupa array', 400)
+        if len(bahan_list) == 0:
+            return _json_error('bahan_list tidak boleh kosong', 400)
+
+        batch_start_time = time.perf_counter()
+        deadline = Deadline.from_request(request.headers, data, svc.EXPIRY_DEFAULT_TIMEOUT, svc.DEADLINE_SAFETY_MARGIN)
+        packed = data.get('packed', svc.EXPIRY_PACKED_MODE)
+        use_kb = data.get('use_kb', True)
+        packed_usage = svc.new_ollama_usage()
+        pack_stats = None
+        events.info("expiry.batch.start", items=len(bahan_list), packed=bool(packed), mode='async',
+                    deadline_seconds=lambda: deadline.remaining())
+
+        if packed:
+            outcomes, pack_stats = await predictor.predict_packed(
+                bahan_list, int(data.get('pack_size') or svc.EXPIRY_PACK_SIZE), packed_usage, deadline, use_kb
+            )
+        else:
+            limit = asyncio.Semaphore(ASYNC_BATCH_CONCURRENCY) if ASYNC_BATCH_CONCURRENCY > 0 else None
+
+            async def predict_item(bahan_data: Dict) -> Dict:
+                if limit is None:
+                    return await predictor.predict(bahan_data, deadline=deadline, use_kb=use_kb)
+                async with limit:
+                    return await predictor.predict(bahan_data, deadline=deadline, use_kb=use_kb)
+
+            outcomes = await asyncio.gather(*(predict_item(b) for b in bahan_list), return_exceptions=True)
+
+        results, errors, item_usages = [], [], []
+        skipped = 0
+        for idx, (bahan_data, result) in enumerate(zip(bahan_list, outcomes), 1):
+            nama = bahan_data.get('nama_bahan', f'Bahan-{idx}')
+            if isinstance(result, BaseException):
+                events.error("expiry.batch.item_exception", exc_info=result, index=idx, nama_bahan=nama,
+                             error=str(result))
+                result = {'success': False, 'error': f"Exception saat memproses {nama}: {str(result)}"}
+            if 'ollama_usage' in result:
+                item_usages.append(result['ollama_usage'])
+            if result.get('deadline_exceeded'):
+                skipped += 1
+            if result['success']:
+                results.append(result)
+            else:
+                errors.append({
+                    'bahan': nama,
+                    'kategori': bahan_data.get('kategori', ''),
+                    'error': result.get('error', 'Unknown error')
+                })
+
+        events.info("expiry.batch.done", items=len(bahan_list), berhasil=len(results), gagal=len(errors),
+                    skipped=skipped, elapsed=round(time.perf_counter() - batch_start_time, 3))
+        return web.json_response({
+            'success': True,
+            'data': {
+                'total': len(bahan_list),
+                'berhasil': len(results),
+                'gagal': len(errors),
+                'predictions': results,
+                'errors': errors,
+                'mode': 'packed' if packed else 'individual',
+                'dilewati_deadline': skipped,
+                'dari_knowledge_base': sum(1 for r in results if r.get('source') == 'knowledge_base'),
+                'ollama_usage': svc.summarize_ollama_usage(item_usages, packed_usage),
+                **({'packing': pack_stats} if pack_stats is not None else {})
+            }
+        }, status=200)
+    except Exception as e:
+        events.error("http.predict_expiration_batch.exception", exc_info=e, error=str(e))
+        return _json_error('Terjadi kesalahan saat memprediksi expired', 500, str(e))
+
+
+async def health_check(request: web.Request) -> web.Response:
+    client: AsyncOllamaClient = request.app['ollama']
+    config = svc.get_ollama_config()
+    return web.json_response({
+        'status': 'running',
+        'message': 'Expired Prediction Service is running',
+        'mode': 'async',
+        'ollama': 'ready' if await client.available(force=True) else 'not_available',
+        'ollama_url': config['url'],
+        'ollama_model': config['model'],
+        'ollama_backends': client.pool.stats(),
+        'llm_concurrency': {'limit': client.concurrency, 'waiting': client.waiting},
+        'retry_budget': svc.retry_budget.stats(),
+        'shelf_life_kb': svc.shelf_life_kb.summary() if svc.shelf_life_kb is not None else None
+    }, status=200)
+
+
+async def metrics_endpoint(request: web.Request) -> web.Response:
+    return web.Response(text=svc.metrics.render(), content_type='text/plain', charset='utf-8')
+
+
+def create_app(concurrency: int = ASYNC_LLM_CONCURRENCY, pool=None) -> web.Application:
+    app = web.Application()
+
+    async def ollama_session(app: web.Application):
+        # One connection per LLM slot; keep-alive across predictions.
+        connector = aiohttp.TCPConnector(limit=max(1, concurrency))
+        async with aiohttp.ClientSession(connector=connector) as session:
+            app['ollama'] = AsyncOllamaClient(session, concurrency, pool)
+            app['predictor'] = AsyncExpiryPredictor(app['ollama'])
+            yield
+
+    app.cleanup_ctx.append(ollama_session)
+    app.router.add_post('/predict-expiration', predict_expiration_endpoint)
+    app.router.add_post('/predict-expiration-batch', predict_expiration_batch_endpoint)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_endpoint)
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Expired Prediction Service (Ollama AI, asyncio)')
+    parser.add_argument('--port', '-p', type=int, default=None,
+                        help='Port number untuk service (default: dari EXPIRED_PREDICTION_SERVICE_PORT atau 5001)')
+    parser.add_argument('--host', type=str, default=None,
+                        help='Host address untuk service (default: dari EXPIRED_PREDICTION_SERVICE_HOST atau 0.0.0.0)')
+    parser.add_argument('--llm-concurrency', type=int, default=ASYNC_LLM_CONCURRENCY,
+                        help='Maksimal generate Ollama bersamaan (default: ASYNC_LLM_CONCURRENCY)')
+    args = parser.parse_args()
+
+    port = args.port if args.port is not None else int(os.getenv('EXPIRED_PREDICTION_SERVICE_PORT', '5001'))
+    host = args.host if args.host is not None else os.getenv('EXPIRED_PREDICTION_SERVICE_HOST', '0.0.0.0')
+    logger.info("Starting Expired Prediction Service (asyncio) on %s:%s, LLM concurrency %s",
+                host, port, args.llm_concurrency)
+    web.run_app(create_app(args.llm_concurrency), host=host, port=port)
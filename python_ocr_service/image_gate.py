@@ -0,0 +1,135 @@
+import io
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from variant_planner import image_stats
+
+MESSAGES = {
+    'undecodable': "File bukan gambar yang valid.",
+    'too_large': "Resolusi foto terlalu besar, kirim foto maksimal {max_side} px per sisi.",
+    'too_small': "Foto terlalu kecil, dekatkan kamera ke struk lalu foto ulang.",
+    'dark': "Foto terlalu gelap, foto ulang di tempat yang lebih terang.",
+    'overexposed': "Foto terlalu terang atau silau, hindari pantulan cahaya lalu foto ulang.",
+    'blurry': "Foto buram, pastikan struk fokus (tidak goyang) lalu foto ulang.",
+}
+
+
+class ImageRejected(Exception):
+    """The upload failed the pre-OCR gate; `reason` is a MESSAGES key."""
+
+    def __init__(self, reason: str, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.reason = reason
+        self.message = message
+        self.details = details or {}
+
+
+def header_size(image_bytes: bytes) -> Tuple[int, int]:
+    """(width, height) from the image header; PIL does not decode pixels here."""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return img.size
+
+
+def quality_thumbnail(image_bytes: bytes, longest_side: int) -> Optional[np.ndarray]:
+    """Grayscale decode at 1/2, 1/4 or 1/8 scale; JPEG skips the full-size
+    IDCT entirely at reduced scales."""
+    flag = cv2.IMREAD_GRAYSCALE
+    for min_side, reduced in ((2048, cv2.IMREAD_REDUCED_GRAYSCALE_8), (1024, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                              (512, cv2.IMREAD_REDUCED_GRAYSCALE_2)):
+        if longest_side >= min_side:
+            flag = reduced
+            break
+    return cv2.imdecode(np.frombuffer(image_bytes, np.uint8), flag)
+
+
+class ImageGate:
+    """Rejects uploads that cannot produce a usable OCR result before any
+    full decode or readtext pass: absurd dimensions (read from the header,
+    which also stops decompression bombs) and dark, washed-out or blurry
+    photos (scored on a reduced-size decode)."""
+
+    def __init__(self, max_pixels: int = 40_000_000, max_side: int = 10000, min_side: int = 200,
+                 min_brightness: float = 45, max_brightness: float = 245, min_contrast: float = 20,
+                 min_sharpness: float = 50, metrics=None):
+        self.max_pixels = max_pixels
+        self.max_side = max_side
+        self.min_side = min_side
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.min_sharpness = min_sharpness
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+        self.saved_seconds = 0.0
+        # Running mean of what an accepted image costs (OCR + classify).
+        self._avg_processing = None
+        self._outcomes = self._seconds = self._saved = None
+        if metrics is not None:
+            self._outcomes = metrics.counter('ocr_image_gate_total', 'Pre-OCR gate decisions by outcome')
+            self._seconds = metrics.histogram('ocr_image_gate_seconds', 'Time spent in the pre-OCR gate',
+                                              buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1))
+            self._saved = metrics.counter('ocr_image_gate_saved_seconds_total',
+                                          'Estimated processing time not spent on rejected images')
+
+    def _reject(self, reason: str, started: float, **details):
+        message = MESSAGES[reason].format(max_side=self.max_side)
+        self._record(reason, started)
+        raise ImageRejected(reason, message, details)
+
+    def _record(self, outcome: str, started: float):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.counts[outcome] = self.counts.get(outcome, 0) + 1
+            saved = self._avg_processing if outcome != 'accepted' and self._avg_processing else 0.0
+            self.saved_seconds += saved
+        if self._outcomes is not None:
+            self._outcomes.inc(outcome=outcome)
+            self._seconds.observe(elapsed)
+            if saved:
+                self._saved.inc(saved)
+
+    def check(self, image_bytes: bytes) -> Dict[str, Any]:
+        """Raises ImageRejected; returns the size and quality scores otherwise."""
+        started = time.perf_counter()
+        try:
+            width, height = header_size(image_bytes)
+        except Image.DecompressionBombError:
+            self._reject('too_large', started)
+        except Exception:
+            self._reject('undecodable', started)
+        if width * height > self.max_pixels or max(width, height) > self.max_side:
+            self._reject('too_large', started, width=width, height=height)
+        if min(width, height) < self.min_side:
+            self._reject('too_small', started, width=width, height=height)
+
+        thumbnail = quality_thumbnail(image_bytes, max(width, height))
+        if thumbnail is None:
+            self._reject('undecodable', started)
+        stats = image_stats(thumbnail)
+        scores = {key: round(stats[key], 1) for key in ('brightness', 'contrast', 'sharpness')}
+        if stats['brightness'] < self.min_brightness:
+            self._reject('dark', started, **scores)
+        if stats['brightness'] > self.max_brightness and stats['contrast'] < self.min_contrast:
+            self._reject('overexposed', started, **scores)
+        if stats['sharpness'] < self.min_sharpness:
+            self._reject('blurry', started, **scores)
+        self._record('accepted', started)
+        return {'width': width, 'height': height, **scores}
+
+    def observe_processing(self, seconds: float):
+        """Feed the processing time of an accepted image (for saved_seconds)."""
+        with self._lock:
+            if self._avg_processing is None:
+                self._avg_processing = seconds
+            else:
+                self._avg_processing += 0.1 * (seconds - self._avg_processing)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'counts': dict(self.counts), 'saved_seconds': round(self.saved_seconds, 2),
+                    'avg_processing_seconds': round(self._avg_processing, 3) if self._avg_processing else None}
@@ -0,0 +1,179 @@
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Alert severity, highest first in the ranking.
+SEVERITY = {'expired': 3, 'expiring': 2, 'low_stock': 1}
+NUMERIC_COLUMNS = ('stok_bahan', 'min_stok', 'harga_beli', 'estimasi_hari', 'pemakaian_harian')
+
+
+def rows_to_columns(bahan_list: List[Dict]) -> Dict[str, list]:
+    """Batch payload rows (the /predict-expiration-batch shape) to columns."""
+    columns: Dict[str, list] = {}
+    keys = set()
+    for bahan in bahan_list:
+        keys.update(bahan)
+    for key in keys:
+        columns[key] = [bahan.get(key) for bahan in bahan_list]
+    return columns
+
+
+def _float_column(columns: Dict[str, Sequence], name: str, size: int, default: float = np.nan) -> np.ndarray:
+    values = columns.get(name)
+    if values is None:
+        return np.full(size, default, dtype=np.float64)
+    if len(values) != size:
+        raise ValueError(f"Kolom {name} berisi {len(values)} nilai, seharusnya {size}")
+    try:
+        # None becomes NaN; numeric strings from PHP json_encode are accepted.
+        return np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        pass
+    array = np.asarray(values, dtype=object)
+    array[(array == None) | (array == '')] = np.nan  # noqa: E711
+    try:
+        return array.astype(np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(f"Kolom {name} harus berisi angka")
+
+
+def _date_column(columns: Dict[str, Sequence], size: int, today: np.datetime64) -> np.ndarray:
+    values = columns.get('terakhir_update')
+    if values is None:
+        return np.full(size, today, dtype='datetime64[D]')
+    if len(values) != size:
+        raise ValueError(f"Kolom terakhir_update berisi {len(values)} nilai, seharusnya {size}")
+    # Parse the leading YYYY-MM-DD from the raw bytes; a datetime64 string
+    # cast is several times slower. Empty or malformed dates count as today,
+    # like terakhir_update_date() in the service.
+    raw = np.asarray([value or '' for value in values], dtype='S10')
+    digits = raw.view(np.uint8).reshape(size, 10).astype(np.int32) - ord('0')
+    separators = (digits[:, 4] == ord('-') - ord('0')) & (digits[:, 7] == ord('-') - ord('0'))
+    numeric = ((digits[:, [0, 1, 2, 3, 5, 6, 8, 9]] >= 0) & (digits[:, [0, 1, 2, 3, 5, 6, 8, 9]] <= 9)).all(axis=1)
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+    valid = separators & numeric & (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+    year, month, day = np.where(valid, year, 1970), np.where(valid, month, 1), np.where(valid, day, 1)
+    dates = ((year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1)).astype('datetime64[D]') \
+        + (day - 1)
+    return np.where(valid, dates, today)
+
+
+def fill_shelf_life(columns: Dict[str, Sequence], estimasi: np.ndarray,
+                    lookup: Callable[[List[Tuple[str, str]]], Dict[Tuple[str, str], float]]) -> int:
+    """Fill missing estimasi_hari in place; `lookup` gets the distinct
+    nama_bahan + kategori pairs in one call and returns days per known
+    pair. Returns the number of items filled."""
+    missing = np.flatnonzero(np.isnan(estimasi))
+    if missing.size == 0:
+        return 0
+    names = columns.get('nama_bahan') or [''] * len(estimasi)
+    kategori = columns.get('kategori') or [''] * len(estimasi)
+    pairs = [(names[idx] or '', kategori[idx] or '') for idx in missing]
+    known = lookup(list(dict.fromkeys(pairs)))
+    filled = 0
+    for idx, pair in zip(missing, pairs):
+        days = known.get(pair)
+        if days is not None:
+            estimasi[idx] = days
+            filled += 1
+    return filled
+
+
+def scan_inventory(columns: Dict[str, Sequence], horizon_days: float = 7.0, limit: int = 100,
+                   today: Optional[date] = None,
+                   shelf_life_lookup: Optional[Callable[[List[Tuple[str, str]]], Dict[Tuple[str, str], float]]] = None
+                   ) -> Dict[str, Any]:
+    """Days to expiry, days to min stock and value at risk for every item in
+    one vectorized pass, plus the ranked alerts.
+
+    - days_to_expiry = terakhir_update + estimasi_hari - today (NaN when the
+      shelf life is unknown)
+    - days_to_min_stock = (stok_bahan - min_stok) / pemakaian_harian; 0 when
+      already at or below min_stok, inf without usage data
+    - value_at_risk = harga_beli * the stock that will not be used before it
+      expires (all of it when pemakaian_harian is unknown and the item
+      expires within the horizon)
+    """
+    started = time.perf_counter()
+    size = len(columns.get('id_bahan') or columns.get('nama_bahan') or columns.get('stok_bahan') or [])
+    if size == 0:
+        raise ValueError("Inventory kosong: kirim minimal kolom id_bahan atau nama_bahan")
+    today64 = np.datetime64(today or date.today(), 'D')
+
+    stok = np.nan_to_num(_float_column(columns, 'stok_bahan', size, 0.0))
+    min_stok = np.nan_to_num(_float_column(columns, 'min_stok', size, 0.0))
+    harga = np.nan_to_num(_float_column(columns, 'harga_beli', size, 0.0))
+    estimasi = _float_column(columns, 'estimasi_hari', size)
+    usage = _float_column(columns, 'pemakaian_harian', size)
+    terakhir = _date_column(columns, size, today64)
+    from_kb = fill_shelf_life(columns, estimasi, shelf_life_lookup) if shelf_life_lookup is not None else 0
+
+    age = (today64 - terakhir).astype(np.float64)
+    days_to_expiry = estimasi - age
+
+    has_usage = usage > 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_to_min = np.where(has_usage, (stok - min_stok) / np.where(has_usage, usage, 1.0), np.inf)
+    days_to_min = np.where(stok <= min_stok, 0.0, np.maximum(days_to_min, 0.0))
+
+    known = ~np.isnan(days_to_expiry)
+    remaining_days = np.clip(np.nan_to_num(days_to_expiry), 0.0, None)
+    leftover = np.where(has_usage, np.clip(stok - np.nan_to_num(usage) * remaining_days, 0.0, None),
+                        np.where(days_to_expiry <= horizon_days, stok, 0.0))
+    value_at_risk = np.where(known & (stok > 0), leftover * harga, 0.0)
+
+    expired = known & (days_to_expiry < 0) & (stok > 0)
+    expiring = known & ~expired & (days_to_expiry <= horizon_days) & (stok > 0)
+    # Without stok_bahan there is nothing to compare against min_stok.
+    low_stock = (days_to_min <= horizon_days) & ('stok_bahan' in columns)
+    severity = np.select([expired, expiring, low_stock],
+                         [SEVERITY['expired'], SEVERITY['expiring'], SEVERITY['low_stock']], 0)
+
+    flagged = np.flatnonzero(severity > 0)
+    soonest = np.minimum(np.where(known, days_to_expiry, np.inf), days_to_min)[flagged]
+    # Highest severity, then most money at risk, then soonest.
+    order = flagged[np.lexsort((soonest, -value_at_risk[flagged], -severity[flagged]))][:max(0, limit)]
+
+    def column_value(name: str, idx: int):
+        values = columns.get(name)
+        return values[idx] if values is not None else None
+
+    def finite(value: float) -> Optional[float]:
+        return round(float(value), 2) if np.isfinite(value) else None
+
+    alerts = []
+    for rank, idx in enumerate(order.tolist(), 1):
+        reasons = [name for name, mask in (('expired', expired), ('expiring', expiring), ('low_stock', low_stock))
+                   if mask[idx]]
+        alerts.append({
+            'rank': rank,
+            'id_bahan': column_value('id_bahan', idx),
+            'nama_bahan': column_value('nama_bahan', idx),
+            'kategori': column_value('kategori', idx),
+            'alerts': reasons,
+            'days_to_expiry': finite(days_to_expiry[idx]),
+            'expired_date': str(terakhir[idx] + int(estimasi[idx])) if known[idx] else None,
+            'days_to_min_stock': finite(days_to_min[idx]),
+            'stok_bahan': float(stok[idx]),
+            'value_at_risk': round(float(value_at_risk[idx]), 2),
+        })
+
+    return {
+        'summary': {
+            'items': size,
+            'expired': int(expired.sum()),
+            'expiring': int(expiring.sum()),
+            'low_stock': int(low_stock.sum()),
+            'unknown_shelf_life': int((~known).sum()),
+            'shelf_life_from_kb': from_kb,
+            'value_at_risk': round(float(value_at_risk.sum()), 2),
+            'horizon_days': horizon_days,
+            'today': str(today64),
+            'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+        },
+        'alerts': alerts,
+    }
@@ -0,0 +1,87 @@
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+TOTAL_LINE = re.compile(r'\b(?:grand\s*total|total|jumlah\s*bayar|tagihan)\b', re.IGNORECASE)
+NOT_TOTAL_LINE = re.compile(r'sub\s*total|total\s*(?:item|qty|disc|diskon|hemat)', re.IGNORECASE)
+# Share of the estimate per signal; signals that are unavailable for a
+# receipt (no TOTAL line, lines without OCR confidences) drop out and the
+# rest are renormalised.
+WEIGHTS = {'prices': 0.3, 'catalog': 0.3, 'ocr': 0.2, 'total': 0.2}
+
+
+def find_total(lines: Sequence[str], price_of: Callable[[int, str], Optional[int]]) -> Optional[int]:
+    """Amount on the last TOTAL-like line (subtotals and discount totals
+    excluded); `price_of(index, line)` reads the amount of a line."""
+    for idx in range(len(lines) - 1, -1, -1):
+        line = lines[idx] or ''
+        if TOTAL_LINE.search(line) and not NOT_TOTAL_LINE.search(line):
+            amount = price_of(idx, line)
+            if amount:
+                return amount
+    return None
+
+
+def total_matches(items: Iterable[Dict[str, Any]], total: int, tolerance: float = 0.001) -> bool:
+    """Item prices add up to the TOTAL line, read either as line totals or
+    as unit prices times quantity."""
+    items = list(items)
+    line_totals = sum(item['harga'] for item in items)
+    extended = sum(item['harga'] * max(1, item.get('jumlah') or 1) for item in items)
+    slack = max(1, total * tolerance)
+    return abs(line_totals - total) <= slack or abs(extended - total) <= slack
+
+
+def estimate_quality(item_lines: int, priced_lines: int, top_scores: Sequence[float],
+                     ocr_confidences: Sequence[float], total_match: Optional[bool]) -> Dict[str, Any]:
+    """0..1 estimate that the deterministic parse is already right.
+
+    prices: share of item-looking lines that yielded a price; catalog: the
+    lowest top fuzzy score among the parsed names (0..100 scaled to 0..1),
+    so one unmatched name is not averaged away; ocr: mean recognizer
+    confidence; total: whether the items sum to the TOTAL line.
+    """
+    components: Dict[str, Optional[float]] = {
+        'prices': min(1.0, priced_lines / item_lines) if item_lines else 0.0,
+        'catalog': min(top_scores) / 100.0 if top_scores else 0.0,
+        'ocr': sum(ocr_confidences) / len(ocr_confidences) if ocr_confidences else None,
+        'total': None if total_match is None else float(total_match),
+    }
+    available = {name: value for name, value in components.items() if value is not None}
+    weight = sum(WEIGHTS[name] for name in available)
+    score = sum(WEIGHTS[name] * value for name, value in available.items()) / weight
+    return {'score': round(score, 3), 'components': {name: None if value is None else round(value, 3)
+                                                      for name, value in components.items()}}
+
+
+class LlmBypass:
+    """Decides, per receipt, whether the deterministic parse is returned as
+    is (no LLM call) and keeps the bypass rate."""
+
+    def __init__(self, threshold: float = 0.9, min_items: int = 1, metrics=None):
+        self.threshold = threshold
+        self.min_items = min_items
+        self._lock = threading.Lock()
+        self.counts = {'bypassed': 0, 'llm': 0}
+        self._outcomes = self._scores = None
+        if metrics is not None:
+            self._outcomes = metrics.counter('classify_llm_bypass_total',
+                                             'Receipts by whether the LLM classifier was skipped')
+            self._scores = metrics.histogram('classify_parse_quality', 'Deterministic parse quality estimate',
+                                             buckets=(0.2, 0.4, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0))
+
+    def decide(self, items: List[Dict[str, Any]], quality: Dict[str, Any]) -> bool:
+        bypass = len(items) >= self.min_items and quality['score'] >= self.threshold
+        outcome = 'bypassed' if bypass else 'llm'
+        with self._lock:
+            self.counts[outcome] += 1
+        if self._outcomes is not None:
+            self._outcomes.inc(outcome=outcome)
+            self._scores.observe(quality['score'])
+        return bypass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.counts['bypassed'] + self.counts['llm']
+            return {**self.counts, 'threshold': self.threshold,
+                    'bypass_rate': round(self.counts['bypassed'] / total, 3) if total else None}
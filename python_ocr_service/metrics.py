@@ -0,0 +1,277 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from flask import Response, g, request
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._lock = threading.Lock()
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self.samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(_Metric):
+    """Settable value; `set_function` gauges are read at scrape time."""
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._values: Dict[LabelKey, float] = {}
+        self._functions: Dict[LabelKey, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], float], **labels):
+        with self._lock:
+            self._functions[_label_key(labels)] = fn
+
+    def value(self, **labels) -> float:
+        key = _label_key(labels)
+        with self._lock:
+            fn = self._functions.get(key)
+            if fn is None:
+                return self._values.get(key, 0.0)
+        return float(fn())
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+            functions = dict(self._functions)
+        for key, fn in functions.items():
+            try:
+                values[key] = float(fn())
+            except Exception:
+                continue
+        return [f'{self.name}{_format_labels(key)} {_format_value(value)}' for key, value in sorted(values.items())]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series: Dict[LabelKey, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # bucket counts, then sum and count
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[idx] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        with self._lock:
+            series = self._series.get(_label_key(labels))
+            return series[-1] if series else 0.0
+
+    def samples(self):
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+        lines = []
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0.0
+            for idx, bound in enumerate(self.buckets):
+                cumulative += series[idx]
+                lines.append(f'{self.name}_bucket{_format_labels(key, ("le", _format_value(bound)))} '
+                             f'{_format_value(cumulative)}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {_format_value(series[-2])}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {_format_value(series[-1])}')
+        return lines
+
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format.
+
+    Each service keeps one registry; gunicorn/multi-instance setups are
+    scraped per process (see MULTIPLE_INSTANCES.md).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(self, name: str, documentation: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+class OllamaMetrics:
+    """Counters fed from the timing fields of every Ollama /api/generate
+    response (`eval_count`, `eval_duration` in ns, ...)."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.requests = registry.counter(
+            'ollama_requests_total', 'Ollama generate calls by purpose and outcome')
+        self.latency = registry.histogram(
+            'ollama_request_duration_seconds', 'Wall time of Ollama generate calls')
+        self.prompt_tokens = registry.counter(
+            'ollama_prompt_eval_tokens_total', 'Prompt tokens evaluated by Ollama')
+        self.prompt_seconds = registry.counter(
+            'ollama_prompt_eval_duration_seconds_total', 'Time Ollama spent evaluating prompts')
+        self.eval_tokens = registry.counter(
+            'ollama_eval_tokens_total', 'Tokens generated by Ollama')
+        self.eval_seconds = registry.counter(
+            'ollama_eval_duration_seconds_total', 'Time Ollama spent generating tokens')
+        self.tokens_per_second = registry.histogram(
+            'ollama_eval_tokens_per_second', 'Generation throughput per call', TOKENS_PER_SECOND_BUCKETS)
+
+    def observe(self, purpose: str, outcome: str, elapsed: Optional[float] = None, result: Optional[Dict] = None):
+        self.requests.inc(purpose=purpose, outcome=outcome)
+        if elapsed is not None:
+            self.latency.observe(elapsed, purpose=purpose)
+        if not result:
+            return
+        model = result.get('model', '')
+        self.prompt_tokens.inc(int(result.get('prompt_eval_count') or 0), model=model)
+        self.prompt_seconds.inc((result.get('prompt_eval_duration') or 0) / 1e9, model=model)
+        eval_count = int(result.get('eval_count') or 0)
+        eval_seconds = (result.get('eval_duration') or 0) / 1e9
+        self.eval_tokens.inc(eval_count, model=model)
+        self.eval_seconds.inc(eval_seconds, model=model)
+        if eval_count and eval_seconds > 0:
+            self.tokens_per_second.observe(eval_count / eval_seconds, model=model)
+
+
+def install_flask_metrics(app, registry: MetricsRegistry, path: str = '/metrics'):
+    """Request count/latency and in-flight gauges per endpoint, plus the
+    scrape endpoint itself."""
+    requests_total = registry.counter('http_requests_total', 'HTTP requests by endpoint and status')
+    duration = registry.histogram('http_request_duration_seconds', 'HTTP request latency by endpoint')
+    in_flight = registry.gauge('http_requests_in_flight', 'Requests currently being handled')
+
+    def endpoint_label() -> str:
+        return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+    @app.before_request
+    def _metrics_start():
+        if request.path == path:
+            return
+        g.metrics_start = time.perf_counter()
+        g.metrics_endpoint = endpoint_label()
+        in_flight.inc(endpoint=g.metrics_endpoint)
+
+    @app.after_request
+    def _metrics_status(response):
+        if 'metrics_start' in g:
+            requests_total.inc(endpoint=g.metrics_endpoint, method=request.method, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def _metrics_finish(_exc):
+        start = g.pop('metrics_start', None)
+        if start is None:
+            return
+        duration.observe(time.perf_counter() - start, endpoint=g.metrics_endpoint)
+        in_flight.dec(endpoint=g.metrics_endpoint)
+
+    def metrics_endpoint():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule(path, 'metrics', metrics_endpoint, methods=['GET'])
@@ -0,0 +1,106 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("model_router")
+
+OUTCOMES = ('accepted', 'rejected', 'no_response')
+
+
+def parse_routes(spec: str) -> Dict[str, List[str]]:
+    """JSON object {task: [model, ...]} or a path to a JSON file with one.
+    A plain string value is read as a comma separated list."""
+    spec = (spec or '').strip()
+    if not spec:
+        return {}
+    if not spec.startswith('{'):
+        try:
+            with open(spec, 'r', encoding='utf-8') as f:
+                spec = f.read()
+        except OSError as exc:
+            logger.warning("Cannot read model routes from %s: %s", spec, exc)
+            return {}
+    try:
+        data = json.loads(spec)
+    except json.JSONDecodeError as exc:
+        logger.warning("Invalid MODEL_ROUTES JSON: %s", exc)
+        return {}
+    routes = {}
+    for task, models in (data or {}).items():
+        if isinstance(models, str):
+            models = models.split(',')
+        models = [str(model).strip() for model in models if str(model).strip()]
+        if models:
+            routes[str(task)] = models
+    return routes
+
+
+class ModelRouter:
+    """Ordered model cascade per task, cheapest model first.
+
+    Callers start at tier 0 and move to the next tier only when the output
+    of the current one is rejected by validation; timeouts and empty
+    responses are retried on the same tier. Every call is recorded per
+    (task, tier) so the hit rate of the small model is visible.
+    """
+
+    def __init__(self, default_model: str, routes: Optional[Dict[str, List[str]]] = None, metrics=None):
+        self.default_model = default_model
+        self.routes = routes or {}
+        self._lock = threading.Lock()
+        self._stats: Dict[tuple, Dict[str, Any]] = {}
+        self._calls = self._latency = None
+        if metrics is not None:
+            self._calls = metrics.counter('llm_cascade_calls_total', 'LLM calls per task, cascade tier and outcome')
+            self._latency = metrics.histogram('llm_cascade_duration_seconds', 'LLM call latency per task and model')
+
+    def cascade(self, task: str) -> List[str]:
+        return self.routes.get(task) or self.routes.get('default') or [self.default_model]
+
+    def model_for(self, task: str, tier: int) -> str:
+        models = self.cascade(task)
+        return models[min(max(tier, 0), len(models) - 1)]
+
+    def next_tier(self, task: str, tier: int) -> Optional[int]:
+        """Tier to escalate to after a rejected answer, None at the top."""
+        return tier + 1 if tier + 1 < len(self.cascade(task)) else None
+
+    def record(self, task: str, tier: int, model: str, outcome: str, elapsed: float):
+        if outcome not in OUTCOMES:
+            raise ValueError(f"unknown outcome {outcome}")
+        with self._lock:
+            entry = self._stats.setdefault((task, tier, model), {
+                'calls': 0, 'accepted': 0, 'rejected': 0, 'no_response': 0, 'seconds': 0.0,
+            })
+            entry['calls'] += 1
+            entry[outcome] += 1
+            entry['seconds'] += elapsed
+        if self._calls is not None:
+            self._calls.inc(task=task, tier=tier, model=model, outcome=outcome)
+            self._latency.observe(elapsed, task=task, model=model)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {key: dict(value) for key, value in self._stats.items()}
+        tasks: Dict[str, Any] = {}
+        for (task, tier, model), entry in sorted(snapshot.items()):
+            calls = entry['calls']
+            tasks.setdefault(task, {'cascade': self.cascade(task), 'tiers': []})['tiers'].append({
+                'tier': tier,
+                'model': model,
+                'calls': calls,
+                'accepted': entry['accepted'],
+                'rejected': entry['rejected'],
+                'no_response': entry['no_response'],
+                'hit_rate': round(entry['accepted'] / calls, 3) if calls else 0.0,
+                'avg_seconds': round(entry['seconds'] / calls, 3) if calls else 0.0,
+            })
+        for task in self.routes:
+            tasks.setdefault(task, {'cascade': self.cascade(task), 'tiers': []})
+        return tasks
+
+
+def create_router_from_env(default_model: str, metrics=None) -> ModelRouter:
+    return ModelRouter(default_model, parse_routes(os.getenv('MODEL_ROUTES', '')), metrics=metrics)
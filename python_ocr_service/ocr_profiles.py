@@ -0,0 +1,120 @@
+import copy
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger("ocr_profiles")
+
+VARIANT_NAMES = ('original', 'gray', 'clahe', 'thresh')
+# Characters printed on Indonesian receipts; anything else the recognizer
+# reads is noise (EasyOCR zeroes the other classes before decoding).
+RECEIPT_ALLOWLIST = ('0123456789'
+                     'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+                     ' .,:;-/%()&@#+*=\'"')
+
+# readtext keyword arguments, the preprocessing variants tried in order, the
+# row tolerance for build_lines_from_results and the digit line count that
+# stops trying further variants (None = OCR every variant and keep the best).
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'fast': {
+        'readtext': {'canvas_size': 1280, 'mag_ratio': 1.0, 'decoder': 'greedy', 'batch_size': 8,
+                     'text_threshold': 0.7, 'low_text': 0.4, 'width_ths': 0.7, 'height_ths': 0.7,
+                     'allowlist': RECEIPT_ALLOWLIST},
+        'variants': ['gray'],
+        'row_tolerance': 15,
+        'stop_digit_lines': 4,
+    },
+    # The parameters every request used before profiles existed.
+    'balanced': {
+        'readtext': {'canvas_size': 2560, 'mag_ratio': 1.0, 'decoder': 'greedy', 'batch_size': 1,
+                     'text_threshold': 0.7, 'low_text': 0.4, 'width_ths': 0.7, 'height_ths': 0.7},
+        'variants': list(VARIANT_NAMES),
+        'row_tolerance': 18,
+        'stop_digit_lines': 6,
+    },
+    'accurate': {
+        'readtext': {'canvas_size': 3200, 'mag_ratio': 1.5, 'decoder': 'beamsearch', 'beamWidth': 5,
+                     'batch_size': 4, 'text_threshold': 0.6, 'low_text': 0.3, 'width_ths': 0.7,
+                     'height_ths': 0.7, 'allowlist': RECEIPT_ALLOWLIST},
+        'variants': ['original', 'clahe', 'gray', 'thresh'],
+        'row_tolerance': 18,
+        'stop_digit_lines': None,
+    },
+}
+
+
+def load_profiles(spec: str = '') -> Dict[str, Dict[str, Any]]:
+    """Built-in profiles, optionally overridden by OCR_PROFILES: a JSON object
+    (or a path to one) {name: {readtext: {...}, variants: [...], ...}}. Keys
+    of an existing profile are merged into it; new names start from
+    balanced."""
+    profiles = copy.deepcopy(PROFILES)
+    spec = (spec or '').strip()
+    if not spec:
+        return profiles
+    if not spec.startswith('{'):
+        try:
+            with open(spec, 'r', encoding='utf-8') as f:
+                spec = f.read()
+        except OSError as exc:
+            logger.warning("Cannot read OCR profiles from %s: %s", spec, exc)
+            return profiles
+    try:
+        overrides = json.loads(spec)
+    except json.JSONDecodeError as exc:
+        logger.warning("Invalid OCR_PROFILES JSON: %s", exc)
+        return profiles
+    for name, override in (overrides or {}).items():
+        profile = profiles.setdefault(name, copy.deepcopy(PROFILES['balanced']))
+        for key, value in override.items():
+            if key == 'readtext':
+                profile['readtext'].update(value)
+            else:
+                profile[key] = value
+        unknown = [variant for variant in profile['variants'] if variant not in VARIANT_NAMES]
+        if unknown or not profile['variants']:
+            logger.warning("OCR profile %s has invalid variants %s, using balanced", name, unknown)
+            profile['variants'] = list(VARIANT_NAMES)
+    return profiles
+
+
+class OcrProfiles:
+    """Named readtext/preprocessing bundles, one of them the default."""
+
+    def __init__(self, profiles: Dict[str, Dict[str, Any]], default: str = 'balanced'):
+        self.profiles = profiles
+        if default not in profiles:
+            logger.warning("Unknown OCR_PROFILE %s, using balanced", default)
+            default = 'balanced'
+        self.default = default
+
+    def resolve(self, name: Optional[str] = None) -> str:
+        """Profile name for a request; raises ValueError for unknown names."""
+        name = (name or '').strip().lower() or self.default
+        if name not in self.profiles:
+            raise ValueError(f"Profil OCR tidak dikenal: {name} (pilihan: {', '.join(self.profiles)})")
+        return name
+
+    def get(self, name: Optional[str] = None) -> Dict[str, Any]:
+        return self.profiles[self.resolve(name)]
+
+    def summary(self) -> Dict[str, Any]:
+        return {'default': self.default, 'profiles': self.profiles}
+
+    def check_backend(self, backend: str) -> List[str]:
+        """Profiles asking for a decoder the OCR backend does not have. The
+        ONNX reader only decodes greedily, so beamsearch/beamWidth would be
+        dropped; each such profile is logged once here, not per request."""
+        if backend != 'onnx':
+            return []
+        mismatched = [name for name, profile in self.profiles.items()
+                      if profile['readtext'].get('decoder', 'greedy') != 'greedy']
+        for name in mismatched:
+            logger.warning("OCR profile %s asks for decoder=%s, but OCR_BACKEND=onnx decodes greedily; "
+                           "its decoder and beamWidth are ignored", name, self.profiles[name]['readtext']['decoder'])
+        return mismatched
+
+
+def create_profiles_from_env() -> OcrProfiles:
+    return OcrProfiles(load_profiles(os.getenv('OCR_PROFILES', '')), os.getenv('OCR_PROFILE', 'balanced'))
@@ -0,0 +1,96 @@
+import os
+from typing import Any, Dict, Optional
+
+import cv2
+
+
+def cuda_available() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return bool(torch.cuda.is_available())
+
+
+def resolve_profile(device: str = 'auto', int8: str = 'auto', threads: int = 0, workers: int = 1,
+                    cpu_count: Optional[int] = None, has_cuda: Optional[bool] = None,
+                    backend: str = 'easyocr', tile_workers: int = 1) -> Dict[str, Any]:
+    """Inference settings for the OCR reader.
+
+    device 'auto' picks CUDA when torch sees a GPU and the CPU profile
+    otherwise. The CPU profile keeps dynamic int8 quantization (EasyOCR's
+    own default) unless int8 is 'false', which loads the fp32 models, and
+    splits the cores between the OCR workers: every
+    worker runs readtext concurrently and torch/OpenCV thread pools are
+    process wide, so each gets cores // workers threads instead of all
+    cores each. A worker reading a tall receipt runs up to `tile_workers`
+    strips at once, so the share is divided by that too.
+
+    backend 'onnx' runs the exported models on ONNX Runtime's CPU provider,
+    so the device is always the CPU and torch is never imported.
+    """
+    backend = (backend or 'easyocr').lower()
+    if backend not in ('easyocr', 'onnx'):
+        raise ValueError(f"OCR_BACKEND harus easyocr atau onnx, bukan {backend!r}")
+    device = 'cpu' if backend == 'onnx' else (device or 'auto').lower()
+    if device not in ('auto', 'cpu', 'cuda'):
+        raise ValueError(f"OCR_DEVICE harus auto, cpu atau cuda, bukan {device!r}")
+    if device == 'auto':
+        device = 'cuda' if (cuda_available() if has_cuda is None else has_cuda) else 'cpu'
+
+    int8 = (int8 or 'auto').lower()
+    if int8 not in ('auto', 'true', 'false'):
+        raise ValueError(f"OCR_INT8 harus auto, true atau false, bukan {int8!r}")
+    quantize = device == 'cpu' and int8 in ('auto', 'true')
+
+    cores = cpu_count or os.cpu_count() or 1
+    per_worker = threads if threads > 0 else max(1, cores // (max(1, workers) * max(1, tile_workers)))
+    return {
+        'backend': backend,
+        'device': device,
+        'gpu': device == 'cuda',
+        'int8': quantize,
+        'workers': max(1, workers),
+        'torch_threads': per_worker if backend == 'easyocr' and device == 'cpu' else None,
+        'ort_threads': per_worker if backend == 'onnx' else None,
+        'cv2_threads': per_worker,
+    }
+
+
+def apply_thread_limits(profile: Dict[str, Any]):
+    """Set the process-wide torch and OpenCV thread pools for the profile."""
+    cv2.setNumThreads(profile['cv2_threads'])
+    if profile['torch_threads'] is None:
+        return
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(profile['torch_threads'])
+    try:
+        # Inter-op parallelism only adds threads for the sequential CRAFT and
+        # CRNN graphs; it can only be set before the first parallel op.
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass
+
+
+def reader_kwargs(profile: Dict[str, Any]) -> Dict[str, Any]:
+    """easyocr.Reader arguments for the profile. EasyOCR's quantize flag
+    applies torch dynamic int8 quantization to the CPU models: the
+    recognizer's LSTM/Linear layers and any Linear layers of the detector
+    (CRAFT is convolutional, so it stays mostly fp32). easyocr.Reader
+    defaults to quantize=True, so it is always passed explicitly: False is
+    the only way to get the fp32 models on the CPU."""
+    return {'gpu': profile['gpu'], 'quantize': profile['int8']}
+
+
+def create_profile_from_env(tile_workers: int = 1) -> Dict[str, Any]:
+    return resolve_profile(
+        tile_workers=tile_workers,
+        backend=os.getenv('OCR_BACKEND', 'easyocr'),
+        device=os.getenv('OCR_DEVICE', 'auto'),
+        int8=os.getenv('OCR_INT8', 'auto'),
+        threads=int(os.getenv('OCR_THREADS', '0')),
+        workers=int(os.getenv('PIPELINE_OCR_WORKERS', '1')),
+    )
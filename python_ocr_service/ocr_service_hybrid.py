@@ -5,17 +5,37 @@ import os
 import re
 import time
 import logging
+import contextlib
+import contextvars
+import copy
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from flask import Flask, request, jsonify
 import numpy as np
 import cv2
 from datetime import datetime
-import uuid
 import requests
 from PIL import Image
 from dotenv import load_dotenv
 import pathlib
 
+from event_log import create_event_logger_from_env
+from image_gate import ImageGate, ImageRejected
+from llm_bypass import LlmBypass, estimate_quality, find_total, total_matches
+from metrics import MetricsRegistry, OllamaMetrics, install_flask_metrics
+from model_router import create_router_from_env
+from ocr_profiles import VARIANT_NAMES, create_profiles_from_env
+from ocr_runtime import apply_thread_limits, create_profile_from_env, reader_kwargs
+from ocr_tiling import readtext_tiled, should_tile
+from ollama_pool import create_pool_from_env
+from receipt_layout import analyze_layout, parse_amount
+from receipt_pipeline import PipelineBusy, ReceiptPipeline
+from singleflight import SingleFlight, request_key
+import tracing
+from upload_archive import create_archiver_from_env
+from variant_planner import VariantPlanner
+
 try:
     from rapidfuzz import process, fuzz
     rapidfuzz_available = True
@@ -35,6 +55,7 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger("ocr_service")
+events = create_event_logger_from_env("ocr_service")
 logger.info("Environment variables loaded")
 LOG_OCR_OUTPUT = os.getenv('LOG_OCR_OUTPUT', 'true').lower() == 'true'
 
@@ -49,35 +70,105 @@ except (ImportError, AttributeError) as e:
 logger.info("Initializing EasyOCR...")
 easyocr_available = False
 easyocr_reader = None
-
-try:
-    import easyocr
+# Tall receipts (height >= OCR_TILE_MIN_ASPECT x width) are OCR'd as
+# overlapping horizontal strips, in parallel, instead of one downscaled pass.
+# Off until the wall-time/recall comparison on long receipts has been run.
+OCR_TILING = os.getenv('OCR_TILING', 'false').lower() == 'true'
+OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', '1600'))
+OCR_TILE_OVERLAP = int(os.getenv('OCR_TILE_OVERLAP', '160'))
+OCR_TILE_MIN_ASPECT = float(os.getenv('OCR_TILE_MIN_ASPECT', '2.0'))
+OCR_TILE_WORKERS = int(os.getenv('OCR_TILE_WORKERS', '2'))
+# OCR_DEVICE=auto uses CUDA when present, otherwise the CPU profile with the
+# cores split between PIPELINE_OCR_WORKERS and, when tiling, the strips each
+# of them reads at once (see ocr_runtime). OCR_INT8=false switches the CPU
+# models from EasyOCR's default int8 to fp32.
+ocr_profile = create_profile_from_env(tile_workers=OCR_TILE_WORKERS if OCR_TILING else 1)
+# OCR_BACKEND=onnx runs the exported EasyOCR models on ONNX Runtime instead
+# (same readtext results); easyocr_reader then holds the OnnxReader.
+ONNX_MODEL_DIR = os.getenv('ONNX_MODEL_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models', 'onnx'))
+ocr_init_start = time.perf_counter()
+
+if ocr_profile['backend'] == 'onnx':
     try:
-        logger.info("Loading EasyOCR models...")
-        easyocr_reader = easyocr.Reader(['en', 'id'], gpu=True)
+        from onnx_ocr import OnnxReader
+        logger.info("Loading ONNX OCR models from %s (int8=%s)...", ONNX_MODEL_DIR, ocr_profile['int8'])
+        apply_thread_limits(ocr_profile)
+        easyocr_reader = OnnxReader.load(ONNX_MODEL_DIR, int8=ocr_profile['int8'],
+                                         threads=ocr_profile['ort_threads'])
         easyocr_available = True
-        logger.info("EasyOCR initialized successfully")
+        logger.info("ONNX OCR initialized successfully")
+    except ImportError as e:
+        logger.error("onnxruntime not installed: %s", e)
+    except Exception as e:
+        logger.error("ONNX OCR initialization error: %s", e)
+else:
+    try:
+        import easyocr
+        try:
+            logger.info("Loading EasyOCR models (%s, int8=%s)...", ocr_profile['device'], ocr_profile['int8'])
+            apply_thread_limits(ocr_profile)
+            easyocr_reader = easyocr.Reader(['en', 'id'], **reader_kwargs(ocr_profile))
+            easyocr_available = True
+            logger.info("EasyOCR initialized successfully")
+        except Exception as e:
+            logger.error("EasyOCR initialization error: %s", e)
+            easyocr_available = False
+    except ImportError as e:
+        logger.error("easyocr not installed: %s", e)
+        easyocr_available = False
     except Exception as e:
         logger.error("EasyOCR initialization error: %s", e)
         easyocr_available = False
-except ImportError as e:
-    logger.error("easyocr not installed: %s", e)
-    easyocr_available = False
-except Exception as e:
-    logger.error("EasyOCR initialization error: %s", e)
-    easyocr_available = False
+
+ocr_startup_seconds = round(time.perf_counter() - ocr_init_start, 3)
 
 if not easyocr_available:
     logger.warning("EasyOCR not available - service will not work properly")
 
 OLLAMA_URL = os.getenv('OLLAMA_URL', 'http://localhost:11434/api/generate')
 OLLAMA_MODEL = os.getenv('OLLAMA_MODEL', 'gemma3:1b')
+# OLLAMA_URLS spreads calls over several Ollama boxes; defaults to OLLAMA_URL alone.
+ollama_pool = create_pool_from_env(OLLAMA_URL)
 AUTO_ACCEPT_THRESHOLD = float(os.getenv('AUTO_ACCEPT_THRESHOLD', '85'))
 ASK_LLM_THRESHOLD = float(os.getenv('ASK_LLM_THRESHOLD', '60'))
 RAPIDFUZZ_TOPK = int(os.getenv('RAPIDFUZZ_TOPK', '5'))
 MAX_LLM_CALLS = int(os.getenv('MAX_LLM_CALLS', '8'))
 PRODUCT_CATALOG_PATH = os.getenv('PRODUCT_CATALOG_PATH')
 USE_FULLTEXT_CLASSIFIER = os.getenv('USE_FULLTEXT_CLASSIFIER', 'true').lower() == 'true'
+MAX_BATCH_IMAGES = int(os.getenv('MAX_BATCH_IMAGES', '20'))
+OCR_BATCH_SIZE = int(os.getenv('OCR_BATCH_SIZE', '8'))
+BATCH_DECODE_WORKERS = int(os.getenv('BATCH_DECODE_WORKERS', '4'))
+PIPELINE_OCR_WORKERS = int(os.getenv('PIPELINE_OCR_WORKERS', '1'))
+PIPELINE_CLASSIFY_WORKERS = int(os.getenv('PIPELINE_CLASSIFY_WORKERS', '4'))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', '16'))
+PIPELINE_SUBMIT_TIMEOUT = float(os.getenv('PIPELINE_SUBMIT_TIMEOUT', '30'))
+# readtext parameters + variants per named profile (fast/balanced/accurate);
+# OCR_PROFILE is the default, requests may pick another with `profile`.
+ocr_profiles = create_profiles_from_env()
+ocr_profiles.check_backend(ocr_profile['backend'])
+# Row/column reconstruction: 'adaptive' (NumPy, row tolerance from the median
+# text height, deskewed, with qty/price column cells) or 'legacy' (fixed px).
+OCR_LAYOUT = os.getenv('OCR_LAYOUT', 'adaptive').lower()
+OCR_LAYOUT_ROW_RATIO = float(os.getenv('OCR_LAYOUT_ROW_RATIO', '0.5'))
+# Pre-OCR gate: header dimension limits and a thumbnail sharpness/exposure check.
+IMAGE_GATE_ENABLED = os.getenv('IMAGE_GATE_ENABLED', 'true').lower() == 'true'
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', '40000000'))
+IMAGE_MAX_SIDE = int(os.getenv('IMAGE_MAX_SIDE', '10000'))
+IMAGE_MIN_SIDE = int(os.getenv('IMAGE_MIN_SIDE', '200'))
+IMAGE_MIN_BRIGHTNESS = float(os.getenv('IMAGE_MIN_BRIGHTNESS', '45'))
+IMAGE_MIN_SHARPNESS = float(os.getenv('IMAGE_MIN_SHARPNESS', '50'))
+# Order/prune preprocessing variants by past winners for similar images.
+VARIANT_PLANNER_ENABLED = os.getenv('VARIANT_PLANNER_ENABLED', 'true').lower() == 'true'
+VARIANT_PLANNER_MIN_SAMPLES = int(os.getenv('VARIANT_PLANNER_MIN_SAMPLES', '5'))
+VARIANT_PLANNER_PRUNE_SHARE = float(os.getenv('VARIANT_PLANNER_PRUNE_SHARE', '0.05'))
+VARIANT_PLANNER_EXPLORE_RATE = float(os.getenv('VARIANT_PLANNER_EXPLORE_RATE', '0.05'))
+# Receipts whose regex parse + catalog match scores at least this (0..1) are
+# returned without any LLM call.
+LLM_BYPASS_ENABLED = os.getenv('LLM_BYPASS_ENABLED', 'true').lower() == 'true'
+LLM_BYPASS_THRESHOLD = float(os.getenv('LLM_BYPASS_THRESHOLD', '0.9'))
+# Receipts slower than this keep their span tree in a ring buffer (0 = off).
+TRACE_SLOW_SECONDS = float(os.getenv('TRACE_SLOW_SECONDS', '30'))
+TRACE_BUFFER_SIZE = int(os.getenv('TRACE_BUFFER_SIZE', '50'))
 
 DEFAULT_CATALOG = [
     "Semangka", "Melon", "Nangka", "Jambu", "Mangga", "Apel", "Salak",
@@ -114,13 +205,9 @@ def get_ollama_config():
         'model': OLLAMA_MODEL
     }
 
-def is_ollama_available():
+def is_ollama_available(force: bool = False):
     try:
-        config = get_ollama_config()
-        base_url = config['url'].rsplit('/', 1)[0]
-        tags_url = base_url + '/tags'
-        resp = requests.get(tags_url, timeout=3)
-        return resp.status_code == 200
+        return ollama_pool.available(force=force)
     except Exception as e:
         logger.warning("Ollama check failed: %s", e)
         return False
@@ -134,23 +221,48 @@ else:
 
 app = Flask(__name__)
 
-UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-def save_image(image_file):
-    try:
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        filename = f"receipt_{timestamp}_{unique_id}.jpg"
-        image_path = os.path.join(UPLOAD_FOLDER, filename)
-        image_file.seek(0)
-        image_file.save(image_path)
-        logger.info("Image saved: %s", image_path)
-        return image_path, filename
-    except Exception as e:
-        logger.error("Error saving image: %s", e)
-        return None, None
+metrics = MetricsRegistry()
+install_flask_metrics(app, metrics)
+ollama_metrics = OllamaMetrics(metrics)
+STAGE_SECONDS = metrics.histogram('ocr_stage_duration_seconds', 'Time per /process-photo stage')
+VARIANT_SECONDS = metrics.histogram('ocr_variant_duration_seconds',
+                                    'Preprocessing and readtext time per image variant')
+VARIANT_SELECTED = metrics.counter('ocr_variant_selected_total', 'Variant whose OCR lines were used')
+ITEMS_RESOLVED = metrics.counter('ocr_items_resolved_total', 'Receipt items by resolved_by')
+MATCH_TOP_SCORE = metrics.histogram('ocr_match_top_score', 'Best rapidfuzz catalog score per line',
+                                    buckets=(10, 20, 30, 40, 50, 60, 70, 80, 85, 90, 95, 100))
+OCR_PROFILE_USED = metrics.counter('ocr_profile_total', 'Images OCR\'d per OCR profile')
+LLM_SELECT = metrics.counter('ocr_llm_select_total', 'llm_select_candidate outcomes')
+slow_traces = tracing.SlowTraceBuffer(TRACE_BUFFER_SIZE, TRACE_SLOW_SECONDS)
+LLM_CALLS_PER_RECEIPT = metrics.histogram('ocr_llm_calls_per_receipt', 'Candidate LLM calls per receipt (per-line mode)',
+                                          buckets=(0, 1, 2, 4, 8, 16, 32))
+# Per-task model cascade (MODEL_ROUTES); without routes every task uses OLLAMA_MODEL.
+model_router = create_router_from_env(OLLAMA_MODEL, metrics=metrics)
+ollama_pool.instrument(metrics)
+receipt_flight = SingleFlight('ocr_receipt', metrics)
+image_gate = ImageGate(
+    max_pixels=IMAGE_MAX_PIXELS,
+    max_side=IMAGE_MAX_SIDE,
+    min_side=IMAGE_MIN_SIDE,
+    min_brightness=IMAGE_MIN_BRIGHTNESS,
+    min_sharpness=IMAGE_MIN_SHARPNESS,
+    metrics=metrics
+) if IMAGE_GATE_ENABLED else None
+variant_planner = VariantPlanner(
+    min_samples=VARIANT_PLANNER_MIN_SAMPLES,
+    prune_share=VARIANT_PLANNER_PRUNE_SHARE,
+    explore_rate=VARIANT_PLANNER_EXPLORE_RATE,
+    metrics=metrics
+) if VARIANT_PLANNER_ENABLED else None
+llm_bypass = LlmBypass(threshold=LLM_BYPASS_THRESHOLD, metrics=metrics) if LLM_BYPASS_ENABLED else None
+ollama_flight = SingleFlight('ocr_ollama', metrics)
+
+UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'uploads')
+upload_archiver = create_archiver_from_env(UPLOAD_FOLDER)
+logger.info(
+    "Upload archive mode %s (compression %s) at %s",
+    upload_archiver.mode, upload_archiver.compression, UPLOAD_FOLDER
+)
 
 def clean_ocr_text(text):
     if not text:
@@ -173,7 +285,7 @@ def generic_cleanup(text: str) -> str:
         'kg': 'Kg'
     }
     for needle, repl in replacements.items():
-        cleaned = re.sub(needle, repl, cleaned, flags=re.IGNORECASE)
+        cleaned = re.sub(re.escape(needle), repl, cleaned, flags=re.IGNORECASE)
     cleaned = re.sub(r'(?<=\d)[lI](?=\d)', '1', cleaned)
     cleaned = cleaned.replace('_', ' ').replace('-', ' - ')
     cleaned = cleaned.replace("(", " ").replace(")", " ")
@@ -289,6 +401,8 @@ SKIP_LINE_PREFIXES = [
     'jumlah', 'lemon8', '@maisaspb', 'kokobit', 'odinala', 'warning',
     'torch', 'userwarning', 'perhatian', 'barang-barang', 'hormat kami'
 ]
+# "08-02-2025", "8/2/25": a date is never a price or a quantity.
+DATE_PATTERN = re.compile(r'\b\d{1,2}[-/.]\d{1,2}[-/.]\d{2,4}\b')
 
 
 def resolve_line(line: str,
@@ -316,6 +430,8 @@ def resolve_line(line: str,
         return None
 
     candidates = match_product_to_catalog(nama_candidate)
+    if candidates:
+        MATCH_TOP_SCORE.observe(candidates[0]['score'])
     result_candidates = [
         {'name': cand['name'], 'score': round(cand['score'], 2)}
         for cand in candidates[:3]
@@ -379,6 +495,7 @@ def match_product_to_catalog(name: str, top_k: Optional[int] = None) -> List[Dic
 
 def llm_select_candidate(noisy_input: str, candidates: List[Dict], llm_state: Dict[str, int]) -> Optional[int]:
     if llm_state.get('count', 0) >= MAX_LLM_CALLS:
+        LLM_SELECT.inc(outcome='limit_reached')
         logger.warning("LLM call limit (%s) reached; skipping LLM selection", MAX_LLM_CALLS)
         return None
     if not candidates:
@@ -401,24 +518,43 @@ Instruksi:
 - Jawab 0 jika tidak ada yang cocok.
 - Jangan tambahkan kata lain, penjelasan, atau tanda baca."""
 
-    response = call_ollama_api(
-        prompt,
-        timeout=25,
-        options={'temperature': 0.0, 'top_p': 0.1, 'top_k': 10, 'num_predict': 128}
-    )
-    if response is None:
-        return None
+    tier = 0
+    while True:
+        model = model_router.model_for('select_candidate', tier)
+        started = time.perf_counter()
+        with tracing.span('llm_select_candidate', line=noisy_input, candidates=len(candidates), tier=tier):
+            response = call_ollama_api(
+                prompt,
+                timeout=25,
+                options={'temperature': 0.0, 'top_p': 0.1, 'top_k': 10, 'num_predict': 128},
+                purpose='select_candidate',
+                model=model
+            )
+        elapsed = time.perf_counter() - started
+        if response is None:
+            model_router.record('select_candidate', tier, model, 'no_response', elapsed)
+            LLM_SELECT.inc(outcome='no_response')
+            return None
+
+        match = re.search(r'-?\d+', response)
+        choice = int(match.group()) if match else -1
+        if 0 <= choice <= len(candidates):
+            model_router.record('select_candidate', tier, model, 'accepted', elapsed)
+            break
+        model_router.record('select_candidate', tier, model, 'rejected', elapsed)
+        next_tier = model_router.next_tier('select_candidate', tier)
+        if next_tier is None:
+            LLM_SELECT.inc(outcome='invalid')
+            return None
+        LLM_SELECT.inc(outcome='escalated')
+        tier = next_tier
 
-    match = re.search(r'-?\d+', response)
-    if not match:
-        return None
-    choice = int(match.group())
     if choice == 0:
+        LLM_SELECT.inc(outcome='none_matched')
         return None
-    if 1 <= choice <= len(candidates):
-        llm_state['count'] = llm_state.get('count', 0) + 1
-        return choice - 1
-    return None
+    llm_state['count'] = llm_state.get('count', 0) + 1
+    LLM_SELECT.inc(outcome='chosen')
+    return choice - 1
 
 def clean_nama_barang(name: str) -> str:
     cleaned = strip_price_tokens(generic_cleanup(name))
@@ -458,6 +594,11 @@ def group_text_by_rows(text_results, tolerance=15):
 
 
 def build_lines_from_results(text_results, tolerance=15):
+    """Receipt lines from readtext results. The adaptive layout returns a
+    ReceiptLines list whose `rows` carry the qty/name/price cells; `tolerance`
+    (px) applies to the legacy grouping only."""
+    if OCR_LAYOUT == 'adaptive':
+        return analyze_layout(text_results, min_conf=0.2, row_ratio=OCR_LAYOUT_ROW_RATIO, clean=clean_ocr_text)
     filtered_results = [item for item in text_results if item[2] > 0.2]
     if not filtered_results:
         return []
@@ -471,77 +612,117 @@ def build_lines_from_results(text_results, tolerance=15):
     return lines
 
 
-def generate_preprocessed_variants(original_img):
-    variants = [('original', original_img)]
-    gray = cv2.cvtColor(original_img, cv2.COLOR_BGR2GRAY)
-    gray_bgr = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-    variants.append(('gray', gray_bgr))
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
-    variants.append(('clahe', cv2.cvtColor(clahe, cv2.COLOR_GRAY2BGR)))
-    thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 25, 6
-    )
-    variants.append(('thresh', cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR)))
-    return variants
+def generate_preprocessed_variants(original_img, names=VARIANT_NAMES):
+    """Yield (name, image) in the requested order. Each variant is built only
+    when the caller asks for the next one, so variants after an early stop
+    are never computed."""
+    gray = None
+    for name in names:
+        with tracing.span('preprocess', variant=name), VARIANT_SECONDS.time(variant=name, step='preprocess'):
+            if name == 'original':
+                variant = original_img
+            else:
+                if gray is None:
+                    gray = cv2.cvtColor(original_img, cv2.COLOR_BGR2GRAY)
+                if name == 'gray':
+                    variant = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
+                elif name == 'clahe':
+                    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(gray)
+                    variant = cv2.cvtColor(clahe, cv2.COLOR_GRAY2BGR)
+                elif name == 'thresh':
+                    thresh = cv2.adaptiveThreshold(
+                        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 25, 6
+                    )
+                    variant = cv2.cvtColor(thresh, cv2.COLOR_GRAY2BGR)
+                else:
+                    raise ValueError(f"Unknown preprocessing variant: {name}")
+        yield name, variant
+
+def decode_image(image_bytes: bytes):
+    if not image_bytes:
+        return None
+    with STAGE_SECONDS.time(stage='decode'), tracing.span('decode', bytes=len(image_bytes)):
+        nparr = np.frombuffer(image_bytes, np.uint8)
+        return cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+
+
+tile_executor = ThreadPoolExecutor(max_workers=OCR_TILE_WORKERS, thread_name_prefix='ocr-tile') \
+    if OCR_TILING and OCR_TILE_WORKERS > 1 else None
+
+
+def ocr_readtext(image, readtext_kwargs: Dict) -> list:
+    """easyocr_reader.readtext, split into strips for tall receipts."""
+    if OCR_TILING and should_tile(image.shape, OCR_TILE_HEIGHT, OCR_TILE_MIN_ASPECT):
+        tracing.annotate(tiled=True)
+        return readtext_tiled(easyocr_reader, image, OCR_TILE_HEIGHT, OCR_TILE_OVERLAP, executor=tile_executor,
+                              detail=1, paragraph=False, **readtext_kwargs)
+    return easyocr_reader.readtext(image, detail=1, paragraph=False, **readtext_kwargs)
 
-def extract_text_with_easyocr(image_file):
+
+def extract_text_from_image(original_img, batch_size: Optional[int] = None, profile: Optional[str] = None):
+    """OCR lines of the best preprocessing variant. `profile` names an OCR
+    profile (default OCR_PROFILE); batch_size overrides the profile's."""
     try:
         if not easyocr_available or easyocr_reader is None:
             logger.error("EasyOCR not available")
             return []
-        
-        image_file.seek(0)
-        image_bytes = image_file.read()
-        image_file.seek(0)
-        
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        original_img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if original_img is None:
-            logger.error("Failed to decode image for OCR")
-            return []
-        
+
+        profile_name = ocr_profiles.resolve(profile)
+        settings = ocr_profiles.get(profile_name)
+        readtext_kwargs = dict(settings['readtext'])
+        if batch_size:
+            readtext_kwargs['batch_size'] = batch_size
+        stop_digit_lines = settings['stop_digit_lines']
+        OCR_PROFILE_USED.inc(profile=profile_name)
+        tracing.annotate(profile=profile_name)
+
+        variants = settings['variants']
+        plan = None
+        if variant_planner is not None and len(variants) > 1:
+            # Likely winner first; exhaustive profiles keep every variant.
+            plan = variant_planner.plan(original_img, variants, prune=stop_digit_lines is not None)
+            variants = plan.order
+            tracing.annotate(variant_plan=variants, image_bucket=plan.bucket)
+
         best_lines = []
         best_digit_lines = -1
         selected_variant = None
-        for variant_name, variant_img in generate_preprocessed_variants(original_img):
-            logger.info("EasyOCR text extraction running (%s)", variant_name)
-            text_results = easyocr_reader.readtext(
-                variant_img,
-                detail=1,
-                paragraph=False,
-                width_ths=0.7,
-                height_ths=0.7
-            )
+        passes = 0
+        for variant_name, variant_img in generate_preprocessed_variants(original_img, variants):
+            passes += 1
+            variant_start = time.perf_counter()
+            with tracing.span('readtext', variant=variant_name) as readtext_span:
+                text_results = ocr_readtext(variant_img, readtext_kwargs)
+                if readtext_span is not None:
+                    readtext_span.set(boxes=len(text_results or []))
+            VARIANT_SECONDS.observe(time.perf_counter() - variant_start, variant=variant_name, step='readtext')
+            STAGE_SECONDS.observe(time.perf_counter() - variant_start, stage='readtext')
             if not text_results:
                 continue
-            variant_lines = build_lines_from_results(text_results, tolerance=18)
+            variant_lines = build_lines_from_results(text_results, tolerance=settings['row_tolerance'])
             digit_lines = sum(1 for line in variant_lines if DIGIT_PATTERN.search(line))
-            logger.info(
-                "Variant %s produced %s lines (%s with digits)",
-                variant_name, len(variant_lines), digit_lines
-            )
+            if readtext_span is not None:
+                readtext_span.set(lines=len(variant_lines), digit_lines=digit_lines)
+            events.debug("ocr.variant", variant=variant_name, lines=len(variant_lines), digit_lines=digit_lines,
+                         elapsed=round(time.perf_counter() - variant_start, 3))
             if digit_lines > best_digit_lines or (digit_lines == best_digit_lines and len(variant_lines) > len(best_lines)):
                 best_digit_lines = digit_lines
                 best_lines = variant_lines
                 selected_variant = variant_name
-            if digit_lines >= 6:
+            if stop_digit_lines is not None and digit_lines >= stop_digit_lines:
                 break
-        
+
+        if plan is not None:
+            variant_planner.record(plan, selected_variant, passes)
         if not best_lines:
             logger.warning("EasyOCR returned no usable text")
             return []
 
-        logger.info(
-            "EasyOCR produced %s text lines using variant %s",
-            len(best_lines),
-            selected_variant
-        )
+        VARIANT_SELECTED.inc(variant=selected_variant)
+        tracing.annotate(variant=selected_variant, lines=len(best_lines))
+        events.info("ocr.done", lines=len(best_lines), variant=selected_variant, profile=profile_name)
         if LOG_OCR_OUTPUT:
-            logger.info("=== EasyOCR Lines ===")
-            for i, text in enumerate(best_lines, 1):
-                logger.info("%s. %s", i, text)
-            logger.info("=== End of EasyOCR Lines ===")
+            events.info("ocr.lines", lines=list(best_lines))
         
         return best_lines
 
@@ -550,12 +731,36 @@ def extract_text_with_easyocr(image_file):
         traceback.print_exc()
         return []
 
-def call_ollama_api(prompt: str, timeout: int = 30, options: Optional[Dict] = None) -> Optional[str]:
-    try:
-        config = get_ollama_config()
-        logger.debug("Calling Ollama (timeout %ss)", timeout)
-        start_time = time.time()
 
+def extract_text_with_easyocr(image_bytes: bytes, batch_size: Optional[int] = None, profile: Optional[str] = None):
+    if not easyocr_available or easyocr_reader is None:
+        logger.error("EasyOCR not available")
+        return []
+    original_img = decode_image(image_bytes)
+    if original_img is None:
+        logger.error("Failed to decode image for OCR")
+        return []
+    return extract_text_from_image(original_img, batch_size=batch_size, profile=profile)
+
+def call_ollama_api(prompt: str, timeout: int = 30, options: Optional[Dict] = None,
+                    purpose: str = 'other', model: Optional[str] = None) -> Optional[str]:
+    model = model or get_ollama_config()['model']
+    with tracing.span('llm', purpose=purpose, model=model, prompt_chars=len(prompt)) as llm_span:
+        key = request_key(model, prompt, options)
+        response_text, shared = ollama_flight.do(key, _call_ollama_api, prompt, timeout, options, purpose,
+                                                 llm_span, model)
+        if llm_span is not None:
+            if shared:
+                llm_span.set(coalesced=True)
+            if response_text is not None:
+                llm_span.set(response_chars=len(response_text))
+        return response_text
+
+
+def _call_ollama_api(prompt: str, timeout: int, options: Optional[Dict], purpose: str,
+                     llm_span: Optional[tracing.Span], model: str) -> Optional[str]:
+    start_time = time.time()
+    try:
         base_options = {
             'num_predict': 1000,
             'temperature': 0.2,
@@ -565,40 +770,60 @@ def call_ollama_api(prompt: str, timeout: int = 30, options: Optional[Dict] = No
         if options:
             base_options.update(options)
 
-        response = requests.post(
-            config['url'],
-            json={
-                'model': config['model'],
+        response = ollama_pool.post(
+            {
+                'model': model,
                 'prompt': prompt,
                 'stream': False,
                 'options': base_options
             },
-            timeout=timeout
+            timeout
         )
 
         elapsed = time.time() - start_time
-        logger.debug("Ollama response received in %.2fs", elapsed)
 
         if response.status_code == 200:
             result = response.json()
+            ollama_metrics.observe(purpose, 'ok', elapsed, result)
+            if llm_span is not None:
+                llm_span.set(outcome='ok', **ollama_timing_fields(result))
+            events.debug("ollama.response", elapsed=round(elapsed, 3), prompt_chars=len(prompt),
+                         prompt_eval_count=result.get('prompt_eval_count'), eval_count=result.get('eval_count'))
             return result.get('response', '').strip()
         else:
             error_text = response.text
+            ollama_metrics.observe(purpose, 'http_error', elapsed)
+            tracing.annotate(outcome='http_error', status=response.status_code)
             logger.error("Ollama API error %s: %s", response.status_code, error_text)
             if "memory" in error_text.lower() or "GiB" in error_text:
                 logger.warning("Memory error detected from Ollama response")
             return None
     except requests.exceptions.Timeout:
+        ollama_metrics.observe(purpose, 'timeout', time.time() - start_time)
+        tracing.annotate(outcome='timeout', timeout=timeout)
         logger.warning("Ollama API timeout after %ss", timeout)
         return None
     except requests.exceptions.ConnectionError:
+        ollama_metrics.observe(purpose, 'connection_error')
+        tracing.annotate(outcome='connection_error')
         logger.error("Ollama connection error")
         return None
     except Exception as e:
+        ollama_metrics.observe(purpose, 'error')
+        tracing.annotate(outcome='error', error=str(e))
         logger.error("Ollama API call error: %s", e)
         return None
 
 
+def ollama_timing_fields(result: Dict) -> Dict:
+    """Token counts and Ollama's own timings (ns converted to ms)."""
+    fields = {key: result[key] for key in ('prompt_eval_count', 'eval_count') if result.get(key) is not None}
+    for key in ('total_duration', 'load_duration', 'prompt_eval_duration', 'eval_duration'):
+        if result.get(key) is not None:
+            fields[f'{key}_ms'] = round(result[key] / 1e6, 1)
+    return fields
+
+
 def extract_json_block(text: str) -> Optional[str]:
     if not text:
         return None
@@ -618,6 +843,45 @@ def extract_json_block(text: str) -> Optional[str]:
     return None
 
 
+def extract_items_json(prompt_json: str) -> Optional[list]:
+    """Stage 2 of the fulltext classifier. Output that is not a JSON array
+    is re-asked one tier up the 'fulltext_extract' model cascade."""
+    tier = 0
+    while True:
+        model = model_router.model_for('fulltext_extract', tier)
+        started = time.perf_counter()
+        with tracing.span('stage2_extract', tier=tier):
+            response = call_ollama_api(
+                prompt_json,
+                timeout=35,  # Reduced from 50s to 35s for faster fallback
+                options={'num_predict': 1200, 'temperature': 0.0, 'top_p': 0.2, 'top_k': 10},
+                purpose='fulltext_extract',
+                model=model
+            )
+        elapsed = time.perf_counter() - started
+        if not response:
+            model_router.record('fulltext_extract', tier, model, 'no_response', elapsed)
+            logger.warning("Tahap 2 (ekstraksi JSON) gagal")
+            return None
+
+        json_block = extract_json_block(response)
+        parsed = None
+        if not json_block:
+            logger.warning("Response tahap 2 dari %s tidak mengandung JSON block", model)
+        else:
+            try:
+                parsed = json.loads(json_block)
+            except json.JSONDecodeError as exc:
+                logger.error("Failed to parse fulltext LLM JSON from %s: %s", model, exc)
+        if isinstance(parsed, list):
+            model_router.record('fulltext_extract', tier, model, 'accepted', elapsed)
+            return parsed
+        model_router.record('fulltext_extract', tier, model, 'rejected', elapsed)
+        tier = model_router.next_tier('fulltext_extract', tier)
+        if tier is None:
+            return None
+
+
 def classify_fulltext_with_ollama(text_list: List[str]) -> List[Dict]:
     if not text_list:
         return []
@@ -639,18 +903,21 @@ DATA OCR:
 
 Output text yang sudah rapih:"""
         
-        logger.info("Tahap 1: Normalisasi text OCR (%s lines)", len(text_list))
-        cleaned_response = call_ollama_api(
-            prompt_clean,
-            timeout=40,  # Reduced from 50s to 40s for faster processing
-            options={'num_predict': 1200, 'temperature': 0.1, 'top_p': 0.3, 'top_k': 20}
-        )
+        events.debug("classify.fulltext.stage1", lines=len(text_list))
+        with tracing.span('stage1_normalize'):
+            cleaned_response = call_ollama_api(
+                prompt_clean,
+                timeout=40,  # Reduced from 50s to 40s for faster processing
+                options={'num_predict': 1200, 'temperature': 0.1, 'top_p': 0.3, 'top_k': 20},
+                purpose='fulltext_normalize',
+                model=model_router.model_for('fulltext_normalize', 0)
+            )
         if not cleaned_response:
             logger.warning("Tahap 1 (normalisasi) gagal, menggunakan text asli")
             cleaned_text = combined_text
         else:
             cleaned_text = cleaned_response.strip()
-            logger.debug("Text setelah normalisasi: %s", cleaned_text[:200])
+            events.debug("classify.fulltext.normalized", text=lambda: cleaned_text[:200])
         
         # Tahap 2: Ekstrak JSON dari text yang sudah rapih
         prompt_json = f"""Tugas: Ekstrak semua item belanja dari text struk yang sudah rapih menjadi JSON array.
@@ -673,24 +940,9 @@ TEXT YANG SUDAH RAPIH:
 
 JSON array:"""
         
-        logger.info("Tahap 2: Ekstraksi JSON dari text normalisasi")
-        response = call_ollama_api(
-            prompt_json,
-            timeout=35,  # Reduced from 50s to 35s for faster fallback
-            options={'num_predict': 1200, 'temperature': 0.0, 'top_p': 0.2, 'top_k': 10}
-        )
-        if not response:
-            logger.warning("Tahap 2 (ekstraksi JSON) gagal")
-            return []
-        
-        json_block = extract_json_block(response)
-        if not json_block:
-            logger.warning("Response tahap 2 tidak mengandung JSON block")
-            return []
-        try:
-            parsed = json.loads(json_block)
-        except json.JSONDecodeError as exc:
-            logger.error("Failed to parse fulltext LLM JSON: %s", exc)
+        events.debug("classify.fulltext.stage2")
+        parsed = extract_items_json(prompt_json)
+        if parsed is None:
             return []
 
         items = []
@@ -762,13 +1014,9 @@ JSON array:"""
             items.append(item)
 
         if LOG_OCR_OUTPUT and items:
-            logger.info("=== Fulltext LLM Items ===")
-            for item in items:
-                logger.info(
-                    "- %s | harga=%s | qty=%s | unit=%s",
-                    item['nama_barang'], item['harga'], item['jumlah'], item['unit']
-                )
-            logger.info("=== End of Fulltext LLM Items ===")
+            events.info("classify.fulltext.items", items=lambda: [
+                {key: item[key] for key in ('nama_barang', 'harga', 'jumlah', 'unit')} for item in items
+            ])
         return items
     except Exception as exc:
         logger.error("Fulltext classification error: %s", exc)
@@ -804,23 +1052,15 @@ def classify_per_line(text_list: List[str]) -> List[Dict]:
             continue
         items.append(item)
 
-    logger.info("Resolved %s items (%s LLM calls)", len(items), llm_state.get('count', 0))
+    LLM_CALLS_PER_RECEIPT.observe(llm_state.get('count', 0))
+    tracing.annotate(items=len(items), llm_selections=llm_state.get('count', 0))
+    events.info("classify.per_line.done", items=len(items), llm_calls=llm_state.get('count', 0))
     if LOG_OCR_OUTPUT:
-        if items:
-            logger.info("=== Resolved Items ===")
-            for item in items:
-                logger.info(
-                    "- %s | harga=%s | qty=%s | unit=%s | by=%s | conf=%.2f",
-                    item['nama_barang'],
-                    item['harga'],
-                    item['jumlah'],
-                    item['unit'],
-                    item.get('resolved_by'),
-                    item.get('confidence', 0.0)
-                )
-            logger.info("=== End of Resolved Items ===")
-        else:
-            logger.warning("No items resolved from per-line pipeline")
+        events.info("classify.per_line.items", items=lambda: [
+            {'nama_barang': item['nama_barang'], 'harga': item['harga'], 'jumlah': item['jumlah'],
+             'unit': item['unit'], 'by': item.get('resolved_by'), 'conf': round(item.get('confidence', 0.0), 2)}
+            for item in items
+        ])
     return items
 
 
@@ -828,111 +1068,354 @@ def classify_with_ollama(text_list):
     try:
         if not text_list:
             return []
+        if llm_bypass is not None:
+            with STAGE_SECONDS.time(stage='deterministic'), tracing.span('deterministic') as parse_span:
+                items, quality = parse_receipt_deterministic(text_list)
+                bypassed = llm_bypass.decide(items, quality)
+                if parse_span is not None:
+                    parse_span.set(items=len(items), quality=quality['score'], bypassed=bypassed)
+            tracing.annotate(parse_quality=quality['score'], llm_bypassed=bypassed)
+            events.info("classify.bypass", bypassed=bypassed, items=len(items), **quality)
+            if bypassed:
+                return items
         if USE_FULLTEXT_CLASSIFIER:
             try:
-                fulltext_items = classify_fulltext_with_ollama(text_list)
+                with STAGE_SECONDS.time(stage='classify_fulltext'), \
+                        tracing.span('classify_fulltext') as fulltext_span:
+                    fulltext_items = classify_fulltext_with_ollama(text_list)
+                    if fulltext_span is not None:
+                        fulltext_span.set(items=len(fulltext_items))
                 if fulltext_items:
                     return fulltext_items
             except Exception as exc:
                 logger.warning("Fulltext classifier error: %s, falling back to per-line mode", exc)
             logger.warning("Fulltext classifier returned no items, falling back to per-line mode")
-        return classify_per_line(text_list)
+        with STAGE_SECONDS.time(stage='classify_per_line'), tracing.span('classify_per_line'):
+            return classify_per_line(text_list)
     except Exception as exc:
         logger.error("Classification error: %s", exc)
         traceback.print_exc()
         return []
 
+def _line_price(text_list, idx: int, cleaned_line: str) -> Optional[int]:
+    """Amount of a line: its price cell when the layout engine found one,
+    a trailing '19.000'-style amount, else the first price-like token."""
+    rows = getattr(text_list, 'rows', None) or []
+    price_in_line = parse_amount(rows[idx]['cells']['price']) if idx < len(rows) else None
+    if price_in_line is None and cleaned_line.split():
+        price_in_line = parse_amount(cleaned_line.split()[-1])
+    if price_in_line is None:
+        price_in_line = extract_harga_from_text(cleaned_line)
+    return price_in_line
+
+
+def _parse_receipt_lines(text_list) -> Tuple[List[Dict], int]:
+    """Regex items of a receipt and the number of item-looking lines (a
+    name-like remainder plus a number once dates are removed)."""
+    items = []
+    item_lines = 0
+    pending_price = None
+    for idx, line in enumerate(text_list):
+        if not line or len(line.strip()) < 3:
+            continue
+        # Before generic_cleanup, which spaces out the dashes of a date.
+        cleaned_line = generic_cleanup(DATE_PATTERN.sub(' ', line)).strip()
+        lower_line = cleaned_line.lower()
+        if len(cleaned_line) < 3 or any(lower_line.startswith(prefix) for prefix in SKIP_LINE_PREFIXES):
+            continue
+
+        # Lines from the layout engine carry cells; the price column beats
+        # the first number-looking token (often a unit price or a qty).
+        price_in_line = _line_price(text_list, idx, cleaned_line)
+        stripped = strip_price_tokens(cleaned_line)
+        if price_in_line and len(stripped) <= 2:
+            pending_price = price_in_line
+            continue
+        if len(stripped) >= 3 and DIGIT_PATTERN.search(cleaned_line):
+            item_lines += 1
+
+        harga = pending_price if pending_price is not None else price_in_line
+        pending_price = None
+        if harga is None or harga < 100:
+            continue
+
+        qty = extract_qty_from_text(cleaned_line)
+        unit = extract_unit_from_text(cleaned_line, qty)
+        nama = clean_nama_barang(cleaned_line)
+        if not nama or len(nama) < 2:
+            continue
+
+        items.append({
+            'nama_barang': nama,
+            'jumlah': qty,
+            'harga': harga,
+            'unit': unit,
+            'category_id': 1,
+            'minStock': 10,
+            'confidence': 0.3,
+            'resolved_by': 'fallback'
+        })
+    return items, item_lines
+
+
 def parse_receipt_text_fallback(text_list):
     try:
         if not text_list:
             return []
+        items, _ = _parse_receipt_lines(text_list)
+        events.info("classify.fallback.done", items=len(items))
+        return items
 
-        logger.info("Running fallback parsing")
-        items = []
+    except Exception as e:
+        logger.error("Fallback parse error: %s", e)
+        return []
 
-        pending_price = None
-        for line in text_list:
-            if not line or len(line.strip()) < 3:
-                continue
-            cleaned_line = generic_cleanup(line)
-            lower_line = cleaned_line.lower()
-            if any(lower_line.startswith(prefix) for prefix in SKIP_LINE_PREFIXES):
-                continue
 
-            price_in_line = extract_harga_from_text(cleaned_line)
-            stripped = strip_price_tokens(cleaned_line)
-            if price_in_line and len(stripped) <= 2:
-                pending_price = price_in_line
-                continue
+def parse_receipt_deterministic(text_list) -> Tuple[List[Dict], Dict]:
+    """Regex parse plus catalog auto-accept, with no LLM call, and the
+    estimate of how likely that result is already correct."""
+    items, item_lines = _parse_receipt_lines(text_list)
+    top_scores = []
+    for item in items:
+        candidates = match_product_to_catalog(item['nama_barang'])
+        top_score = candidates[0]['score'] if candidates else 0.0
+        top_scores.append(top_score)
+        item['resolved_by'] = 'user'
+        item['confidence'] = 0.4
+        if candidates:
+            MATCH_TOP_SCORE.observe(top_score)
+            item['candidates'] = [{'name': cand['name'], 'score': round(cand['score'], 2)}
+                                  for cand in candidates[:3]]
+            if top_score >= AUTO_ACCEPT_THRESHOLD:
+                item['nama_barang'] = candidates[0]['name']
+                item['resolved_by'] = 'auto'
+                item['confidence'] = round(min(0.95, top_score / 100.0), 2)
+
+    total = find_total(text_list, lambda idx, line: _line_price(text_list, idx, generic_cleanup(line)))
+    rows = getattr(text_list, 'rows', None) or []
+    quality = estimate_quality(
+        item_lines=item_lines,
+        priced_lines=len(items),
+        top_scores=top_scores,
+        ocr_confidences=[row['confidence'] for row in rows],
+        total_match=total_matches(items, total) if total and items else None,
+    )
+    quality['total'] = total
+    return items, quality
 
-            harga = pending_price if pending_price is not None else price_in_line
-            pending_price = None
-            if harga is None or harga < 100:
-                continue
 
-            qty = extract_qty_from_text(cleaned_line)
-            unit = extract_unit_from_text(cleaned_line, qty)
-            nama = clean_nama_barang(cleaned_line)
-            if not nama or len(nama) < 2:
-                continue
+def classify_text_lines(text_list: List[str]) -> List[Dict]:
+    result_json = classify_with_ollama(text_list)
+    if not result_json:
+        logger.warning("Classifier returned no items, running fallback parser")
+        with STAGE_SECONDS.time(stage='fallback'), tracing.span('fallback'):
+            result_json = parse_receipt_text_fallback(text_list)
+    for item in result_json or []:
+        ITEMS_RESOLVED.inc(resolved_by=item.get('resolved_by', 'unknown'))
+    return result_json if result_json else []
 
-            items.append({
-                'nama_barang': nama,
-                'jumlah': qty,
-                'harga': harga,
-                'unit': unit,
-                'category_id': 1,
-                'minStock': 10,
-                'confidence': 0.3,
-                'resolved_by': 'fallback'
-            })
 
-        logger.info("Fallback parsing found %s items", len(items))
-        return items
+def _pipeline_ocr(payload: Dict) -> List[str]:
+    with tracing.span('ocr'):
+        return _run_ocr_stage(payload)
 
-    except Exception as e:
-        logger.error("Fallback parse error: %s", e)
+
+def _run_ocr_stage(payload: Dict) -> List[str]:
+    original_img = payload.get('image')
+    if original_img is None:
+        original_img = decode_image(payload.get('image_bytes'))
+    if original_img is None:
+        logger.error("Failed to decode image for OCR")
         return []
+    text_list = extract_text_from_image(original_img, batch_size=payload.get('batch_size'),
+                                        profile=payload.get('profile'))
+    if not text_list:
+        logger.warning("No text found by EasyOCR")
+    return text_list
+
+
+def _pipeline_classify(text_list: List[str]) -> List[Dict]:
+    events.debug("classify.start", lines=len(text_list))
+    with tracing.span('classify', lines=len(text_list)) as classify_span:
+        items = classify_text_lines(text_list)
+        if classify_span is not None:
+            classify_span.set(items=len(items), resolved_by=sorted({item.get('resolved_by') for item in items}))
+        return items
+
+
+receipt_pipeline = ReceiptPipeline(
+    _pipeline_ocr,
+    _pipeline_classify,
+    ocr_workers=PIPELINE_OCR_WORKERS,
+    classify_workers=PIPELINE_CLASSIFY_WORKERS,
+    queue_size=PIPELINE_QUEUE_SIZE,
+    submit_timeout=PIPELINE_SUBMIT_TIMEOUT
+)
+_pipeline_queue_depth = metrics.gauge('ocr_pipeline_queue_depth', 'Jobs waiting per pipeline stage')
+_pipeline_busy = metrics.gauge('ocr_pipeline_busy_workers', 'Pipeline workers currently busy')
+for _stage in (receipt_pipeline.ocr, receipt_pipeline.classify):
+    _pipeline_queue_depth.set_function(_stage.queue.qsize, stage=_stage.name)
+    _pipeline_busy.set_function(lambda stage=_stage: stage.busy_workers, stage=_stage.name)
+
+
+def observe_pipeline_timings(timings: Dict[str, float]):
+    """ocr/classify service time, queue waits and total from the pipeline."""
+    for stage, seconds in timings.items():
+        if stage != 'decode':
+            STAGE_SECONDS.observe(seconds, stage=stage)
+
 
-def process_image_hybrid(image_file):
+def process_image_hybrid(image_file, profile: Optional[str] = None):
     try:
-        start_time = time.time()
-        
-        image_path, saved_filename = save_image(image_file)
-        if not image_path:
+        image_file.seek(0)
+        image_bytes = image_file.read()
+        if not image_bytes:
+            logger.error("Uploaded image is empty")
             return []
+        if image_gate is not None:
+            image_gate.check(image_bytes)
+        upload_archiver.submit(image_bytes, getattr(image_file, 'filename', None))
 
         if not easyocr_available:
             logger.error("EasyOCR not available")
             return []
         
-        logger.info("Step 1: EasyOCR text extraction")
-        text_list = extract_text_with_easyocr(image_file)
-        ocr_time = time.time() - start_time
-        logger.info("OCR extraction took %.2fs", ocr_time)
-        
-        if not text_list:
-            logger.warning("No text found by EasyOCR")
-            return []
-        
-        logger.info("Step 2: classification on %s lines", len(text_list))
-        ollama_start = time.time()
-        result_json = classify_with_ollama(text_list)
-        if not result_json:
-            logger.warning("Classifier returned no items, running fallback parser")
-            result_json = parse_receipt_text_fallback(text_list)
-        ollama_time = time.time() - ollama_start
-        total_time = time.time() - start_time
-        
-        logger.info("Classification time %.2fs, total processing %.2fs", ollama_time, total_time)
-        
-        return result_json if result_json else []
-
+        # Double submits of the same photo wait for the run already in the pipeline.
+        image_key = (hashlib.sha256(image_bytes).hexdigest(), profile)
+        result, shared = receipt_flight.do(image_key, receipt_pipeline.process,
+                                           {'image_bytes': image_bytes, 'profile': profile})
+        if shared:
+            tracing.annotate(coalesced=True)
+            events.info("receipt.coalesced", items=len(result['items']), lines=result['lines'])
+            return copy.deepcopy(result['items'])
+        timings = result['timings']
+        observe_pipeline_timings(timings)
+        if image_gate is not None:
+            image_gate.observe_processing(timings.get('total', 0.0))
+        tracing.annotate(items=len(result['items']), lines=result['lines'], timings=timings)
+        events.info("receipt.processed", items=len(result['items']), lines=result['lines'], **timings)
+        return result['items']
+
+    except (PipelineBusy, ImageRejected):
+        raise
     except Exception as e:
         logger.error("OCR processing error: %s", e)
         traceback.print_exc()
         return []
 
+
+def process_images_batch(uploads: List[Tuple[str, bytes]], profile: Optional[str] = None) -> List[Dict]:
+    """Decode a batch of receipt images concurrently and feed them through
+    the OCR -> classification pipeline, so classifying image N overlaps OCR
+    of image N+1. Returns one result dict per upload, in order. When the
+    pipeline is full, that image and the rest of the batch get a 'busy'
+    entry; images already queued still finish."""
+    batch_start = time.time()
+    entries = [
+        {'index': idx, 'filename': filename, 'success': False, 'items': [], 'timings': {}}
+        for idx, (filename, _) in enumerate(uploads)
+    ]
+
+    def decode_entry(idx: int):
+        decode_start = time.time()
+        if image_gate is not None:
+            try:
+                image_gate.check(uploads[idx][1])
+            except ImageRejected as exc:
+                entries[idx].update(error=exc.message, reason=exc.reason)
+                return None
+        upload_archiver.submit(uploads[idx][1], uploads[idx][0])
+        img = decode_image(uploads[idx][1])
+        entries[idx]['timings']['decode'] = round(time.time() - decode_start, 3)
+        return img
+
+    with ThreadPoolExecutor(max_workers=BATCH_DECODE_WORKERS) as decode_pool:
+        decoded = [decode_pool.submit(contextvars.copy_context().run, decode_entry, idx)
+                   for idx in range(len(uploads))]
+        pending = []
+        busy = False
+        for idx, future in enumerate(decoded):
+            img = future.result()
+            if img is None:
+                entries[idx].setdefault('error', "Failed to decode image")
+                continue
+            if busy:
+                entries[idx].update(error="Service busy", reason='busy')
+                continue
+            image_span = tracing.start_span('image', index=idx, filename=uploads[idx][0])
+            try:
+                with tracing.activate(image_span):
+                    future = receipt_pipeline.submit({'image': img, 'batch_size': OCR_BATCH_SIZE,
+                                                      'profile': profile})
+            except PipelineBusy as exc:
+                # Every further submit would wait out the same timeout.
+                logger.warning("Pipeline busy at batch image %d: %s", idx, exc)
+                busy = True
+                entries[idx].update(error="Service busy", reason='busy')
+                if image_span is not None:
+                    image_span.finish()
+                continue
+            if image_span is not None:
+                future.add_done_callback(lambda _, finished=image_span: finished.finish())
+            pending.append((idx, future))
+
+    for idx, future in pending:
+        entry = entries[idx]
+        try:
+            result = future.result()
+        except Exception as exc:
+            logger.error("Batch processing error for %s: %s", entry['filename'], exc)
+            entry['error'] = str(exc)
+            continue
+        entry['timings'].update(result['timings'])
+        observe_pipeline_timings(result['timings'])
+        if image_gate is not None:
+            image_gate.observe_processing(result['timings'].get('total', 0.0))
+        entry['lines'] = result['lines']
+        entry['items'] = result['items']
+        entry['success'] = bool(result['items'])
+        if not result['lines']:
+            entry['error'] = "No text found"
+        elif not result['items']:
+            entry['error'] = "No items found"
+
+    for entry in entries:
+        timings = entry['timings']
+        timings['total'] = round(timings.get('decode', 0.0) + timings.get('total', 0.0), 3)
+    events.info("receipt.batch_processed", images=len(entries), elapsed=round(time.time() - batch_start, 3),
+                with_items=sum(1 for e in entries if e['success']))
+    return entries
+
+
+def request_trace(name: str, **attrs):
+    """Trace the request when the client asks for it (`X-Debug-Trace: 1` or
+    `?trace=1`) or when slow receipts are being sampled."""
+    if TRACE_SLOW_SECONDS > 0 or tracing.trace_requested(request.headers, request.args):
+        return tracing.trace(name, **attrs)
+    return contextlib.nullcontext()
+
+
+def requested_profile() -> str:
+    """OCR profile from the `profile` form field or query parameter."""
+    return ocr_profiles.resolve(request.form.get('profile') or request.args.get('profile'))
+
+
+def profile_error(exc: ValueError):
+    return jsonify({
+        "success": False,
+        "error": str(exc),
+        "message": "Profil OCR tidak dikenal."
+    }), 400
+
+
+def traced_json(body: Dict, current_trace: Optional[tracing.Trace], status: int = 200):
+    if current_trace is not None:
+        slow_traces.offer(current_trace)
+        if tracing.trace_requested(request.headers, request.args):
+            body['trace'] = current_trace.to_dict()
+    return jsonify(body), status
+
+
 @app.route('/process-photo', methods=['POST'])
 def process_photo():
     try:
@@ -943,26 +1426,48 @@ def process_photo():
         if image_file.filename == '':
             return jsonify({"success": False, "error": "No image file selected"}), 400
         
+        try:
+            profile = requested_profile()
+        except ValueError as exc:
+            return profile_error(exc)
+
         if not easyocr_available:
             logger.warning("EasyOCR not available for incoming request")
         
-        logger.info("Processing uploaded image %s", image_file.filename)
-        result = process_image_hybrid(image_file)
-        logger.info("Extracted %s items", len(result))
+        current_trace = None
+        try:
+            with request_trace('process-photo', filename=image_file.filename, profile=profile) as current_trace:
+                result = process_image_hybrid(image_file, profile=profile)
+        except PipelineBusy as exc:
+            logger.warning("Rejecting upload, pipeline busy: %s", exc)
+            return traced_json({
+                "success": False,
+                "error": "Service busy",
+                "message": "Server sedang sibuk memproses struk lain, coba lagi sebentar."
+            }, current_trace, 503)
+        except ImageRejected as exc:
+            events.info("image_gate.rejected", reason=exc.reason, **exc.details)
+            return traced_json({
+                "success": False,
+                "error": "Image rejected",
+                "reason": exc.reason,
+                "message": exc.message,
+                "details": exc.details
+            }, current_trace, 422)
         
         if not result:
-            return jsonify({
+            return traced_json({
                 "success": False,
                 "error": "No items found",
                 "message": "Tidak ada item yang ditemukan dalam foto."
-            }), 200
+            }, current_trace)
         
-        return jsonify({
+        return traced_json({
             "success": True,
             "data": {
                 "items": result
             }
-        })
+        }, current_trace)
         
     except Exception as e:
         logger.error("process_photo error: %s", e)
@@ -973,6 +1478,60 @@ def process_photo():
             "message": "Terjadi kesalahan saat memproses gambar."
         }), 500
 
+@app.route('/process-photo-batch', methods=['POST'])
+def process_photo_batch():
+    try:
+        files = request.files.getlist('images') or request.files.getlist('image')
+        files = [f for f in files if f and f.filename]
+        if not files:
+            return jsonify({"success": False, "error": "No image files provided"}), 400
+        if len(files) > MAX_BATCH_IMAGES:
+            return jsonify({
+                "success": False,
+                "error": f"Too many images (max {MAX_BATCH_IMAGES})",
+                "message": f"Maksimal {MAX_BATCH_IMAGES} foto per batch."
+            }), 400
+
+        try:
+            profile = requested_profile()
+        except ValueError as exc:
+            return profile_error(exc)
+
+        if not easyocr_available:
+            logger.warning("EasyOCR not available for incoming batch request")
+
+        uploads = [(image_file.filename, image_file.read()) for image_file in files]
+
+        batch_start = time.time()
+        with request_trace('process-photo-batch', images=len(uploads), profile=profile) as current_trace:
+            results = process_images_batch(uploads, profile=profile)
+        if all(entry.get('reason') == 'busy' for entry in results):
+            logger.warning("Rejecting batch, pipeline busy")
+            return traced_json({
+                "success": False,
+                "error": "Service busy",
+                "message": "Server sedang sibuk memproses struk lain, coba lagi sebentar."
+            }, current_trace, 503)
+
+        return traced_json({
+            "success": any(entry['success'] for entry in results),
+            "data": {
+                "total": len(results),
+                "berhasil": sum(1 for entry in results if entry['success']),
+                "elapsed": round(time.time() - batch_start, 3),
+                "results": results
+            }
+        }, current_trace)
+
+    except Exception as e:
+        logger.error("process_photo_batch error: %s", e)
+        traceback.print_exc()
+        return jsonify({
+            "success": False,
+            "error": str(e),
+            "message": "Terjadi kesalahan saat memproses gambar."
+        }), 500
+
 @app.route('/process-receipt', methods=['POST'])
 def process_receipt():
     return process_photo()
@@ -980,19 +1539,58 @@ def process_receipt():
 @app.route('/health', methods=['GET'])
 def health():
     easyocr_status = "ready" if easyocr_available else "not_available"
-    ollama_status = "ready" if is_ollama_available() else "not_available"
+    ollama_status = "ready" if is_ollama_available(force=True) else "not_available"
     config = get_ollama_config()
     
     return jsonify({
         "status": "healthy", 
         "message": "OCR service is running (EasyOCR + Ollama AI)",
         "easyocr": easyocr_status,
-        "easyocr_engine": "EasyOCR (high accuracy)" if easyocr_status == "ready" else None,
+        "easyocr_engine": ("EasyOCR (ONNX Runtime)" if ocr_profile['backend'] == 'onnx' else "EasyOCR (high accuracy)")
+        if easyocr_status == "ready" else None,
+        "ocr_runtime": dict(ocr_profile, startup_seconds=ocr_startup_seconds),
+        "ocr_profile": ocr_profiles.default,
+        "ocr_layout": OCR_LAYOUT,
+        "variant_planner": variant_planner.stats() if variant_planner is not None else None,
+        "image_gate": image_gate.stats() if image_gate is not None else None,
+        "llm_bypass": llm_bypass.stats() if llm_bypass is not None else None,
         "ollama": ollama_status,
         "ollama_url": config['url'],
-        "ollama_model": config['model']
+        "ollama_model": config['model'],
+        "ollama_backends": ollama_pool.stats(),
+        "coalescing": {"receipt": receipt_flight.stats(), "ollama": ollama_flight.stats()}
+    })
+
+@app.route('/ocr-profiles', methods=['GET'])
+def list_ocr_profiles():
+    return jsonify({"success": True, "data": ocr_profiles.summary()})
+
+@app.route('/pipeline-stats', methods=['GET'])
+def pipeline_stats():
+    return jsonify({"success": True, "data": receipt_pipeline.stats()})
+
+@app.route('/model-routes', methods=['GET'])
+def model_routes():
+    return jsonify({"success": True, "data": model_router.stats()})
+
+@app.route('/traces/slow', methods=['GET'])
+def list_slow_traces():
+    return jsonify({
+        "success": True,
+        "data": {
+            "threshold_seconds": slow_traces.threshold,
+            "sampled": slow_traces.sampled,
+            "traces": slow_traces.list()
+        }
     })
 
+@app.route('/traces/slow/<trace_id>', methods=['GET'])
+def get_slow_trace(trace_id):
+    trace_data = slow_traces.get(trace_id)
+    if trace_data is None:
+        return jsonify({"success": False, "error": "Trace not found"}), 404
+    return jsonify({"success": True, "data": trace_data})
+
 @app.route('/test-ollama', methods=['GET'])
 def test_ollama():
     try:
@@ -1183,7 +1781,7 @@ def parse_expiration_response(ai_response: str, bahan_data: Dict) -> Dict:
 
 if __name__ == '__main__':
     logger.info("Starting OCR Service (EasyOCR + Ollama AI)")
-    logger.info("Service endpoints: process-photo, health, test-ollama")
+    logger.info("Service endpoints: process-photo, process-photo-batch, health, test-ollama")
 
     if not easyocr_available:
         logger.warning("EasyOCR not available! Install via pip install easyocr")
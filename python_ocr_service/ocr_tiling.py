@@ -0,0 +1,106 @@
+from concurrent.futures import Executor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def plan_tiles(height: int, tile_height: int, overlap: int) -> List[Tuple[int, int]]:
+    """(top, bottom) rows of horizontal strips covering the image, each
+    overlapping the next by `overlap` rows."""
+    if height <= tile_height:
+        return [(0, height)]
+    step = max(1, tile_height - overlap)
+    tiles = []
+    top = 0
+    while True:
+        bottom = min(height, top + tile_height)
+        tiles.append((top, bottom))
+        if bottom >= height:
+            return tiles
+        top += step
+
+
+def should_tile(shape: Sequence[int], tile_height: int, min_aspect: float) -> bool:
+    height, width = shape[:2]
+    return height > tile_height and height >= min_aspect * width
+
+
+def _box_extent(bbox) -> Tuple[float, float, float, float]:
+    xs = [point[0] for point in bbox]
+    ys = [point[1] for point in bbox]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _pairwise_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """IoU of every row of `a` against every row of `b` (x0, y0, x1, y1)."""
+    a, b = a[:, None, :], b[None, :, :]
+    inter_w = np.clip(np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    area_a = (a[..., 2] - a[..., 0]) * (a[..., 3] - a[..., 1])
+    area_b = (b[..., 2] - b[..., 0]) * (b[..., 3] - b[..., 1])
+    return inter / np.maximum(area_a + area_b - inter, 1e-6)
+
+
+def merge_tile_results(tiles: Sequence[Tuple[int, int]], tile_results: Sequence[list], height: int,
+                       edge: int = 4, iou_threshold: float = 0.3) -> list:
+    """One readtext-style result list in full-image coordinates.
+
+    Boxes touching a cut edge are partial words; the overlap is taller than a
+    text line, so the neighbouring strip holds the same word whole and the
+    partial box is dropped. A word can then only be read twice when it lies
+    wholly inside the band two adjacent strips share, so only those boxes
+    are compared, strip against next strip, and each duplicate is reduced
+    to the higher-confidence reading.
+    """
+    merged = []
+    strip_ids = []
+    for strip, ((top, bottom), results) in enumerate(zip(tiles, tile_results)):
+        for bbox, text, conf in results or []:
+            shifted = [[point[0], point[1] + top] for point in bbox]
+            _, y0, _, y1 = _box_extent(shifted)
+            if top > 0 and y0 <= top + edge:
+                continue
+            if bottom < height and y1 >= bottom - edge:
+                continue
+            merged.append((shifted, text, conf))
+            strip_ids.append(strip)
+    if len(tiles) < 2 or not merged:
+        return merged
+
+    extents = np.array([_box_extent(bbox) for bbox, _, _ in merged], dtype=np.float64)
+    confidences = np.array([conf for _, _, conf in merged], dtype=np.float64)
+    strip_ids = np.array(strip_ids)
+    keep = np.ones(len(merged), dtype=bool)
+    for strip in range(len(tiles) - 1):
+        band_top, band_bottom = tiles[strip + 1][0], tiles[strip][1]
+        in_band = (extents[:, 1] >= band_top) & (extents[:, 3] <= band_bottom)
+        upper = np.flatnonzero(in_band & (strip_ids == strip))
+        lower = np.flatnonzero(in_band & (strip_ids == strip + 1))
+        if not len(upper) or not len(lower):
+            continue
+        iou = _pairwise_iou(extents[upper], extents[lower])
+        pairs = np.argwhere(iou > iou_threshold)
+        # Best-matching pairs first, so a box is paired with its own reading.
+        for u, l in pairs[np.argsort(-iou[pairs[:, 0], pairs[:, 1]], kind='stable')]:
+            a, b = upper[u], lower[l]
+            if keep[a] and keep[b]:
+                keep[b if confidences[a] >= confidences[b] else a] = False
+    return [result for result, kept in zip(merged, keep) if kept]
+
+
+def readtext_tiled(reader, image: np.ndarray, tile_height: int, overlap: int,
+                   executor: Optional[Executor] = None, **readtext_kwargs) -> list:
+    """reader.readtext over overlapping horizontal strips (in parallel when an
+    executor is given), merged into one result list."""
+    tiles = plan_tiles(image.shape[0], tile_height, overlap)
+
+    def read(tile):
+        top, bottom = tile
+        return reader.readtext(image[top:bottom], **readtext_kwargs)
+
+    if executor is None or len(tiles) == 1:
+        tile_results = [read(tile) for tile in tiles]
+    else:
+        tile_results = list(executor.map(read, tiles))
+    return merge_tile_results(tiles, tile_results, image.shape[0])
@@ -0,0 +1,255 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Set
+
+import requests
+
+logger = logging.getLogger("ollama_pool")
+
+
+def _base_url(url: str) -> str:
+    """http://host:11434/api/generate -> http://host:11434/api"""
+    url = url.strip().rstrip('/')
+    if url.endswith('/generate'):
+        return url.rsplit('/', 1)[0]
+    return url if url.endswith('/api') else url + '/api'
+
+
+class OllamaBackend:
+    def __init__(self, url: str):
+        self.base_url = _base_url(url)
+        self.generate_url = self.base_url + '/generate'
+        self.healthy = True
+        self.models: Optional[Set[str]] = None  # None = not known yet
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.checked_at = 0.0
+
+    def serves(self, model: Optional[str]) -> bool:
+        if model is None or self.models is None:
+            return True
+        # /api/tags lists "gemma3:1b"; a bare "gemma3" means ":latest".
+        return model in self.models or (':' not in model and f'{model}:latest' in self.models)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'url': self.base_url,
+            'healthy': self.healthy,
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'failures': self.failures,
+            'models': sorted(self.models) if self.models is not None else None,
+        }
+
+
+class OllamaPool:
+    """Ollama endpoints behind one `post(payload, timeout)` call.
+
+    Each request goes to the healthy backend that has the payload's model
+    (per `/api/tags`) and the fewest requests in flight. A backend that
+    refuses connections is marked unhealthy until the next health check,
+    and the request fails over to the next backend. With `hedge` enabled a
+    request still running after the observed p95 latency is duplicated on a
+    second backend and the first answer wins; the slower call is left to
+    finish in the background because requests cannot cancel it.
+    """
+
+    def __init__(self, urls: List[str], health_interval: float = 30.0, hedge: bool = False,
+                 hedge_quantile: float = 0.95, hedge_min_samples: int = 20, metrics=None):
+        if not urls:
+            raise ValueError("OllamaPool butuh minimal satu URL")
+        self.backends = [OllamaBackend(url) for url in urls]
+        self.health_interval = health_interval
+        self.hedge = hedge and len(self.backends) > 1
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[Optional[str], deque] = {}
+        self._executor = ThreadPoolExecutor(max_workers=4 * len(self.backends),
+                                            thread_name_prefix='ollama-hedge') if self.hedge else None
+        self.hedges = {'fired': 0, 'won': 0}
+        self._requests = self._hedged = None
+        if metrics is not None:
+            self.instrument(metrics)
+
+    def instrument(self, metrics):
+        self._requests = metrics.counter('ollama_backend_requests_total', 'Ollama calls per backend and outcome')
+        self._hedged = metrics.counter('ollama_hedged_requests_total', 'Hedged duplicate Ollama calls')
+        in_flight = metrics.gauge('ollama_backend_in_flight', 'Ollama calls in flight per backend')
+        healthy = metrics.gauge('ollama_backend_healthy', '1 when the backend passed its last health check')
+        for backend in self.backends:
+            in_flight.set_function(lambda b=backend: b.in_flight, backend=backend.base_url)
+            healthy.set_function(lambda b=backend: 1 if b.healthy else 0, backend=backend.base_url)
+
+    # -- health ---------------------------------------------------------------
+
+    def check(self, backend: OllamaBackend, timeout: float = 3.0) -> bool:
+        try:
+            resp = requests.get(backend.base_url + '/tags', timeout=timeout)
+            healthy = resp.status_code == 200
+            if healthy:
+                models = resp.json().get('models') or []
+                backend.models = {entry.get('name') or entry.get('model') for entry in models} - {None}
+        except (requests.exceptions.RequestException, ValueError) as exc:
+            logger.warning("Ollama backend %s check failed: %s", backend.base_url, exc)
+            healthy = False
+        backend.healthy = healthy
+        backend.checked_at = time.monotonic()
+        return healthy
+
+    def refresh(self, force: bool = False):
+        now = time.monotonic()
+        for backend in self.backends:
+            if force or now - backend.checked_at >= self.health_interval:
+                self.check(backend)
+
+    def available(self, model: Optional[str] = None, force: bool = False) -> bool:
+        """True when a healthy backend serves `model`. Backends are re-checked
+        once `health_interval` has passed, or right away with `force` (the
+        /health endpoints); request paths use the cached state."""
+        self.refresh(force=force)
+        return any(backend.healthy and backend.serves(model) for backend in self.backends)
+
+    # -- routing --------------------------------------------------------------
+
+    def choose(self, model: Optional[str] = None, exclude=()) -> Optional[OllamaBackend]:
+        candidates = [backend for backend in self.backends if backend not in exclude]
+        if len(self.backends) > 1:
+            self.refresh()
+            usable = [backend for backend in candidates if backend.healthy and backend.serves(model)]
+            # Nothing known to be healthy: try the rest rather than failing outright.
+            candidates = usable or [backend for backend in candidates if backend.serves(model)] or candidates
+        if not candidates:
+            return None
+        with self._lock:
+            backend = min(candidates, key=lambda b: (b.in_flight, b.requests))
+            backend.in_flight += 1
+            backend.requests += 1
+        return backend
+
+    def hedge_delay(self, model: Optional[str]) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._latencies.get(model, ()))
+        if len(samples) < self.hedge_min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_quantile))]
+
+    def release(self, backend: OllamaBackend, outcome: str, model: Optional[str] = None,
+                elapsed: Optional[float] = None):
+        """Bookkeeping after a call on a backend returned by choose(); outcome
+        is 'ok', 'http_error', 'connection_error', 'error' or 'cancelled' (a
+        hedge that lost the race). Used directly by callers with their own
+        HTTP client (the asyncio service)."""
+        with self._lock:
+            backend.in_flight -= 1
+            if outcome == 'ok' and elapsed is not None:
+                self._latencies.setdefault(model, deque(maxlen=200)).append(elapsed)
+        if outcome == 'connection_error':
+            backend.healthy = False
+        if outcome not in ('ok', 'cancelled'):
+            backend.failures += 1
+        self._count(backend, outcome)
+
+    def record_hedge(self, outcome: str):
+        """Count a hedged duplicate ('fired') or a duplicate that answered
+        first ('won')."""
+        with self._lock:
+            self.hedges[outcome] += 1
+        if self._hedged is not None:
+            self._hedged.inc(outcome=outcome)
+
+    def _send(self, backend: OllamaBackend, payload: Dict, timeout: float) -> requests.Response:
+        started = time.perf_counter()
+        try:
+            response = requests.post(backend.generate_url, json=payload, timeout=timeout)
+        except requests.exceptions.ConnectionError:
+            self.release(backend, 'connection_error')
+            raise
+        except Exception:
+            self.release(backend, 'error')
+            raise
+        outcome = 'ok' if response.status_code == 200 else 'http_error'
+        self.release(backend, outcome, payload.get('model'), time.perf_counter() - started)
+        return response
+
+    def _count(self, backend: OllamaBackend, outcome: str):
+        if self._requests is not None:
+            self._requests.inc(backend=backend.base_url, outcome=outcome)
+
+    def post(self, payload: Dict, timeout: float) -> requests.Response:
+        """POST /api/generate on the least loaded backend serving payload['model']."""
+        model = payload.get('model')
+        tried: List[OllamaBackend] = []
+        while True:
+            backend = self.choose(model, exclude=tried)
+            if backend is None:
+                raise requests.exceptions.ConnectionError("Tidak ada backend Ollama yang bisa dihubungi")
+            tried.append(backend)
+            try:
+                delay = self.hedge_delay(model) if self.hedge else None
+                if delay is not None and delay < timeout:
+                    return self._post_hedged(backend, payload, timeout, delay, tried)
+                return self._send(backend, payload, timeout)
+            except requests.exceptions.ConnectionError:
+                if len(tried) >= len(self.backends):
+                    raise
+                logger.warning("Ollama backend %s unreachable, failing over", backend.base_url)
+
+    def _post_hedged(self, backend: OllamaBackend, payload: Dict, timeout: float, delay: float,
+                     tried: List[OllamaBackend]) -> requests.Response:
+        started = time.perf_counter()
+        primary = self._executor.submit(self._send, backend, payload, timeout)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            return primary.result()
+        second = self.choose(payload.get('model'), exclude=tried)
+        if second is None:
+            return primary.result()
+        tried.append(second)
+        self.record_hedge('fired')
+        remaining = max(0.1, timeout - (time.perf_counter() - started))
+        hedge = self._executor.submit(self._send, second, payload, remaining)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                response = future.result()
+                if response.status_code == 200 or not pending:
+                    if future is hedge:
+                        self.record_hedge('won')
+                    return response
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backends': [backend.to_dict() for backend in self.backends],
+            'hedge': self.hedge,
+            'hedges': dict(self.hedges),
+            'hedge_delay_seconds': {
+                str(model): round(delay, 3)
+                for model in list(self._latencies)
+                for delay in [self.hedge_delay(model)] if delay is not None
+            },
+        }
+
+
+def create_pool_from_env(default_url: str, metrics=None) -> OllamaPool:
+    """OLLAMA_URLS (comma separated) or the single OLLAMA_URL."""
+    urls = [url.strip() for url in os.getenv('OLLAMA_URLS', '').split(',') if url.strip()] or [default_url]
+    return OllamaPool(
+        urls,
+        health_interval=float(os.getenv('OLLAMA_HEALTH_INTERVAL', '30')),
+        hedge=os.getenv('OLLAMA_HEDGE', 'false').lower() == 'true',
+        hedge_quantile=float(os.getenv('OLLAMA_HEDGE_QUANTILE', '0.95')),
+        hedge_min_samples=int(os.getenv('OLLAMA_HEDGE_MIN_SAMPLES', '20')),
+        metrics=metrics,
+    )
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""EasyOCR's CRAFT detector and CRNN recognizer on ONNX Runtime (CPU).
+
+OnnxReader.readtext() returns the same (bbox, text, confidence) tuples as
+easyocr.Reader.readtext(detail=1), so build_lines_from_results and the
+classifiers do not change. torch is only needed once, to export the models:
+
+    python onnx_ocr.py export --output models/onnx [--int8]
+
+The pre/post-processing follows EasyOCR's defaults (canvas 2560, text 0.7,
+link 0.4, low_text 0.4, greedy CTC decoding) without its horizontal box
+merging; group_text_by_rows already joins the words of a receipt line.
+"""
+import argparse
+import json
+import math
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+DETECTOR_FILE = 'detector.onnx'
+RECOGNIZER_FILE = 'recognizer.onnx'
+RECOGNIZER_INT8_FILE = 'recognizer.int8.onnx'
+META_FILE = 'meta.json'
+
+CANVAS_SIZE = 2560
+TEXT_THRESHOLD = 0.7
+LINK_THRESHOLD = 0.4
+LOW_TEXT = 0.4
+MIN_COMPONENT_AREA = 10
+MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255.0
+STD = np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255.0
+
+
+def resize_for_detection(image: np.ndarray, canvas_size: int = CANVAS_SIZE,
+                         mag_ratio: float = 1.0) -> Tuple[np.ndarray, float]:
+    """Scale the longest side by mag_ratio, capped at canvas_size, and pad to
+    a multiple of 32."""
+    height, width = image.shape[:2]
+    ratio = min(mag_ratio * max(height, width), canvas_size) / max(height, width)
+    target_h, target_w = int(height * ratio), int(width * ratio)
+    resized = cv2.resize(image, (target_w, target_h), interpolation=cv2.INTER_LINEAR)
+    padded = np.zeros((target_h + (-target_h) % 32, target_w + (-target_w) % 32, 3), dtype=np.float32)
+    padded[:target_h, :target_w] = resized
+    return padded, ratio
+
+
+def detection_boxes(textmap: np.ndarray, linkmap: np.ndarray, text_threshold: float = TEXT_THRESHOLD,
+                    link_threshold: float = LINK_THRESHOLD, low_text: float = LOW_TEXT) -> List[np.ndarray]:
+    """Word polygons (4 x 2, heatmap coordinates) from the CRAFT score maps;
+    EasyOCR's getDetBoxes_core, working on each component's bounding box
+    instead of a full-size mask per component."""
+    text_score = textmap > low_text
+    link_score = linkmap > link_threshold
+    combined = (text_score | link_score).astype(np.uint8)
+    count, labels, stats, _ = cv2.connectedComponentsWithStats(combined, connectivity=4)
+    map_h, map_w = textmap.shape
+    boxes = []
+    for label in range(1, count):
+        x, y, w, h, area = stats[label]
+        if area < MIN_COMPONENT_AREA:
+            continue
+        niter = int(math.sqrt(area * min(w, h) / (w * h)) * 2)
+        sx, sy = max(0, x - niter), max(0, y - niter)
+        ex, ey = min(map_w, x + w + niter + 1), min(map_h, y + h + niter + 1)
+        region = labels[sy:ey, sx:ex] == label
+        if textmap[sy:ey, sx:ex][region].max() < text_threshold:
+            continue
+        segmap = region.astype(np.uint8) * 255
+        segmap[link_score[sy:ey, sx:ex] & ~text_score[sy:ey, sx:ex]] = 0
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1 + niter, 1 + niter))
+        segmap = cv2.dilate(segmap, kernel)
+        ys, xs = np.nonzero(segmap)
+        points = np.stack([xs + sx, ys + sy], axis=1).astype(np.float32)
+        box = cv2.boxPoints(cv2.minAreaRect(points))
+        # Start at the top-left corner, clockwise, like EasyOCR.
+        box = np.roll(box, 4 - box.sum(axis=1).argmin(), axis=0)
+        boxes.append(box)
+    return boxes
+
+
+def ctc_decode(probs: np.ndarray, characters: str) -> List[Tuple[str, float]]:
+    """Greedy CTC decoding of (batch, steps, classes) softmax output; index 0
+    is the blank. Confidence is EasyOCR's custom_mean of the kept maxima."""
+    indices = probs.argmax(axis=2)
+    maxima = probs.max(axis=2)
+    decoded = []
+    for row_idx, row_max in zip(indices, maxima):
+        keep = row_idx != 0
+        keep[1:] &= row_idx[1:] != row_idx[:-1]
+        text = ''.join(characters[idx - 1] for idx in row_idx[keep])
+        kept = row_max[row_idx != 0]
+        confidence = float(kept.prod() ** (2.0 / math.sqrt(len(kept)))) if len(kept) else 0.0
+        decoded.append((text, confidence))
+    return decoded
+
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    shifted = np.exp(logits - logits.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class OnnxReader:
+    """Drop-in for the easyocr.Reader.readtext calls made by the OCR service."""
+
+    def __init__(self, detector, recognizer, characters: str, model_height: int = 64, margin: float = 0.1):
+        self.detector = detector
+        self.recognizer = recognizer
+        self.characters = characters
+        self.model_height = model_height
+        self.margin = margin
+
+    @classmethod
+    def load(cls, model_dir: str, int8: bool = False, threads: Optional[int] = None) -> 'OnnxReader':
+        import onnxruntime as ort
+
+        with open(os.path.join(model_dir, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        recognizer_path = os.path.join(model_dir, RECOGNIZER_FILE)
+        if int8 and os.path.exists(os.path.join(model_dir, RECOGNIZER_INT8_FILE)):
+            recognizer_path = os.path.join(model_dir, RECOGNIZER_INT8_FILE)
+        providers = ['CPUExecutionProvider']
+        return cls(
+            ort.InferenceSession(os.path.join(model_dir, DETECTOR_FILE), options, providers=providers),
+            ort.InferenceSession(recognizer_path, options, providers=providers),
+            meta['characters'],
+            model_height=meta.get('model_height', 64),
+        )
+
+    def detect(self, image: np.ndarray, canvas_size: int = CANVAS_SIZE, mag_ratio: float = 1.0,
+               text_threshold: float = TEXT_THRESHOLD, link_threshold: float = LINK_THRESHOLD,
+               low_text: float = LOW_TEXT) -> List[Tuple[int, int, int, int]]:
+        """Axis-aligned (x_min, x_max, y_min, y_max) word boxes in image pixels."""
+        padded, ratio = resize_for_detection(image, canvas_size, mag_ratio)
+        batch = ((padded - MEAN) / STD).transpose(2, 0, 1)[np.newaxis].astype(np.float32)
+        scores = self.detector.run(None, {self.detector.get_inputs()[0].name: batch})[0][0]
+        height, width = image.shape[:2]
+        boxes = []
+        for poly in detection_boxes(scores[:, :, 0], scores[:, :, 1], text_threshold, link_threshold, low_text):
+            # The score maps are half the network input resolution.
+            poly = poly * 2.0 / ratio
+            x_min, y_min = poly.min(axis=0)
+            x_max, y_max = poly.max(axis=0)
+            pad = self.margin * (y_max - y_min)
+            boxes.append((max(0, int(x_min - pad)), min(width, int(x_max + pad)),
+                          max(0, int(y_min - pad)), min(height, int(y_max + pad))))
+        return [box for box in boxes if box[1] - box[0] > 1 and box[3] - box[2] > 1]
+
+    def _prepare_batch(self, crops: Sequence[np.ndarray]) -> np.ndarray:
+        widths = [max(1, math.ceil(self.model_height * crop.shape[1] / crop.shape[0])) for crop in crops]
+        batch = np.zeros((len(crops), 1, self.model_height, max(widths)), dtype=np.float32)
+        for idx, (crop, width) in enumerate(zip(crops, widths)):
+            resized = cv2.resize(crop, (width, self.model_height), interpolation=cv2.INTER_CUBIC)
+            normalized = (resized.astype(np.float32) / 255.0 - 0.5) / 0.5
+            batch[idx, 0, :, :width] = normalized
+            # Pad by repeating the last column (EasyOCR's NormalizePAD).
+            batch[idx, 0, :, width:] = normalized[:, -1:]
+        return batch
+
+    def recognize(self, gray: np.ndarray, boxes: Sequence[Tuple[int, int, int, int]],
+                  batch_size: int = 1, allowlist: Optional[str] = None) -> List[Tuple[str, float]]:
+        crops = [gray[y_min:y_max, x_min:x_max] for x_min, x_max, y_min, y_max in boxes]
+        # Similar widths share a batch so little of it is padding.
+        order = sorted(range(len(crops)), key=lambda idx: crops[idx].shape[1] / crops[idx].shape[0])
+        results: List[Optional[Tuple[str, float]]] = [None] * len(crops)
+        input_name = self.recognizer.get_inputs()[0].name
+        step = max(1, batch_size)
+        # Like EasyOCR, characters outside the allowlist get zero probability.
+        ignored = None
+        if allowlist:
+            ignored = [idx + 1 for idx, char in enumerate(self.characters) if char not in allowlist]
+        for start in range(0, len(order), step):
+            chunk = order[start:start + step]
+            logits = self.recognizer.run(None, {input_name: self._prepare_batch([crops[idx] for idx in chunk])})[0]
+            probs = softmax(logits)
+            if ignored:
+                probs[:, :, ignored] = 0.0
+                probs /= probs.sum(axis=2, keepdims=True)
+            for idx, decoded in zip(chunk, ctc_decode(probs, self.characters)):
+                results[idx] = decoded
+        return results
+
+    def readtext(self, image: np.ndarray, detail: int = 1, paragraph: bool = False, width_ths: float = 0.7,
+                 height_ths: float = 0.7, batch_size: int = 1, canvas_size: int = CANVAS_SIZE,
+                 mag_ratio: float = 1.0, text_threshold: float = TEXT_THRESHOLD,
+                 link_threshold: float = LINK_THRESHOLD, low_text: float = LOW_TEXT,
+                 allowlist: Optional[str] = None, **ignored) -> List:
+        """easyocr.Reader.readtext for a BGR/RGB array: [(bbox, text, conf)],
+        bbox being the four corners from the top-left, clockwise. width_ths
+        and height_ths belong to EasyOCR's box merging, and decoding is always
+        greedy (decoder/beamWidth are ignored; OcrProfiles.check_backend warns
+        about profiles that set them)."""
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        color = image if image.ndim == 3 else cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+        boxes = self.detect(color, canvas_size, mag_ratio, text_threshold, link_threshold, low_text)
+        results = []
+        recognized = self.recognize(gray, boxes, batch_size, allowlist)
+        for (x_min, x_max, y_min, y_max), (text, confidence) in zip(boxes, recognized):
+            if not text:
+                continue
+            bbox = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append((bbox, text, confidence) if detail else text)
+        return results
+
+
+def export_models(output_dir: str, languages: Sequence[str] = ('en', 'id'), int8: bool = False,
+                  opset: int = 17) -> Dict[str, str]:
+    """Export the EasyOCR models for `languages` to ONNX (needs easyocr/torch)."""
+    import easyocr
+    import torch
+
+    reader = easyocr.Reader(list(languages), gpu=False, quantize=False)
+    detector = getattr(reader.detector, 'module', reader.detector).eval()
+    recognizer = getattr(reader.recognizer, 'module', reader.recognizer).eval()
+
+    class Detector(torch.nn.Module):
+        def __init__(self, net):
+            super().__init__()
+            self.net = net
+
+        def forward(self, image):
+            return self.net(image)[0]
+
+    class Recognizer(torch.nn.Module):
+        def __init__(self, net):
+            super().__init__()
+            self.net = net
+
+        def forward(self, image):
+            return self.net(image, None)
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = {'detector': os.path.join(output_dir, DETECTOR_FILE),
+             'recognizer': os.path.join(output_dir, RECOGNIZER_FILE)}
+    with torch.no_grad():
+        torch.onnx.export(Detector(detector), torch.randn(1, 3, 640, 640), paths['detector'],
+                          input_names=['image'], output_names=['scores'], opset_version=opset,
+                          dynamic_axes={'image': {2: 'height', 3: 'width'}, 'scores': {1: 'height', 2: 'width'}})
+        torch.onnx.export(Recognizer(recognizer), torch.randn(1, 1, 64, 256), paths['recognizer'],
+                          input_names=['image'], output_names=['logits'], opset_version=opset,
+                          dynamic_axes={'image': {0: 'batch', 3: 'width'}, 'logits': {0: 'batch', 1: 'steps'}})
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        paths['recognizer_int8'] = os.path.join(output_dir, RECOGNIZER_INT8_FILE)
+        quantize_dynamic(paths['recognizer'], paths['recognizer_int8'], weight_type=QuantType.QInt8)
+    paths['meta'] = os.path.join(output_dir, META_FILE)
+    with open(paths['meta'], 'w', encoding='utf-8') as f:
+        json.dump({'characters': reader.character, 'languages': list(languages), 'model_height': 64,
+                   'easyocr_version': easyocr.__version__}, f, ensure_ascii=False, indent=2)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EasyOCR models on ONNX Runtime')
+    sub = parser.add_subparsers(dest='command', required=True)
+    export = sub.add_parser('export', help='Export the EasyOCR detector/recognizer to ONNX')
+    export.add_argument('--output', default='models/onnx')
+    export.add_argument('--languages', default='en,id')
+    export.add_argument('--int8', action='store_true', help='Also write a dynamic int8 recognizer')
+    export.add_argument('--opset', type=int, default=17)
+    args = parser.parse_args()
+
+    paths = export_models(args.output, [lang for lang in args.languages.split(',') if lang],
+                          int8=args.int8, opset=args.opset)
+    print(json.dumps(paths, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,212 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# "12.500", "Rp 8,000", "15000", "7.500,-": an amount in a price column.
+PRICE_TOKEN = re.compile(r'^(?:rp\.?\s*)?(?:\d{1,3}(?:[.,]\d{3})+|\d{4,})(?:[.,]-+|,00)?$', re.IGNORECASE)
+# "2", "2x", "1,5", "3 pcs": a quantity in a qty column.
+QTY_TOKEN = re.compile(r'^\d{1,3}(?:[.,]\d{1,2})?\s*(?:x|pcs|pc|bh|kg|g|gr|ml|l|ltr)?$', re.IGNORECASE)
+# Largest slant (dy/dx) still treated as skew rather than two different rows.
+MAX_SKEW = 0.2
+# Boxes on either side (in y order) searched for a same-line neighbour.
+NEIGHBOUR_WINDOW = 12
+
+
+def parse_amount(text: str) -> Optional[int]:
+    """Rupiah value of a price-column token: '28.000' and 'Rp 8,000,-' are
+    thousands separators here, not decimals."""
+    text = (text or '').strip()
+    if not PRICE_TOKEN.match(text):
+        return None
+    body = re.sub(r'(?:[.,]-+|,00)$', '', re.sub(r'^rp\.?\s*', '', text, flags=re.IGNORECASE))
+    digits = re.sub(r'\D', '', body)
+    return int(digits) if digits else None
+
+
+class ReceiptLines(list):
+    """The joined line strings, with the layout behind them: `rows[i]` holds
+    the cells and confidence of line i, `columns` the detected bands."""
+
+    def __init__(self, lines=(), rows=None, columns=None, skew=0.0, row_tolerance=0.0):
+        super().__init__(lines)
+        self.rows: List[Dict[str, Any]] = rows or []
+        self.columns: Dict[str, Optional[Tuple[float, float]]] = columns or {'qty': None, 'price': None}
+        self.skew = skew
+        self.row_tolerance = row_tolerance
+
+
+def boxes_to_arrays(text_results, min_conf: float = 0.2):
+    """(extents Nx4 as x0, y0, x1, y1; top-edge slopes; texts; confidences)
+    of the readtext results above `min_conf`."""
+    kept = [result for result in text_results or [] if result[2] > min_conf]
+    if not kept:
+        return np.zeros((0, 4)), np.zeros(0), [], np.zeros(0)
+    polygons = np.array([[point[:2] for point in bbox[:4]] for bbox, _, _ in kept], dtype=np.float64)
+    extents = np.concatenate([polygons.min(axis=1), polygons.max(axis=1)], axis=1)
+    top_dx = polygons[:, 1, 0] - polygons[:, 0, 0]
+    top_dy = polygons[:, 1, 1] - polygons[:, 0, 1]
+    slopes = np.divide(top_dy, top_dx, out=np.zeros(len(kept)), where=top_dx > 0)
+    texts = [text for _, text, _ in kept]
+    confidences = np.array([conf for _, _, conf in kept], dtype=np.float64)
+    return extents, slopes, texts, confidences
+
+
+def estimate_skew(extents: np.ndarray, slopes: np.ndarray, text_height: float) -> float:
+    """Median slant (dy/dx) of the receipt's text lines.
+
+    Rotated boxes carry it in their top edge. Axis-aligned boxes (EasyOCR's
+    default output) do not, so it is also measured between each box and its
+    nearest right-hand neighbour on roughly the same line. Neighbours are
+    searched among the NEIGHBOUR_WINDOW boxes on either side in y order,
+    which keeps this linear in the box count.
+    """
+    samples = [slopes[np.abs(slopes) > 1e-3]]
+    count = len(extents)
+    if count > 1:
+        order = np.argsort((extents[:, 1] + extents[:, 3]) / 2, kind='stable')
+        x0, y0, x1, y1 = extents[order].T
+        cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+        positions = np.arange(count)
+        best_cost = np.full(count, np.inf)
+        best_dx = np.zeros(count)
+        best_dy = np.zeros(count)
+        for offset in range(-NEIGHBOUR_WINDOW, NEIGHBOUR_WINDOW + 1):
+            if offset == 0:
+                continue
+            other = positions + offset
+            valid = (other >= 0) & (other < count)
+            mine, other = positions[valid], other[valid]
+            gap = x0[other] - x1[mine]
+            dx = cx[other] - cx[mine]
+            dy = cy[other] - cy[mine]
+            # Boxes of the rows above and below sit at the same gap; the
+            # one closest in y is the continuation of this line.
+            cost = np.clip(gap, 0, None) + 2 * np.abs(dy)
+            better = ((gap > -0.5 * text_height) & (gap < 4 * text_height) & (np.abs(dy) < text_height)
+                      & (dx > 0) & (cost < best_cost[mine]))
+            mine = mine[better]
+            best_cost[mine] = cost[better]
+            best_dx[mine] = dx[better]
+            best_dy[mine] = dy[better]
+        paired = np.isfinite(best_cost)
+        samples.append(best_dy[paired] / best_dx[paired])
+    samples = np.concatenate(samples)
+    if not len(samples):
+        return 0.0
+    return float(np.clip(np.median(samples), -MAX_SKEW, MAX_SKEW))
+
+
+def cluster_rows(extents: np.ndarray, skew: float, tolerance: float) -> np.ndarray:
+    """Row id per box: centres are projected onto the deskewed y axis,
+    sorted, and a new row starts wherever the gap exceeds `tolerance`."""
+    if not len(extents):
+        return np.zeros(0, dtype=np.int64)
+    cx = (extents[:, 0] + extents[:, 2]) / 2
+    cy = (extents[:, 1] + extents[:, 3]) / 2
+    key = cy - skew * cx
+    order = np.argsort(key, kind='stable')
+    breaks = np.diff(key[order]) > tolerance
+    row_ids = np.empty(len(extents), dtype=np.int64)
+    row_ids[order] = np.concatenate(([0], np.cumsum(breaks)))
+    return row_ids
+
+
+def column_band(positions: np.ndarray, starts: np.ndarray, ends: np.ndarray, bin_width: float,
+                min_rows: int = 2, prefer_right: bool = False) -> Optional[Tuple[float, float]]:
+    """(x0, x1) of the densest run of histogram bins over `positions`, or
+    None when fewer than `min_rows` tokens fall in it. `prefer_right` breaks
+    ties towards the rightmost peak (a total column beside a unit price)."""
+    if len(positions) < min_rows:
+        return None
+    low = positions.min()
+    bins = max(1, int(np.ceil((positions.max() - low) / bin_width)) + 1)
+    counts, edges = np.histogram(positions, bins=bins, range=(low, low + bins * bin_width))
+    peak = bins - 1 - int(np.argmax(counts[::-1])) if prefer_right else int(np.argmax(counts))
+    first = last = peak
+    while first > 0 and counts[first - 1]:
+        first -= 1
+    while last < bins - 1 and counts[last + 1]:
+        last += 1
+    members = (positions >= edges[first]) & (positions <= edges[last + 1])
+    if members.sum() < min_rows:
+        return None
+    return float(starts[members].min()), float(ends[members].max())
+
+
+def _in_band(band: Optional[Tuple[float, float]], values: np.ndarray, slack: float) -> np.ndarray:
+    if band is None:
+        return np.zeros(len(values), dtype=bool)
+    return (values >= band[0] - slack) & (values <= band[1] + slack)
+
+
+def analyze_layout(text_results, min_conf: float = 0.2, row_ratio: float = 0.5,
+                   clean: Optional[Callable[[str], str]] = None) -> ReceiptLines:
+    """Rows and qty/name/price cells of a receipt from readtext results.
+
+    The row tolerance is `row_ratio` times the median box height, so it
+    follows the print size instead of a fixed pixel count. Price and qty
+    columns are the densest x-histogram bands of price-like (right edge) and
+    quantity-like (centre) tokens on multi-token rows.
+    """
+    clean = clean or (lambda text: re.sub(r'\s+', ' ', (text or '').strip()))
+    extents, slopes, texts, confidences = boxes_to_arrays(text_results, min_conf)
+    if not texts:
+        return ReceiptLines()
+    texts = [clean(text) for text in texts]
+    heights = extents[:, 3] - extents[:, 1]
+    text_height = float(max(np.median(heights), 1.0))
+    skew = estimate_skew(extents, slopes, text_height)
+    tolerance = row_ratio * text_height
+    row_ids = cluster_rows(extents, skew, tolerance)
+
+    x0, x1 = extents[:, 0], extents[:, 2]
+    cx = (x0 + x1) / 2
+    is_price = np.array([bool(PRICE_TOKEN.match(text)) for text in texts])
+    is_qty = np.array([bool(QTY_TOKEN.match(text)) for text in texts]) & ~is_price
+    row_sizes = np.bincount(row_ids)
+    multi = row_sizes[row_ids] > 1
+    price_mask = is_price & multi
+    qty_mask = is_qty & multi
+    columns = {
+        'qty': column_band(cx[qty_mask], x0[qty_mask], x1[qty_mask], 2 * text_height),
+        'price': column_band(x1[price_mask], x0[price_mask], x1[price_mask], 2 * text_height,
+                             prefer_right=True),
+    }
+
+    in_price = is_price & _in_band(columns['price'], x1, text_height)
+    if columns['price'] is None:
+        in_price = is_price & multi
+    in_qty = is_qty & _in_band(columns['qty'], cx, text_height)
+    row_y = np.bincount(row_ids, weights=(extents[:, 1] + extents[:, 3]) / 2) / row_sizes
+    row_conf = np.bincount(row_ids, weights=confidences) / row_sizes
+
+    order = np.lexsort((x0, row_ids))
+    bounds = np.flatnonzero(np.diff(row_ids[order])) + 1
+    in_price, in_qty = in_price.tolist(), in_qty.tolist()
+    lines, rows = [], []
+    for members in np.split(order, bounds):
+        members = members.tolist()
+        row_text = " ".join(texts[idx] for idx in members).strip()
+        if len(row_text) <= 1:
+            continue
+        # Without a detected band only a row's last token can be its price.
+        price_idx = [idx for idx in members if in_price[idx]]
+        if columns['price'] is None:
+            price_idx = price_idx[-1:] if price_idx and price_idx[-1] == members[-1] else []
+        price = price_idx[-1] if price_idx else None
+        qty_idx = [idx for idx in members if idx != price and in_qty[idx]]
+        name = [texts[idx] for idx in members if idx != price and idx not in qty_idx]
+        row_id = row_ids[members[0]]
+        lines.append(row_text)
+        rows.append({
+            'text': row_text,
+            'cells': {
+                'qty': " ".join(texts[idx] for idx in qty_idx),
+                'name': " ".join(name).strip(),
+                'price': texts[price] if price is not None else '',
+            },
+            'y': round(float(row_y[row_id]), 1),
+            'confidence': round(float(row_conf[row_id]), 3),
+        })
+    return ReceiptLines(lines, rows, columns, round(skew, 4), round(tolerance, 1))
@@ -0,0 +1,115 @@
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Mapping, Optional
+
+
+class Deadline:
+    """Absolute point in time after which the caller no longer waits.
+
+    Built from the request: `X-Request-Deadline` (unix seconds or ISO 8601),
+    `X-Request-Timeout` (seconds from now) or a `timeout_seconds` body field.
+    Every stage asks for the remaining budget instead of using its own fixed
+    timeout, so nested retries can never outlive the client.
+    """
+
+    def __init__(self, expires_at: Optional[float], margin: float = 0.0):
+        self.expires_at = expires_at
+        self.margin = margin
+
+    @classmethod
+    def after(cls, seconds: Optional[float], margin: float = 0.0) -> 'Deadline':
+        return cls(time.time() + seconds if seconds and seconds > 0 else None, margin)
+
+    @classmethod
+    def from_request(cls, headers: Mapping[str, str], body: Optional[Dict[str, Any]] = None,
+                     default_timeout: float = 0.0, margin: float = 0.0) -> 'Deadline':
+        absolute = headers.get('X-Request-Deadline')
+        if absolute:
+            try:
+                return cls(float(absolute), margin)
+            except ValueError:
+                try:
+                    return cls(datetime.fromisoformat(absolute).timestamp(), margin)
+                except ValueError:
+                    pass
+        relative = headers.get('X-Request-Timeout')
+        if relative is None and isinstance(body, dict):
+            relative = body.get('timeout_seconds')
+        try:
+            seconds = float(relative) if relative is not None else default_timeout
+        except (TypeError, ValueError):
+            seconds = default_timeout
+        return cls.after(seconds, margin)
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left after the safety margin, None when unbounded."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - self.margin - time.time())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and self.remaining() <= 0
+
+    def clamp(self, timeout: float) -> float:
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+
+class RetryBudget:
+    """Service wide cap on retries as a fraction of traffic.
+
+    Each first attempt deposits `ratio` tokens and each retry withdraws one,
+    so under sustained failure retries stay at about `ratio` of requests
+    instead of multiplying load. `min_per_second` keeps a small trickle of
+    retries available at low traffic (one per 100 s by default, so it cannot
+    outweigh the ratio at the few requests per second Ollama serves); the
+    balance never exceeds `max_tokens`.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 0.01, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.max_tokens, self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+            self.requests += 1
+
+    def try_retry(self) -> bool:
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self.retries += 1
+                return True
+            self.rejected += 1
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refill()
+            return {
+                'ratio': self.ratio,
+                'tokens': round(self._tokens, 2),
+                'requests': self.requests,
+                'retries': self.retries,
+                'rejected': self.rejected,
+            }
@@ -0,0 +1,224 @@
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("expired_prediction_service.shelf_life_kb")
+
+SOURCES = ('llm', 'manual')
+# Quantities and units are not part of what an ingredient is: "Beras 5 kg"
+# and "beras" share one entry.
+_QUANTITY_PATTERN = re.compile(
+    r'\b\d+(?:[.,]\d+)?\s*(?:kg|gr|gram|g|ml|l|liter|ltr|pcs|pack|pak|bks|btl|ikat|sisir|ekor)?\b'
+)
+
+# Pairs per bulk SELECT: two bound variables each keeps a statement under
+# the 999-variable limit of older SQLite builds.
+BULK_LOOKUP_CHUNK = 400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shelf_life (
+    name_key TEXT NOT NULL,
+    kategori_key TEXT NOT NULL,
+    nama_bahan TEXT NOT NULL,
+    kategori TEXT NOT NULL,
+    estimasi_hari INTEGER NOT NULL,
+    reason TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    source TEXT NOT NULL,
+    kb_version INTEGER NOT NULL,
+    model TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (name_key, kategori_key)
+)
+"""
+
+
+def normalize_key(text: str) -> str:
+    cleaned = _QUANTITY_PATTERN.sub(' ', (text or '').lower())
+    cleaned = re.sub(r'[^a-z0-9\s]', ' ', cleaned)
+    return re.sub(r'\s+', ' ', cleaned).strip()
+
+
+class ShelfLifeKB:
+    """Persistent shelf-life answers keyed by normalized nama_bahan + kategori.
+
+    The LLM's actual output is the number of days an ingredient keeps, which
+    does not depend on the store, the stock level or today's date. Entries
+    learned from the LLM expire after `ttl_days` and whenever `version` is
+    bumped (e.g. after a prompt change); `manual` entries are overrides that
+    never expire and are never replaced by LLM answers.
+    """
+
+    def __init__(self, path: str, ttl_days: float = 90, version: int = 1, min_confidence: float = 60.0):
+        self.path = path
+        self.ttl_seconds = ttl_days * 86400 if ttl_days > 0 else None
+        self.version = version
+        self.min_confidence = min_confidence
+        if path != ':memory:':
+            folder = os.path.dirname(os.path.abspath(path))
+            os.makedirs(folder, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(SCHEMA)
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'stored': 0}
+
+    def _fresh(self, row: sqlite3.Row) -> bool:
+        if row['source'] == 'manual':
+            return True
+        if row['kb_version'] != self.version:
+            return False
+        return self.ttl_seconds is None or time.time() - row['updated_at'] <= self.ttl_seconds
+
+    def lookup(self, nama_bahan: str, kategori: str) -> Optional[Dict[str, Any]]:
+        key = (normalize_key(nama_bahan), normalize_key(kategori))
+        if not key[0]:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM shelf_life WHERE name_key = ? AND kategori_key = ?', key
+            ).fetchone()
+            if row is None:
+                self.stats['misses'] += 1
+                return None
+            if not self._fresh(row):
+                self.stats['stale'] += 1
+                return None
+            self.stats['hits'] += 1
+            with self._conn:
+                self._conn.execute(
+                    'UPDATE shelf_life SET hits = hits + 1 WHERE name_key = ? AND kategori_key = ?', key
+                )
+        return self._row_to_dict(row)
+
+    def lookup_many(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """Fresh entries for (nama_bahan, kategori) pairs, keyed by the pair as
+        given; misses and stale entries are left out. Read-only: one SELECT
+        over the distinct keys (per BULK_LOOKUP_CHUNK of them) and no hit
+        counting, for scans over the whole inventory."""
+        wanted: Dict[Tuple[str, str], List[Tuple[str, str]]] = {}
+        for pair in pairs:
+            key = (normalize_key(pair[0]), normalize_key(pair[1]))
+            if key[0]:
+                wanted.setdefault(key, []).append(pair)
+        keys = list(wanted)
+        rows = []
+        with self._lock:
+            for start in range(0, len(keys), BULK_LOOKUP_CHUNK):
+                chunk = keys[start:start + BULK_LOOKUP_CHUNK]
+                rows += self._conn.execute(
+                    'SELECT * FROM shelf_life WHERE (name_key, kategori_key) IN (VALUES '
+                    + ', '.join(['(?, ?)'] * len(chunk)) + ')',
+                    [part for key in chunk for part in key]
+                ).fetchall()
+        found = {}
+        for row in rows:
+            if not self._fresh(row):
+                continue
+            entry = self._row_to_dict(row)
+            for pair in wanted[(row['name_key'], row['kategori_key'])]:
+                found[pair] = entry
+        return found
+
+    def get(self, nama_bahan: str, kategori: str) -> Optional[Dict[str, Any]]:
+        """Entry regardless of freshness, without counting a lookup."""
+        key = (normalize_key(nama_bahan), normalize_key(kategori))
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT * FROM shelf_life WHERE name_key = ? AND kategori_key = ?', key
+            ).fetchone()
+        return self._row_to_dict(row) if row is not None else None
+
+    def store(self, nama_bahan: str, kategori: str, estimasi_hari: int, reason: str, confidence: float,
+              source: str = 'llm', model: Optional[str] = None) -> bool:
+        """Insert or refresh an entry. LLM answers below `min_confidence` are
+        not kept and never replace a manual override."""
+        if source not in SOURCES:
+            raise ValueError(f"source harus salah satu dari {SOURCES}")
+        key = (normalize_key(nama_bahan), normalize_key(kategori))
+        if not key[0] or int(estimasi_hari) <= 0:
+            return False
+        if source == 'llm' and confidence < self.min_confidence:
+            return False
+        now = time.time()
+        with self._lock, self._conn:
+            if source == 'llm':
+                existing = self._conn.execute(
+                    'SELECT source FROM shelf_life WHERE name_key = ? AND kategori_key = ?', key
+                ).fetchone()
+                if existing is not None and existing['source'] == 'manual':
+                    return False
+            self._conn.execute(
+                """INSERT INTO shelf_life (name_key, kategori_key, nama_bahan, kategori, estimasi_hari, reason,
+                                           confidence, source, kb_version, model, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (name_key, kategori_key) DO UPDATE SET
+                       nama_bahan = excluded.nama_bahan, kategori = excluded.kategori,
+                       estimasi_hari = excluded.estimasi_hari, reason = excluded.reason,
+                       confidence = excluded.confidence, source = excluded.source,
+                       kb_version = excluded.kb_version, model = excluded.model,
+                       updated_at = excluded.updated_at""",
+                key + (nama_bahan, kategori, int(estimasi_hari), reason, float(confidence), source,
+                       self.version, model, now, now)
+            )
+            self.stats['stored'] += 1
+        return True
+
+    def delete(self, nama_bahan: str, kategori: str) -> bool:
+        key = (normalize_key(nama_bahan), normalize_key(kategori))
+        with self._lock, self._conn:
+            cursor = self._conn.execute('DELETE FROM shelf_life WHERE name_key = ? AND kategori_key = ?', key)
+        return cursor.rowcount > 0
+
+    def list(self, query: str = '', limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT * FROM shelf_life WHERE name_key LIKE ? ORDER BY name_key, kategori_key LIMIT ? OFFSET ?',
+                (f'%{normalize_key(query)}%', limit, offset)
+            ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self._conn.execute('SELECT COUNT(*) FROM shelf_life').fetchone()[0]
+            manual = self._conn.execute("SELECT COUNT(*) FROM shelf_life WHERE source = 'manual'").fetchone()[0]
+            return {'entries': total, 'manual': manual, 'version': self.version, **self.stats}
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            'nama_bahan': row['nama_bahan'],
+            'kategori': row['kategori'],
+            'estimasi_hari': row['estimasi_hari'],
+            'reason': row['reason'],
+            'confidence': row['confidence'],
+            'source': row['source'],
+            'model': row['model'],
+            'kb_version': row['kb_version'],
+            'updated_at': row['updated_at'],
+            'hits': row['hits'],
+            'fresh': self._fresh(row),
+        }
+
+
+def create_kb_from_env() -> Optional[ShelfLifeKB]:
+    if os.getenv('SHELF_LIFE_KB_ENABLED', 'true').lower() != 'true':
+        return None
+    path = os.getenv('SHELF_LIFE_KB_PATH', 'shelf_life_kb.sqlite3')
+    try:
+        return ShelfLifeKB(
+            path,
+            ttl_days=float(os.getenv('SHELF_LIFE_KB_TTL_DAYS', '90')),
+            version=int(os.getenv('SHELF_LIFE_KB_VERSION', '1')),
+            min_confidence=float(os.getenv('SHELF_LIFE_KB_MIN_CONFIDENCE', '60')),
+        )
+    except sqlite3.Error as exc:
+        logger.error("Shelf-life KB at %s unavailable: %s", path, exc)
+        return None
@@ -0,0 +1,87 @@
+import hashlib
+import json
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def request_key(*parts: Any) -> str:
+    """Stable hash of JSON-serializable request parts (dict keys sorted)."""
+    encoded = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class _Call:
+    __slots__ = ('done', 'value', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces concurrent calls that share a key.
+
+    The first caller for a key runs the work; callers arriving while it is
+    still running wait for that result (or exception) instead of repeating
+    the work. Nothing is cached: once the call returns the key is free
+    again. A waiter that cannot wait longer than `wait_timeout` runs the
+    work itself, and so does a waiter handed a result that `share_if`
+    rejects (a leader that ran out of its own deadline, say).
+    """
+
+    def __init__(self, name: str, metrics=None):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.stats_counts = {'leaders': 0, 'coalesced': 0, 'wait_timeouts': 0, 'reruns': 0}
+        self._counter = None
+        if metrics is not None:
+            self._counter = metrics.counter('singleflight_calls_total',
+                                            'Calls per coalescing group, by leader/coalesced role')
+
+    def count(self, role: str):
+        """Record a leader/coalesced call made outside do() (asyncio callers)."""
+        with self._lock:
+            self.stats_counts[role] += 1
+        if self._counter is not None:
+            self._counter.inc(group=self.name, role=role)
+
+    def do(self, key: Hashable, fn: Callable, *args, wait_timeout: Optional[float] = None,
+           share_if: Optional[Callable[[Any], bool]] = None, **kwargs) -> Tuple[Any, bool]:
+        """Returns (result, shared); `shared` is True when another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            if call.done.wait(wait_timeout):
+                if call.error is None and share_if is not None and not share_if(call.value):
+                    self.count('reruns')
+                    return fn(*args, **kwargs), False
+                self.count('coalesced')
+                if call.error is not None:
+                    raise call.error
+                return call.value, True
+            self.count('wait_timeouts')
+            return fn(*args, **kwargs), False
+
+        self.count('leaders')
+        try:
+            call.value = fn(*args, **kwargs)
+            return call.value, False
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'in_flight': len(self._calls), **self.stats_counts}
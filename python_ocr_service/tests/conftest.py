@@ -0,0 +1,16 @@
+import os
+import pathlib
+import sys
+
+# The services import their helper modules as top-level siblings (they are run
+# as scripts from python_ocr_service/), so make that directory importable.
+SERVICE_DIR = pathlib.Path(__file__).resolve().parent.parent
+if str(SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICE_DIR))
+
+# Tests exercise the LLM path; the shelf-life knowledge base would otherwise
+# persist answers between tests (and runs). Its tests build their own.
+os.environ.setdefault('SHELF_LIFE_KB_ENABLED', 'false')
+# The endpoint tests upload tiny blank images that the pre-OCR quality gate
+# would reject; test_image_gate exercises the gate directly.
+os.environ.setdefault('IMAGE_GATE_ENABLED', 'false')
@@ -0,0 +1,180 @@
+import asyncio
+import socket
+import time
+from collections import deque
+from unittest.mock import patch
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web  # noqa: E402
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+import python_ocr_service.expired_prediction_service_async as async_service  # noqa: E402
+from benchmarks.mock_ollama import default_response  # noqa: E402
+from ollama_pool import OllamaPool  # noqa: E402
+
+BAHAN = [
+    {'id_bahan': idx, 'nama_bahan': name, 'kategori': 'Bahan Pokok', 'stok_bahan': 10, 'satuan': 'kg'}
+    for idx, name in enumerate(['Beras', 'Gula Pasir', 'Minyak Goreng', 'Tepung Terigu'], 1)
+]
+
+
+def _ollama_app(generate):
+    async def tags(request):
+        router = async_service.svc.model_router
+        names = {model for task in ('expiry', 'expiry_packed') for model in router.cascade(task)}
+        return web.json_response({'models': [{'name': name} for name in sorted(names)]})
+
+    app = web.Application()
+    app.router.add_get('/api/tags', tags)
+    app.router.add_post('/api/generate', generate)
+    return app
+
+
+def _fake_ollama(state):
+    async def generate(request):
+        body = await request.json()
+        state['active'] += 1
+        state['peak'] = max(state['peak'], state['active'])
+        await asyncio.sleep(0.05)
+        state['active'] -= 1
+        return web.json_response({'response': default_response(body['prompt']), 'eval_count': 10})
+
+    return _ollama_app(generate)
+
+
+def test_batch_keeps_the_sync_contract_and_caps_llm_concurrency():
+    async def scenario():
+        state = {'active': 0, 'peak': 0}
+        async with TestServer(_fake_ollama(state)) as ollama:
+            pool = OllamaPool([str(ollama.make_url('/api/generate'))])
+            async with TestClient(TestServer(async_service.create_app(concurrency=2, pool=pool))) as client:
+                resp = await client.post('/predict-expiration-batch', json={'bahan_list': BAHAN, 'use_kb': False})
+                body = await resp.json()
+                single = await client.post('/predict-expiration', json={'bahan': BAHAN[0], 'use_kb': False})
+                single = await single.json()
+                missing = await client.post('/predict-expiration', json={})
+        return state, resp.status, body, single, missing.status
+
+    state, status, body, single, missing_status = asyncio.run(scenario())
+
+    assert status == 200 and body['success']
+    data = body['data']
+    assert data['total'] == 4 and data['berhasil'] == 4 and data['mode'] == 'individual'
+    assert [p['bahan']['id_bahan'] for p in data['predictions']] == [1, 2, 3, 4]
+    assert data['ollama_usage']['total']['calls'] == 4
+    assert state['peak'] == 2
+    assert single['success'] and set(single['data']['prediction']) == {'expired_date', 'days', 'reason', 'confidence'}
+    assert missing_status == 400
+
+
+def _recording_ollama(calls, delay=0.0, context=None):
+    async def generate(request):
+        body = await request.json()
+        calls.append(body)
+        await asyncio.sleep(delay)
+        # A context handle stands for the prefix it was evaluated from.
+        prompt = (async_service.svc.EXPIRATION_PROMPT_PREFIX if body.get('context') else '') + body['prompt']
+        reply = {'response': default_response(prompt), 'eval_count': 10}
+        if context is not None:
+            reply['context'] = context
+        return web.json_response(reply)
+
+    return _ollama_app(generate)
+
+
+def _closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/api/generate'
+
+
+def test_generation_fails_over_to_the_next_backend_and_hedges_slow_calls():
+    model = async_service.svc.model_router.model_for('expiry', 0)
+
+    async def scenario():
+        slow_calls, fast_calls = [], []
+        async with TestServer(_recording_ollama(slow_calls, delay=1.0)) as slow, \
+                TestServer(_recording_ollama(fast_calls)) as fast, aiohttp.ClientSession() as session:
+            down = OllamaPool([_closed_port_url(), str(fast.make_url('/api/generate'))])
+            for backend in down.backends:
+                backend.checked_at = time.monotonic()
+            failover = await async_service.AsyncOllamaClient(session, 2, pool=down).generate(
+                BAHAN[0]['nama_bahan'], retry=0, model=model)
+
+            hedged = OllamaPool([str(slow.make_url('/api/generate')), str(fast.make_url('/api/generate'))],
+                                hedge=True, hedge_min_samples=1)
+            for backend in hedged.backends:
+                backend.checked_at = time.monotonic()
+            hedged._latencies[model] = deque([0.05])
+            started = time.perf_counter()
+            answer = await async_service.AsyncOllamaClient(session, 2, pool=hedged).generate(
+                BAHAN[1]['nama_bahan'], retry=0, model=model)
+            elapsed = time.perf_counter() - started
+        return failover, down, answer, hedged, elapsed, len(slow_calls), len(fast_calls)
+
+    failover, down, answer, hedged, elapsed, slow_calls, fast_calls = asyncio.run(scenario())
+
+    assert failover and down.backends[0].healthy is False and down.backends[1].requests == 1
+    assert answer and elapsed < 0.8
+    assert (slow_calls, fast_calls) == (1, 2)
+    assert hedged.hedges == {'fired': 1, 'won': 1}
+    assert all(backend.in_flight == 0 for backend in hedged.backends)
+
+
+def test_prefix_context_is_evaluated_once_and_reused():
+    async def scenario():
+        calls = []
+        async with TestServer(_recording_ollama(calls, context=[7, 8, 9])) as ollama, \
+                aiohttp.ClientSession() as session:
+            pool = OllamaPool([str(ollama.make_url('/api/generate'))])
+            predictor = async_service.AsyncExpiryPredictor(async_service.AsyncOllamaClient(session, 2, pool=pool))
+            results = [await predictor.predict(bahan, use_kb=False) for bahan in BAHAN[:2]]
+        return calls, results
+
+    with patch.object(async_service.svc, 'OLLAMA_REUSE_CONTEXT', True), \
+            patch.dict(async_service.svc._prefix_context, clear=True):
+        calls, results = asyncio.run(scenario())
+
+    assert all(result['success'] for result in results)
+    prefix, *predictions = calls
+    assert prefix['prompt'].startswith(async_service.svc.EXPIRATION_PROMPT_PREFIX) and 'context' not in prefix
+    assert len(predictions) == 2
+    assert all(call['context'] == [7, 8, 9] for call in predictions)
+    assert not any(call['prompt'].startswith(async_service.svc.EXPIRATION_PROMPT_PREFIX) for call in predictions)
+
+
+def test_unavailable_ollama_short_circuits_single_and_packed_predictions():
+    async def scenario():
+        calls = []
+        async with TestServer(_recording_ollama(calls)) as ollama, aiohttp.ClientSession() as session:
+            pool = OllamaPool([str(ollama.make_url('/api/generate'))])
+            predictor = async_service.AsyncExpiryPredictor(async_service.AsyncOllamaClient(session, 2, pool=pool))
+            pool.backends[0].healthy, pool.backends[0].checked_at = False, time.monotonic()
+            single = await predictor.predict(BAHAN[0], use_kb=False)
+            packed, stats = await predictor.predict_packed(BAHAN, 2, async_service.svc.new_ollama_usage(), None, False)
+        return calls, single, packed, stats
+
+    calls, single, packed, stats = asyncio.run(scenario())
+
+    assert calls == []
+    assert not single['success'] and single['error'].startswith('Ollama tidak tersedia di ')
+    assert all(not result['success'] and result['error'] == single['error'] for result in packed)
+    assert stats['llm_calls'] == 0
+
+
+def test_packed_chunks_are_recorded_on_the_model_router():
+    async def scenario():
+        calls = []
+        async with TestServer(_recording_ollama(calls)) as ollama, aiohttp.ClientSession() as session:
+            pool = OllamaPool([str(ollama.make_url('/api/generate'))])
+            predictor = async_service.AsyncExpiryPredictor(async_service.AsyncOllamaClient(session, 2, pool=pool))
+            return await predictor.predict_packed(BAHAN, 2, async_service.svc.new_ollama_usage(), None, False)
+
+    with patch.object(async_service.svc.model_router, 'record') as record:
+        results, stats = asyncio.run(scenario())
+
+    assert all(result['success'] for result in results) and stats['packed_ok'] == 4
+    assert [(c.args[0], c.args[3]) for c in record.call_args_list] == [('expiry_packed', 'accepted')] * 2
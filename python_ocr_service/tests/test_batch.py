@@ -0,0 +1,85 @@
+import io
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+import python_ocr_service.ocr_service_hybrid as service
+from image_gate import ImageRejected
+from receipt_pipeline import PipelineBusy
+
+
+def _png_bytes():
+    ok, encoded = cv2.imencode('.png', np.full((40, 60, 3), 255, np.uint8))
+    assert ok
+    return encoded.tobytes()
+
+
+def test_process_photo_batch_returns_per_image_results_in_order():
+    client = service.app.test_client()
+    data = {
+        'images': [
+            (io.BytesIO(_png_bytes()), 'a.png'),
+            (io.BytesIO(b'not an image'), 'b.jpg'),
+            (io.BytesIO(_png_bytes()), 'c.png'),
+        ]
+    }
+    item = {'nama_barang': 'Semangka', 'jumlah': 1, 'harga': 15000}
+    with patch.object(service.upload_archiver, 'submit'), \
+            patch.object(service, 'extract_text_from_image', return_value=['1 Kg Semangka 15.000']) as ocr, \
+            patch.object(service, 'classify_text_lines', return_value=[item]):
+        response = client.post('/process-photo-batch', data=data, content_type='multipart/form-data')
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert ocr.call_count == 2
+    assert ocr.call_args.kwargs['batch_size'] == service.OCR_BATCH_SIZE
+    results = body['data']['results']
+    assert [r['filename'] for r in results] == ['a.png', 'b.jpg', 'c.png']
+    assert [r['success'] for r in results] == [True, False, True]
+    assert results[1]['error'] == "Failed to decode image"
+    assert {'decode', 'ocr', 'classify', 'total'} <= set(results[0]['timings'])
+
+
+class RejectTinyGate:
+    def check(self, image_bytes):
+        if len(image_bytes) < 100:
+            raise ImageRejected('too_small', 'Gambar terlalu kecil.')
+
+    def observe_processing(self, seconds):
+        pass
+
+
+def test_batch_archives_only_uploads_that_pass_the_image_gate():
+    uploads = [('a.png', _png_bytes()), ('tiny.jpg', b'tiny'), ('c.png', _png_bytes())]
+    with patch.object(service, 'image_gate', RejectTinyGate()), \
+            patch.object(service.upload_archiver, 'submit') as archive, \
+            patch.object(service, 'extract_text_from_image', return_value=[]), \
+            patch.object(service, 'classify_text_lines', return_value=[]):
+        results = service.process_images_batch(uploads)
+
+    assert sorted(call.args[1] for call in archive.call_args_list) == ['a.png', 'c.png']
+    assert results[1]['reason'] == 'too_small'
+
+
+def test_busy_pipeline_marks_the_remaining_images_instead_of_failing_the_batch():
+    real_submit = service.receipt_pipeline.submit
+    submitted = []
+
+    def submit_once(payload):
+        if submitted:
+            raise PipelineBusy("OCR queue full (16 pending)")
+        submitted.append(payload)
+        return real_submit(payload)
+
+    item = {'nama_barang': 'Semangka', 'jumlah': 1, 'harga': 15000}
+    uploads = [(name, _png_bytes()) for name in ('a.png', 'b.png', 'c.png')]
+    with patch.object(service.upload_archiver, 'submit'), \
+            patch.object(service.receipt_pipeline, 'submit', side_effect=submit_once) as submit, \
+            patch.object(service, 'extract_text_from_image', return_value=['1 Kg Semangka 15.000']), \
+            patch.object(service, 'classify_text_lines', return_value=[item]):
+        results = service.process_images_batch(uploads)
+
+    assert submit.call_count == 2
+    assert [r['success'] for r in results] == [True, False, False]
+    assert [r.get('reason') for r in results] == [None, 'busy', 'busy']
@@ -0,0 +1,39 @@
+import io
+import json
+
+from event_log import EventLogger, parse_sampling
+
+
+def test_events_are_json_lines_and_lazy_fields_skip_below_level():
+    stream = io.StringIO()
+    events = EventLogger('test_json', level='INFO', async_mode=False, stream=stream)
+    evaluated = []
+
+    events.debug('ollama.response_preview', preview=lambda: evaluated.append('debug') or 'x')
+    events.info('ollama.response', elapsed=1.5, preview=lambda: 'hasil')
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    payload = json.loads(lines[0])
+    assert payload['service'] == 'test_json'
+    assert payload['event'] == 'ollama.response'
+    assert payload['elapsed'] == 1.5 and payload['preview'] == 'hasil'
+    assert evaluated == []
+
+
+def test_sampling_uses_longest_prefix_and_async_queue_drops_instead_of_blocking():
+    assert parse_sampling('ollama=0.5, expiry.parse=0,bad') == {'ollama': 0.5, 'expiry.parse': 0.0}
+
+    stream = io.StringIO()
+    events = EventLogger('test_sampling', level='DEBUG', async_mode=False, stream=stream,
+                         sampling={'expiry': 1.0, 'expiry.parse': 0.0})
+    events.debug('expiry.parse.result', days=3)
+    events.debug('expiry.predict.done', days=3)
+    assert [json.loads(line)['event'] for line in stream.getvalue().splitlines()] == ['expiry.predict.done']
+    assert events.stats()['sampled_out'] == 1
+
+    queued = EventLogger('test_drop', level='INFO', async_mode=True, queue_size=1, stream=io.StringIO())
+    queued.close()  # listener stopped, so the single slot fills up
+    for _ in range(5):
+        queued.info('receipt.processed')
+    assert queued.stats()['dropped'] == 4
@@ -0,0 +1,45 @@
+import json
+from unittest.mock import patch
+
+import python_ocr_service.expired_prediction_service as service
+from benchmarks.mock_ollama import default_response
+
+BAHAN = [
+    {'id_bahan': 1, 'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 20, 'satuan': 'liter'},
+    {'id_bahan': 2, 'nama_bahan': 'Ayam Potong', 'kategori': 'Daging', 'stok_bahan': 10, 'satuan': 'kg'},
+    {'id_bahan': 3, 'nama_bahan': 'Beras', 'kategori': 'Bahan Pokok', 'stok_bahan': 50, 'satuan': 'kg'},
+]
+
+
+def test_chunking_respects_pack_size_and_prompt_budget():
+    chunks = service.chunk_bahan_for_packing(BAHAN, pack_size=2, max_prompt_chars=100000)
+    assert [[key for key, _ in chunk] for chunk in chunks] == [['1', '2'], ['3']]
+
+    tiny = service.chunk_bahan_for_packing(BAHAN, pack_size=8, max_prompt_chars=0)
+    assert len(tiny) == 3
+
+
+def test_packed_batch_retries_only_items_missing_from_the_array():
+    calls = []
+
+    def fake_ollama(prompt, **kwargs):
+        calls.append(prompt)
+        answer = default_response(prompt)
+        if 'DAFTAR BAHAN:' in prompt:
+            return json.dumps([entry for entry in json.loads(answer) if entry['id_bahan'] != 2])
+        return answer
+
+    client = service.app.test_client()
+    with patch.object(service, 'call_ollama_api', side_effect=fake_ollama), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        resp = client.post('/predict-expiration-batch', json={'bahan_list': BAHAN, 'packed': True})
+
+    data = resp.get_json()['data']
+    assert data['berhasil'] == 3
+    assert data['mode'] == 'packed'
+    assert data['packing'] == {'chunks': 1, 'packed_ok': 2, 'individual_retries': 1, 'llm_calls': 1}
+    assert [p['bahan']['id_bahan'] for p in data['predictions']] == [1, 2, 3]
+    assert data['predictions'][0]['prediction']['days'] == 180
+    # One packed prompt plus a single individual retry for Ayam Potong.
+    assert len(calls) == 2
+    assert 'Ayam Potong' in calls[1] and 'DAFTAR BAHAN:' not in calls[1]
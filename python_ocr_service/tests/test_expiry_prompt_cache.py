@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+import python_ocr_service.expired_prediction_service as service
+from benchmarks.mock_ollama import MockOllama, build_parser, create_app
+
+BAHAN = [
+    {'id_bahan': 1, 'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 20, 'satuan': 'liter'},
+    {'id_bahan': 2, 'nama_bahan': 'Ayam Potong', 'kategori': 'Daging', 'stok_bahan': 10, 'satuan': 'kg'},
+    {'id_bahan': 3, 'nama_bahan': 'Beras', 'kategori': 'Bahan Pokok', 'stok_bahan': 50, 'satuan': 'kg'},
+]
+
+
+class _Reply:
+    def __init__(self, resp):
+        self.status_code = resp.status_code
+        self.text = resp.get_data(as_text=True)
+        self._json = resp.get_json()
+
+    def json(self):
+        return self._json
+
+
+def _post_to(client, sent):
+    def post(url, json=None, timeout=None):
+        sent.append(json)
+        return _Reply(client.post('/api/generate', json=json))
+    return post
+
+
+def test_prompt_starts_with_identical_static_prefix():
+    first = service.build_expiration_prompt(BAHAN[0])
+    second = service.build_expiration_prompt(BAHAN[1], is_retry=True, previous_error='format')
+    assert first.startswith(service.EXPIRATION_PROMPT_PREFIX)
+    assert second.startswith(service.EXPIRATION_PROMPT_PREFIX)
+    assert 'Minyak Goreng' not in service.EXPIRATION_PROMPT_PREFIX
+    assert '- Nama:' not in service.EXPIRATION_PROMPT_PREFIX
+
+
+def test_batch_reports_prompt_eval_saving_after_first_item():
+    client = create_app(MockOllama(build_parser().parse_args(['--tokens-per-second', '0']))).test_client()
+    sent = []
+    with patch.object(service.requests, 'post', side_effect=_post_to(client, sent)), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        resp = service.app.test_client().post('/predict-expiration-batch', json={'bahan_list': BAHAN})
+
+    data = resp.get_json()['data']
+    assert data['berhasil'] == 3
+    usage = data['ollama_usage']
+    assert usage['total']['calls'] == 3
+    assert usage['avg_prompt_eval_count_after_first'] < usage['first_item_prompt_eval_count'] / 3
+    assert all(payload['keep_alive'] == service.OLLAMA_KEEP_ALIVE for payload in sent)
+
+
+def test_context_reuse_sends_only_the_suffix():
+    client = create_app(MockOllama(build_parser().parse_args(['--no-prompt-cache']))).test_client()
+    sent = []
+    service._prefix_context.clear()
+    with patch.object(service.requests, 'post', side_effect=_post_to(client, sent)), \
+            patch.object(service, 'is_ollama_available', return_value=True), \
+            patch.object(service, 'OLLAMA_REUSE_CONTEXT', True):
+        results = [service.predict_expiration(bahan) for bahan in BAHAN[:2]]
+    service._prefix_context.clear()
+
+    assert all(result['success'] for result in results)
+    # One warm-up call for the prefix, then suffix-only prompts with the context handle.
+    assert len(sent) == 3
+    assert sent[0]['prompt'].startswith(service.EXPIRATION_PROMPT_PREFIX)
+    for payload in sent[1:]:
+        assert payload['context'] == sent[1]['context']
+        assert not payload['prompt'].startswith(service.EXPIRATION_PROMPT_PREFIX)
@@ -0,0 +1,53 @@
+import io
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+import pytest
+
+import python_ocr_service.ocr_service_hybrid as service
+from benchmarks.receipt_corpus import encode_image, generate_corpus
+from image_gate import ImageGate, ImageRejected
+from metrics import MetricsRegistry
+
+
+def _reason(gate, image_bytes):
+    with pytest.raises(ImageRejected) as exc:
+        gate.check(image_bytes)
+    return exc.value.reason
+
+
+def test_gate_rejects_bad_photos_before_decoding_and_accepts_receipts():
+    gate = ImageGate(max_side=4000, metrics=MetricsRegistry())
+    receipt = generate_corpus(size=1, seed=3)[0]['image']
+
+    accepted = gate.check(encode_image(receipt))
+    assert accepted['width'] == receipt.shape[1] and accepted['sharpness'] > gate.min_sharpness
+    gate.observe_processing(2.5)
+
+    assert _reason(gate, encode_image(cv2.GaussianBlur(receipt, (31, 31), 10))) == 'blurry'
+    assert _reason(gate, encode_image((receipt * 0.1).astype(np.uint8))) == 'dark'
+    assert _reason(gate, encode_image(np.full((300, 300, 3), 255, np.uint8))) == 'overexposed'
+    assert _reason(gate, encode_image(receipt[:100, :150])) == 'too_small'
+    assert _reason(gate, cv2.imencode('.png', np.zeros((300, 4500), np.uint8))[1].tobytes()) == 'too_large'
+    assert _reason(gate, b'definitely not an image') == 'undecodable'
+
+    stats = gate.stats()
+    assert stats['counts'] == {'accepted': 1, 'blurry': 1, 'dark': 1, 'overexposed': 1, 'too_small': 1,
+                               'too_large': 1, 'undecodable': 1}
+    assert stats['saved_seconds'] == 15.0
+
+
+def test_process_photo_answers_422_with_a_hint_without_running_ocr():
+    blurry = cv2.GaussianBlur(generate_corpus(size=1, seed=3)[0]['image'], (31, 31), 10)
+    client = service.app.test_client()
+    with patch.object(service, 'image_gate', ImageGate()), patch.object(service, 'easyocr_available', True), \
+            patch.object(service.upload_archiver, 'submit') as archive, \
+            patch.object(service, 'extract_text_from_image') as ocr:
+        resp = client.post('/process-photo', data={'image': (io.BytesIO(encode_image(blurry)), 'struk.jpg')},
+                           content_type='multipart/form-data')
+
+    body = resp.get_json()
+    assert resp.status_code == 422
+    assert body['reason'] == 'blurry' and 'buram' in body['message']
+    assert not ocr.called and not archive.called
@@ -0,0 +1,70 @@
+from datetime import date
+from unittest.mock import patch
+
+import python_ocr_service.expired_prediction_service as service
+from inventory_risk import rows_to_columns, scan_inventory
+from shelf_life_kb import ShelfLifeKB
+
+TODAY = date(2026, 10, 1)
+
+
+def test_scan_computes_expiry_stock_out_and_value_at_risk_and_ranks_alerts():
+    columns = {
+        'id_bahan': [1, 2, 3, 4, 5],
+        'nama_bahan': ['Tahu', 'Susu', 'Beras', 'Gula', 'Telur'],
+        'stok_bahan': [10, 4, 50, 2, 0],
+        'min_stok': [0, 0, 5, 5, 0],
+        'harga_beli': [5000, '12000', 10000, 15000, 2000],
+        'estimasi_hari': [3, 7, 365, None, 14],
+        'pemakaian_harian': [None, 1, 5, None, 2],
+        'terakhir_update': ['2026-09-25', '2026-09-28 08:00:00', '2026-09-01', '', 'rusak'],
+    }
+
+    result = scan_inventory(columns, horizon_days=7, today=TODAY)
+    summary = result['summary']
+    by_id = {alert['id_bahan']: alert for alert in result['alerts']}
+
+    assert summary['items'] == 5 and summary['unknown_shelf_life'] == 1
+    assert (summary['expired'], summary['expiring'], summary['low_stock']) == (1, 1, 3)
+    # Tahu: 3 days of shelf life, 6 days old, no usage -> all stock lost.
+    assert by_id[1]['alerts'] == ['expired'] and by_id[1]['days_to_expiry'] == -3
+    assert by_id[1]['expired_date'] == '2026-09-28' and by_id[1]['value_at_risk'] == 50000
+    # Susu: 4 days left at 1/day uses up all 4 units in time, and runs out.
+    assert by_id[2]['alerts'] == ['expiring', 'low_stock'] and by_id[2]['value_at_risk'] == 0
+    # Gula is already below min_stok; Telur (stok 0) is out of stock.
+    assert by_id[4]['alerts'] == ['low_stock'] and by_id[4]['days_to_expiry'] is None
+    assert by_id[5]['alerts'] == ['low_stock'] and by_id[5]['days_to_min_stock'] == 0
+    assert 3 not in by_id
+    assert [alert['id_bahan'] for alert in result['alerts']] == [1, 2, 4, 5]
+    assert len(scan_inventory(columns, today=TODAY, limit=2)['alerts']) == 2
+
+    rows = [{'id_bahan': 1, 'nama_bahan': 'Tahu', 'stok_bahan': 10, 'terakhir_update': '2026-09-25'},
+            {'id_bahan': 2, 'nama_bahan': 'Kecap', 'stok_bahan': 1}]
+    filled = scan_inventory(rows_to_columns(rows), today=TODAY,
+                            shelf_life_lookup=lambda pairs: {pair: 3 for pair in pairs if pair[0] == 'Tahu'})
+    assert filled['summary']['shelf_life_from_kb'] == 1 and filled['summary']['expired'] == 1
+
+
+def test_inventory_risk_endpoint_fills_shelf_life_from_the_kb(tmp_path):
+    kb = ShelfLifeKB(str(tmp_path / 'kb.sqlite3'))
+    kb.store('Tahu', 'Protein', 3, 'Tahu tahan 3 hari di kulkas', 100, source='manual')
+    client = service.app.test_client()
+
+    with patch.object(service, 'shelf_life_kb', kb), \
+            patch.object(service, 'call_ollama_api', side_effect=AssertionError('LLM dipanggil')):
+        resp = client.post('/inventory-risk', json={
+            'bahan_list': [{'id_bahan': 9, 'nama_bahan': 'tahu', 'kategori': 'Protein', 'stok_bahan': 8,
+                            'harga_beli': 3000, 'terakhir_update': '2026-09-20'}],
+            'today': '2026-10-01',
+        })
+        bad = client.post('/inventory-risk', json={'columns': {'id_bahan': [1, 2], 'stok_bahan': [1]}})
+        missing = client.post('/inventory-risk', json={})
+
+    body = resp.get_json()
+    assert resp.status_code == 200 and body['success']
+    assert body['data']['summary']['shelf_life_from_kb'] == 1
+    # The scan reads the KB without counting hits.
+    assert kb.get('Tahu', 'Protein')['hits'] == 0
+    assert body['data']['alerts'][0]['alerts'] == ['expired']
+    assert body['data']['alerts'][0]['value_at_risk'] == 24000
+    assert bad.status_code == 400 and missing.status_code == 400
@@ -0,0 +1,54 @@
+from unittest.mock import patch
+
+import python_ocr_service.ocr_service_hybrid as service
+from llm_bypass import LlmBypass, estimate_quality
+
+CLEAN_RECEIPT = ['TOKO BAROKAH', '----------------------------',
+                 '2 Kg Melon 19.000', '1 Kg Mangga 21.000', '2 Btl Kecap 51.000',
+                 '----------------------------', 'TOTAL 91.000']
+
+
+def test_plain_lines_read_a_trailing_thousands_amount():
+    # extract_harga_from_text alone reads '19.000' as nothing ('000' < 100).
+    assert service.extract_harga_from_text('2 Kg Melon 19.000') is None
+    items, item_lines = service._parse_receipt_lines(['2 Kg Melon 19.000', 'Kecap Rp 8.500,-', 'Gula 15000'])
+    assert [item['harga'] for item in items] == [19000, 8500, 15000]
+    assert item_lines == 3
+
+
+def test_clean_receipt_is_returned_without_any_llm_call():
+    bypass = LlmBypass(threshold=0.9)
+    with patch.object(service, 'llm_bypass', bypass), \
+            patch.object(service, 'call_ollama_api') as llm:
+        items = service.classify_text_lines(CLEAN_RECEIPT)
+
+    llm.assert_not_called()
+    assert [(item['nama_barang'], item['harga'], item['resolved_by']) for item in items] == [
+        ('Melon', 19000, 'auto'), ('Mangga', 21000, 'auto'), ('Kecap', 51000, 'auto')]
+    assert bypass.stats()['bypass_rate'] == 1.0
+
+
+def test_receipt_that_does_not_add_up_goes_to_the_llm():
+    misread = [line.replace('21.000', '27.000') for line in CLEAN_RECEIPT]
+    _, quality = service.parse_receipt_deterministic(misread)
+    assert quality['components']['total'] == 0.0
+
+    bypass = LlmBypass(threshold=0.9)
+    with patch.object(service, 'llm_bypass', bypass), \
+            patch.object(service, 'USE_FULLTEXT_CLASSIFIER', True), \
+            patch.object(service, 'call_ollama_api', return_value='') as llm:
+        service.classify_text_lines(misread)
+
+    assert llm.called
+    assert bypass.stats() == {'bypassed': 0, 'llm': 1, 'threshold': 0.9, 'bypass_rate': 0.0}
+
+
+def test_quality_estimate_drops_missing_signals_and_follows_the_weakest_name():
+    quality = estimate_quality(item_lines=4, priced_lines=4, top_scores=[100, 100, 100, 100],
+                               ocr_confidences=[], total_match=None)
+    assert quality['score'] == 1.0 and quality['components']['ocr'] is None
+
+    weak_name = estimate_quality(item_lines=4, priced_lines=4, top_scores=[100, 100, 100, 40],
+                                 ocr_confidences=[0.95], total_match=True)
+    assert weak_name['components']['catalog'] == 0.4
+    assert weak_name['score'] < 0.9
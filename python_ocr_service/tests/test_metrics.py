@@ -0,0 +1,71 @@
+from unittest.mock import MagicMock, patch
+
+import python_ocr_service.expired_prediction_service as expiry_service
+import python_ocr_service.ocr_service_hybrid as ocr_service
+from benchmarks.mock_ollama import default_response
+from metrics import MetricsRegistry, OllamaMetrics
+
+
+def test_histogram_and_ollama_throughput_render_as_prometheus_text():
+    registry = MetricsRegistry()
+    stage = registry.histogram('stage_seconds', 'Stage time', buckets=(0.1, 1))
+    stage.observe(0.05, stage='decode')
+    stage.observe(0.5, stage='decode')
+    OllamaMetrics(registry).observe('select_candidate', 'ok', 1.2, {
+        'model': 'gemma3:1b', 'eval_count': 40, 'eval_duration': 2_000_000_000, 'prompt_eval_count': 300,
+    })
+
+    text = registry.render()
+    assert 'stage_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'stage_seconds_bucket{stage="decode",le="+Inf"} 2' in text
+    assert 'stage_seconds_count{stage="decode"} 2' in text
+    assert 'ollama_requests_total{outcome="ok",purpose="select_candidate"} 1' in text
+    assert 'ollama_eval_tokens_total{model="gemma3:1b"} 40' in text
+    assert 'ollama_eval_tokens_per_second_bucket{model="gemma3:1b",le="20"} 1' in text
+
+
+def test_ocr_metrics_count_resolved_by_and_llm_timeouts():
+    timeout = ocr_service.requests.exceptions.Timeout
+    with patch.object(ocr_service, 'USE_FULLTEXT_CLASSIFIER', True), \
+            patch.object(ocr_service.requests, 'post', side_effect=timeout):
+        before = ocr_service.ollama_metrics.requests.value(purpose='fulltext_extract', outcome='timeout')
+        items = ocr_service.classify_text_lines(['GULA PASIR 15000'])
+
+    assert len(items) == 1
+    resolved_by = items[0]['resolved_by']
+    assert ocr_service.ITEMS_RESOLVED.value(resolved_by=resolved_by) >= 1
+    assert ocr_service.ollama_metrics.requests.value(purpose='fulltext_extract', outcome='timeout') == before + 1
+
+    body = ocr_service.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'ocr_stage_duration_seconds_count{stage="classify_fulltext"}' in body
+    assert 'ocr_stage_duration_seconds_count{stage="classify_per_line"}' in body
+    assert f'ocr_items_resolved_total{{resolved_by="{resolved_by}"}}' in body
+    assert 'ocr_pipeline_queue_depth{stage="ocr"} 0' in body
+
+
+def test_expiry_metrics_track_retries_and_in_flight_requests():
+    responses = iter(['', None])
+
+    def fake_post(url, json, timeout):
+        text = next(responses)
+        reply = MagicMock(status_code=200)
+        reply.json.return_value = {'response': text if text is not None else default_response(json['prompt']),
+                                   'eval_count': 10, 'eval_duration': 10**9}
+        return reply
+
+    retries_before = expiry_service.PREDICT_RETRIES.value(reason='no_response')
+
+    client = expiry_service.app.test_client()
+    with patch.object(expiry_service, 'is_ollama_available', return_value=True), \
+            patch.object(expiry_service.requests, 'post', side_effect=fake_post):
+        resp = client.post('/predict-expiration', json={'bahan': {
+            'id_bahan': 1, 'nama_bahan': 'Beras', 'kategori': 'Bahan Pokok', 'stok_bahan': 5, 'satuan': 'kg'}})
+
+    assert resp.status_code == 200
+    assert expiry_service.PREDICT_RETRIES.value(reason='no_response') == retries_before + 1
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'expiry_predictions_total{outcome="success"}' in body
+    assert 'http_requests_in_flight{endpoint="/predict-expiration"} 0' in body
+    assert 'http_requests_total{endpoint="/predict-expiration",method="POST",status="200"}' in body
+    assert 'expiry_retry_budget_tokens' in body
@@ -0,0 +1,34 @@
+import json
+
+from benchmarks.mock_ollama import MockOllama, build_parser, create_app
+
+
+def _client(*argv):
+    return create_app(MockOllama(build_parser().parse_args(list(argv)))).test_client()
+
+
+def test_generate_answers_expiry_prompt_and_reports_ollama_fields():
+    client = _client('--tokens-per-second', '0')
+    prompt = "DATA BAHAN:\n- Nama: Minyak Goreng\n...\nOUTPUT (HANYA JSON): estimasi_hari"
+    resp = client.post('/api/generate', json={'model': 'gemma3:1b', 'prompt': prompt, 'stream': False})
+    body = resp.get_json()
+    assert resp.status_code == 200
+    assert json.loads(body['response'])['estimasi_hari'] == 180
+    assert {'prompt_eval_count', 'prompt_eval_duration', 'eval_count', 'eval_duration'} <= set(body)
+
+    streamed = client.post('/api/generate', json={'model': 'gemma3:1b', 'prompt': 'halo'})
+    chunks = [json.loads(line) for line in streamed.data.decode().splitlines()]
+    assert chunks[-1]['done'] is True
+    assert "".join(c['response'] for c in chunks) == 'Ya, saya berfungsi dengan baik.'
+
+    assert client.get('/api/tags').get_json()['models'][0]['name'] == 'gemma3:1b'
+
+
+def test_error_injection_and_unknown_model():
+    client = _client('--error-rate', '1.0')
+    assert client.post('/api/generate', json={'model': 'gemma3:1b', 'prompt': 'x', 'stream': False}).status_code == 500
+    assert client.post('/api/generate', json={'model': 'llama3:70b', 'prompt': 'x'}).status_code == 404
+    stats = client.get('/mock/stats').get_json()
+    assert stats['requests'] == 2
+    assert stats['errors_injected'] == 1
+    assert stats['unknown_model'] == 1
@@ -0,0 +1,61 @@
+from unittest.mock import patch
+
+import python_ocr_service.expired_prediction_service as service
+import python_ocr_service.ocr_service_hybrid as ocr_service
+from benchmarks.mock_ollama import default_response
+from metrics import MetricsRegistry
+from model_router import ModelRouter, parse_routes
+
+BAHAN = {'id_bahan': 1, 'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 20, 'satuan': 'liter'}
+
+
+def test_routes_parse_json_and_fall_back_to_default_model():
+    routes = parse_routes('{"expiry": ["gemma3:1b", "gemma3:4b"], "default": "qwen2.5:0.5b, gemma3:1b"}')
+    router = ModelRouter('gemma3:1b', routes)
+
+    assert router.cascade('expiry') == ['gemma3:1b', 'gemma3:4b']
+    assert router.cascade('select_candidate') == ['qwen2.5:0.5b', 'gemma3:1b']
+    assert router.next_tier('expiry', 0) == 1 and router.next_tier('expiry', 1) is None
+    assert ModelRouter('gemma3:1b').cascade('expiry') == ['gemma3:1b']
+    assert parse_routes('{bukan json') == {}
+
+
+def test_rejected_answer_escalates_to_the_next_tier():
+    models = []
+
+    def fake_ollama(prompt, model=None, **kwargs):
+        models.append(model)
+        return 'maaf, saya tidak tahu' if model == 'small' else default_response(prompt)
+
+    registry = MetricsRegistry()
+    router = ModelRouter('small', {'expiry': ['small', 'large']}, metrics=registry)
+    with patch.object(service, 'model_router', router), \
+            patch.object(service, 'call_ollama_api', side_effect=fake_ollama), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        result = service.predict_expiration(BAHAN, use_kb=False)
+        stats = service.app.test_client().get('/model-routes').get_json()['data']
+
+    assert result['success'] and result['model'] == 'large'
+    assert models == ['small', 'large']
+    tiers = {tier['model']: tier for tier in stats['expiry']['tiers']}
+    assert tiers['small']['rejected'] == 1 and tiers['small']['hit_rate'] == 0.0
+    assert tiers['large']['accepted'] == 1 and tiers['large']['hit_rate'] == 1.0
+    assert 'llm_cascade_calls_total{model="large",outcome="accepted",task="expiry",tier="1"} 1' in registry.render()
+
+
+def test_candidate_selection_stays_on_the_small_model_when_its_answer_is_valid():
+    router = ModelRouter('small', {'select_candidate': ['small', 'large']})
+    candidates = [{'name': 'Gula Pasir'}, {'name': 'Garam'}]
+    answers = {'small': ['7', '2'], 'large': ['1']}
+
+    def fake_ollama(prompt, model=None, **kwargs):
+        return answers[model].pop(0)
+
+    with patch.object(ocr_service, 'model_router', router), \
+            patch.object(ocr_service, 'call_ollama_api', side_effect=fake_ollama):
+        assert ocr_service.llm_select_candidate('GULA PSR', candidates, {}) == 0
+        assert ocr_service.llm_select_candidate('GARAM', candidates, {}) == 1
+
+    tiers = {tier['model']: tier for tier in router.stats()['select_candidate']['tiers']}
+    assert tiers['small']['calls'] == 2 and tiers['small']['accepted'] == 1
+    assert tiers['large']['calls'] == 1
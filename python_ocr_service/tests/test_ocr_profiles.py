@@ -0,0 +1,67 @@
+import io
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+import python_ocr_service.ocr_service_hybrid as service
+from ocr_profiles import OcrProfiles, load_profiles
+
+
+class RecordingReader:
+    def __init__(self):
+        self.calls = []
+
+    def readtext(self, img, **kwargs):
+        self.calls.append(kwargs)
+        return [([[0, 0], [200, 0], [200, 20], [0, 20]], 'GULA PASIR 15000', 0.9)]
+
+
+def test_profiles_bundle_readtext_knobs_variants_and_are_chosen_per_request():
+    reader = RecordingReader()
+    image = np.full((40, 60, 3), 255, np.uint8)
+    with patch.object(service, 'easyocr_available', True), patch.object(service, 'easyocr_reader', reader):
+        assert service.extract_text_from_image(image, profile='fast') == ['GULA PASIR 15000']
+        assert len(reader.calls) == 1 and reader.calls[0]['canvas_size'] == 1280
+        assert 'allowlist' in reader.calls[0]
+
+        reader.calls.clear()
+        service.extract_text_from_image(image, batch_size=8, profile='accurate')
+        # accurate never stops early and overrides batch_size only when asked.
+        assert len(reader.calls) == 4
+        assert {call['decoder'] for call in reader.calls} == {'beamsearch'}
+        assert {call['batch_size'] for call in reader.calls} == {8}
+
+    assert [name for name, _ in service.generate_preprocessed_variants(image, ['thresh', 'original'])] == \
+        ['thresh', 'original']
+
+    ok, png = cv2.imencode('.png', image)
+    with patch.object(service.upload_archiver, 'submit'), patch.object(service, 'easyocr_available', True), \
+            patch.object(service, 'extract_text_from_image', return_value=['1 Kg Semangka 15.000']) as ocr, \
+            patch.object(service, 'classify_text_lines', return_value=[{'nama_barang': 'Semangka'}]):
+        client = service.app.test_client()
+        ok_resp = client.post('/process-photo?profile=fast', data={'image': (io.BytesIO(png.tobytes()), 'a.png')},
+                              content_type='multipart/form-data')
+        bad_resp = client.post('/process-photo', data={'image': (io.BytesIO(png.tobytes()), 'a.png'),
+                                                       'profile': 'turbo'},
+                               content_type='multipart/form-data')
+    assert ok_resp.status_code == 200 and ocr.call_args.kwargs['profile'] == 'fast'
+    assert bad_resp.status_code == 400
+
+
+def test_env_overrides_merge_into_builtin_profiles():
+    profiles = OcrProfiles(load_profiles('{"fast": {"readtext": {"canvas_size": 960}}, '
+                                         '"nightly": {"variants": ["clahe"], "stop_digit_lines": null}}'),
+                           default='nightly')
+    assert profiles.get('fast')['readtext']['canvas_size'] == 960
+    assert profiles.get('fast')['readtext']['decoder'] == 'greedy'
+    assert profiles.get()['variants'] == ['clahe'] and profiles.get()['row_tolerance'] == 18
+    assert OcrProfiles(load_profiles(''), default='missing').default == 'balanced'
+
+
+def test_beamsearch_profiles_are_flagged_for_the_onnx_backend(caplog):
+    profiles = OcrProfiles(load_profiles())
+    assert profiles.check_backend('easyocr') == []
+    with caplog.at_level('WARNING', logger='ocr_profiles'):
+        assert profiles.check_backend('onnx') == ['accurate']
+    assert 'accurate' in caplog.text and 'beamsearch' in caplog.text
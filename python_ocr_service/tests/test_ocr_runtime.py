@@ -0,0 +1,29 @@
+from unittest.mock import patch
+
+import pytest
+
+import ocr_runtime
+
+
+def test_cpu_profile_quantizes_and_splits_cores_between_ocr_workers():
+    cpu = ocr_runtime.resolve_profile(workers=3, cpu_count=8, has_cuda=False)
+    assert cpu == {'backend': 'easyocr', 'device': 'cpu', 'gpu': False, 'int8': True, 'workers': 3,
+                   'torch_threads': 2, 'ort_threads': None, 'cv2_threads': 2}
+    assert ocr_runtime.reader_kwargs(cpu) == {'gpu': False, 'quantize': True}
+
+    gpu = ocr_runtime.resolve_profile(cpu_count=8, has_cuda=True)
+    assert gpu['device'] == 'cuda' and not gpu['int8'] and gpu['torch_threads'] is None
+    fp32 = ocr_runtime.resolve_profile(device='cpu', int8='false', threads=6, workers=2, cpu_count=8)
+    assert not fp32['int8'] and fp32['torch_threads'] == 6
+    tiled = ocr_runtime.resolve_profile(workers=2, tile_workers=2, cpu_count=8, has_cuda=False)
+    assert tiled['torch_threads'] == tiled['cv2_threads'] == 2
+    # easyocr.Reader quantizes by default; fp32 has to be asked for.
+    assert ocr_runtime.reader_kwargs(fp32) == {'gpu': False, 'quantize': False}
+    with pytest.raises(ValueError):
+        ocr_runtime.resolve_profile(device='tpu')
+    with pytest.raises(ValueError):
+        ocr_runtime.resolve_profile(int8='fp32')
+
+    with patch.object(ocr_runtime.cv2, 'setNumThreads') as set_threads:
+        ocr_runtime.apply_thread_limits(cpu)
+    set_threads.assert_called_once_with(2)
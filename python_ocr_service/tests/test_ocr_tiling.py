@@ -0,0 +1,61 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from ocr_tiling import merge_tile_results, plan_tiles, readtext_tiled, should_tile
+
+WORDS = [(20, y, 300, y + 30, f'ITEM {idx}') for idx, y in enumerate(range(40, 3950, 50))]
+
+
+class StripReader:
+    """Reads WORDS from whatever strip it gets; column 0 holds the global row index."""
+
+    def __init__(self):
+        self.strips = []
+
+    def readtext(self, strip, **kwargs):
+        top, bottom = int(strip[0, 0]), int(strip[-1, 0]) + 1
+        self.strips.append((top, bottom))
+        results = []
+        for x0, y0, x1, y1, text in WORDS:
+            if y1 <= top or y0 >= bottom:
+                continue
+            clipped_top, clipped_bottom = max(y0, top) - top, min(y1, bottom) - top
+            whole = y0 >= top and y1 <= bottom
+            results.append(([[x0, clipped_top], [x1, clipped_top], [x1, clipped_bottom], [x0, clipped_bottom]],
+                            text if whole else text[:4], 0.9 if whole else 0.6))
+        return results
+
+
+def test_tall_images_are_read_in_overlapping_strips_and_merged_once_per_word():
+    assert plan_tiles(1000, 1600, 160) == [(0, 1000)]
+    assert plan_tiles(4000, 1600, 160) == [(0, 1600), (1440, 3040), (2880, 4000)]
+    assert should_tile((4000, 640), 1600, 2.0) and not should_tile((4000, 3000), 1600, 2.0)
+
+    image = np.repeat(np.arange(4000, dtype=np.int32)[:, None], 8, axis=1)
+    reader = StripReader()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = readtext_tiled(reader, image, 1600, 160, executor=executor, detail=1)
+
+    assert sorted(reader.strips) == [(0, 1600), (1440, 3040), (2880, 4000)]
+    texts = [text for _, text, _ in sorted(results, key=lambda r: r[0][0][1])]
+    assert texts == [word[4] for word in WORDS]
+    for bbox, text, conf in results:
+        x0, y0, x1, y1, _ = WORDS[int(text.split()[1])]
+        assert bbox[0] == [x0, y0] and bbox[2] == [x1, y1] and conf == 0.9
+
+
+def test_only_boxes_inside_the_overlap_of_adjacent_strips_are_deduplicated():
+    def word(y0, text, conf, x0=20):
+        return ([[x0, y0], [x0 + 280, y0], [x0 + 280, y0 + 30], [x0, y0 + 30]], text, conf)
+
+    tiles = [(0, 1600), (1440, 3040), (2880, 4000)]
+    results = merge_tile_results(tiles, [
+        # Two overlapping readings inside one strip are not a strip-seam duplicate.
+        [word(100, 'GULA', 0.9), word(105, 'GULA 2', 0.8), word(1500, 'TELUR', 0.7)],
+        [word(1500 - 1440, 'TELUR', 0.95), word(2950 - 1440, 'KOPI', 0.9)],
+        [word(2950 - 2880, 'KOPI', 0.6)],
+    ], height=4000)
+
+    assert sorted((bbox[0][1], text, conf) for bbox, text, conf in results) == [
+        (100, 'GULA', 0.9), (105, 'GULA 2', 0.8), (1500, 'TELUR', 0.95), (2950, 'KOPI', 0.9)]
@@ -0,0 +1,91 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from ollama_pool import OllamaPool
+
+A = 'http://box-a:11434/api/generate'
+B = 'http://box-b:11434/api/generate'
+
+
+def _tags(models_by_host):
+    def fake_get(url, timeout):
+        host = url.split('//')[1].split(':')[0]
+        if host not in models_by_host:
+            raise requests.exceptions.ConnectionError(host)
+        reply = MagicMock(status_code=200)
+        reply.json.return_value = {'models': [{'name': name} for name in models_by_host[host]]}
+        return reply
+    return fake_get
+
+
+def test_requests_go_to_the_least_loaded_backend_that_has_the_model():
+    pool = OllamaPool([A, B, 'http://box-c:11434'])
+    hosts = []
+    release = threading.Event()
+
+    def fake_post(url, json, timeout):
+        hosts.append(url.split('//')[1].split(':')[0])
+        if len(hosts) == 1:
+            release.wait(2)
+        return MagicMock(status_code=200)
+
+    tags = _tags({'box-a': ['gemma3:1b'], 'box-b': ['gemma3:1b', 'gemma3:4b']})  # box-c is down
+    with patch.object(requests, 'get', side_effect=tags), patch.object(requests, 'post', side_effect=fake_post):
+        assert pool.available('gemma3:4b')
+        slow = threading.Thread(target=pool.post, args=({'model': 'gemma3:1b'}, 5))
+        slow.start()
+        while not hosts:
+            time.sleep(0.01)
+        pool.post({'model': 'gemma3:1b'}, 5)
+        pool.post({'model': 'gemma3:4b'}, 5)
+        release.set()
+        slow.join()
+
+    assert hosts == ['box-a', 'box-b', 'box-b']
+    stats = {backend['url']: backend for backend in pool.stats()['backends']}
+    assert stats['http://box-c:11434/api']['healthy'] is False
+    assert all(backend['in_flight'] == 0 for backend in stats.values())
+
+
+def test_connection_errors_fail_over_and_slow_calls_are_hedged():
+    pool = OllamaPool([A, B], hedge=True, hedge_min_samples=3)
+    pool.backends[0].checked_at = pool.backends[1].checked_at = time.monotonic()
+    down = {'box-a'}
+
+    def fake_post(url, json, timeout):
+        host = url.split('//')[1].split(':')[0]
+        if host in down:
+            raise requests.exceptions.ConnectionError(host)
+        time.sleep(0.5 if host == 'box-a' else 0.01)
+        return MagicMock(status_code=200, host=host)
+
+    with patch.object(requests, 'post', side_effect=fake_post):
+        assert pool.post({'model': 'm'}, 5).host == 'box-b'
+        assert not pool.backends[0].healthy
+        for _ in range(3):
+            pool.post({'model': 'm'}, 5)  # fast samples from box-b set a low p95
+        pool.backends[0].healthy = True
+        down.clear()
+        pool.backends[1].requests = 100  # make box-a the first choice
+        started = time.perf_counter()
+        response = pool.post({'model': 'm'}, 5)
+
+    assert response.host == 'box-b'
+    assert time.perf_counter() - started < 0.4
+    assert pool.hedges == {'fired': 1, 'won': 1}
+
+
+def test_availability_uses_cached_health_until_the_interval_passes():
+    pool = OllamaPool([A, B], health_interval=30.0)
+    tags = _tags({'box-a': ['gemma3:1b']})
+    with patch.object(requests, 'get', side_effect=tags) as get:
+        assert pool.available('gemma3:1b')
+        assert get.call_count == 2
+        for _ in range(5):
+            assert pool.available('gemma3:1b')
+        assert get.call_count == 2
+        pool.available(force=True)
+        assert get.call_count == 4
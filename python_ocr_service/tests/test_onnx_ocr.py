@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+import python_ocr_service.ocr_service_hybrid as service
+from onnx_ocr import OnnxReader, ctc_decode
+
+
+class FakeSession:
+    def __init__(self, run):
+        self._run = run
+        self.shapes = []
+
+    def get_inputs(self):
+        return [SimpleNamespace(name='image')]
+
+    def run(self, outputs, feeds):
+        self.shapes.append(feeds['image'].shape)
+        return [self._run(feeds['image'])]
+
+
+def test_ctc_decode_collapses_repeats_and_blanks():
+    probs = np.full((1, 6, 4), 0.1, dtype=np.float32)
+    for step, idx in enumerate([1, 1, 0, 1, 3, 3]):
+        probs[0, step, idx] = 0.7
+    [(text, confidence)] = ctc_decode(probs, 'abc')
+    assert text == 'aac'
+    assert 0 < confidence < 0.7
+
+
+def test_onnx_reader_returns_easyocr_tuples_for_each_word():
+    def detector(batch):
+        # Two words on one row of a 64 x 256 input: heatmaps are half size.
+        scores = np.zeros((1, batch.shape[2] // 2, batch.shape[3] // 2, 2), dtype=np.float32)
+        scores[0, 10:20, 10:40, 0] = 0.9
+        scores[0, 10:20, 60:100, 0] = 0.9
+        return scores
+
+    def recognizer(batch):
+        logits = np.zeros((batch.shape[0], 8, 4), dtype=np.float32)
+        logits[:, :, 0] = 5.0
+        logits[:, 1, 2] = 10.0  # 'b'
+        logits[:, 3, 3] = 10.0  # 'c'
+        return logits
+
+    recognizer_session = FakeSession(recognizer)
+    reader = OnnxReader(FakeSession(detector), recognizer_session, 'abc')
+    image = np.full((64, 256, 3), 255, dtype=np.uint8)
+
+    results = reader.readtext(image, detail=1, paragraph=False, width_ths=0.7, height_ths=0.7, batch_size=8)
+
+    assert [text for _, text, _ in results] == ['bc', 'bc']
+    bbox, _, confidence = results[0]
+    assert len(bbox) == 4 and bbox[0][0] < bbox[1][0] and bbox[0][1] < bbox[2][1]
+    assert 0.5 < confidence <= 1.0
+    # Both crops went through the recognizer in one padded batch.
+    assert len(recognizer_session.shapes) == 1 and recognizer_session.shapes[0][:3] == (2, 1, 64)
+    assert service.build_lines_from_results(results, tolerance=18) == ['bc bc']
@@ -0,0 +1,23 @@
+import numpy as np
+
+from benchmarks.receipt_corpus import generate_corpus, score_items
+
+
+def test_generate_corpus_is_deterministic_and_golden_matches_total():
+    first = generate_corpus(size=5, seed=7)
+    second = generate_corpus(size=5, seed=7)
+    assert [s['lines'] for s in first] == [s['lines'] for s in second]
+    assert np.array_equal(first[3]['image'], second[3]['image'])
+    for sample in first:
+        assert sample['total'] == sum(item['harga'] for item in sample['expected'])
+        assert sample['image'].ndim == 3
+
+
+def test_score_items_matches_on_price_and_fuzzy_name():
+    expected = [{'nama_barang': 'Semangka', 'harga': 15000}, {'nama_barang': 'Melon', 'harga': 20000}]
+    predicted = [
+        {'nama_barang': 'Kg Semangka', 'harga': 15000},
+        {'nama_barang': 'Melon', 'harga': 2000},
+        {'nama_barang': 'Tgl', 'harga': 2025},
+    ]
+    assert score_items(predicted, expected) == {'true_positive': 1, 'predicted': 3, 'expected': 2}
@@ -0,0 +1,51 @@
+import python_ocr_service.ocr_service_hybrid as service
+from receipt_layout import analyze_layout
+
+ITEMS = [('Gula Pasir', '2', '14.000', '28.000'), ('Minyak Goreng', '1', '18.500', '18.500'),
+         ('Telur Ayam', '3', '2.000', '6.000'), ('Tepung Terigu', '2', '11.000', '22.000'),
+         ('Kopi Bubuk', '4', '2.500', '10.000'), ('Beras Premium', '1', '65.000', '65.000')]
+
+
+def box(x0, y0, x1, y1, text, conf=0.9):
+    return ([[x0, y0], [x1, y0], [x1, y1], [x0, y1]], text, conf)
+
+
+def slanted_receipt(slope):
+    """Axis-aligned word boxes (as EasyOCR returns them) of a receipt
+    photographed `slope` dy/dx off level; rows are 34 px apart with 24 px
+    tall text."""
+    results = []
+    for row, (name, qty, unit_price, total) in enumerate(ITEMS):
+        base = 40 + row * 34
+        for x0, x1, text in ((20, 260, name), (300, 320, qty), (380, 470, unit_price), (520, 610, total)):
+            results.append(box(x0, base + slope * x0, x1, base + slope * x1 + 24, text))
+    return results
+
+
+def test_slanted_rows_are_reconstructed_with_price_column_cells():
+    layout = analyze_layout(slanted_receipt(0.08))
+
+    # Over 600 px a 0.08 slant drifts 48 px, more than a row; the fixed
+    # tolerance splits and mixes rows, the deskewed clustering does not.
+    assert len(service.group_text_by_rows(slanted_receipt(0.08), tolerance=18)) != len(ITEMS)
+    assert list(layout) == [' '.join(item) for item in ITEMS]
+    assert abs(layout.skew - 0.08) < 0.01
+    assert layout.columns['price'][0] >= 500
+    assert [row['cells'] for row in layout.rows] == [
+        {'qty': qty, 'name': f'{name} {unit_price}', 'price': total}
+        for name, qty, unit_price, total in ITEMS]
+
+
+def test_fallback_parser_takes_the_price_from_the_price_column(monkeypatch):
+    monkeypatch.setattr(service, 'OCR_LAYOUT', 'adaptive')
+    lines = service.build_lines_from_results(slanted_receipt(0.0))
+    items = service.parse_receipt_text_fallback(lines)
+    assert [item['harga'] for item in items] == [28000, 18500, 6000, 22000, 10000, 65000]
+
+    monkeypatch.setattr(service, 'OCR_LAYOUT', 'legacy')
+    legacy_lines = service.build_lines_from_results(slanted_receipt(0.0), tolerance=18)
+    assert legacy_lines == list(lines)
+    # Plain lines read a trailing '28.000' too; the cells matter when the
+    # price column is not the last token.
+    assert [item['harga'] for item in service.parse_receipt_text_fallback(legacy_lines)] == [
+        28000, 18500, 6000, 22000, 10000, 65000]
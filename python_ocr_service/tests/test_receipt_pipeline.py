@@ -0,0 +1,31 @@
+import time
+
+from receipt_pipeline import ReceiptPipeline
+
+
+def test_pipeline_overlaps_ocr_and_classification():
+    def ocr(payload):
+        time.sleep(0.1)
+        return [f"line {payload['id']}"] if payload['id'] != 2 else []
+
+    def classify(text_list):
+        time.sleep(0.1)
+        return [{'nama_barang': text_list[0]}]
+
+    pipeline = ReceiptPipeline(ocr, classify, ocr_workers=1, classify_workers=4)
+    start = time.time()
+    futures = [pipeline.submit({'id': idx}) for idx in range(4)]
+    results = [future.result(timeout=5) for future in futures]
+    elapsed = time.time() - start
+
+    # Sequential OCR + classification would take 4 * 0.2s.
+    assert elapsed < 0.7
+    assert [r['items'] for r in results] == [
+        [{'nama_barang': 'line 0'}], [{'nama_barang': 'line 1'}], [], [{'nama_barang': 'line 3'}]
+    ]
+    assert 'classify' not in results[2]['timings']
+
+    stats = pipeline.stats()
+    assert stats['stages']['ocr']['processed'] == 4
+    assert stats['stages']['classify']['processed'] == 3
+    assert stats['bottleneck'] in ('ocr', 'classify')
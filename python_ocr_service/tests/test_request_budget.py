@@ -0,0 +1,57 @@
+import time
+from unittest.mock import patch
+
+import requests
+
+import python_ocr_service.expired_prediction_service as service
+from request_budget import Deadline, RetryBudget
+
+BAHAN = {'id_bahan': 1, 'nama_bahan': 'Beras', 'kategori': 'Bahan Pokok', 'stok_bahan': 50, 'satuan': 'kg'}
+
+
+def test_deadline_from_headers_and_body():
+    absolute = Deadline.from_request({'X-Request-Deadline': str(time.time() + 30)})
+    assert 29 < absolute.remaining() <= 30
+    relative = Deadline.from_request({'X-Request-Timeout': '10'}, margin=2)
+    assert 7 < relative.remaining() <= 8
+    assert relative.clamp(240) <= 8
+    from_body = Deadline.from_request({}, {'timeout_seconds': 5})
+    assert from_body.bounded and not from_body.expired()
+    unbounded = Deadline.from_request({}, {})
+    assert unbounded.remaining() is None and unbounded.clamp(240) == 240
+
+
+def test_retry_budget_caps_retries_to_a_fraction_of_requests():
+    budget = RetryBudget(ratio=0.25, min_per_second=0.0, max_tokens=1.0)
+    budget._tokens = 0.0
+    allowed = 0
+    for _ in range(20):
+        budget.record_request()
+        if budget.try_retry():
+            allowed += 1
+    assert allowed == 5
+    assert budget.stats()['rejected'] == 15
+
+
+def test_exhausted_budget_stops_ollama_retries():
+    empty = RetryBudget(ratio=0.0, min_per_second=0.0, max_tokens=0.0)
+    with patch.object(service, 'retry_budget', empty), \
+            patch.object(service.requests, 'post', side_effect=requests.exceptions.ConnectionError) as post:
+        assert service.call_ollama_api('halo', timeout=5, retry=2) is None
+    assert post.call_count == 1
+    assert empty.stats()['rejected'] == 1
+
+
+def test_expired_deadline_abandons_work():
+    client = service.app.test_client()
+    past = {'X-Request-Deadline': str(time.time() - 1)}
+    with patch.object(service, 'is_ollama_available', return_value=True), \
+            patch.object(service, 'call_ollama_api') as ollama:
+        single = client.post('/predict-expiration', json={'bahan': BAHAN}, headers=past)
+        batch = client.post('/predict-expiration-batch', json={'bahan_list': [BAHAN, BAHAN]}, headers=past)
+
+    assert single.status_code == 504
+    assert single.get_json()['data']['deadline_exceeded'] is True
+    data = batch.get_json()['data']
+    assert data['gagal'] == 2 and data['dilewati_deadline'] == 2
+    ollama.assert_not_called()
@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+import python_ocr_service.expired_prediction_service as service
+from benchmarks.mock_ollama import default_response
+from shelf_life_kb import ShelfLifeKB, normalize_key
+
+
+def test_entries_are_keyed_by_normalized_name_and_expire_by_ttl_or_version(tmp_path):
+    kb = ShelfLifeKB(str(tmp_path / 'kb.sqlite3'), ttl_days=30, version=2)
+    assert normalize_key('Beras  5 kg') == normalize_key('beras') == 'beras'
+
+    assert kb.store('Beras 5 kg', 'Bahan Pokok', 365, 'Beras tahan 365 hari', 90)
+    assert kb.lookup('BERAS', 'bahan pokok')['estimasi_hari'] == 365
+    assert kb.lookup('Beras', 'Sayuran') is None
+    assert not kb.store('Beras', 'Bahan Pokok', 10, 'ragu', 20)  # below min_confidence
+
+    kb._conn.execute('UPDATE shelf_life SET updated_at = ?', (time.time() - 31 * 86400,))
+    assert kb.lookup('Beras', 'Bahan Pokok') is None
+    newer = ShelfLifeKB(kb.path, ttl_days=0, version=3)
+    assert newer.lookup('Beras', 'Bahan Pokok') is None
+
+    assert kb.store('Ayam Potong', 'Daging', 2, 'Ayam Potong tahan 2 hari di kulkas', 100, source='manual')
+    assert not kb.store('Ayam Potong', 'Daging', 5, 'Ayam Potong 5 hari', 95)
+    assert newer.lookup('ayam potong', 'daging')['estimasi_hari'] == 2
+
+    hits = newer.get('Ayam Potong', 'Daging')['hits']
+    found = newer.lookup_many([('AYAM POTONG', 'Daging'), ('Ayam Potong 1 kg', 'daging'), ('Beras', 'Bahan Pokok'),
+                               ('Kecap', '')])
+    assert sorted(found) == [('AYAM POTONG', 'Daging'), ('Ayam Potong 1 kg', 'daging')]
+    assert newer.get('Ayam Potong', 'Daging')['hits'] == hits
+
+
+def test_batch_only_calls_the_llm_for_unseen_ingredients(tmp_path):
+    kb = ShelfLifeKB(str(tmp_path / 'kb.sqlite3'))
+    prompts = []
+
+    def fake_ollama(prompt, **kwargs):
+        prompts.append(prompt)
+        return default_response(prompt)
+
+    bahan_list = [
+        {'id_bahan': 1, 'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 20,
+         'satuan': 'liter', 'terakhir_update': '2026-01-01'},
+        {'id_bahan': 2, 'nama_bahan': 'Minyak Goreng', 'kategori': 'Bahan Pokok', 'stok_bahan': 3,
+         'satuan': 'liter', 'terakhir_update': '2026-03-01'},
+        {'id_bahan': 3, 'nama_bahan': 'Gula Pasir', 'kategori': 'Bahan Pokok', 'stok_bahan': 8, 'satuan': 'kg'},
+    ]
+    client = service.app.test_client()
+    with patch.object(service, 'shelf_life_kb', kb), \
+            patch.object(service, 'call_ollama_api', side_effect=fake_ollama), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        first = client.post('/predict-expiration-batch', json={'bahan_list': bahan_list}).get_json()['data']
+        calls_after_first = len(prompts)
+        second = client.post('/predict-expiration-batch', json={'bahan_list': bahan_list, 'packed': True})
+        second = second.get_json()['data']
+
+    assert first['berhasil'] == 3 and first['dari_knowledge_base'] == 1
+    assert calls_after_first == 2
+    assert len(prompts) == calls_after_first
+    assert second['dari_knowledge_base'] == 3 and second['packing']['llm_calls'] == 0
+    days = second['predictions'][0]['prediction']['days']
+    assert second['predictions'][0]['prediction']['expired_date'] == \
+        (service.datetime(2026, 1, 1) + service.timedelta(days=days)).strftime('%Y-%m-%d')
+    assert second['predictions'][1]['prediction']['expired_date'] == \
+        (service.datetime(2026, 3, 1) + service.timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+def test_override_endpoint_replaces_llm_answer(tmp_path):
+    kb = ShelfLifeKB(str(tmp_path / 'kb.sqlite3'))
+    client = service.app.test_client()
+    with patch.object(service, 'shelf_life_kb', kb), \
+            patch.object(service, 'call_ollama_api') as ollama:
+        put = client.put('/shelf-life', json={'nama_bahan': 'Tahu', 'kategori': 'Protein', 'estimasi_hari': 3})
+        resp = client.post('/predict-expiration', json={'bahan': {'nama_bahan': 'tahu', 'kategori': 'Protein'}})
+        listed = client.get('/shelf-life?q=tahu').get_json()['data']
+
+    assert put.status_code == 200 and put.get_json()['data']['source'] == 'manual'
+    assert resp.get_json()['data']['prediction']['days'] == 3
+    assert resp.get_json()['data']['source'] == 'knowledge_base'
+    assert ollama.call_count == 0
+    assert listed['entries'][0]['hits'] == 1
+
+
+def test_list_endpoint_rejects_bad_paging_and_clamps_limit(tmp_path):
+    kb = ShelfLifeKB(str(tmp_path / 'kb.sqlite3'))
+    for name in ('Tahu', 'Tempe', 'Telur'):
+        kb.store(name, 'Protein', 3, f'{name} tahan 3 hari', 90)
+    client = service.app.test_client()
+    with patch.object(service, 'shelf_life_kb', kb):
+        bad = client.get('/shelf-life?limit=abc')
+        negative = client.get('/shelf-life?limit=-1').get_json()['data']['entries']
+        shifted = client.get('/shelf-life?limit=5&offset=-2').get_json()['data']['entries']
+
+    assert bad.status_code == 400 and not bad.get_json()['success']
+    assert len(negative) == 1
+    assert len(shifted) == 3
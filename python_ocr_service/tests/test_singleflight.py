@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+import python_ocr_service.expired_prediction_service as service
+from benchmarks.mock_ollama import default_response
+from metrics import MetricsRegistry
+from singleflight import SingleFlight, request_key
+
+
+def test_concurrent_callers_share_one_execution_and_its_error():
+    flight = SingleFlight('test', MetricsRegistry())
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def work(value):
+        runs.append(value)
+        started.set()
+        release.wait(2)
+        if value == 'boom':
+            raise RuntimeError(value)
+        return value
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(flight.do, 'k', work, 'a')
+        started.wait(2)
+        followers = [pool.submit(flight.do, 'k', work, 'a') for _ in range(3)]
+        while flight._calls['k'].waiters < 3:
+            time.sleep(0.01)
+        release.set()
+        assert leader.result() == ('a', False)
+        assert [f.result() for f in followers] == [('a', True)] * 3
+    assert runs == ['a']
+    assert flight.stats() == {'in_flight': 0, 'leaders': 1, 'coalesced': 3, 'wait_timeouts': 0, 'reruns': 0}
+
+    release.clear()
+    started.clear()
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'k', work, 'boom')
+        started.wait(2)
+        follower = pool.submit(flight.do, 'k', work, 'boom')
+        while flight._calls['k'].waiters < 1:
+            time.sleep(0.01)
+        release.set()
+        with pytest.raises(RuntimeError):
+            follower.result()
+        with pytest.raises(RuntimeError):
+            leader.result()
+
+    assert request_key({'a': 1, 'b': 2}) == request_key({'b': 2, 'a': 1})
+
+
+def test_waiter_reruns_a_failed_result_it_still_has_time_for():
+    flight = SingleFlight('test', MetricsRegistry())
+    started = threading.Event()
+    release = threading.Event()
+    runs = []
+
+    def work(budget):
+        runs.append(budget)
+        if budget == 'spent':
+            started.set()
+            release.wait(2)
+            return {'success': False, 'deadline_exceeded': True}
+        return {'success': True}
+
+    share_if = lambda value: value['success']
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, 'k', work, 'spent', share_if=share_if)
+        started.wait(2)
+        follower = pool.submit(flight.do, 'k', work, 'fresh', share_if=share_if)
+        while flight._calls['k'].waiters < 1:
+            time.sleep(0.01)
+        release.set()
+        assert leader.result() == ({'success': False, 'deadline_exceeded': True}, False)
+        assert follower.result() == ({'success': True}, False)
+    assert runs == ['spent', 'fresh']
+    assert flight.stats()['reruns'] == 1 and flight.stats()['coalesced'] == 0
+
+
+def test_duplicate_predictions_for_the_same_bahan_run_one_generation():
+    bahan = {'id_bahan': 7, 'nama_bahan': 'Tahu', 'kategori': 'Protein', 'stok_bahan': 5, 'satuan': 'pcs'}
+    twin = dict(bahan, nama_bahan='  tahu ')
+    gate = threading.Event()
+    prompts = []
+
+    def slow_ollama(prompt, **kwargs):
+        prompts.append(prompt)
+        gate.wait(2)
+        return default_response(prompt)
+
+    with patch.object(service, 'call_ollama_api', side_effect=slow_ollama), \
+            patch.object(service, 'is_ollama_available', return_value=True):
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            first = pool.submit(service.predict_expiration, bahan, use_kb=False)
+            while not prompts:
+                time.sleep(0.01)
+            second = pool.submit(service.predict_expiration, twin, use_kb=False)
+            while not any(call.waiters for call in list(service.predict_flight._calls.values())):
+                time.sleep(0.01)
+            gate.set()
+            first, second = first.result(), second.result()
+
+    assert len(prompts) == 1
+    assert first['prediction'] == second['prediction']
+    assert second['bahan'] is twin and second['ollama_usage']['calls'] == 0
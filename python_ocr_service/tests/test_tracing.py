@@ -0,0 +1,88 @@
+import io
+import json
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+
+import python_ocr_service.ocr_service_hybrid as service
+import tracing
+
+
+class FakeReader:
+    def readtext(self, img, **kwargs):
+        return [([[0, 0], [200, 0], [200, 20], [0, 20]], 'GULA PASIR 15000', 0.9)]
+
+
+def _ollama_reply(url, json, timeout):
+    reply = MagicMock(status_code=200)
+    if 'JSON array' in json['prompt']:
+        text = '[{"nama_barang": "Gula Pasir", "jumlah": 1, "satuan": "1 kg", "harga": 15000}]'
+    else:
+        text = 'GULA PASIR 15000'
+    reply.json.return_value = {'response': text, 'prompt_eval_count': 120, 'eval_count': 30,
+                               'eval_duration': 600_000_000, 'total_duration': 900_000_000}
+    return reply
+
+
+def _names(node):
+    yield node['name']
+    for child in node.get('children', []):
+        yield from _names(child)
+
+
+def _find(node, name):
+    if node['name'] == name:
+        return node
+    for child in node.get('children', []):
+        found = _find(child, name)
+        if found:
+            return found
+    return None
+
+
+def test_trace_flag_returns_span_tree_across_pipeline_threads():
+    ok, png = cv2.imencode('.png', np.full((40, 60, 3), 255, np.uint8))
+    client = service.app.test_client()
+    with patch.object(service, 'easyocr_available', True), \
+            patch.object(service, 'easyocr_reader', FakeReader()), \
+            patch.object(service.upload_archiver, 'submit'), \
+            patch.object(service, 'USE_FULLTEXT_CLASSIFIER', True), \
+            patch.object(service.requests, 'post', side_effect=_ollama_reply):
+        plain = client.post('/process-photo', data={'image': (io.BytesIO(png.tobytes()), 'a.png')},
+                            content_type='multipart/form-data')
+        traced = client.post('/process-photo?trace=1', data={'image': (io.BytesIO(png.tobytes()), 'a.png')},
+                             content_type='multipart/form-data')
+
+    assert 'trace' not in plain.get_json()
+    trace = traced.get_json()['trace']
+    names = set(_names(trace))
+    assert {'decode', 'ocr', 'preprocess', 'readtext', 'classify', 'classify_fulltext',
+            'stage1_normalize', 'stage2_extract', 'llm'} <= names
+    assert _find(trace, 'ocr')['attrs']['variant'] == 'original'
+    llm = _find(_find(trace, 'stage2_extract'), 'llm')
+    assert llm['attrs']['purpose'] == 'fulltext_extract'
+    assert llm['attrs']['eval_count'] == 30 and llm['attrs']['eval_duration_ms'] == 600.0
+    assert llm['attrs']['prompt_chars'] > 0
+    assert trace['attrs']['items'] == 1
+
+
+def test_slow_traces_are_kept_in_a_bounded_ring_buffer():
+    buffer = tracing.SlowTraceBuffer(capacity=2, threshold=0.0001)
+    ids = []
+    for idx in range(3):
+        with tracing.trace('process-photo', index=idx) as current:
+            with tracing.span('ocr'):
+                sum(range(20000))
+        assert buffer.offer(current)
+        ids.append(current.trace_id)
+
+    listed = buffer.list()
+    assert [entry['trace_id'] for entry in listed] == [ids[2], ids[1]]
+    assert buffer.get(ids[0]) is None
+    assert buffer.get(ids[2])['children'][0]['name'] == 'ocr'
+
+    with patch.object(service, 'slow_traces', buffer):
+        body = service.app.test_client().get('/traces/slow').get_json()
+    assert body['data']['sampled'] == 3 and len(body['data']['traces']) == 2
+    assert json.dumps(body)
@@ -0,0 +1,46 @@
+import os
+import time
+
+import cv2
+import numpy as np
+
+from upload_archive import UploadArchiver
+
+
+def test_submit_writes_in_background_and_off_mode_skips(tmp_path):
+    archiver = UploadArchiver(str(tmp_path), mode='async', compression='gzip')
+    name = archiver.submit(b"fake-image-bytes", "struk.png")
+    assert archiver.flush(timeout=5)
+    assert (tmp_path / f"{name}.png.gz").exists()
+
+    disabled = UploadArchiver(str(tmp_path / 'off'), mode='off')
+    assert disabled.submit(b"fake-image-bytes") is None
+    assert not (tmp_path / 'off').exists()
+
+
+def test_retention_removes_old_then_oldest_until_under_budget(tmp_path):
+    now = time.time()
+    for idx, age_days in enumerate([30, 3, 2, 1]):
+        path = tmp_path / f"receipt_{idx}.jpg"
+        path.write_bytes(b"x" * 600 * 1024)
+        mtime = now - age_days * 86400
+        os.utime(path, (mtime, mtime))
+    (tmp_path / ".gitkeep").write_bytes(b"")
+
+    archiver = UploadArchiver(str(tmp_path), max_age_days=14, max_total_mb=1.2)
+    assert archiver.enforce_retention() == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['.gitkeep', 'receipt_2.jpg', 'receipt_3.jpg']
+
+
+def test_jpeg_mode_names_the_file_after_what_was_written(tmp_path):
+    archiver = UploadArchiver(str(tmp_path), compression='jpeg')
+    # Not decodable, so the original bytes (and extension) are kept.
+    kept = archiver.submit(b"not-an-image", "struk.png")
+    noise = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    ok, bmp = cv2.imencode('.bmp', noise)
+    assert ok
+    reencoded = archiver.submit(bmp.tobytes(), "struk.bmp")
+    assert archiver.flush(timeout=5)
+
+    assert (tmp_path / f"{kept}.png").read_bytes() == b"not-an-image"
+    assert (tmp_path / f"{reencoded}.jpg").exists()
@@ -11,6 +11,18 @@ def test_generic_cleanup_normalizes_common_noise():
     assert "RR" in cleaned  # still present before stripping
 
 
+def test_generic_cleanup_matches_needles_literally():
+    # 'Bks.' is an abbreviation, not a regex: the next letter must survive.
+    assert service.generic_cleanup("5 Bks Masako") == "5 Bks Masako"
+    assert service.generic_cleanup("5 Bks. Masako") == "5 Bks Masako"
+    assert service.clean_nama_barang("3 Bks Mie Instan 82500") == "Mie Instan"
+
+
+def test_date_lines_are_not_parsed_as_items():
+    items = service.parse_receipt_text_fallback(['Tgl 08-02-2025', 'Tanggal 8/2/25', '1 Kg Mangga 12500'])
+    assert [(item['nama_barang'], item['harga']) for item in items] == [('Kg Mangga', 12500)]
+
+
 def test_extract_harga_from_text_handles_formats():
     assert service.extract_harga_from_text("Rp 12.000") == 12000
     assert service.extract_harga_from_text("1-50d") == 15000
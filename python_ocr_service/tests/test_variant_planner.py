@@ -0,0 +1,47 @@
+from unittest.mock import patch
+
+import numpy as np
+
+import python_ocr_service.ocr_service_hybrid as service
+from metrics import MetricsRegistry
+from variant_planner import VariantPlanner, image_stats, stats_bucket
+
+VARIANTS = ['original', 'gray', 'clahe', 'thresh']
+
+
+class CountingReader:
+    def __init__(self):
+        self.calls = 0
+
+    def readtext(self, img, **kwargs):
+        self.calls += 1
+        return [([[0, y], [200, y], [200, y + 20], [0, y + 20]], f'ITEM {y} 15000', 0.9) for y in range(0, 240, 40)]
+
+
+def test_planner_learns_the_winning_variant_per_image_bucket_and_prunes_the_rest():
+    dark = np.full((300, 200, 3), 30, np.uint8)
+    planner = VariantPlanner(min_samples=3, explore_rate=0.0, metrics=MetricsRegistry())
+    assert stats_bucket(image_stats(dark)).startswith('dark/low')
+    assert planner.plan(dark, VARIANTS).order == VARIANTS
+
+    for _ in range(3):
+        plan = planner.plan(dark, VARIANTS)
+        planner.record(plan, 'thresh', passes=4)
+    plan = planner.plan(dark, VARIANTS)
+    assert plan.order == ['thresh']
+    assert planner.plan(dark, VARIANTS, prune=False).order[0] == 'thresh'
+    # A different kind of photo falls back to the global winners, unpruned.
+    assert planner.plan(np.full((300, 200, 3), 240, np.uint8), VARIANTS).order == \
+        ['thresh', 'original', 'gray', 'clahe']
+
+    reader = CountingReader()
+    with patch.object(service, 'variant_planner', planner), \
+            patch.object(service, 'easyocr_available', True), patch.object(service, 'easyocr_reader', reader), \
+            patch.object(service.cv2, 'createCLAHE', side_effect=AssertionError('clahe computed')):
+        lines = service.extract_text_from_image(dark, profile='balanced')
+
+    assert len(lines) == 6 and reader.calls == 1
+    stats = planner.stats()
+    # Only the very first receipt had no history to go on.
+    assert stats['planned'] == 4 and stats['first_choice'] == 3
+    assert stats['buckets'][plan.bucket] == {'thresh': 4}
@@ -0,0 +1,162 @@
+import contextvars
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('trace_span', default=None)
+
+TRACE_HEADER = 'X-Debug-Trace'
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'start', 'end', 'attrs', 'children')
+
+    def __init__(self, trace: 'Trace', name: str, attrs: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+        self.attrs = attrs
+        self.children: List['Span'] = []
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        end = self.end if self.end is not None else time.perf_counter()
+        node = {
+            'name': self.name,
+            'start_ms': round((self.start - origin) * 1000, 1),
+            'duration_ms': round((end - self.start) * 1000, 1),
+        }
+        if self.attrs:
+            node['attrs'] = dict(self.attrs)
+        if self.children:
+            node['children'] = [child.to_dict(origin) for child in self.children]
+        return node
+
+
+class Trace:
+    """Span tree of one request. Spans may be opened from pipeline worker
+    threads (the submitting context is copied into the job), so child lists
+    are only touched under the trace lock."""
+
+    def __init__(self, name: str, **attrs):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.created_at = time.time()
+        self.lock = threading.Lock()
+        self.root = Span(self, name, attrs)
+
+    @property
+    def duration(self) -> float:
+        end = self.root.end if self.root.end is not None else time.perf_counter()
+        return end - self.root.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            tree = self.root.to_dict(self.root.start)
+        return {'trace_id': self.trace_id, 'started_at': self.created_at, **tree}
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_span(name: str, **attrs) -> Optional[Span]:
+    """Child of the current span that the caller finishes itself; None when
+    no trace is active."""
+    parent = _current_span.get()
+    if parent is None:
+        return None
+    span = Span(parent.trace, name, attrs)
+    with parent.trace.lock:
+        parent.children.append(span)
+    return span
+
+
+@contextmanager
+def activate(span: Optional[Span]):
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a stage as a child of the current span. A no-op outside a trace."""
+    child = start_span(name, **attrs)
+    if child is None:
+        yield None
+        return
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def annotate(**attrs):
+    current = _current_span.get()
+    if current is not None:
+        current.set(**attrs)
+
+
+@contextmanager
+def trace(name: str, **attrs):
+    new_trace = Trace(name, **attrs)
+    token = _current_span.set(new_trace.root)
+    try:
+        yield new_trace
+    finally:
+        new_trace.root.finish()
+        _current_span.reset(token)
+
+
+def trace_requested(headers, args) -> bool:
+    flag = headers.get(TRACE_HEADER) or args.get('trace') or ''
+    return flag.lower() in ('1', 'true', 'yes')
+
+
+class SlowTraceBuffer:
+    """Keeps the last `capacity` traces slower than `threshold` seconds."""
+
+    def __init__(self, capacity: int = 50, threshold: float = 30.0):
+        self.threshold = threshold
+        self._traces: deque = deque(maxlen=max(1, capacity))
+        self._lock = threading.Lock()
+        self.sampled = 0
+
+    def offer(self, finished: Trace) -> bool:
+        if self.threshold <= 0 or finished.duration < self.threshold:
+            return False
+        snapshot = finished.to_dict()
+        with self._lock:
+            self._traces.append(snapshot)
+            self.sampled += 1
+        return True
+
+    def list(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = list(self._traces)
+        return [
+            {'trace_id': t['trace_id'], 'started_at': t['started_at'], 'name': t['name'],
+             'duration_ms': t['duration_ms'], 'attrs': t.get('attrs', {})}
+            for t in reversed(traces)
+        ]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for t in self._traces:
+                if t['trace_id'] == trace_id:
+                    return t
+        return None
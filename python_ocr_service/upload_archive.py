@@ -0,0 +1,220 @@
+import gzip
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+
+logger = logging.getLogger("ocr_service.upload_archive")
+
+ARCHIVE_MODES = ('async', 'off')
+COMPRESSION_MODES = ('none', 'gzip', 'jpeg')
+ALLOWED_EXTENSIONS = ('jpg', 'jpeg', 'png', 'webp', 'bmp')
+
+
+class UploadArchiver:
+    """Writes uploaded receipt images to disk from a background thread.
+
+    The request path only enqueues the raw bytes; encoding, writing and the
+    retention sweep (by age and total folder size) happen on the writer thread.
+    """
+
+    def __init__(self,
+                 folder: str,
+                 mode: str = 'async',
+                 compression: str = 'none',
+                 jpeg_quality: int = 75,
+                 max_age_days: float = 14,
+                 max_total_mb: float = 500,
+                 queue_size: int = 32,
+                 cleanup_interval: float = 300):
+        if mode not in ARCHIVE_MODES:
+            logger.warning("Unknown upload archive mode %s, using 'off'", mode)
+            mode = 'off'
+        if compression not in COMPRESSION_MODES:
+            logger.warning("Unknown upload compression %s, using 'none'", compression)
+            compression = 'none'
+        self.folder = folder
+        self.mode = mode
+        self.compression = compression
+        self.jpeg_quality = jpeg_quality
+        self.max_age_seconds = max_age_days * 86400 if max_age_days > 0 else None
+        self.max_total_bytes = int(max_total_mb * 1024 * 1024) if max_total_mb > 0 else None
+        self.cleanup_interval = cleanup_interval
+        self.stats = {'queued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'deleted': 0}
+        self._queue: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._last_cleanup = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != 'off'
+
+    def submit(self, image_bytes: bytes, original_filename: Optional[str] = None) -> Optional[str]:
+        """Queue an upload for archiving and return the archive name. The
+        writer adds the extension once it knows what it encoded (a jpeg
+        re-encode that would not be smaller keeps the original format).
+
+        Never blocks: when the writer falls behind the upload is dropped.
+        """
+        if not self.enabled or not image_bytes:
+            return None
+        self._ensure_started()
+        name = self._build_name()
+        try:
+            self._queue.put_nowait((name, self._original_extension(original_filename), image_bytes))
+        except queue.Full:
+            self._count('dropped', 1)
+            logger.warning("Upload archive queue full; dropping %s", name)
+            return None
+        self._count('queued', 1)
+        return name
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued upload has been written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def enforce_retention(self) -> int:
+        """Delete archived uploads older than the max age, then the oldest
+        ones until the folder fits the size budget. Returns deleted count."""
+        if not os.path.isdir(self.folder):
+            return 0
+        entries = []
+        for name in os.listdir(self.folder):
+            if not name.startswith('receipt_'):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+
+        now = time.time()
+        deleted = 0
+        remaining = []
+        for mtime, size, path in entries:
+            if self.max_age_seconds is not None and now - mtime > self.max_age_seconds:
+                deleted += self._remove(path)
+            else:
+                remaining.append((mtime, size, path))
+
+        if self.max_total_bytes is not None:
+            total = sum(size for _, size, _ in remaining)
+            for mtime, size, path in remaining:
+                if total <= self.max_total_bytes:
+                    break
+                if self._remove(path):
+                    deleted += 1
+                    total -= size
+
+        if deleted:
+            self._count('deleted', deleted)
+            logger.info("Upload retention removed %s archived images", deleted)
+        return deleted
+
+    def _count(self, key: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[key] += amount
+
+    def _remove(self, path: str) -> int:
+        try:
+            os.remove(path)
+            return 1
+        except OSError as exc:
+            logger.warning("Failed to remove archived upload %s: %s", path, exc)
+            return 0
+
+    @staticmethod
+    def _build_name() -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        unique_id = str(uuid.uuid4())[:8]
+        return f"receipt_{timestamp}_{unique_id}"
+
+    @staticmethod
+    def _original_extension(original_filename: Optional[str]) -> str:
+        if original_filename and '.' in original_filename:
+            candidate = original_filename.rsplit('.', 1)[1].lower()
+            if candidate in ALLOWED_EXTENSIONS:
+                return candidate
+        return 'jpg'
+
+    def _encode(self, image_bytes: bytes, ext: str) -> Tuple[bytes, str]:
+        """The bytes to write and the file extension matching them."""
+        if self.compression == 'gzip':
+            return gzip.compress(image_bytes, compresslevel=6), f"{ext}.gz"
+        if self.compression == 'jpeg':
+            import cv2
+            import numpy as np
+            img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+            if img is None:
+                return image_bytes, ext
+            ok, encoded = cv2.imencode('.jpg', img, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            if ok and len(encoded) < len(image_bytes):
+                return encoded.tobytes(), 'jpg'
+        return image_bytes, ext
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="upload-archiver", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                name, ext, image_bytes = self._queue.get(timeout=self.cleanup_interval)
+            except queue.Empty:
+                self._maybe_cleanup(force=True)
+                continue
+            try:
+                data, ext = self._encode(image_bytes, ext)
+                os.makedirs(self.folder, exist_ok=True)
+                path = os.path.join(self.folder, f"{name}.{ext}")
+                with open(path, 'wb') as f:
+                    f.write(data)
+                self._count('written', 1)
+                logger.debug("Archived upload %s", path)
+            except Exception as exc:
+                self._count('failed', 1)
+                logger.error("Error archiving upload %s: %s", name, exc)
+            finally:
+                self._queue.task_done()
+            self._maybe_cleanup()
+
+    def _maybe_cleanup(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_cleanup < self.cleanup_interval:
+            return
+        self._last_cleanup = now
+        try:
+            self.enforce_retention()
+        except Exception as exc:
+            logger.error("Upload retention error: %s", exc)
+
+
+def create_archiver_from_env(default_folder: str = 'uploads') -> UploadArchiver:
+    return UploadArchiver(
+        folder=os.getenv('UPLOAD_FOLDER', default_folder),
+        mode=os.getenv('UPLOAD_ARCHIVE_MODE', 'async').lower(),
+        compression=os.getenv('UPLOAD_ARCHIVE_COMPRESSION', 'none').lower(),
+        jpeg_quality=int(os.getenv('UPLOAD_ARCHIVE_JPEG_QUALITY', '75')),
+        max_age_days=float(os.getenv('UPLOAD_RETENTION_DAYS', '14')),
+        max_total_mb=float(os.getenv('UPLOAD_RETENTION_MAX_MB', '500')),
+        queue_size=int(os.getenv('UPLOAD_ARCHIVE_QUEUE_SIZE', '32')),
+        cleanup_interval=float(os.getenv('UPLOAD_RETENTION_INTERVAL', '300')),
+    )
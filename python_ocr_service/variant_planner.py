@@ -0,0 +1,115 @@
+import random
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+THUMBNAIL_SIDE = 256
+
+
+def image_stats(image: np.ndarray) -> Dict[str, float]:
+    """Brightness, contrast, clipped shadows/highlights, sharpness and noise
+    of a small grayscale thumbnail (well under a millisecond)."""
+    gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    scale = THUMBNAIL_SIDE / max(gray.shape[:2])
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    hist = np.bincount(gray.ravel(), minlength=256) / gray.size
+    return {
+        'brightness': float(gray.mean()),
+        'contrast': float(gray.std()),
+        'dark_share': float(hist[:32].sum()),
+        'bright_share': float(hist[224:].sum()),
+        'sharpness': float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        'noise': float(np.abs(gray.astype(np.int16) - cv2.medianBlur(gray, 3)).mean()),
+    }
+
+
+def stats_bucket(stats: Dict[str, float]) -> str:
+    """Coarse class of similar photos, e.g. 'dark/low/blurry/clean'."""
+    brightness = 'dark' if stats['brightness'] < 90 else 'bright' if stats['brightness'] > 190 else 'mid'
+    contrast = 'low' if stats['contrast'] < 40 else 'high'
+    sharpness = 'blurry' if stats['sharpness'] < 100 else 'sharp'
+    noise = 'noisy' if stats['noise'] > 8 else 'clean'
+    return '/'.join((brightness, contrast, sharpness, noise))
+
+
+class VariantPlan:
+    __slots__ = ('bucket', 'order', 'stats')
+
+    def __init__(self, bucket: str, order: List[str], stats: Dict[str, float]):
+        self.bucket = bucket
+        self.order = order
+        self.stats = stats
+
+
+class VariantPlanner:
+    """Orders (and prunes) preprocessing variants by which one won before
+    for photos in the same stats bucket.
+
+    Until a bucket has `min_samples` receipts the global win counts are
+    used, then the profile order. Once the bucket has enough history,
+    variants that won less than `prune_share` of it are skipped; an
+    `explore_rate` share of receipts still runs the full list so a pruned
+    variant can earn its place back.
+    """
+
+    def __init__(self, min_samples: int = 5, prune_share: float = 0.05, explore_rate: float = 0.05,
+                 metrics=None, rng: Optional[random.Random] = None):
+        self.min_samples = min_samples
+        self.prune_share = prune_share
+        self.explore_rate = explore_rate
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._wins: Dict[str, Counter] = {}
+        self._global = Counter()
+        self.counts = {'planned': 0, 'first_choice': 0, 'passes': 0, 'pruned': 0, 'explored': 0}
+        self._outcomes = self._passes = None
+        if metrics is not None:
+            self._outcomes = metrics.counter('ocr_variant_plan_total',
+                                             'Receipts by whether the first planned variant won')
+            self._passes = metrics.histogram('ocr_variant_passes', 'readtext passes per receipt',
+                                             buckets=(1, 2, 3, 4, 5))
+
+    def plan(self, image: np.ndarray, variants: Sequence[str], prune: bool = True) -> VariantPlan:
+        stats = image_stats(image)
+        bucket = stats_bucket(stats)
+        with self._lock:
+            wins = self._wins.get(bucket, Counter())
+            history = wins if sum(wins.values()) >= self.min_samples else self._global
+            position = {name: idx for idx, name in enumerate(variants)}
+            order = sorted(variants, key=lambda name: (-history[name], position[name]))
+            total = sum(wins.values())
+            if prune and total >= self.min_samples:
+                if self._rng.random() < self.explore_rate:
+                    self.counts['explored'] += 1
+                else:
+                    kept = [order[0]] + [name for name in order[1:] if wins[name] / total >= self.prune_share]
+                    self.counts['pruned'] += len(order) - len(kept)
+                    order = kept
+        return VariantPlan(bucket, order, stats)
+
+    def record(self, plan: VariantPlan, winner: Optional[str], passes: int):
+        first_choice = winner is not None and winner == plan.order[0]
+        with self._lock:
+            if winner is not None:
+                self._wins.setdefault(plan.bucket, Counter())[winner] += 1
+                self._global[winner] += 1
+            self.counts['planned'] += 1
+            self.counts['passes'] += passes
+            self.counts['first_choice'] += int(first_choice)
+        if self._outcomes is not None:
+            self._outcomes.inc(outcome='first_choice' if first_choice else 'later' if winner else 'none')
+            self._passes.observe(passes)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            planned = self.counts['planned']
+            return {
+                **self.counts,
+                'first_choice_hit_rate': round(self.counts['first_choice'] / planned, 3) if planned else None,
+                'avg_passes': round(self.counts['passes'] / planned, 2) if planned else None,
+                'buckets': {bucket: dict(wins) for bucket, wins in self._wins.items()},
+            }